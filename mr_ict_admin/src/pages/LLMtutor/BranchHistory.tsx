@@ -14,12 +14,26 @@ const BranchHistory = ({ lessonId, onSelectBranch }) => {
         return res.json();
       })
       .then((data) => {
-        setBranches(data);
+        setBranches(data.branches);
       })
       .catch((error) => {
         console.error('Error fetching branches:', error);
       });
   }, [lessonId]);
+
+  const selectBranch = (branch) => {
+    fetch(`${baseUrl}llm-tutor/api/branches/${lessonId}/${branch.branch_id}/`)
+      .then((res) => {
+        if (!res.ok) {
+          throw new Error('Failed to fetch branch');
+        }
+        return res.json();
+      })
+      .then((data) => onSelectBranch(data.code, branch.step.step_number))
+      .catch((error) => {
+        console.error('Error fetching branch:', error);
+      });
+  };
   
   
   return (
@@ -30,7 +44,7 @@ const BranchHistory = ({ lessonId, onSelectBranch }) => {
           <li key={branch.branch_id} className="py-1">
             <button
               className="text-blue-600 hover:underline"
-              onClick={() => onSelectBranch(branch.code, branch.step.step_number)}
+              onClick={() => selectBranch(branch)}
             >
               Step {branch.step.step_number} - {branch.timestamp}
             </button>
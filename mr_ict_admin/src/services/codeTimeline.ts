@@ -0,0 +1,173 @@
+import api from './apiClient';
+
+// Code snapshots arrive as a seekable timeline: an index of chunks, each one a
+// keyframe (full code) followed by deltas against the previous event.
+// A delta is a list of ops: a positive number keeps that many characters, a
+// negative number deletes that many, a string is inserted; the rest is kept.
+
+export type CodeTimelineOp = number | string;
+
+export interface CodeTimelineChunkInfo {
+  index: number;
+  start: number;
+  end: number;
+  count: number;
+}
+
+export interface CodeTimelineIndex {
+  url: string | null;
+  version: number;
+  count: number;
+  duration: number;
+  chunks: CodeTimelineChunkInfo[];
+}
+
+export interface CodeTimelineEvent {
+  t: number;
+  id: number;
+  code?: string;
+  ops?: CodeTimelineOp[];
+  cursor?: Record<string, unknown>;
+  scroll?: Record<string, unknown>;
+  highlight?: boolean;
+  output?: string;
+}
+
+export interface CodeSnapshot {
+  id: number;
+  timestamp: number;
+  code_content: string;
+  cursor_position: Record<string, unknown>;
+  scroll_position: Record<string, unknown>;
+  is_highlight: boolean;
+  output: string | null;
+}
+
+export const applyOps = (code: string, ops: CodeTimelineOp[]): string => {
+  let result = '';
+  let position = 0;
+  ops.forEach((op) => {
+    if (typeof op === 'string') {
+      result += op;
+    } else if (op > 0) {
+      result += code.slice(position, position + op);
+      position += op;
+    } else {
+      position -= op;
+    }
+  });
+  return result + code.slice(position);
+};
+
+export const decodeEvents = (events: CodeTimelineEvent[]): CodeSnapshot[] => {
+  let code = '';
+  let cursor: Record<string, unknown> = {};
+  let scroll: Record<string, unknown> = {};
+  return events.map((event) => {
+    code = event.code !== undefined ? event.code : applyOps(code, event.ops || []);
+    cursor = event.cursor ?? cursor;
+    scroll = event.scroll ?? scroll;
+    return {
+      id: event.id,
+      timestamp: event.t,
+      code_content: code,
+      cursor_position: cursor,
+      scroll_position: scroll,
+      is_highlight: Boolean(event.highlight),
+      output: event.output ?? null,
+    };
+  });
+};
+
+export const chunkAt = (timeline: CodeTimelineIndex, time: number): number => {
+  let found = 0;
+  timeline.chunks.forEach((chunk, index) => {
+    if (chunk.start <= time) found = index;
+  });
+  return found;
+};
+
+export const fetchCodeTimelineChunk = async (
+  timeline: CodeTimelineIndex,
+  index: number,
+): Promise<CodeSnapshot[]> => {
+  if (!timeline.url) return [];
+  const response = await api.get(timeline.url, { params: { chunk: index } });
+  return decodeEvents(response.data?.events || []);
+};
+
+// Playback fetches chunks on demand: the one covering the current time, and the
+// next one once playback is within PREFETCH_SECONDS of it. Decoded chunks are
+// kept, so seeking back to a chunk that was already played costs nothing.
+export const PREFETCH_SECONDS = 10;
+
+export interface CodeTimelinePosition {
+  current: CodeSnapshot | null;
+  next: CodeSnapshot | null;
+}
+
+export class CodeTimelineLoader {
+  private readonly timeline: CodeTimelineIndex | null;
+  private readonly pending = new Map<number, Promise<CodeSnapshot[]>>();
+  private readonly loaded = new Map<number, CodeSnapshot[]>();
+
+  constructor(timeline: CodeTimelineIndex | null | undefined) {
+    this.timeline = timeline?.url && timeline.chunks.length ? timeline : null;
+  }
+
+  private load(position: number): Promise<CodeSnapshot[]> {
+    const timeline = this.timeline;
+    if (!timeline) return Promise.resolve([]);
+    let request = this.pending.get(position);
+    if (!request) {
+      request = fetchCodeTimelineChunk(timeline, timeline.chunks[position].index).then((snapshots) => {
+        this.loaded.set(position, snapshots);
+        return snapshots;
+      });
+      // A failed chunk is fetched again the next time it is needed.
+      request.catch(() => this.pending.delete(position));
+      this.pending.set(position, request);
+    }
+    return request;
+  }
+
+  // Start loading the next chunk when playback at `time` is about to reach it.
+  prefetch(time: number): void {
+    if (!this.timeline) return;
+    const following = chunkAt(this.timeline, time) + 1;
+    const chunk = this.timeline.chunks[following];
+    if (chunk && chunk.start - time <= PREFETCH_SECONDS) {
+      this.load(following).catch(() => undefined);
+    }
+  }
+
+  // The snapshot on screen at `time` and the one after it, from loaded chunks
+  // only; `current` is null while the chunk covering `time` is still loading.
+  around(time: number): CodeTimelinePosition {
+    if (!this.timeline) return { current: null, next: null };
+    const position = chunkAt(this.timeline, time);
+    const snapshots = this.loaded.get(position);
+    if (!snapshots || !snapshots.length) return { current: null, next: null };
+
+    let found = 0;
+    snapshots.forEach((snapshot, index) => {
+      if (snapshot.timestamp <= time) found = index;
+    });
+    const next = found + 1 < snapshots.length ? snapshots[found + 1] : this.loaded.get(position + 1)?.[0] ?? null;
+    return { current: snapshots[found], next };
+  }
+
+  // Load the chunk covering `time` (and prefetch the next) and return the
+  // snapshots it holds.
+  async chunkFor(time: number): Promise<CodeSnapshot[]> {
+    if (!this.timeline) return [];
+    const snapshots = await this.load(chunkAt(this.timeline, time));
+    this.prefetch(time);
+    return snapshots;
+  }
+
+  async seek(time: number): Promise<CodeTimelinePosition> {
+    await this.chunkFor(time);
+    return this.around(time);
+  }
+}
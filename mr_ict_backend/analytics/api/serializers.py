@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from django.conf import settings
 from rest_framework import serializers
 
 from analytics.models import LearningEvent
@@ -19,6 +20,16 @@ class LearningEventCreateSerializer(serializers.Serializer):
     metadata = serializers.DictField(required=False, default=dict)
 
 
+class LearningEventBatchSerializer(serializers.Serializer):
+    events = LearningEventCreateSerializer(many=True, allow_empty=False)
+
+    def validate_events(self, value):
+        limit = settings.ANALYTICS_EVENT_MAX_BATCH
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} events may be sent per batch.")
+        return value
+
+
 class AdminRecentActivitySerializer(serializers.Serializer):
     id = serializers.IntegerField()
     event_type = serializers.CharField()
@@ -55,7 +66,7 @@ class AnnouncementSummarySerializer(serializers.Serializer):
 
 
 class AdminSummarySerializer(serializers.Serializer):
-    stats = serializers.DictField(child=serializers.FloatField())
+    stats = serializers.DictField(child=serializers.IntegerField())
     recent_activity = AdminRecentActivitySerializer(many=True)
     timeseries = AdminTimeseriesPointSerializer(many=True)
     top_courses = AdminTopCourseSerializer(many=True)
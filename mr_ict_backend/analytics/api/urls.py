@@ -3,6 +3,7 @@ from django.urls import path
 from analytics.api.views import (
     AdminAnalyticsSummaryExportView,
     AdminAnalyticsSummaryView,
+    LearningEventBatchIngestView,
     LearningEventIngestView,
 )
 
@@ -10,6 +11,7 @@ app_name = "analytics"
 
 urlpatterns = [
     path("events/", LearningEventIngestView.as_view(), name="events"),
+    path("events/batch/", LearningEventBatchIngestView.as_view(), name="events-batch"),
     path("admin/summary/", AdminAnalyticsSummaryView.as_view(), name="admin-summary"),
     path(
         "admin/summary/export/",
@@ -4,22 +4,67 @@ from dataclasses import asdict
 
 from django.http import HttpResponse
 from django.utils import timezone
+from rest_framework import status
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
-from analytics.api.serializers import AdminSummarySerializer, LearningEventCreateSerializer
+from analytics.api.serializers import (
+    AdminSummarySerializer,
+    LearningEventBatchSerializer,
+    LearningEventCreateSerializer,
+)
+from analytics.ingestion import EventBufferFull, submit_events
 from analytics.models import LearningEvent
 from analytics.services import (
     admin_summary_as_csv,
     build_admin_summary,
-    record_event,
+    event_payload,
 )
 from assessments.models import Assessment
 from courses.models import Course, Lesson
 
 
+def _resolve_event_payloads(request, items):
+    """Build ingestion payloads, resolving course/lesson/assessment ids with
+    one query per model for the whole batch."""
+
+    def lookup(model, field, key):
+        values = {item[key] for item in items if item.get(key)}
+        if not values:
+            return {}
+        return dict(model.objects.filter(**{f"{field}__in": values}).values_list(field, "pk"))
+
+    courses = lookup(Course, "course_id", "course_id")
+    lessons = lookup(Lesson, "lesson_id", "lesson_id")
+    assessments = lookup(Assessment, "slug", "assessment_slug")
+
+    student = getattr(request.user, "student", None)
+    payloads = []
+    for item in items:
+        payload = event_payload(
+            event_type=item["event_type"],
+            user=request.user,
+            student=student,
+            source=item.get("source", LearningEvent.SOURCE_FRONTEND),
+            occurred_at=item.get("occurred_at") or timezone.now(),
+            metadata=item.get("metadata"),
+        )
+        payload["course_id"] = courses.get(item.get("course_id"))
+        payload["lesson_id"] = lessons.get(item.get("lesson_id"))
+        payload["assessment_id"] = assessments.get(item.get("assessment_slug"))
+        payloads.append(payload)
+    return payloads
+
+
+def _buffer_full_response(exc: EventBufferFull) -> Response:
+    return Response(
+        {"detail": str(exc), "retry_in": exc.retry_in},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+    )
+
+
 class LearningEventIngestView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
@@ -27,37 +72,35 @@ class LearningEventIngestView(APIView):
     def post(self, request):
         serializer = LearningEventCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
-
-        student = getattr(request.user, "student", None)
-        course = None
-        lesson = None
-        assessment = None
-
-        course_id = data.get("course_id")
-        if course_id:
-            course = Course.objects.filter(course_id=course_id).first()
-        lesson_id = data.get("lesson_id")
-        if lesson_id:
-            lesson = Lesson.objects.filter(lesson_id=lesson_id).first()
-        assessment_slug = data.get("assessment_slug")
-        if assessment_slug:
-            assessment = Assessment.objects.filter(slug=assessment_slug).first()
-
-        occurred_at = data.get("occurred_at") or timezone.now()
-
-        event = record_event(
-            event_type=data["event_type"],
-            user=request.user,
-            student=student,
-            course=course,
-            lesson=lesson,
-            assessment=assessment,
-            source=data.get("source", LearningEvent.SOURCE_FRONTEND),
-            occurred_at=occurred_at,
-            metadata=data.get("metadata"),
-        )
-        return Response({"message": "Recorded", "data": {"id": event.id}})
+
+        try:
+            events = submit_events(_resolve_event_payloads(request, [serializer.validated_data]))
+        except EventBufferFull as exc:
+            return _buffer_full_response(exc)
+        if events is None:
+            return Response({"message": "Queued", "data": {"queued": True}}, status=status.HTTP_202_ACCEPTED)
+        return Response({"message": "Recorded", "data": {"id": events[0].id}})
+
+
+class LearningEventBatchIngestView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = LearningEventBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["events"]
+
+        try:
+            events = submit_events(_resolve_event_payloads(request, items))
+        except EventBufferFull as exc:
+            return _buffer_full_response(exc)
+        if events is None:
+            return Response(
+                {"message": "Queued", "data": {"accepted": len(items), "queued": True}},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        return Response({"message": "Recorded", "data": {"accepted": len(events), "queued": False}})
 
 
 class AdminAnalyticsSummaryView(APIView):
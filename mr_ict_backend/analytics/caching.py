@@ -0,0 +1,75 @@
+"""Short-lived caching for dashboard reads with stampede protection.
+
+Entries are stored as `(fresh_until, value)` and kept for a grace period
+after they go stale. The first caller to see a stale entry takes a lock via
+`cache.add` and recomputes; everyone else keeps serving the stale value
+instead of piling onto the database. When there is no value at all, callers
+that lose the lock race wait briefly for the winner before computing
+themselves.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+ADMIN_SUMMARY_KEY = "analytics:admin-summary"
+TODAY_SUMMARY_KEY = "analytics:today-summary"
+
+_POLL_INTERVAL = 0.05
+
+
+def get_or_refresh(
+    key: str,
+    compute: Callable[[], Any],
+    *,
+    ttl: int,
+    stale_grace: int = 60,
+    lock_timeout: int = 30,
+    wait: float = 2.0,
+) -> Any:
+    """Return the cached value for `key`, recomputing at most once at a time."""
+
+    if ttl <= 0:
+        return compute()
+
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, "1", lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, (time.time() + ttl, value), ttl + stale_grace)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return entry[1]
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[1]
+    return compute()
+
+
+def invalidate(*keys: str) -> None:
+    """Drop cached entries once the current transaction commits."""
+
+    transaction.on_commit(lambda: cache.delete_many(list(keys)))
+
+
+def admin_summary_ttl() -> int:
+    return int(getattr(settings, "ANALYTICS_ADMIN_SUMMARY_TTL", 60))
+
+
+def today_summary_ttl() -> int:
+    return int(getattr(settings, "ANALYTICS_TODAY_SUMMARY_TTL", 30))
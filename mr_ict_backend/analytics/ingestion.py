@@ -0,0 +1,349 @@
+"""Buffered, batched ingestion of `LearningEvent` rows.
+
+Events are normalised to plain payloads (foreign keys as ids) and either
+written straight away or handed to a buffer that writes them in batches with
+one `bulk_create` plus one rollup update per batch:
+
+* `memory` keeps a bounded per-process queue drained by a background thread
+  every `ANALYTICS_EVENT_BATCH_SIZE` events or `ANALYTICS_EVENT_FLUSH_MS`
+  milliseconds. Events leave the queue only after their batch commits, but a
+  crashed process loses whatever it still held.
+* `redis` appends to a Redis stream read by `process_learning_events` through
+  a consumer group. Entries are acknowledged after the batch commits and
+  unacknowledged entries are reclaimed from dead consumers, so delivery is
+  at least once.
+
+Both buffers refuse new events beyond `ANALYTICS_EVENT_MAX_PENDING` with
+`EventBufferFull` (`EventBufferUnavailable` when Redis cannot be reached),
+and move payloads that still fail after
+`ANALYTICS_EVENT_MAX_ATTEMPTS` writes to `LearningEventDeadLetter`.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+
+from analytics.models import LearningEvent, LearningEventDeadLetter
+from analytics.rollups import apply_events
+
+logger = logging.getLogger(__name__)
+
+
+class EventBufferFull(Exception):
+    """Raised when the buffer is at capacity and cannot accept more events."""
+
+    def __init__(self, message: str = "Event ingestion is busy. Please retry shortly.", retry_in: int = 5) -> None:
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class EventBufferUnavailable(EventBufferFull):
+    """Raised when the buffer's backing store cannot be reached."""
+
+
+def write_events(payloads: List[Dict[str, Any]]) -> List[LearningEvent]:
+    """Insert a batch of payloads and fold them into the rollups atomically."""
+
+    with transaction.atomic():
+        events = LearningEvent.objects.bulk_create([LearningEvent(**payload) for payload in payloads])
+        apply_events(events)
+    return events
+
+
+def dead_letter(payload: Dict[str, Any], error: str, attempts: int) -> None:
+    try:
+        LearningEventDeadLetter.objects.create(payload=payload, error=error[:2000], attempts=attempts)
+    except Exception:
+        # The database is the usual reason we are here; keep the payload in the logs.
+        logger.error(
+            "Dropping learning event after %s attempts: %s",
+            attempts,
+            json.dumps(payload, cls=DjangoJSONEncoder),
+            exc_info=True,
+        )
+
+
+def _write_or_dead_letter(payloads: List[Dict[str, Any]], attempts: int) -> None:
+    """Final attempt for a failing batch: write events one by one so a single
+    bad payload does not take the rest of the batch down with it."""
+
+    for payload in payloads:
+        try:
+            write_events([payload])
+        except Exception as exc:
+            dead_letter(payload, repr(exc), attempts)
+
+
+def replay_dead_letters(limit: int = 1000) -> int:
+    """Write dead-lettered payloads again, removing the ones that succeed."""
+
+    replayed = 0
+    for letter in LearningEventDeadLetter.objects.all()[:limit]:
+        payload = dict(letter.payload)
+        if isinstance(payload.get("occurred_at"), str):
+            payload["occurred_at"] = parse_datetime(payload["occurred_at"])
+        try:
+            write_events([payload])
+        except Exception as exc:
+            letter.attempts += 1
+            letter.error = repr(exc)[:2000]
+            letter.save(update_fields=["attempts", "error"])
+            continue
+        letter.delete()
+        replayed += 1
+    return replayed
+
+
+class MemoryEventBuffer:
+    def __init__(
+        self,
+        *,
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        max_attempts: int,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        # Entries are [payload, attempts] so failed batches keep their count.
+        self._pending: "deque[list]" = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def put(self, payloads: List[Dict[str, Any]]) -> None:
+        with self._condition:
+            if len(self._pending) + len(payloads) > self.max_pending:
+                raise EventBufferFull()
+            self._pending.extend([payload, 0] for payload in payloads)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="learning-event-buffer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+            if stopping:
+                return
+
+    def _take_batch(self) -> List[list]:
+        with self._condition:
+            size = min(self.batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(size)]
+
+    def flush(self) -> int:
+        """Write everything currently buffered; returns the number of events written."""
+
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return written
+                payloads = [payload for payload, _ in batch]
+                try:
+                    write_events(payloads)
+                    written += len(batch)
+                except Exception as exc:
+                    attempts = max(entry[1] for entry in batch) + 1
+                    if attempts >= self.max_attempts:
+                        logger.error("Learning event batch failed %s times: %s", attempts, exc)
+                        _write_or_dead_letter(payloads, attempts)
+                        continue
+                    logger.warning("Learning event batch failed, will retry: %s", exc)
+                    with self._condition:
+                        for entry in reversed(batch):
+                            entry[1] = attempts
+                            self._pending.appendleft(entry)
+                    return written
+
+    def close(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 5)
+        else:
+            self.flush()
+
+
+class RedisStreamEventBuffer:
+    def __init__(
+        self,
+        url: str,
+        *,
+        stream: str,
+        group: str,
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        max_attempts: int,
+        claim_idle: float = 60.0,
+    ) -> None:
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=5, socket_connect_timeout=1)
+        self.stream = stream
+        self.group = group
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.claim_idle_ms = int(claim_idle * 1000)
+
+    def put(self, payloads: List[Dict[str, Any]]) -> None:
+        import redis
+
+        try:
+            if self.client.xlen(self.stream) + len(payloads) > self.max_pending:
+                raise EventBufferFull()
+            pipe = self.client.pipeline(transaction=False)
+            for payload in payloads:
+                pipe.xadd(self.stream, {"payload": json.dumps(payload, cls=DjangoJSONEncoder)})
+            pipe.execute()
+        except redis.RedisError as exc:
+            logger.warning("Learning event stream unavailable: %s", exc)
+            raise EventBufferUnavailable() from exc
+
+    def ensure_group(self) -> None:
+        import redis
+
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    @staticmethod
+    def _decode(fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+        payload = json.loads(fields[b"payload"])
+        payload["occurred_at"] = parse_datetime(payload["occurred_at"])
+        return payload
+
+    def _reclaim(self, consumer: str) -> List[tuple]:
+        """Take over entries left unacknowledged by consumers that died."""
+
+        _, entries, *_ = self.client.xautoclaim(
+            self.stream, self.group, consumer, self.claim_idle_ms, start_id="0-0", count=self.batch_size
+        )
+        return entries
+
+    def _delivery_counts(self, entry_ids: List[bytes]) -> Dict[bytes, int]:
+        details = self.client.xpending_range(
+            self.stream, self.group, min=entry_ids[0], max=entry_ids[-1], count=len(entry_ids)
+        )
+        return {detail["message_id"]: detail["times_delivered"] for detail in details}
+
+    def consume(self, consumer: str) -> int:
+        """Read and write one batch; returns the number of events acknowledged."""
+
+        entries = self._reclaim(consumer)
+        if not entries:
+            response = self.client.xreadgroup(
+                self.group,
+                consumer,
+                {self.stream: ">"},
+                count=self.batch_size,
+                block=int(self.flush_interval * 1000),
+            )
+            entries = response[0][1] if response else []
+        if not entries:
+            return 0
+
+        entry_ids = [entry_id for entry_id, _ in entries]
+        payloads = [self._decode(fields) for _, fields in entries]
+        try:
+            write_events(payloads)
+        except Exception as exc:
+            counts = self._delivery_counts(entry_ids)
+            if max(counts.values(), default=1) < self.max_attempts:
+                # Leave the entries pending; they are reclaimed after claim_idle.
+                logger.warning("Learning event batch failed, will retry: %s", exc)
+                return 0
+            logger.error("Learning event batch failed %s times: %s", max(counts.values()), exc)
+            _write_or_dead_letter(payloads, max(counts.values()))
+
+        self.client.xack(self.stream, self.group, *entry_ids)
+        self.client.xdel(self.stream, *entry_ids)
+        return len(entry_ids)
+
+
+_event_buffer = None
+_event_buffer_lock = threading.Lock()
+
+
+def get_event_buffer():
+    """Return the configured event buffer, or None to write synchronously."""
+
+    global _event_buffer
+    backend = getattr(settings, "ANALYTICS_EVENT_BUFFER", "")
+    if not backend:
+        return None
+    if _event_buffer is None:
+        with _event_buffer_lock:
+            if _event_buffer is None:
+                options = {
+                    "batch_size": settings.ANALYTICS_EVENT_BATCH_SIZE,
+                    "flush_interval": settings.ANALYTICS_EVENT_FLUSH_MS / 1000,
+                    "max_pending": settings.ANALYTICS_EVENT_MAX_PENDING,
+                    "max_attempts": settings.ANALYTICS_EVENT_MAX_ATTEMPTS,
+                }
+                if backend == "redis":
+                    _event_buffer = RedisStreamEventBuffer(
+                        settings.ANALYTICS_EVENT_STREAM_URL,
+                        stream=settings.ANALYTICS_EVENT_STREAM,
+                        group="learning-events",
+                        **options,
+                    )
+                elif backend == "memory":
+                    buffer = MemoryEventBuffer(**options)
+                    buffer.start()
+                    _event_buffer = buffer
+                else:
+                    raise ValueError(f"Unknown ANALYTICS_EVENT_BUFFER backend '{backend}'")
+    return _event_buffer
+
+
+def submit_events(payloads: List[Dict[str, Any]]) -> Optional[List[LearningEvent]]:
+    """Buffer payloads when a buffer is configured, otherwise write them now.
+
+    Returns the written events for synchronous writes and None when the
+    payloads were buffered. `EventBufferFull` (and `EventBufferUnavailable`)
+    propagates to the caller.
+    """
+
+    if not payloads:
+        return []
+    buffer = get_event_buffer()
+    if buffer is None:
+        return write_events(payloads)
+    buffer.put(payloads)
+    return None
@@ -1,11 +1,48 @@
 from __future__ import annotations
 
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date, timedelta
+from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from django.utils import timezone
 
-from analytics.services import backfill_daily_summaries
+from analytics.retention import archive_watermark, is_archived
+from analytics.rollups import rebuild_rollups_for_date
+from analytics.services import backfill_daily_summaries, summary_rows_for_range, upsert_daily_summaries
+
+
+def _chunks(start: date, end: date, size: int) -> list[tuple[date, date]]:
+    chunks = []
+    current = start
+    while current <= end:
+        chunk_end = min(current + timedelta(days=size - 1), end)
+        chunks.append((current, chunk_end))
+        current = chunk_end + timedelta(days=1)
+    return chunks
+
+
+def _compute_chunk(bounds: tuple[date, date]) -> tuple[tuple[date, date], list[dict]]:
+    return bounds, summary_rows_for_range(*bounds)
+
+
+def _load_checkpoint(path: Path) -> set[str]:
+    if not path.exists():
+        return set()
+    try:
+        return set(json.loads(path.read_text())["completed"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise CommandError(f"Unreadable checkpoint file '{path}': {exc}") from exc
+
+
+def _save_checkpoint(path: Path, completed: set[str]) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_text(json.dumps({"completed": sorted(completed)}))
+    os.replace(tmp_path, path)
 
 
 class Command(BaseCommand):
@@ -32,6 +69,38 @@ class Command(BaseCommand):
                 "Must be positive."
             ),
         )
+        parser.add_argument(
+            "--workers",
+            dest="workers",
+            type=int,
+            default=0,
+            help=(
+                "Compute the range in chunks with range-aggregate queries across this many "
+                "processes and bulk-upsert the summaries. Omit to recompute day by day, "
+                "which also rebuilds the incremental rollups."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-days",
+            dest="chunk_days",
+            type=int,
+            default=31,
+            help="Days per chunk in chunked mode (default 31).",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            dest="checkpoint",
+            help=(
+                "JSON file recording completed days in chunked mode. Re-running with the "
+                "same file skips chunks that already finished."
+            ),
+        )
+        parser.add_argument(
+            "--rebuild-rollups",
+            dest="rebuild_rollups",
+            action="store_true",
+            help="Also rebuild the incremental rollups for each day in chunked mode.",
+        )
 
     def handle(self, *args, **options):
         start_value = options.get("start")
@@ -73,9 +142,71 @@ class Command(BaseCommand):
         # By this point both start and end should be populated
         assert start is not None and end is not None  # for type checkers
 
+        if options.get("workers"):
+            self._backfill_chunked(start, end, options)
+            return
+
         summaries = backfill_daily_summaries(start, end)
         self.stdout.write(
             self.style.SUCCESS(
                 f"Computed {len(summaries)} daily summary(ies) from {start.isoformat()} to {end.isoformat()}"
             )
         )
+
+    def _backfill_chunked(self, start: date, end: date, options) -> None:
+        workers = options["workers"]
+        chunk_days = options["chunk_days"]
+        if workers < 0 or chunk_days <= 0:
+            raise CommandError("--workers and --chunk-days must be positive integers")
+
+        checkpoint = Path(options["checkpoint"]) if options.get("checkpoint") else None
+        completed = _load_checkpoint(checkpoint) if checkpoint else set()
+
+        def days_of(bounds: tuple[date, date]) -> list[str]:
+            first, last = bounds
+            return [(first + timedelta(days=offset)).isoformat() for offset in range((last - first).days + 1)]
+
+        all_chunks = _chunks(start, end, chunk_days)
+        pending = [bounds for bounds in all_chunks if not set(days_of(bounds)) <= completed]
+        skipped = len(all_chunks) - len(pending)
+        if skipped:
+            self.stdout.write(f"Resuming: {skipped} of {len(all_chunks)} chunk(s) already completed")
+
+        total_days = sum(len(days_of(bounds)) for bounds in pending)
+        done_days = 0
+        watermark = archive_watermark()
+
+        def finish(bounds: tuple[date, date], rows: list[dict]) -> None:
+            nonlocal done_days
+            upsert_daily_summaries(rows)
+            if options.get("rebuild_rollups"):
+                for row in rows:
+                    if not is_archived(row["date"], watermark):
+                        rebuild_rollups_for_date(row["date"])
+            done_days += len(rows)
+            if checkpoint:
+                completed.update(days_of(bounds))
+                _save_checkpoint(checkpoint, completed)
+            self.stdout.write(
+                f"Chunk {bounds[0].isoformat()}..{bounds[1].isoformat()} done "
+                f"({done_days}/{total_days} days)"
+            )
+
+        if workers == 1 or len(pending) <= 1 or not hasattr(os, "fork"):
+            for bounds in pending:
+                finish(*_compute_chunk(bounds))
+        else:
+            # Forked workers must not share the parent's database connections.
+            connections.close_all()
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=context) as pool:
+                futures = [pool.submit(_compute_chunk, bounds) for bounds in pending]
+                for future in as_completed(futures):
+                    finish(*future.result())
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Computed {total_days} daily summary(ies) from {start.isoformat()} to {end.isoformat()} "
+                f"in {len(pending)} chunk(s)"
+            )
+        )
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.models import DailyEngagementSummary, LearningEvent
+from analytics.rollups import xp_amount
+from analytics.services import apply_event_counts, window_for_date
+from schools.models import School
+from students.models import Student
+
+SUMMARY_FIELDS = (
+    "active_students",
+    "lessons_viewed",
+    "lessons_completed",
+    "courses_completed",
+    "assessments_completed",
+    "comments_posted",
+    "xp_earned",
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _per_query_counts(summary, start, end) -> None:
+    """The previous implementation: one COUNT per figure plus a Python XP loop."""
+
+    events = LearningEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end)
+    summary.active_students = events.exclude(student__isnull=True).values("student").distinct().count()
+    summary.lessons_viewed = events.filter(event_type=LearningEvent.TYPE_LESSON_VIEWED).count()
+    summary.lessons_completed = events.filter(event_type=LearningEvent.TYPE_LESSON_COMPLETED).count()
+    summary.courses_completed = events.filter(event_type=LearningEvent.TYPE_COURSE_COMPLETED).count()
+    summary.assessments_completed = events.filter(event_type=LearningEvent.TYPE_ASSESSMENT_COMPLETED).count()
+    summary.comments_posted = events.filter(event_type=LearningEvent.TYPE_COMMENT_CREATED).count()
+    summary.xp_earned = sum(
+        xp_amount(metadata)
+        for metadata in events.filter(event_type=LearningEvent.TYPE_XP_AWARDED).values_list("metadata", flat=True)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed LearningEvent rows inside a rolled-back transaction and time the "
+        "daily summary recount against the per-query implementation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=1_000_000, help="Rows to seed (default 1,000,000).")
+        parser.add_argument("--days", type=int, default=7, help="Days the events are spread over (default 7).")
+        parser.add_argument("--students", type=int, default=500, help="Distinct students (default 500).")
+        parser.add_argument("--batch", type=int, default=10_000, help="bulk_create batch size (default 10,000).")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the best is reported.")
+
+    def handle(self, *args, **options):
+        for name in ("events", "days", "students", "batch", "repeat"):
+            if options[name] <= 0:
+                raise CommandError(f"--{name} must be a positive integer")
+
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            self.stdout.write("Seeded rows rolled back.")
+
+    def _seed(self, options) -> None:
+        school = School.objects.create(
+            school_id="BENCH-ANALYTICS",
+            name="Benchmark School",
+            region="Benchmark",
+            district="Benchmark",
+            phone="0000000000",
+        )
+        User = get_user_model()
+        users = User.objects.bulk_create(
+            [
+                User(email=f"bench-analytics-{index}@example.com", first_name="Bench", last_name=str(index))
+                for index in range(options["students"])
+            ]
+        )
+        students = Student.objects.bulk_create([Student(user=user, school=school) for user in users])
+        student_ids = [student.pk for student in students] + [None]
+
+        event_types = [choice for choice, _ in LearningEvent.EVENT_CHOICES]
+        first_day, _ = window_for_date(timezone.localdate() - timedelta(days=options["days"] - 1))
+        span = options["days"] * 86400
+        rng = random.Random(7)
+        remaining = options["events"]
+        started = time.perf_counter()
+        while remaining:
+            size = min(options["batch"], remaining)
+            batch = []
+            for _ in range(size):
+                event_type = rng.choice(event_types)
+                metadata = {"amount": rng.randint(1, 50)} if event_type == LearningEvent.TYPE_XP_AWARDED else {}
+                batch.append(
+                    LearningEvent(
+                        event_type=event_type,
+                        student_id=rng.choice(student_ids),
+                        occurred_at=first_day + timedelta(seconds=rng.randrange(span)),
+                        metadata=metadata,
+                    )
+                )
+            LearningEvent.objects.bulk_create(batch)
+            remaining -= size
+        self.stdout.write(f"Seeded {options['events']:,} events in {time.perf_counter() - started:.1f}s")
+
+    def _run(self, options) -> None:
+        self._seed(options)
+
+        today = timezone.localdate()
+        dates = [today - timedelta(days=offset) for offset in range(options["days"])]
+        timings = {}
+        results = {}
+        for label, recount in (("per-query", _per_query_counts), ("aggregate", apply_event_counts)):
+            best = None
+            for _ in range(options["repeat"]):
+                summaries = []
+                began = time.perf_counter()
+                for target_date in dates:
+                    summary = DailyEngagementSummary(date=target_date)
+                    recount(summary, *window_for_date(target_date))
+                    summaries.append(summary)
+                elapsed = time.perf_counter() - began
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+            results[label] = [{field: getattr(summary, field) for field in SUMMARY_FIELDS} for summary in summaries]
+            self.stdout.write(f"{label:<10} {best * 1000:9.1f} ms  ({len(dates)} days)")
+
+        if results["per-query"] != results["aggregate"]:
+            raise CommandError("Aggregate recount does not match the per-query implementation")
+
+        speedup = timings["per-query"] / timings["aggregate"] if timings["aggregate"] else 0
+        self.stdout.write(self.style.SUCCESS(f"Aggregate recount is {speedup:.2f}x faster"))
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.partitions import ensure_partitions, is_partitioned
+from analytics.retention import compact_learning_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming LearningEvent partitions and archive raw events older than "
+        "the retention window into compressed files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-months",
+            dest="retention_months",
+            type=int,
+            default=None,
+            help="Whole months of raw events to keep (defaults to ANALYTICS_EVENT_RETENTION_MONTHS).",
+        )
+        parser.add_argument(
+            "--partitions-only",
+            dest="partitions_only",
+            action="store_true",
+            help="Only create upcoming partitions; do not archive anything.",
+        )
+
+    def handle(self, *args, **options):
+        retention = options.get("retention_months")
+        if retention is not None and retention < 0:
+            raise CommandError("--retention-months cannot be negative")
+
+        if is_partitioned():
+            created = ensure_partitions(settings.ANALYTICS_EVENT_PARTITIONS_AHEAD)
+            self.stdout.write(f"Created {len(created)} partition(s)")
+        if options["partitions_only"]:
+            return
+
+        archives = compact_learning_events(retention)
+        for archive in archives:
+            self.stdout.write(f"Archived {archive.row_count} event(s) to {archive.path}")
+        self.stdout.write(self.style.SUCCESS(f"Compacted {len(archives)} month(s)"))
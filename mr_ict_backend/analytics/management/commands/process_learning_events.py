@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+import socket
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from analytics.ingestion import RedisStreamEventBuffer, get_event_buffer, replay_dead_letters
+
+
+class Command(BaseCommand):
+    help = "Drain the Redis learning event stream into the database in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumer",
+            dest="consumer",
+            default=f"{socket.gethostname()}-{os.getpid()}",
+            help="Consumer name within the stream's consumer group (default host-pid).",
+        )
+        parser.add_argument(
+            "--once",
+            dest="once",
+            action="store_true",
+            help="Process a single batch and exit.",
+        )
+        parser.add_argument(
+            "--replay-dead-letters",
+            dest="replay",
+            action="store_true",
+            help="Write dead-lettered events again instead of reading the stream.",
+        )
+
+    def handle(self, *args, **options):
+        if options["replay"]:
+            replayed = replay_dead_letters()
+            self.stdout.write(self.style.SUCCESS(f"Replayed {replayed} dead-lettered event(s)"))
+            return
+
+        buffer = get_event_buffer()
+        if not isinstance(buffer, RedisStreamEventBuffer):
+            raise CommandError("ANALYTICS_EVENT_BUFFER must be 'redis' to consume the event stream")
+
+        buffer.ensure_group()
+        consumer = options["consumer"]
+        self.stdout.write(f"Consuming {buffer.stream} as {consumer}")
+        while True:
+            written = buffer.consume(consumer)
+            close_old_connections()
+            if written:
+                self.stdout.write(f"Wrote {written} event(s)")
+            if options["once"]:
+                return
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_initial'),
+        ('students', '0002_student_availability_student_last_activity_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('hour', 'Hour')], max_length=8)),
+                ('bucket', models.DateTimeField()),
+                ('metric', models.CharField(max_length=96)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket', 'metric'), name='analytics_counter_unique_bucket_metric')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyActiveStudent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='active_days', to='students.student')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'student'), name='analytics_active_student_unique_day')],
+            },
+        ),
+    ]
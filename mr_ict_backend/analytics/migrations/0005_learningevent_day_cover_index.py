@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_engagement_rollups'),
+        ('assessments', '0002_initial'),
+        ('courses', '0002_course_spotlight_course_subtitle_course_track_and_more'),
+        ('students', '0002_student_availability_student_last_activity_date_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='learningevent',
+            index=models.Index(fields=['occurred_at', 'event_type', 'student'], name='analytics_event_day_cover'),
+        ),
+    ]
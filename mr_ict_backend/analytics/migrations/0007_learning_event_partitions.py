@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:59
+
+from django.db import migrations, models
+
+
+def partition_learning_events(apps, schema_editor):
+    # PostgreSQL only; other backends keep the plain table.
+    from analytics.partitions import partition_learning_events as convert
+
+    convert(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_learningeventdeadletter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearningEventArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField(unique=True)),
+                ('period_end', models.DateField(help_text='Exclusive end of the archived period.')),
+                ('path', models.CharField(max_length=500)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['period_start'],
+            },
+        ),
+        migrations.RunPython(partition_learning_events, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
@@ -86,6 +87,8 @@ class LearningEvent(models.Model):
         indexes = [
             models.Index(fields=["event_type", "occurred_at"]),
             models.Index(fields=["student", "occurred_at"]),
+            # Covers the per-day summary aggregate so it never reads table rows.
+            models.Index(fields=["occurred_at", "event_type", "student"], name="analytics_event_day_cover"),
         ]
 
     def __str__(self) -> str:
@@ -115,3 +118,92 @@ class DailyEngagementSummary(models.Model):
 
     def __str__(self) -> str:
         return f"Summary for {self.date:%Y-%m-%d}"
+
+
+class EngagementCounter(models.Model):
+    """Running total for one metric in a day or hour bucket.
+
+    Counters are incremented as events are recorded so dashboards can read
+    daily and hourly figures without scanning `LearningEvent`.
+    """
+
+    GRANULARITY_DAY = "day"
+    GRANULARITY_HOUR = "hour"
+
+    GRANULARITY_CHOICES = (
+        (GRANULARITY_DAY, "Day"),
+        (GRANULARITY_HOUR, "Hour"),
+    )
+
+    granularity = models.CharField(max_length=8, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    metric = models.CharField(max_length=96)
+    value = models.BigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket", "metric"],
+                name="analytics_counter_unique_bucket_metric",
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.metric} @ {self.bucket:%Y-%m-%d %H:%M} ({self.granularity}) = {self.value}"
+
+
+class DailyActiveStudent(models.Model):
+    """Distinct students with at least one learning event on a date."""
+
+    date = models.DateField()
+    student = models.ForeignKey(
+        "students.Student",
+        related_name="active_days",
+        on_delete=models.CASCADE,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "student"], name="analytics_active_student_unique_day")
+        ]
+
+    def __str__(self) -> str:
+        return f"Student {self.student_id} active on {self.date:%Y-%m-%d}"
+
+
+class LearningEventDeadLetter(models.Model):
+    """Buffered event payload that could not be written after every retry."""
+
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at"]
+
+    def __str__(self) -> str:
+        return f"Dead letter {self.pk} ({self.payload.get('event_type')})"
+
+
+class LearningEventArchive(models.Model):
+    """A compacted period whose raw events were exported and removed.
+
+    The rollups and daily summaries for the period stay in place and are the
+    source of truth for it from then on.
+    """
+
+    period_start = models.DateField(unique=True)
+    period_end = models.DateField(help_text="Exclusive end of the archived period.")
+    path = models.CharField(max_length=500)
+    row_count = models.PositiveIntegerField(default=0)
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["period_start"]
+
+    def __str__(self) -> str:
+        return f"Archive {self.period_start:%Y-%m-%d}..{self.period_end:%Y-%m-%d} ({self.row_count} events)"
@@ -0,0 +1,189 @@
+"""Monthly range partitioning of `LearningEvent` on PostgreSQL.
+
+The parent table is partitioned by `occurred_at` with one partition per
+calendar month (UTC) named `analytics_learningevent_pYYYYMM` plus a default
+partition that catches rows outside the prepared range. The primary key
+becomes `(id, occurred_at)` in the database because PostgreSQL requires the
+partition key in every unique constraint; `id` still comes from a single
+sequence, so Django keeps treating it as the primary key.
+
+On other backends (SQLite in development) the table stays a plain table and
+every helper here is a no-op, so the retention job falls back to deleting
+rows.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.db import connection as default_connection
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "analytics_learningevent"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+ID_SEQUENCE = f"{PARENT_TABLE}_pk_seq"
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month: date) -> tuple[datetime, datetime]:
+    start = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    next_month = add_months(month, 1)
+    return start, datetime(next_month.year, next_month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+
+def supports_partitioning(connection=None) -> bool:
+    return (connection or default_connection).vendor == "postgresql"
+
+
+def is_partitioned(connection=None) -> bool:
+    connection = connection or default_connection
+    if not supports_partitioning(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s",
+            [PARENT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(connection=None) -> Dict[date, str]:
+    """Monthly partitions currently attached, keyed by the month they cover."""
+
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    prefix = f"{PARENT_TABLE}_p"
+    for name in names:
+        suffix = name[len(prefix):] if name.startswith(prefix) else ""
+        if len(suffix) == 6 and suffix.isdigit():
+            partitions[date(int(suffix[:4]), int(suffix[4:]), 1)] = name
+    return partitions
+
+
+def _create_partition(cursor, month: date) -> None:
+    start, end = month_bounds(month)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(month)}" PARTITION OF "{PARENT_TABLE}" '
+        "FOR VALUES FROM (%s) TO (%s)",
+        [start, end],
+    )
+
+
+def ensure_partitions(months_ahead: int = 2, *, start: Optional[date] = None, connection=None) -> List[str]:
+    """Create monthly partitions from `start` (default: this month) through
+    `months_ahead` months in the future. Returns the names created."""
+
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+    existing = existing_partitions(connection)
+    month = month_start(start or datetime.now(dt_timezone.utc).date())
+    last = add_months(month_start(datetime.now(dt_timezone.utc).date()), months_ahead)
+    created = []
+    with connection.cursor() as cursor:
+        while month <= last:
+            if month not in existing:
+                _create_partition(cursor, month)
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+    return created
+
+
+def drop_partition(month: date, connection=None) -> bool:
+    """Drop the partition for `month`; the caller must have archived it first."""
+
+    connection = connection or default_connection
+    name = existing_partitions(connection).get(month)
+    if name is None:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE "{name}"')
+    return True
+
+
+def partition_learning_events(connection, months_ahead: int = 2) -> None:
+    """Convert the plain table into a partitioned one, keeping data, indexes,
+    foreign keys and the id sequence. Safe to call repeatedly."""
+
+    if not supports_partitioning(connection) or is_partitioned(connection):
+        return
+
+    legacy = f"{PARENT_TABLE}_legacy"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'",
+            [PARENT_TABLE],
+        )
+        primary_key = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+            [PARENT_TABLE],
+        )
+        indexes = [definition for name, definition in cursor.fetchall() if name != primary_key]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [PARENT_TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min(occurred_at), max(id) FROM "{PARENT_TABLE}"')
+        earliest, max_id = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" RENAME TO "{legacy}"')
+        cursor.execute(
+            f'CREATE TABLE "{PARENT_TABLE}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            "PARTITION BY RANGE (occurred_at)"
+        )
+        cursor.execute(f'CREATE SEQUENCE "{ID_SEQUENCE}" OWNED BY "{PARENT_TABLE}".id')
+        cursor.execute(f"ALTER TABLE \"{PARENT_TABLE}\" ALTER COLUMN id SET DEFAULT nextval('\"{ID_SEQUENCE}\"')")
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{PARENT_TABLE}" DEFAULT')
+
+        month = month_start(earliest.astimezone(dt_timezone.utc).date()) if earliest else None
+        current = month_start(datetime.now(dt_timezone.utc).date())
+        month = min(month or current, current)
+        while month <= add_months(current, months_ahead):
+            _create_partition(cursor, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO "{PARENT_TABLE}" SELECT * FROM "{legacy}"')
+        if max_id:
+            cursor.execute("SELECT setval(%s, %s)", [ID_SEQUENCE, max_id])
+        cursor.execute(f'DROP TABLE "{legacy}"')
+
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" ADD CONSTRAINT "{primary_key}" PRIMARY KEY (id, occurred_at)')
+        for definition in indexes:
+            if "UNIQUE" in definition.upper():
+                logger.warning("Skipping unique index on partitioned table: %s", definition)
+                continue
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" ADD CONSTRAINT "{name}" {definition}')
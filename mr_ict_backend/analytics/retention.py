@@ -0,0 +1,156 @@
+"""Retention and compaction of raw `LearningEvent` rows.
+
+Whole months older than `ANALYTICS_EVENT_RETENTION_MONTHS` are compacted
+oldest first: the rollups and daily summaries for every day are rebuilt from
+the raw rows, the rows are exported to a gzipped JSON Lines file under
+`ANALYTICS_ARCHIVE_DIR`, a `LearningEventArchive` row records the period and
+the raw rows are removed (by dropping the monthly partition on PostgreSQL,
+by deleting rows elsewhere).
+
+Archived periods are contiguous from the first compacted month, so a single
+watermark tells the services which days must be answered from the rollups
+because their raw events are gone.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from analytics import partitions
+from analytics.models import LearningEvent, LearningEventArchive
+from analytics.rollups import day_bucket, rebuild_rollups_for_date
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    "id",
+    "event_type",
+    "source",
+    "occurred_at",
+    "metadata",
+    "created_at",
+    "user_id",
+    "student_id",
+    "course_id",
+    "lesson_id",
+    "assessment_id",
+)
+
+
+def archive_watermark() -> Optional[date]:
+    """First day whose raw events are still stored, or None if nothing is archived."""
+
+    return LearningEventArchive.objects.aggregate(end=Max("period_end"))["end"]
+
+
+def is_archived(day: date, watermark: Optional[date] = None) -> bool:
+    watermark = watermark if watermark is not None else archive_watermark()
+    return watermark is not None and day < watermark
+
+
+def _archive_dir() -> Path:
+    return Path(getattr(settings, "ANALYTICS_ARCHIVE_DIR", Path(settings.MEDIA_ROOT) / "analytics-archive"))
+
+
+def _export(events, path: Path) -> tuple[int, str]:
+    """Stream rows to a gzipped JSON Lines file; returns (rows, sha256 of the file)."""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    rows = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as handle:
+        for row in events.order_by("occurred_at", "id").values(*ARCHIVE_FIELDS).iterator(chunk_size=5000):
+            handle.write(json.dumps(row, cls=DjangoJSONEncoder))
+            handle.write("\n")
+            rows += 1
+    digest = hashlib.sha256()
+    with open(tmp_path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    os.replace(tmp_path, path)
+    return rows, digest.hexdigest()
+
+
+def _remove_raw_rows(start_date: date, end_date: date) -> None:
+    start, end = day_bucket(start_date), day_bucket(end_date)
+    for month, _ in sorted(partitions.existing_partitions().items()):
+        month_start, month_end = partitions.month_bounds(month)
+        if start <= month_start and month_end <= end:
+            partitions.drop_partition(month)
+    LearningEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end).delete()
+
+
+def compact_month(month: date) -> LearningEventArchive:
+    """Rebuild aggregates for `month`, archive its raw events and remove them."""
+
+    from analytics.services import summary_rows_for_range, upsert_daily_summaries
+
+    period_start = partitions.month_start(month)
+    period_end = partitions.add_months(period_start, 1)
+    watermark = archive_watermark()
+    if watermark is not None and period_start != watermark:
+        raise ValueError(f"Archives must stay contiguous; the next month to compact starts {watermark}")
+
+    last_day = period_end - timedelta(days=1)
+    upsert_daily_summaries(summary_rows_for_range(period_start, last_day))
+    day = period_start
+    while day < period_end:
+        rebuild_rollups_for_date(day)
+        day += timedelta(days=1)
+
+    events = LearningEvent.objects.filter(
+        occurred_at__gte=day_bucket(period_start), occurred_at__lt=day_bucket(period_end)
+    )
+    path = _archive_dir() / f"learning-events-{period_start:%Y-%m}.jsonl.gz"
+    row_count, sha256 = _export(events, path)
+
+    with transaction.atomic():
+        archive = LearningEventArchive.objects.create(
+            period_start=period_start,
+            period_end=period_end,
+            path=str(path),
+            row_count=row_count,
+            sha256=sha256,
+        )
+        _remove_raw_rows(period_start, period_end)
+    logger.info("Archived %s learning events for %s to %s", row_count, period_start, path)
+    return archive
+
+
+def compact_learning_events(
+    retention_months: Optional[int] = None,
+    *,
+    today: Optional[date] = None,
+) -> List[LearningEventArchive]:
+    """Compact every whole month that falls outside the retention window."""
+
+    if retention_months is None:
+        retention_months = settings.ANALYTICS_EVENT_RETENTION_MONTHS
+    if retention_months <= 0:
+        return []
+
+    horizon = partitions.add_months(partitions.month_start(today or timezone.localdate()), -retention_months)
+    month = archive_watermark()
+    if month is None:
+        earliest = LearningEvent.objects.aggregate(first=Min("occurred_at"))["first"]
+        if earliest is None:
+            return []
+        month = partitions.month_start(timezone.localdate(earliest))
+
+    archives = []
+    while month < horizon:
+        archives.append(compact_month(month))
+        month = partitions.add_months(month, 1)
+    return archives
@@ -0,0 +1,249 @@
+"""Incremental engagement rollups maintained alongside `LearningEvent` writes.
+
+Each recorded event bumps day and hour `EngagementCounter` rows with an
+atomic `UPDATE ... SET value = value + n` (inserting the row on first use) and
+marks the student active for the day. Rollups only see events written through
+`analytics.services.record_event`; `rebuild_rollups_for_date` recomputes a
+day from the raw events as the repair path.
+"""
+from __future__ import annotations
+
+import math
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Count, F, FloatField, Q, Sum
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Abs, Cast, Coalesce, Floor, Sign, TruncHour
+from django.utils import timezone
+
+from analytics.models import DailyActiveStudent, EngagementCounter, LearningEvent, LearningEventArchive
+
+METRIC_XP_EARNED = "xp_earned"
+
+# Plain decimal `metadata.amount` values, truncated toward zero like int();
+# anything else counts as zero so the Python and database paths agree and the
+# cast never fails on PostgreSQL.
+XP_AMOUNT_PATTERN = r"^\s*-?[0-9]+(\.[0-9]+)?\s*$"
+
+
+def event_metric(event_type: str) -> str:
+    return f"events:{event_type}"
+
+
+def day_bucket(target_date: date) -> datetime:
+    tz = timezone.get_current_timezone()
+    return timezone.make_aware(datetime.combine(target_date, datetime.min.time()), timezone=tz)
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def xp_amount(metadata: Any) -> int:
+    amount = metadata.get("amount") if isinstance(metadata, dict) else None
+    if isinstance(amount, bool):
+        return 0
+    if isinstance(amount, int):
+        return amount
+    if isinstance(amount, float):
+        return int(amount) if math.isfinite(amount) else 0
+    if isinstance(amount, str) and re.match(XP_AMOUNT_PATTERN, amount):
+        return int(Decimal(amount.strip()))
+    return 0
+
+
+def xp_sum():
+    """Database-side sum of `xp_amount` over the XP events in a queryset.
+
+    Amounts are truncated toward zero before summing, and the result is
+    declared as a big integer so every backend hands back an `int`, matching
+    the `xp_earned` field, rather than a numeric/float.
+    """
+
+    amount = Cast(KeyTextTransform("amount", "metadata"), FloatField())
+    return Coalesce(
+        Sum(
+            Cast(Sign(amount) * Floor(Abs(amount)), BigIntegerField()),
+            filter=Q(event_type=LearningEvent.TYPE_XP_AWARDED, metadata__amount__regex=XP_AMOUNT_PATTERN),
+            output_field=BigIntegerField(),
+        ),
+        0,
+        output_field=BigIntegerField(),
+    )
+
+
+def _increment(granularity: str, bucket: datetime, metric: str, amount: int) -> None:
+    lookup = {"granularity": granularity, "bucket": bucket, "metric": metric}
+    if EngagementCounter.objects.filter(**lookup).update(value=F("value") + amount):
+        return
+    try:
+        with transaction.atomic():
+            EngagementCounter.objects.create(value=amount, **lookup)
+    except IntegrityError:
+        # Another writer created the row first; fall back to the increment.
+        EngagementCounter.objects.filter(**lookup).update(value=F("value") + amount)
+
+
+def event_deltas(event_type: str, metadata: Any) -> Dict[str, int]:
+    deltas = {event_metric(event_type): 1}
+    if event_type == LearningEvent.TYPE_XP_AWARDED:
+        amount = xp_amount(metadata)
+        if amount:
+            deltas[METRIC_XP_EARNED] = amount
+    return deltas
+
+
+def apply_events(events: Iterable[LearningEvent]) -> None:
+    """Fold freshly recorded events into the day/hour counters.
+
+    Deltas are summed per counter first so a batch costs one increment per
+    distinct bucket and metric rather than one per event.
+    """
+
+    totals: Dict[tuple[str, datetime, str], int] = defaultdict(int)
+    active: set[tuple[date, int]] = set()
+    for event in events:
+        occurred_at = event.occurred_at
+        local_date = timezone.localdate(occurred_at)
+        buckets = (
+            (EngagementCounter.GRANULARITY_DAY, day_bucket(local_date)),
+            (EngagementCounter.GRANULARITY_HOUR, hour_bucket(occurred_at)),
+        )
+        for metric, amount in event_deltas(event.event_type, event.metadata).items():
+            for granularity, bucket in buckets:
+                totals[(granularity, bucket, metric)] += amount
+        if event.student_id:
+            active.add((local_date, event.student_id))
+
+    for (granularity, bucket, metric), amount in totals.items():
+        _increment(granularity, bucket, metric, amount)
+
+    if active:
+        DailyActiveStudent.objects.bulk_create(
+            [DailyActiveStudent(date=local_date, student_id=student_id) for local_date, student_id in active],
+            ignore_conflicts=True,
+        )
+
+
+def apply_event(event: LearningEvent) -> None:
+    apply_events([event])
+
+
+def daily_counters(target_date: date) -> Dict[str, int]:
+    rows = EngagementCounter.objects.filter(
+        granularity=EngagementCounter.GRANULARITY_DAY,
+        bucket=day_bucket(target_date),
+    ).values_list("metric", "value")
+    return dict(rows)
+
+
+def active_student_count(target_date: date) -> int:
+    return DailyActiveStudent.objects.filter(date=target_date).count()
+
+
+def hourly_series(metric: str, start: datetime, end: datetime) -> list[Dict[str, Any]]:
+    """Hourly values for `metric` in [start, end), for charts and drill-downs."""
+
+    return [
+        {"hour": bucket, "value": value}
+        for bucket, value in EngagementCounter.objects.filter(
+            granularity=EngagementCounter.GRANULARITY_HOUR,
+            metric=metric,
+            bucket__gte=start,
+            bucket__lt=end,
+        )
+        .order_by("bucket")
+        .values_list("bucket", "value")
+    ]
+
+
+def _events_for_window(start: datetime, end: datetime):
+    return LearningEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end)
+
+
+@transaction.atomic
+def rebuild_rollups_for_date(target_date: date) -> None:
+    """Recompute the counters and active students for one day from raw events."""
+
+    if LearningEventArchive.objects.filter(period_start__lte=target_date, period_end__gt=target_date).exists():
+        raise ValueError(f"Raw events for {target_date} are archived; its rollups can no longer be rebuilt")
+
+    start = day_bucket(target_date)
+    end = start + timedelta(days=1)
+    events = _events_for_window(start, end)
+
+    EngagementCounter.objects.filter(
+        granularity=EngagementCounter.GRANULARITY_DAY, bucket=start
+    ).delete()
+    EngagementCounter.objects.filter(
+        granularity=EngagementCounter.GRANULARITY_HOUR, bucket__gte=start, bucket__lt=end
+    ).delete()
+    DailyActiveStudent.objects.filter(date=target_date).delete()
+
+    counters: list[EngagementCounter] = [
+        EngagementCounter(
+            granularity=EngagementCounter.GRANULARITY_DAY,
+            bucket=start,
+            metric=event_metric(row["event_type"]),
+            value=row["total"],
+        )
+        for row in events.order_by().values("event_type").annotate(total=Count("id"))
+    ]
+    counters.extend(
+        EngagementCounter(
+            granularity=EngagementCounter.GRANULARITY_HOUR,
+            bucket=row["hour"],
+            metric=event_metric(row["event_type"]),
+            value=row["total"],
+        )
+        for row in events.order_by()
+        .annotate(hour=TruncHour("occurred_at", tzinfo=dt_timezone.utc))
+        .values("hour", "event_type")
+        .annotate(total=Count("id"))
+    )
+
+    hourly_xp = {
+        row["hour"]: int(row["total"])
+        for row in events.filter(event_type=LearningEvent.TYPE_XP_AWARDED)
+        .order_by()
+        .annotate(hour=TruncHour("occurred_at", tzinfo=dt_timezone.utc))
+        .values("hour")
+        .annotate(total=xp_sum())
+        if row["total"]
+    }
+    daily_xp = sum(hourly_xp.values())
+    if daily_xp:
+        counters.append(
+            EngagementCounter(
+                granularity=EngagementCounter.GRANULARITY_DAY,
+                bucket=start,
+                metric=METRIC_XP_EARNED,
+                value=daily_xp,
+            )
+        )
+    counters.extend(
+        EngagementCounter(
+            granularity=EngagementCounter.GRANULARITY_HOUR,
+            bucket=bucket,
+            metric=METRIC_XP_EARNED,
+            value=value,
+        )
+        for bucket, value in hourly_xp.items()
+    )
+    EngagementCounter.objects.bulk_create(counters)
+
+    DailyActiveStudent.objects.bulk_create(
+        [
+            DailyActiveStudent(date=target_date, student_id=student_id)
+            for student_id in events.exclude(student__isnull=True)
+            .order_by()
+            .values_list("student_id", flat=True)
+            .distinct()
+        ]
+    )
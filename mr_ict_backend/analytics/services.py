@@ -2,18 +2,39 @@ from __future__ import annotations
 
 import csv
 import io
+import logging
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta
 from typing import Any, Dict, Iterable, Optional
 
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Q, Value, When
 from django.utils import timezone
 
+from analytics.caching import (
+    ADMIN_SUMMARY_KEY,
+    TODAY_SUMMARY_KEY,
+    admin_summary_ttl,
+    get_or_refresh,
+    today_summary_ttl,
+)
+from analytics.ingestion import EventBufferFull, EventBufferUnavailable, submit_events, write_events
 from analytics.models import DailyEngagementSummary, LearningEvent
+from analytics.retention import archive_watermark, is_archived
+from analytics.rollups import (
+    METRIC_XP_EARNED,
+    active_student_count,
+    daily_counters,
+    event_metric,
+    rebuild_rollups_for_date,
+    xp_sum,
+)
 from courses.models import CodingChallenge, Course, Lesson, PublishStatus
 from notifications.models import Announcement
 from students.models import Student, StudentCertificate, StudentCourse
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass(frozen=True)
 class AdminSummary:
@@ -24,14 +45,16 @@ class AdminSummary:
     announcements: Iterable[Dict[str, Any]]
 
 
-def _window_for_date(target_date: date) -> tuple[datetime, datetime]:
+def window_for_date(target_date: date) -> tuple[datetime, datetime]:
+    """Start and end of `target_date` in the current timezone."""
+
     tz = timezone.get_current_timezone()
     start = timezone.make_aware(datetime.combine(target_date, time.min), timezone=tz)
     end = start + timedelta(days=1)
     return start, end
 
 
-def record_event(
+def event_payload(
     *,
     event_type: str,
     user=None,
@@ -42,59 +65,143 @@ def record_event(
     source: str = LearningEvent.SOURCE_BACKEND,
     occurred_at: Optional[datetime] = None,
     metadata: Optional[Dict[str, Any]] = None,
-) -> LearningEvent:
-    """Persist a new learning event for analytics."""
+) -> Dict[str, Any]:
+    """Normalise an event into the plain payload the ingestion buffers carry."""
 
-    if occurred_at is None:
-        occurred_at = timezone.now()
-    payload = {
+    return {
         "event_type": event_type,
         "source": source,
-        "occurred_at": occurred_at,
+        "occurred_at": occurred_at or timezone.now(),
         "metadata": metadata or {},
+        "user_id": getattr(user, "pk", None),
+        "student_id": getattr(student, "pk", None),
+        "course_id": getattr(course, "pk", None),
+        "lesson_id": getattr(lesson, "pk", None),
+        "assessment_id": getattr(assessment, "pk", None),
     }
-    if user is not None:
-        payload["user"] = user
-    if student is not None:
-        payload["student"] = student
-    if course is not None:
-        payload["course"] = course
-    if lesson is not None:
-        payload["lesson"] = lesson
-    if assessment is not None:
-        payload["assessment"] = assessment
 
-    return LearningEvent.objects.create(**payload)
 
+def _submit_event(payload: Dict[str, Any]) -> None:
+    try:
+        submit_events([payload])
+    except EventBufferUnavailable:
+        logger.warning("Writing learning event %s directly; the event buffer is unavailable", payload["event_type"])
+        write_events([payload])
+    except EventBufferFull:
+        write_events([payload])
 
-def generate_daily_summary(target_date: Optional[date] = None) -> DailyEngagementSummary:
-    """Aggregate daily metrics for dashboards and reporting."""
 
-    if target_date is None:
-        target_date = timezone.localdate()
+def record_event(
+    *,
+    event_type: str,
+    user=None,
+    student=None,
+    course=None,
+    lesson=None,
+    assessment=None,
+    source: str = LearningEvent.SOURCE_BACKEND,
+    occurred_at: Optional[datetime] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Record a learning event for analytics and the incremental rollups.
+
+    The event is submitted when the current transaction commits (straight
+    away outside one), so a rolled-back change never emits its event and the
+    rows it points at exist by the time it is written. It is queued when an
+    ingestion buffer is configured; if the buffer is full or unreachable it
+    is written synchronously rather than dropped.
+    """
+
+    payload = event_payload(
+        event_type=event_type,
+        user=user,
+        student=student,
+        course=course,
+        lesson=lesson,
+        assessment=assessment,
+        source=source,
+        occurred_at=occurred_at,
+        metadata=metadata,
+    )
+    transaction.on_commit(lambda: _submit_event(payload), robust=True)
+
+
+def _rollup_event_counts(target_date: date) -> Dict[str, int]:
+    counters = daily_counters(target_date)
+    return {
+        "active_students": active_student_count(target_date),
+        "lessons_viewed": counters.get(event_metric(LearningEvent.TYPE_LESSON_VIEWED), 0),
+        "lessons_completed": counters.get(event_metric(LearningEvent.TYPE_LESSON_COMPLETED), 0),
+        "courses_completed": counters.get(event_metric(LearningEvent.TYPE_COURSE_COMPLETED), 0),
+        "assessments_completed": counters.get(event_metric(LearningEvent.TYPE_ASSESSMENT_COMPLETED), 0),
+        "comments_posted": counters.get(event_metric(LearningEvent.TYPE_COMMENT_CREATED), 0),
+        "xp_earned": counters.get(METRIC_XP_EARNED, 0),
+    }
+
+
+def _apply_rollup_counts(summary: DailyEngagementSummary, target_date: date) -> None:
+    for field, value in _rollup_event_counts(target_date).items():
+        setattr(summary, field, value)
 
-    start, end = _window_for_date(target_date)
+
+def _event_count_aggregates() -> Dict[str, Count]:
+    def of_type(event_type: str) -> Count:
+        return Count("id", filter=Q(event_type=event_type))
+
+    return {
+        "active_students": Count("student", distinct=True),
+        "lessons_viewed": of_type(LearningEvent.TYPE_LESSON_VIEWED),
+        "lessons_completed": of_type(LearningEvent.TYPE_LESSON_COMPLETED),
+        "courses_completed": of_type(LearningEvent.TYPE_COURSE_COMPLETED),
+        "assessments_completed": of_type(LearningEvent.TYPE_ASSESSMENT_COMPLETED),
+        "comments_posted": of_type(LearningEvent.TYPE_COMMENT_CREATED),
+    }
+
+
+def apply_event_counts(summary: DailyEngagementSummary, start: datetime, end: datetime) -> None:
+    """Recount the event-derived figures with two aggregate queries.
+
+    Counts and distinct students come from one pass over the covering
+    `(occurred_at, event_type, student)` index; the XP sum reads only the XP
+    rows through the `(event_type, occurred_at)` index.
+    """
 
     events = LearningEvent.objects.filter(occurred_at__gte=start, occurred_at__lt=end)
+    totals = events.aggregate(**_event_count_aggregates())
+    xp = events.filter(event_type=LearningEvent.TYPE_XP_AWARDED).aggregate(xp_earned=xp_sum())
+    totals["xp_earned"] = int(xp["xp_earned"])
+    for field, value in totals.items():
+        setattr(summary, field, value)
+
+
+def generate_daily_summary(
+    target_date: Optional[date] = None,
+    *,
+    recompute: bool = False,
+) -> DailyEngagementSummary:
+    """Aggregate daily metrics for dashboards and reporting.
+
+    Event-derived figures are read from the incremental rollups by default.
+    With `recompute=True` they are recounted from `LearningEvent` and the
+    rollups for the day are rebuilt, which repairs drift from events that
+    were written without `record_event`. Days whose raw events have been
+    archived are always answered from the rollups.
+    """
+
+    if target_date is None:
+        target_date = timezone.localdate()
+
+    start, end = window_for_date(target_date)
 
     summary, _ = DailyEngagementSummary.objects.get_or_create(date=target_date)
     summary.total_students = Student.objects.filter(created_at__lte=end).count()
     summary.new_students = Student.objects.filter(created_at__gte=start, created_at__lt=end).count()
-    summary.active_students = events.exclude(student__isnull=True).values("student").distinct().count()
-    summary.lessons_viewed = events.filter(event_type=LearningEvent.TYPE_LESSON_VIEWED).count()
-    summary.lessons_completed = events.filter(event_type=LearningEvent.TYPE_LESSON_COMPLETED).count()
-    summary.courses_completed = events.filter(event_type=LearningEvent.TYPE_COURSE_COMPLETED).count()
-    summary.assessments_completed = events.filter(event_type=LearningEvent.TYPE_ASSESSMENT_COMPLETED).count()
-    summary.comments_posted = events.filter(event_type=LearningEvent.TYPE_COMMENT_CREATED).count()
-
-    xp_total = 0
-    for event in events.filter(event_type=LearningEvent.TYPE_XP_AWARDED):
-        amount = event.metadata.get("amount") if isinstance(event.metadata, dict) else 0
-        try:
-            xp_total += int(amount)
-        except (TypeError, ValueError):
-            continue
-    summary.xp_earned = xp_total
+
+    if recompute and not is_archived(target_date):
+        apply_event_counts(summary, start, end)
+        rebuild_rollups_for_date(target_date)
+    else:
+        _apply_rollup_counts(summary, target_date)
 
     summary.certificates_issued = StudentCertificate.objects.filter(
         issued_at__gte=start,
@@ -116,8 +223,17 @@ def generate_daily_summary(target_date: Optional[date] = None) -> DailyEngagemen
     return summary
 
 
-def backfill_daily_summaries(start_date: date, end_date: date) -> list[DailyEngagementSummary]:
-    """Compute engagement summaries for every day in the inclusive range."""
+def backfill_daily_summaries(
+    start_date: date,
+    end_date: date,
+    *,
+    recompute: bool = True,
+) -> list[DailyEngagementSummary]:
+    """Compute engagement summaries for every day in the inclusive range.
+
+    Backfills recount from raw events by default since they are the repair
+    path for the rollups.
+    """
 
     if start_date > end_date:
         raise ValueError("start_date cannot be after end_date")
@@ -125,18 +241,156 @@ def backfill_daily_summaries(start_date: date, end_date: date) -> list[DailyEnga
     summaries: list[DailyEngagementSummary] = []
     current = start_date
     while current <= end_date:
-        summaries.append(generate_daily_summary(current))
+        summaries.append(generate_daily_summary(current, recompute=recompute))
         current += timedelta(days=1)
     return summaries
 
 
+def _daily_buckets(queryset, field: str, days: list[date], **aggregates) -> Dict[date, Dict[str, Any]]:
+    # Bucket rows with plain comparisons against each local-day boundary
+    # rather than a per-row timezone conversion, which SQLite runs in Python.
+    day_index = Case(
+        *[When(**{f"{field}__lt": window_for_date(day)[1]}, then=Value(index)) for index, day in enumerate(days)],
+        output_field=IntegerField(),
+    )
+    rows = queryset.order_by().annotate(day_index=day_index).values("day_index").annotate(**aggregates)
+    return {days[row.pop("day_index")]: row for row in rows}
+
+
+def summary_rows_for_range(start_date: date, end_date: date) -> list[Dict[str, Any]]:
+    """Summary field values for every day in the inclusive range.
+
+    Each source table is read with one range query grouped by local date, so
+    the cost is a handful of queries per range rather than per day. Days
+    without activity get zeroed rows.
+    """
+
+    if start_date > end_date:
+        raise ValueError("start_date cannot be after end_date")
+
+    start, _ = window_for_date(start_date)
+    _, end = window_for_date(end_date)
+
+    def within(field: str) -> Dict[str, datetime]:
+        return {f"{field}__gte": start, f"{field}__lt": end}
+
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+    def counts_by_day(queryset, field: str) -> Dict[date, Dict[str, Any]]:
+        return _daily_buckets(queryset.filter(**within(field)), field, days, total=Count("id"))
+
+    events = LearningEvent.objects.filter(**within("occurred_at"))
+    event_counts = _daily_buckets(events, "occurred_at", days, **_event_count_aggregates())
+    xp_totals = _daily_buckets(
+        events.filter(event_type=LearningEvent.TYPE_XP_AWARDED), "occurred_at", days, xp_earned=xp_sum()
+    )
+    new_students = counts_by_day(Student.objects.all(), "created_at")
+    certificates = counts_by_day(StudentCertificate.objects.all(), "issued_at")
+    announcements = counts_by_day(Announcement.objects.all(), "published_at")
+    course_completions = counts_by_day(StudentCourse.objects.filter(completed=True), "updated_at")
+
+    watermark = archive_watermark()
+    total_students = Student.objects.filter(created_at__lt=start).count()
+    rows: list[Dict[str, Any]] = []
+    for current in days:
+        new_today = new_students.get(current, {}).get("total", 0)
+        total_students += new_today
+        counts = event_counts.get(current, {})
+        if is_archived(current, watermark):
+            counts = _rollup_event_counts(current)
+            xp_totals[current] = {"xp_earned": counts["xp_earned"]}
+        rows.append(
+            {
+                "date": current,
+                "total_students": total_students,
+                "new_students": new_today,
+                "active_students": counts.get("active_students", 0),
+                "lessons_viewed": counts.get("lessons_viewed", 0),
+                "lessons_completed": counts.get("lessons_completed", 0),
+                "courses_completed": counts.get("courses_completed", 0),
+                "assessments_completed": counts.get("assessments_completed", 0),
+                "comments_posted": counts.get("comments_posted", 0),
+                "xp_earned": int(xp_totals.get(current, {}).get("xp_earned", 0)),
+                "certificates_issued": certificates.get(current, {}).get("total", 0),
+                "metadata": {
+                    "announcements_published": announcements.get(current, {}).get("total", 0),
+                    "courses_completed_today": course_completions.get(current, {}).get("total", 0),
+                },
+            }
+        )
+    return rows
+
+
+SUMMARY_UPSERT_FIELDS = (
+    "total_students",
+    "new_students",
+    "active_students",
+    "lessons_viewed",
+    "lessons_completed",
+    "courses_completed",
+    "assessments_completed",
+    "comments_posted",
+    "xp_earned",
+    "certificates_issued",
+    "metadata",
+    "generated_at",
+)
+
+
+def upsert_daily_summaries(rows: Iterable[Dict[str, Any]]) -> int:
+    """Insert or overwrite `DailyEngagementSummary` rows in one statement."""
+
+    summaries = [DailyEngagementSummary(**row) for row in rows]
+    DailyEngagementSummary.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=list(SUMMARY_UPSERT_FIELDS),
+    )
+    return len(summaries)
+
+
+def current_day_summary() -> DailyEngagementSummary:
+    """Today's summary, regenerated at most once per `ANALYTICS_TODAY_SUMMARY_TTL`."""
+
+    today = timezone.localdate()
+    summary = get_or_refresh(TODAY_SUMMARY_KEY, generate_daily_summary, ttl=today_summary_ttl())
+    if summary.date != today:
+        # The cached entry is from before midnight.
+        summary = generate_daily_summary(today)
+    return summary
+
+
 def _summaries_for_range(days: int = 7) -> list[DailyEngagementSummary]:
+    """Summaries for the last `days` days, oldest first.
+
+    Past days are immutable once they have been generated after the day
+    ended, so they are read from stored rows. A day with no row, or whose row
+    was last written while the day was still in progress, is finalised by
+    recounting its raw events; when those have been archived the stored row
+    is kept as it is, since the rollups may not cover the day.
+    """
+
     if days <= 0:
         return []
 
     today = timezone.localdate()
     start = today - timedelta(days=days - 1)
-    return backfill_daily_summaries(start, today)
+    stored = {
+        summary.date: summary
+        for summary in DailyEngagementSummary.objects.filter(date__gte=start, date__lt=today)
+    }
+
+    dates = [start + timedelta(days=offset) for offset in range(days - 1)]
+    provisional = [
+        day for day in dates if day not in stored or stored[day].generated_at < window_for_date(day)[1]
+    ]
+    watermark = archive_watermark() if provisional else None
+    for day in provisional:
+        if day not in stored or not (watermark is not None and day < watermark):
+            stored[day] = generate_daily_summary(day, recompute=True)
+
+    return [stored[day] for day in dates] + [current_day_summary()]
 
 
 def _describe_event(event: LearningEvent) -> Dict[str, Any]:
@@ -179,7 +433,34 @@ def _describe_event(event: LearningEvent) -> Dict[str, Any]:
 
 
 def build_admin_summary() -> AdminSummary:
-    today_summary = generate_daily_summary()
+    """Dashboard payload, cached for `ANALYTICS_ADMIN_SUMMARY_TTL` seconds.
+
+    The cache is dropped when courses, lessons, challenges, announcements,
+    students or enrolments change (see `analytics.signals`). Event-driven
+    figures are allowed to lag by up to the TTL.
+    """
+
+    return get_or_refresh(ADMIN_SUMMARY_KEY, _build_admin_summary, ttl=admin_summary_ttl())
+
+
+RECENT_ACTIVITY_WINDOW = timedelta(days=7)
+
+
+def _recent_events(limit: int) -> list[LearningEvent]:
+    # Bounding the scan lets PostgreSQL prune to the newest partitions; the
+    # unbounded query only runs when the last week was too quiet.
+    events = LearningEvent.objects.select_related("student__user", "lesson", "course", "assessment").order_by(
+        "-occurred_at"
+    )
+    recent = list(events.filter(occurred_at__gte=timezone.now() - RECENT_ACTIVITY_WINDOW)[:limit])
+    if len(recent) < limit:
+        recent = list(events[:limit])
+    return recent
+
+
+def _build_admin_summary() -> AdminSummary:
+    summaries = _summaries_for_range(days=7)
+    today_summary = summaries[-1]
     stats = {
         "totalStudents": today_summary.total_students,
         "activeStudentsToday": today_summary.active_students,
@@ -196,14 +477,8 @@ def build_admin_summary() -> AdminSummary:
         "totalChallenges": CodingChallenge.objects.filter(is_archived=False).count(),
     }
 
-    recent_events = [
-        _describe_event(event)
-        for event in LearningEvent.objects.select_related(
-            "student__user", "lesson", "course", "assessment"
-        ).order_by("-occurred_at")[:20]
-    ]
+    recent_events = [_describe_event(event) for event in _recent_events(limit=20)]
 
-    summaries = _summaries_for_range(days=7)
     timeseries = [
         {
             "date": summary.date,
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+
+from analytics.caching import ADMIN_SUMMARY_KEY, invalidate
+from courses.models import CodingChallenge, Course, Lesson
+from notifications.models import Announcement
+from students.models import Student, StudentCertificate, StudentCourse
+
+ADMIN_SUMMARY_SOURCES = (
+    Announcement,
+    CodingChallenge,
+    Course,
+    Lesson,
+    Student,
+    StudentCertificate,
+    StudentCourse,
+)
+
+
+def invalidate_admin_summary(sender, **kwargs) -> None:
+    """Drop the cached admin dashboard when one of its sources changes."""
+
+    invalidate(ADMIN_SUMMARY_KEY)
+
+
+for model in ADMIN_SUMMARY_SOURCES:
+    for action, signal in (("save", post_save), ("delete", post_delete)):
+        signal.connect(
+            invalidate_admin_summary,
+            sender=model,
+            dispatch_uid=f"analytics-admin-summary-{model._meta.label_lower}-{action}",
+        )
@@ -4,8 +4,11 @@ from datetime import date
 from typing import Optional
 
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 
+from analytics.partitions import ensure_partitions
+from analytics.retention import compact_learning_events
 from analytics.services import generate_daily_summary
 
 
@@ -27,3 +30,12 @@ def compute_today_summary_task() -> str:
 
     summary = generate_daily_summary()
     return f"Summary computed for {summary.date.isoformat()}"
+
+
+@shared_task(name="analytics.maintain_learning_events")
+def maintain_learning_events_task() -> str:
+    """Create upcoming event partitions and compact months past retention."""
+
+    created = ensure_partitions(settings.ANALYTICS_EVENT_PARTITIONS_AHEAD)
+    archives = compact_learning_events()
+    return f"Created {len(created)} partition(s), archived {len(archives)} month(s)"
@@ -1,23 +1,66 @@
 from __future__ import annotations
 
-from datetime import timedelta
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.management import call_command
 from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from analytics.models import DailyEngagementSummary, LearningEvent
-from analytics.services import backfill_daily_summaries, generate_daily_summary
+from analytics.caching import ADMIN_SUMMARY_KEY, get_or_refresh
+from analytics.ingestion import MemoryEventBuffer, RedisStreamEventBuffer, replay_dead_letters, write_events
+from analytics.models import (
+    DailyActiveStudent,
+    DailyEngagementSummary,
+    EngagementCounter,
+    LearningEvent,
+    LearningEventArchive,
+    LearningEventDeadLetter,
+)
+from analytics.partitions import add_months, ensure_partitions, month_start, partition_name
+from analytics.retention import archive_watermark, compact_learning_events
+from analytics.rollups import (
+    METRIC_XP_EARNED,
+    daily_counters,
+    event_metric,
+    hourly_series,
+    rebuild_rollups_for_date,
+    xp_amount,
+)
+from analytics.services import (
+    _summaries_for_range,
+    apply_event_counts,
+    backfill_daily_summaries,
+    build_admin_summary,
+    generate_daily_summary,
+    record_event,
+    summary_rows_for_range,
+    window_for_date,
+)
 from courses.models import Course, Lesson, Module, PublishStatus
 from schools.models import School
 from students.models import Student, StudentCourse, StudentLesson
 
+# Cache behaviour is asserted against per-process memory, whatever the
+# environment configures.
+LOCAL_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
 
+
+@override_settings(CACHES=LOCAL_CACHE)
 class AnalyticsApiTests(APITestCase):
     def setUp(self) -> None:
         User = get_user_model()
@@ -116,6 +159,7 @@ class AnalyticsApiTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         data = response.data["data"]
         self.assertGreaterEqual(data["stats"]["totalStudents"], 1)
+        self.assertIs(type(data["stats"]["xpAwardedToday"]), int)
         self.assertGreaterEqual(len(data["recent_activity"]), 1)
         self.assertGreaterEqual(len(data["timeseries"]), 1)
 
@@ -125,6 +169,193 @@ class AnalyticsApiTests(APITestCase):
         self.assertEqual(csv_response["Content-Type"], "text/csv")
 
 
+class AnalyticsIngestionTests(APITestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email="ingest-student@example.com",
+            password="password123",
+            first_name="Yaw",
+            last_name="Asante",
+        )
+        school = School.objects.create(
+            school_id="SCH-INGEST",
+            name="Ingest School",
+            region="Volta",
+            district="Ho",
+            phone="0270000000",
+        )
+        self.student = Student.objects.create(user=self.user, school=school)
+        self.course = Course.objects.create(
+            title="Ingest Course", summary="", description="", status=PublishStatus.PUBLISHED
+        )
+        self.lesson = Lesson.objects.create(
+            course=self.course, title="Ingest Lesson", order=1, status=PublishStatus.PUBLISHED
+        )
+        self.client.force_authenticate(self.user)
+        self.url = reverse("analytics:events-batch")
+        self.events = [
+            {
+                "event_type": LearningEvent.TYPE_LESSON_VIEWED,
+                "course_id": self.course.course_id,
+                "lesson_id": self.lesson.lesson_id,
+            }
+            for _ in range(3)
+        ] + [{"event_type": LearningEvent.TYPE_XP_AWARDED, "metadata": {"amount": 5}}]
+
+    def _buffer(self, **overrides):
+        options = {"batch_size": 2, "flush_interval": 0.1, "max_pending": 10, "max_attempts": 2}
+        options.update(overrides)
+        buffer = MemoryEventBuffer(**options)
+        patcher = mock.patch("analytics.ingestion.get_event_buffer", return_value=buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return buffer
+
+    def test_batch_endpoint_resolves_lookups_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {"events": self.events}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["accepted"], 4)
+        lesson_queries = [query for query in queries if 'FROM "courses_lesson"' in query["sql"]]
+        self.assertEqual(len(lesson_queries), 1)
+        self.assertEqual(LearningEvent.objects.filter(lesson=self.lesson, course=self.course).count(), 3)
+        self.assertEqual(daily_counters(timezone.localdate())[METRIC_XP_EARNED], 5)
+
+    def test_buffered_events_are_written_in_batches(self):
+        buffer = self._buffer()
+
+        response = self.client.post(self.url, {"events": self.events}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(LearningEvent.objects.count(), 0)
+        with mock.patch("analytics.ingestion.write_events", wraps=write_events) as write:
+            self.assertEqual(buffer.flush(), 4)
+        self.assertEqual(write.call_count, 2)
+        self.assertEqual(LearningEvent.objects.filter(student=self.student).count(), 4)
+
+    def test_full_buffer_applies_backpressure(self):
+        self._buffer(max_pending=3)
+
+        response = self.client.post(self.url, {"events": self.events}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("retry_in", response.data)
+
+    def test_failing_batches_are_retried_then_dead_lettered(self):
+        buffer = self._buffer(batch_size=10)
+        self.client.post(self.url, {"events": self.events[:2]}, format="json")
+
+        with mock.patch("analytics.ingestion.write_events", side_effect=RuntimeError("database away")):
+            self.assertEqual(buffer.flush(), 0)
+            self.assertEqual(len(buffer), 2)
+            buffer.flush()
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(LearningEventDeadLetter.objects.count(), 2)
+        self.assertEqual(LearningEventDeadLetter.objects.first().attempts, 2)
+
+        self.assertEqual(replay_dead_letters(), 2)
+        self.assertEqual(LearningEventDeadLetter.objects.count(), 0)
+        self.assertEqual(LearningEvent.objects.filter(lesson=self.lesson).count(), 2)
+
+
+    def test_record_event_waits_for_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    record_event(user=self.user, student=self.student, event_type=LearningEvent.TYPE_XP_AWARDED, metadata={"amount": 5})
+                    raise RuntimeError("award rolled back")
+            record_event(user=self.user, student=self.student, event_type=LearningEvent.TYPE_LESSON_VIEWED)
+            self.assertEqual(LearningEvent.objects.count(), 0)
+
+        self.assertEqual(list(LearningEvent.objects.values_list("event_type", flat=True)), [LearningEvent.TYPE_LESSON_VIEWED])
+
+    def test_unreachable_redis_stream_falls_back_to_direct_writes(self):
+        buffer = RedisStreamEventBuffer(
+            "redis://127.0.0.1:1/0",
+            stream="test-events",
+            group="test",
+            batch_size=10,
+            flush_interval=0.1,
+            max_pending=10,
+            max_attempts=2,
+        )
+        with mock.patch("analytics.ingestion.get_event_buffer", return_value=buffer):
+            with self.captureOnCommitCallbacks(execute=True):
+                record_event(user=self.user, student=self.student, event_type=LearningEvent.TYPE_LESSON_VIEWED)
+
+        self.assertEqual(LearningEvent.objects.filter(student=self.student).count(), 1)
+
+class LearningEventRetentionTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email="retention-student@example.com",
+            password="password123",
+            first_name="Akosua",
+            last_name="Darko",
+        )
+        school = School.objects.create(
+            school_id="SCH-RETAIN",
+            name="Retention School",
+            region="Northern",
+            district="Tamale",
+            phone="0500000000",
+        )
+        self.student = Student.objects.create(user=self.user, school=school)
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, True)
+        self.today = timezone.localdate()
+        self.old_month = add_months(month_start(self.today), -3)
+        self.old_day = self.old_month + timedelta(days=4)
+        occurred_at = timezone.make_aware(datetime.combine(self.old_day, time(10, 30)))
+        for event_type, metadata in (
+            (LearningEvent.TYPE_LESSON_VIEWED, {}),
+            (LearningEvent.TYPE_XP_AWARDED, {"amount": 40}),
+        ):
+            LearningEvent.objects.create(
+                user=self.user,
+                student=self.student,
+                event_type=event_type,
+                metadata=metadata,
+                occurred_at=occurred_at,
+            )
+        LearningEvent.objects.create(user=self.user, student=self.student, event_type=LearningEvent.TYPE_LESSON_VIEWED)
+
+    def test_old_months_are_archived_and_still_answer_queries(self):
+        with override_settings(ANALYTICS_ARCHIVE_DIR=self.archive_dir):
+            archives = compact_learning_events(retention_months=2, today=self.today)
+
+        self.assertEqual([archive.period_start for archive in archives], [self.old_month])
+        self.assertEqual(archive_watermark(), add_months(self.old_month, 1))
+        self.assertEqual(LearningEvent.objects.count(), 1)
+        with gzip.open(archives[0].path, "rt") as handle:
+            rows = [json.loads(line) for line in handle]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(archives[0].row_count, 2)
+
+        summary = generate_daily_summary(self.old_day, recompute=True)
+        self.assertEqual(summary.lessons_viewed, 1)
+        self.assertEqual(summary.xp_earned, 40)
+        self.assertEqual(summary.active_students, 1)
+        row = next(row for row in summary_rows_for_range(self.old_month, self.old_day) if row["date"] == self.old_day)
+        self.assertEqual(row["xp_earned"], 40)
+        with self.assertRaises(ValueError):
+            rebuild_rollups_for_date(self.old_day)
+
+        with override_settings(ANALYTICS_ARCHIVE_DIR=self.archive_dir):
+            self.assertEqual(compact_learning_events(retention_months=2, today=self.today), [])
+
+    def test_retention_disabled_keeps_raw_events(self):
+        self.assertEqual(compact_learning_events(retention_months=0), [])
+        self.assertEqual(LearningEvent.objects.count(), 3)
+
+    def test_partition_helpers_are_noops_without_postgresql(self):
+        self.assertEqual(ensure_partitions(), [])
+        self.assertEqual(add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(partition_name(date(2026, 2, 1)), "analytics_learningevent_p202602")
+
+
 class AnalyticsServiceTests(TestCase):
     def test_backfill_daily_summaries_validates_range(self):
         today = timezone.localdate()
@@ -132,6 +363,167 @@ class AnalyticsServiceTests(TestCase):
             backfill_daily_summaries(today, today - timedelta(days=1))
 
 
+class AnalyticsRollupTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(
+            email="rollup-student@example.com",
+            password="password123",
+            first_name="Efua",
+            last_name="Owusu",
+        )
+        school = School.objects.create(
+            school_id="SCH-ROLL",
+            name="Rollup School",
+            region="Central",
+            district="Cape Coast",
+            phone="0240000000",
+        )
+        self.student = Student.objects.create(user=self.user, school=school)
+
+    def test_record_event_updates_day_and_hour_counters(self):
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                record_event(user=self.user, student=self.student, event_type=LearningEvent.TYPE_LESSON_VIEWED, occurred_at=now)
+            record_event(user=self.user, student=self.student, event_type=LearningEvent.TYPE_XP_AWARDED, metadata={"amount": 15}, occurred_at=now)
+
+        counters = daily_counters(timezone.localdate(now))
+        self.assertEqual(counters[event_metric(LearningEvent.TYPE_LESSON_VIEWED)], 2)
+        self.assertEqual(counters[METRIC_XP_EARNED], 15)
+        self.assertEqual(DailyActiveStudent.objects.count(), 1)
+
+        series = hourly_series(
+            event_metric(LearningEvent.TYPE_LESSON_VIEWED), now - timedelta(hours=1), now + timedelta(hours=1)
+        )
+        self.assertEqual([point["value"] for point in series], [2])
+
+    def test_summary_reads_rollups_without_scanning_events(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_event(user=self.user, student=self.student, event_type=LearningEvent.TYPE_LESSON_COMPLETED)
+            record_event(user=self.user, student=self.student, event_type=LearningEvent.TYPE_XP_AWARDED, metadata={"amount": "10"})
+
+        summary = generate_daily_summary()
+
+        self.assertEqual(summary.lessons_completed, 1)
+        self.assertEqual(summary.xp_earned, 10)
+        self.assertEqual(summary.active_students, 1)
+
+    def test_recompute_repairs_rollups_from_raw_events(self):
+        LearningEvent.objects.create(
+            user=self.user,
+            student=self.student,
+            event_type=LearningEvent.TYPE_XP_AWARDED,
+            metadata={"amount": 25},
+        )
+        self.assertEqual(generate_daily_summary().xp_earned, 0)
+
+        summary = generate_daily_summary(recompute=True)
+
+        self.assertEqual(summary.xp_earned, 25)
+        self.assertEqual(summary.active_students, 1)
+        self.assertEqual(daily_counters(timezone.localdate())[METRIC_XP_EARNED], 25)
+        self.assertEqual(
+            EngagementCounter.objects.filter(granularity=EngagementCounter.GRANULARITY_HOUR, metric=METRIC_XP_EARNED).count(),
+            1,
+        )
+        self.assertEqual(generate_daily_summary().xp_earned, 25)
+
+
+class SummaryAggregationTests(TestCase):
+    def test_recount_runs_as_aggregate_queries(self):
+        now = timezone.now()
+        amounts = [15, "10", " 5 ", "abc", None, 2.5, "10.0", -3.7, " -1.5 ", "1e3", True, {"nested": 1}]
+        LearningEvent.objects.bulk_create(
+            [
+                LearningEvent(event_type=LearningEvent.TYPE_XP_AWARDED, metadata={"amount": amount}, occurred_at=now)
+                for amount in amounts
+            ]
+            + [
+                LearningEvent(event_type=LearningEvent.TYPE_XP_AWARDED, metadata={}, occurred_at=now),
+                LearningEvent(event_type=LearningEvent.TYPE_LESSON_VIEWED, occurred_at=now),
+                LearningEvent(event_type=LearningEvent.TYPE_COMMENT_CREATED, occurred_at=now),
+                LearningEvent(
+                    event_type=LearningEvent.TYPE_LESSON_VIEWED, occurred_at=now - timedelta(days=2)
+                ),
+            ]
+        )
+        summary = DailyEngagementSummary(date=timezone.localdate())
+        start, end = window_for_date(summary.date)
+
+        with self.assertNumQueries(2):
+            apply_event_counts(summary, start, end)
+
+        # Numbers truncate toward zero, as int() does: 15 + 10 + 5 + 2 + 10 - 3 - 1.
+        self.assertEqual(summary.xp_earned, 38)
+        self.assertIs(type(summary.xp_earned), int)
+        self.assertEqual(sum(xp_amount({"amount": amount}) for amount in amounts), 38)
+        self.assertEqual(summary.lessons_viewed, 1)
+        self.assertEqual(summary.comments_posted, 1)
+        self.assertEqual(summary.active_students, 0)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class AdminSummaryCachingTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_finalised_days_are_read_from_stored_rows(self):
+        today = timezone.localdate()
+        yesterday = today - timedelta(days=1)
+        in_progress_day = yesterday - timedelta(days=1)
+        archived_day = yesterday - timedelta(days=2)
+        DailyEngagementSummary.objects.create(date=yesterday, lessons_viewed=42)
+        DailyEngagementSummary.objects.create(date=in_progress_day, lessons_viewed=7)
+        DailyEngagementSummary.objects.create(date=archived_day, lessons_viewed=5)
+        # Last written while the days were still in progress.
+        DailyEngagementSummary.objects.filter(date__in=[in_progress_day, archived_day]).update(
+            generated_at=timezone.now() - timedelta(days=5)
+        )
+        LearningEventArchive.objects.create(
+            period_start=archived_day - timedelta(days=30), period_end=in_progress_day, path="archive.jsonl.gz", sha256=""
+        )
+        # The day's raw events exist but its rollups were never written.
+        day_start, _ = window_for_date(in_progress_day)
+        for _ in range(9):
+            LearningEvent.objects.create(event_type=LearningEvent.TYPE_LESSON_VIEWED, occurred_at=day_start + timedelta(hours=10))
+
+        summaries = _summaries_for_range(days=7)
+
+        self.assertEqual(
+            [summary.date for summary in summaries][-4:], [archived_day, in_progress_day, yesterday, today]
+        )
+        self.assertEqual(summaries[-2].lessons_viewed, 42)
+        self.assertEqual(summaries[-3].lessons_viewed, 9)
+        self.assertEqual(summaries[-4].lessons_viewed, 5)
+        self.assertEqual(DailyEngagementSummary.objects.get(date=archived_day).lessons_viewed, 5)
+        with self.assertNumQueries(2):
+            # The stored rows, plus the archive watermark for the kept archived day.
+            _summaries_for_range(days=7)
+
+    def test_admin_summary_is_cached_until_a_source_changes(self):
+        build_admin_summary()
+        with self.assertNumQueries(0):
+            build_admin_summary()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(title="Fresh Course", summary="", description="", status=PublishStatus.PUBLISHED)
+
+        self.assertIsNone(cache.get(ADMIN_SUMMARY_KEY))
+        self.assertEqual(build_admin_summary().stats["activeCourses"], 1)
+
+    def test_stale_value_is_served_while_another_caller_refreshes(self):
+        calls = []
+        get_or_refresh("analytics:test", lambda: calls.append(1) or "first", ttl=1)
+        cache.set("analytics:test", (0, "first"), 60)
+        cache.add("analytics:test:lock", "1", 30)
+
+        value = get_or_refresh("analytics:test", lambda: calls.append(1) or "second", ttl=1)
+
+        self.assertEqual(value, "first")
+        self.assertEqual(len(calls), 1)
+
+
 class AnalyticsManagementCommandTests(TestCase):
     def setUp(self) -> None:
         User = get_user_model()
@@ -167,6 +559,54 @@ class AnalyticsManagementCommandTests(TestCase):
         self.assertEqual(summary.lessons_viewed, 1)
         self.assertEqual(summary.active_students, 1)
 
+    def test_chunked_backfill_matches_day_by_day_backfill(self):
+        start = timezone.localdate() - timedelta(days=4)
+        for offset, event_type in enumerate(
+            [LearningEvent.TYPE_LESSON_VIEWED, LearningEvent.TYPE_XP_AWARDED, LearningEvent.TYPE_LESSON_COMPLETED]
+        ):
+            LearningEvent.objects.create(
+                user=self.user,
+                student=self.student,
+                event_type=event_type,
+                metadata={"amount": 12},
+                occurred_at=timezone.now() - timedelta(days=offset + 1),
+            )
+        fields = ["date", "total_students", "new_students", "active_students", "lessons_viewed",
+                  "lessons_completed", "xp_earned", "certificates_issued", "metadata"]
+
+        call_command("backfill_analytics", start=start.isoformat(), days=5)
+        day_by_day = list(DailyEngagementSummary.objects.order_by("date").values(*fields))
+        DailyEngagementSummary.objects.all().delete()
+
+        call_command("backfill_analytics", start=start.isoformat(), days=5, workers=1, chunk_days=2)
+        chunked = list(DailyEngagementSummary.objects.order_by("date").values(*fields))
+
+        self.assertEqual(len(chunked), 5)
+        self.assertEqual(chunked, day_by_day)
+
+    def test_chunked_backfill_resumes_from_checkpoint(self):
+        start = timezone.localdate() - timedelta(days=5)
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = Path(directory) / "backfill.json"
+            checkpoint.write_text(
+                json.dumps({"completed": [(start + timedelta(days=offset)).isoformat() for offset in range(3)]})
+            )
+            output = io.StringIO()
+
+            call_command(
+                "backfill_analytics",
+                start=start.isoformat(),
+                days=6,
+                workers=1,
+                chunk_days=3,
+                checkpoint=str(checkpoint),
+                stdout=output,
+            )
+
+            self.assertIn("Resuming: 1 of 2 chunk(s) already completed", output.getvalue())
+            self.assertEqual(len(json.loads(checkpoint.read_text())["completed"]), 6)
+        self.assertEqual(DailyEngagementSummary.objects.count(), 3)
+
     def test_backfill_command_rejects_invalid_range(self):
         with self.assertRaises(CommandError):
             call_command("backfill_analytics", start="2025-09-10", end="2025-09-01")
@@ -1,23 +1,25 @@
 import os
 
-from channels.auth import AuthMiddlewareStack
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
 from django.core.asgi import get_asgi_application
 
-from core import routing
-
 
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 
 django_asgi_app = get_asgi_application()
 
+# Routing imports consumers (and therefore models), so it must load after the
+# app registry is populated by get_asgi_application().
+from core import routing  # noqa: E402
+from core.ws_auth import JWTAuthMiddlewareStack  # noqa: E402
+
 application = ProtocolTypeRouter(
     {
         "http": django_asgi_app,
         "websocket": AllowedHostsOriginValidator(
-            AuthMiddlewareStack(URLRouter(routing.websocket_urlpatterns))
+            JWTAuthMiddlewareStack(URLRouter(routing.websocket_urlpatterns))
         )
     }
 )
\ No newline at end of file
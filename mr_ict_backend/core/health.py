@@ -1,10 +1,31 @@
 from __future__ import annotations
 
 from celery import current_app
+from django.conf import settings
 from django.core.cache import caches
 from django.db import connection
 from django.http import JsonResponse
 
+from students.services.execution_cache import get_result_cache
+
+try:
+    from llm_tutor.tutor.cache import rag_cache_stats
+    from llm_tutor.tutor.client import llm_client_stats
+    from llm_tutor.tutor.responses import response_cache_stats
+    from llm_tutor.tutor.warmup import rag_status
+except ImportError:  # pragma: no cover - the LLM tutor is optional
+    def llm_client_stats():
+        return None
+
+    def rag_cache_stats():
+        return None
+
+    def rag_status():
+        return None
+
+    def response_cache_stats():
+        return None
+
 
 def health_check_view(request):
     checks: dict[str, str] = {}
@@ -35,4 +56,41 @@ def health_check_view(request):
         checks["celery"] = f"error: {exc}"
 
     overall = "ok" if all(value == "ok" for value in checks.values()) else "degraded"
-    return JsonResponse({"status": overall, "checks": checks})
+
+    # Code execution result cache hit/miss counters
+    result_cache = get_result_cache()
+    metrics = {
+        "code_result_cache": result_cache.stats() if result_cache else None,
+        "llm_client": llm_client_stats(),
+        "rag": rag_status(),
+        "rag_cache": rag_cache_stats(),
+        "tutor_responses": response_cache_stats(),
+    }
+
+    return JsonResponse({"status": overall, "checks": checks, "metrics": metrics})
+
+
+def readiness_check_view(request):
+    """Answer 503 until this process can serve traffic.
+
+    Unlike the health check this ignores Celery and the cache: it only fails
+    while the database is unreachable or while a configured RAG preload has
+    not finished (or failed), so load balancers hold traffic back from a
+    worker that would otherwise stall its first tutor request.
+    """
+
+    checks: dict[str, str] = {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        checks["database"] = "ok"
+    except Exception as exc:  # pragma: no cover - recorded in response
+        checks["database"] = f"error: {exc}"
+
+    rag = rag_status()
+    if getattr(settings, "LLM_TUTOR_RAG_PRELOAD", "") and rag is not None:
+        checks["rag"] = "ok" if rag["state"] == "ready" else rag["error"] or rag["state"]
+
+    ready = all(value == "ok" for value in checks.values())
+    return JsonResponse({"status": "ready" if ready else "not_ready", "checks": checks}, status=200 if ready else 503)
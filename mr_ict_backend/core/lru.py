@@ -0,0 +1,110 @@
+"""Bounded LRU stores shared by the result and response caches.
+
+`LocalLRU` lives in the process; `RedisLRU` is shared by every web and Celery
+worker pointed at the same Redis, each user under its own key prefix. Both
+expose `get`, `set`, `stats` and `clear`. Neither swallows errors: callers
+decide whether a failing store is a miss.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class LocalLRU:
+    """Thread-safe in-process LRU with hit and miss counters."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class RedisLRU:
+    """LRU on Redis: values under `<prefix>:v:<key>`, recency in a sorted set."""
+
+    def __init__(self, url: str, max_entries: int, ttl: int, prefix: str) -> None:
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.prefix = prefix
+        self.recency_key = f"{prefix}:lru"
+        self.hits_key = f"{prefix}:hits"
+        self.misses_key = f"{prefix}:misses"
+
+    def _value_key(self, key: str) -> str:
+        return f"{self.prefix}:v:{key}"
+
+    def get(self, key: str) -> Optional[dict]:
+        raw = self.client.get(self._value_key(key))
+        pipe = self.client.pipeline(transaction=False)
+        if raw is None:
+            pipe.incr(self.misses_key)
+            pipe.zrem(self.recency_key, key)
+            pipe.execute()
+            return None
+        pipe.incr(self.hits_key)
+        pipe.zadd(self.recency_key, {key: time.time()})
+        pipe.execute()
+        return json.loads(raw)
+
+    def set(self, key: str, value: dict) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self._value_key(key), json.dumps(value), ex=self.ttl)
+        pipe.zadd(self.recency_key, {key: time.time()})
+        pipe.zcard(self.recency_key)
+        _, _, size = pipe.execute()
+        overflow = size - self.max_entries
+        if overflow > 0:
+            evicted = self.client.zpopmin(self.recency_key, overflow)
+            if evicted:
+                self.client.delete(*(self._value_key(member.decode()) for member, _ in evicted))
+
+    def stats(self) -> Dict[str, int]:
+        hits, misses, entries = (
+            self.client.pipeline(transaction=False)
+            .get(self.hits_key)
+            .get(self.misses_key)
+            .zcard(self.recency_key)
+            .execute()
+        )
+        return {"hits": int(hits or 0), "misses": int(misses or 0), "entries": int(entries or 0)}
+
+    def clear(self) -> None:
+        members = self.client.zrange(self.recency_key, 0, -1)
+        keys = [self._value_key(member.decode()) for member in members]
+        self.client.delete(self.recency_key, self.hits_key, self.misses_key, *keys)
@@ -0,0 +1,193 @@
+"""Serving files under MEDIA_ROOT with byte ranges and conditional requests.
+
+`serve_media` answers `Range: bytes=...` with 206 partial content, so seeking
+in a lesson video fetches only the bytes after the seek point, and answers
+`If-None-Match` / `If-Modified-Since` with 304. The bytes themselves are sent
+in one of three ways, chosen by `MEDIA_OFFLOAD`:
+
+- "x-accel-redirect": an empty response with `X-Accel-Redirect` pointing at
+  an `internal` nginx location (`MEDIA_ACCEL_PREFIX`) aliased to MEDIA_ROOT;
+  nginx handles ranges itself.
+- "x-sendfile": `X-Sendfile` with the absolute path for Apache/lighttpd.
+- "" (default): a `FileResponse` over the open file. Under gunicorn the WSGI
+  file wrapper hands the descriptor to `os.sendfile`, limited to the response's
+  Content-Length, so the range never passes through Python.
+
+`?download=1` adds `Content-Disposition: attachment` for download links.
+"""
+from __future__ import annotations
+
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import content_disposition_header, http_date, parse_etags, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+OFFLOAD_ACCEL = "x-accel-redirect"
+OFFLOAD_SENDFILE = "x-sendfile"
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# HLS playlists and segments are not in every platform's mime database.
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/mp2t", ".ts")
+
+
+def file_etag(stat: os.stat_result) -> str:
+    """Strong validator from size and mtime, in the same form as nginx."""
+
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive `(start, end)` of a single byte range.
+
+    Returns None when the header should be ignored (malformed or multiple
+    ranges; the full file is sent), and raises ValueError when the range
+    cannot be satisfied.
+    """
+
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes.
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError("range starts past the end of the file")
+    return start, end
+
+
+class RangeFile:
+    """Read-only view of `length` bytes of an open file starting at `start`.
+
+    It exposes `fileno()` so sendfile-capable WSGI servers can send the range
+    straight from the descriptor (they start at the current offset), while
+    `read()` stops at the end of the range for everything else.
+    """
+
+    def __init__(self, file, start: int, length: int) -> None:
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _not_modified(request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        tags = parse_etags(if_none_match)
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _range_applies(request, etag: str, mtime: float) -> bool:
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+@require_safe
+def serve_media(request, path: str):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Media not found")
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404("Media not found")
+    if not os.path.isfile(full_path):
+        raise Http404("Media not found")
+
+    etag = file_etag(stat)
+    validators = {"ETag": etag, "Last-Modified": http_date(stat.st_mtime), "Accept-Ranges": "bytes"}
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        for header, value in validators.items():
+            response[header] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+    download = request.GET.get("download") in ("1", "true")
+
+    offload = settings.MEDIA_OFFLOAD
+    if offload in (OFFLOAD_ACCEL, OFFLOAD_SENDFILE):
+        response = HttpResponse(content_type=content_type)
+        if offload == OFFLOAD_ACCEL:
+            response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + quote(path.replace(os.sep, "/"))
+        else:
+            response["X-Sendfile"] = full_path
+    else:
+        byte_range = None
+        if request.headers.get("Range") and _range_applies(request, etag, stat.st_mtime):
+            try:
+                byte_range = parse_range(request.headers["Range"], stat.st_size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{stat.st_size}"
+                response["Accept-Ranges"] = "bytes"
+                return response
+
+        handle = open(full_path, "rb")
+        if byte_range is None:
+            response = FileResponse(handle, content_type=content_type)
+        else:
+            start, end = byte_range
+            response = FileResponse(RangeFile(handle, start, end - start + 1), status=206, content_type=content_type)
+            response["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            response["Content-Length"] = str(end - start + 1)
+
+    for header, value in validators.items():
+        response[header] = value
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Content-Disposition"] = content_disposition_header(download, os.path.basename(full_path))
+    return response
+
+
+def media_download_url(request, file_field) -> Optional[str]:
+    """Absolute URL of a stored file that downloads it rather than playing it."""
+
+    if not file_field:
+        return None
+    try:
+        url = file_field.url
+    except (AttributeError, ValueError):
+        return str(file_field)
+    return request.build_absolute_uri(url + ("&" if "?" in url else "?") + "download=1")
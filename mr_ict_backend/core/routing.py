@@ -1,9 +1,12 @@
 from django.urls import path, re_path
 
+from students.consumers import CodingSubmissionConsumer
+
 
 websocket_urlpatterns = [
 
     #path('ws/communications/chats', BookingChatConsumers.as_asgi()),
     #re_path(r"ws/chat/(?P<room_name>\w+)/$", ChatConsumer.as_asgi()),
+    path('ws/coding/submissions/<str:job_id>/', CodingSubmissionConsumer.as_asgi()),
 
-]
\ No newline at end of file
+]
@@ -145,6 +145,13 @@ STATIC_URL = env("DJANGO_STATIC_URL", default="/static/")
 STATIC_ROOT = env("DJANGO_STATIC_ROOT", default=str(BASE_DIR / "staticfiles"))
 MEDIA_URL = env("DJANGO_MEDIA_URL", default="/media/")
 MEDIA_ROOT = env("DJANGO_MEDIA_ROOT", default=str(BASE_DIR / "media"))
+# MEDIA_URL is served by core.media.serve_media (byte ranges, ETags) whenever
+# DJANGO_MEDIA_SERVE is on. DJANGO_MEDIA_OFFLOAD="x-accel-redirect" hands the
+# transfer to an internal nginx location at DJANGO_MEDIA_ACCEL_PREFIX aliased
+# to MEDIA_ROOT; "x-sendfile" does the same for Apache/lighttpd.
+MEDIA_SERVE = env.bool("DJANGO_MEDIA_SERVE", default=True)
+MEDIA_OFFLOAD = env("DJANGO_MEDIA_OFFLOAD", default="")
+MEDIA_ACCEL_PREFIX = env("DJANGO_MEDIA_ACCEL_PREFIX", default="/protected-media/")
 
 # Email & site metadata
 EMAIL_BACKEND = env("DJANGO_EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend")
@@ -166,6 +173,14 @@ CELERY_BEAT_SCHEDULE = {
         "task": "analytics.compute_today_summary",
         "schedule": crontab(hour=1, minute=0),
     },
+    "analytics-event-maintenance": {
+        "task": "analytics.maintain_learning_events",
+        "schedule": crontab(hour=2, minute=30),
+    },
+    "video-requeue-abandoned-jobs": {
+        "task": "video_tutorials.requeue_abandoned_jobs",
+        "schedule": crontab(minute="*/15"),
+    },
 }
 
 CHANNEL_LAYERS = {
@@ -177,6 +192,13 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache
+# Dashboard caches take their stampede locks and invalidate entries through
+# the default cache, which only works when every worker sees the same one:
+# point DJANGO_CACHE_URL at Redis (redis://redis:6379/1) in any multi-worker
+# deployment. Without it each process keeps its own in-memory cache.
+CACHES = {"default": env.cache("DJANGO_CACHE_URL", default="locmemcache://")}
+
 # DRF & auth defaults
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
@@ -214,6 +236,139 @@ if not DEBUG:
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = env.int("DJANGO_FILE_UPLOAD_MAX_MEMORY", default=10 * 1024 * 1024)
 
+# Student code execution: number of pre-started Python workers per web process
+# (0 disables pooling and cold-starts an interpreter per run) and how many jobs
+# a worker serves before it is recycled. Test cases of one submission run on up
+# to CODE_EXECUTION_CASE_CONCURRENCY workers at once (1 runs them in sequence).
+CODE_EXECUTION_POOL_SIZE = env.int("CODE_EXECUTION_POOL_SIZE", default=4)
+CODE_EXECUTION_WORKER_MAX_JOBS = env.int("CODE_EXECUTION_WORKER_MAX_JOBS", default=50)
+CODE_EXECUTION_CASE_CONCURRENCY = env.int("CODE_EXECUTION_CASE_CONCURRENCY", default=4)
+
+# Content-addressed cache of execution results. Set CODE_RESULT_CACHE_URL to a
+# Redis URL to share entries across workers; leave it empty for a per-process
+# LRU. A max of 0 disables the cache.
+CODE_RESULT_CACHE_URL = env("CODE_RESULT_CACHE_URL", default="")
+CODE_RESULT_CACHE_MAX_ENTRIES = env.int("CODE_RESULT_CACHE_MAX_ENTRIES", default=5000)
+CODE_RESULT_CACHE_TTL = env.int("CODE_RESULT_CACHE_TTL", default=24 * 60 * 60)
+
+# Coding submissions are graded by Celery workers when async grading is on;
+# otherwise they run inline in the request. Caps bound how many submissions
+# may be queued or running at once, and pending jobs older than the stale
+# window no longer count against them.
+CODE_GRADING_ASYNC = env.bool("CODE_GRADING_ASYNC", default=not DEBUG)
+CODE_GRADING_MAX_PENDING_PER_STUDENT = env.int("CODE_GRADING_MAX_PENDING_PER_STUDENT", default=2)
+CODE_GRADING_MAX_PENDING_GLOBAL = env.int("CODE_GRADING_MAX_PENDING_GLOBAL", default=100)
+CODE_GRADING_STALE_SECONDS = env.int("CODE_GRADING_STALE_SECONDS", default=300)
+
+# Uploaded recordings are transcoded to MP4 by Celery workers when async
+# transcoding is on; otherwise inline in the upload request. Progress comes
+# from ffmpeg's -progress output and a run is killed after the timeout.
+VIDEO_TRANSCODE_ASYNC = env.bool("VIDEO_TRANSCODE_ASYNC", default=not DEBUG)
+VIDEO_FFMPEG_BINARY = env("VIDEO_FFMPEG_BINARY", default="ffmpeg")
+VIDEO_TRANSCODE_PRESET = env("VIDEO_TRANSCODE_PRESET", default="veryfast")
+VIDEO_TRANSCODE_TIMEOUT = env.int("VIDEO_TRANSCODE_TIMEOUT", default=2 * 60 * 60)
+# Recordings and lesson videos are also packaged as an HLS ladder with a master
+# playlist; rungs taller than the source are skipped and the original file stays
+# the fallback. Packaging runs on the same workers as transcoding.
+VIDEO_HLS_ENABLED = env.bool("VIDEO_HLS_ENABLED", default=True)
+VIDEO_FFPROBE_BINARY = env("VIDEO_FFPROBE_BINARY", default="ffprobe")
+VIDEO_HLS_SEGMENT_SECONDS = env.int("VIDEO_HLS_SEGMENT_SECONDS", default=6)
+VIDEO_HLS_RENDITIONS = [
+    {"name": "240p", "height": 240, "video_kbps": 300, "audio_kbps": 64},
+    {"name": "360p", "height": 360, "video_kbps": 700, "audio_kbps": 96},
+    {"name": "540p", "height": 540, "video_kbps": 1400, "audio_kbps": 128},
+    {"name": "720p", "height": 720, "video_kbps": 2500, "audio_kbps": 128},
+]
+# Recording and lesson code snapshots are served as a timeline of keyframes and
+# text deltas, split into gzipped chunks that each start at a keyframe; a new
+# keyframe is written at least every CODE_TIMELINE_KEYFRAME_INTERVAL snapshots.
+CODE_TIMELINE_KEYFRAME_INTERVAL = env.int("CODE_TIMELINE_KEYFRAME_INTERVAL", default=50)
+
+# Admin analytics dashboard caching. Today's summary is regenerated at most
+# once per ANALYTICS_TODAY_SUMMARY_TTL seconds and the full payload is cached
+# for ANALYTICS_ADMIN_SUMMARY_TTL seconds (0 disables either cache).
+ANALYTICS_TODAY_SUMMARY_TTL = env.int("ANALYTICS_TODAY_SUMMARY_TTL", default=30)
+ANALYTICS_ADMIN_SUMMARY_TTL = env.int("ANALYTICS_ADMIN_SUMMARY_TTL", default=60)
+
+# Learning event ingestion. Leave ANALYTICS_EVENT_BUFFER empty to write each
+# event in the request; "memory" batches them in a per-process buffer and
+# "redis" appends them to a Redis stream drained by `process_learning_events`.
+# Batches are flushed every ANALYTICS_EVENT_BATCH_SIZE events or
+# ANALYTICS_EVENT_FLUSH_MS milliseconds, new events are refused beyond
+# ANALYTICS_EVENT_MAX_PENDING, and payloads failing ANALYTICS_EVENT_MAX_ATTEMPTS
+# writes are dead-lettered.
+ANALYTICS_EVENT_BUFFER = env("ANALYTICS_EVENT_BUFFER", default="")
+ANALYTICS_EVENT_STREAM_URL = env("ANALYTICS_EVENT_STREAM_URL", default=REDIS_URL)
+ANALYTICS_EVENT_STREAM = env("ANALYTICS_EVENT_STREAM", default="analytics:learning-events")
+ANALYTICS_EVENT_BATCH_SIZE = env.int("ANALYTICS_EVENT_BATCH_SIZE", default=200)
+ANALYTICS_EVENT_FLUSH_MS = env.int("ANALYTICS_EVENT_FLUSH_MS", default=500)
+ANALYTICS_EVENT_MAX_PENDING = env.int("ANALYTICS_EVENT_MAX_PENDING", default=10000)
+ANALYTICS_EVENT_MAX_ATTEMPTS = env.int("ANALYTICS_EVENT_MAX_ATTEMPTS", default=5)
+ANALYTICS_EVENT_MAX_BATCH = env.int("ANALYTICS_EVENT_MAX_BATCH", default=500)
+
+# Raw learning events older than ANALYTICS_EVENT_RETENTION_MONTHS whole months
+# are rolled into the aggregate tables, exported as gzipped JSON Lines under
+# ANALYTICS_ARCHIVE_DIR and removed (0 keeps raw events forever). On PostgreSQL
+# monthly partitions are created ANALYTICS_EVENT_PARTITIONS_AHEAD months ahead.
+ANALYTICS_EVENT_RETENTION_MONTHS = env.int("ANALYTICS_EVENT_RETENTION_MONTHS", default=0)
+ANALYTICS_EVENT_PARTITIONS_AHEAD = env.int("ANALYTICS_EVENT_PARTITIONS_AHEAD", default=2)
+ANALYTICS_ARCHIVE_DIR = env("ANALYTICS_ARCHIVE_DIR", default=str(BASE_DIR / "data" / "analytics-archive"))
+
+# Local Ollama server used by the LLM tutor. Tutor endpoints stream tokens as
+# Server-Sent Events when the request carries `stream=true`; the read timeout
+# bounds the gap between streamed chunks rather than the whole answer. One
+# pooled client per process runs at most LLM_TUTOR_MAX_CONCURRENCY generations
+# and queues up to LLM_TUTOR_MAX_QUEUE more for LLM_TUTOR_QUEUE_TIMEOUT seconds
+# before answering 503.
+LLM_TUTOR_OLLAMA_URL = env("LLM_TUTOR_OLLAMA_URL", default="http://localhost:11434")
+LLM_TUTOR_MODEL = env("LLM_TUTOR_MODEL", default="llama3.2:3b")
+LLM_PLAYGROUND_MODEL = env("LLM_PLAYGROUND_MODEL", default="phi")
+LLM_TUTOR_CONNECT_TIMEOUT = env.float("LLM_TUTOR_CONNECT_TIMEOUT", default=5.0)
+LLM_TUTOR_READ_TIMEOUT = env.float("LLM_TUTOR_READ_TIMEOUT", default=120.0)
+LLM_TUTOR_MAX_CONCURRENCY = env.int("LLM_TUTOR_MAX_CONCURRENCY", default=2)
+LLM_TUTOR_MAX_QUEUE = env.int("LLM_TUTOR_MAX_QUEUE", default=32)
+LLM_TUTOR_QUEUE_TIMEOUT = env.float("LLM_TUTOR_QUEUE_TIMEOUT", default=30.0)
+LLM_TUTOR_POOL_SIZE = env.int("LLM_TUTOR_POOL_SIZE", default=8)
+
+# Retrieval model and FAISS index warm-up for the LLM tutor: "" loads them on
+# the first tutor request, "eager" in AppConfig.ready() (before gunicorn forks
+# with --preload, so workers share the pages), "background" in a thread while
+# /health/ready/ answers 503. The index is memory-mapped when possible.
+LLM_TUTOR_RAG_PRELOAD = env("LLM_TUTOR_RAG_PRELOAD", default="")
+LLM_TUTOR_RAG_MMAP = env.bool("LLM_TUTOR_RAG_MMAP", default=True)
+# Seconds between checks for a rebuilt index (0 disables reloading).
+LLM_TUTOR_RAG_RELOAD_INTERVAL = env.int("LLM_TUTOR_RAG_RELOAD_INTERVAL", default=30)
+# `index_curriculum` builds a flat (exact) index until the corpus reaches
+# LLM_TUTOR_ANN_THRESHOLD documents, then HNSW; "flat", "ivf" or "hnsw" pin it.
+LLM_TUTOR_INDEX_TYPE = env("LLM_TUTOR_INDEX_TYPE", default="auto")
+LLM_TUTOR_ANN_THRESHOLD = env.int("LLM_TUTOR_ANN_THRESHOLD", default=20000)
+# Concurrent retrievals are collected for up to LLM_TUTOR_RAG_BATCH_WAIT_MS
+# (or LLM_TUTOR_RAG_MAX_BATCH requests) and embedded and searched together;
+# 0 retrieves each request on its own.
+LLM_TUTOR_RAG_BATCH_WAIT_MS = env.float("LLM_TUTOR_RAG_BATCH_WAIT_MS", default=5.0)
+LLM_TUTOR_RAG_MAX_BATCH = env.int("LLM_TUTOR_RAG_MAX_BATCH", default=32)
+
+# LRU caches of query embeddings and retrieval results, keyed on the full
+# normalised query (plus k and the index version for retrievals). Set
+# LLM_TUTOR_RAG_CACHE_URL to a Redis URL to share entries across workers; a
+# max of 0 disables that cache.
+LLM_TUTOR_RAG_CACHE_URL = env("LLM_TUTOR_RAG_CACHE_URL", default="")
+LLM_TUTOR_EMBEDDING_CACHE_MAX_ENTRIES = env.int("LLM_TUTOR_EMBEDDING_CACHE_MAX_ENTRIES", default=5000)
+LLM_TUTOR_RETRIEVAL_CACHE_MAX_ENTRIES = env.int("LLM_TUTOR_RETRIEVAL_CACHE_MAX_ENTRIES", default=2000)
+LLM_TUTOR_RAG_CACHE_TTL = env.int("LLM_TUTOR_RAG_CACHE_TTL", default=24 * 60 * 60)
+# Tutor explanations and answers are reused for structurally identical code and
+# for questions on the same step whose embeddings reach
+# LLM_TUTOR_RESPONSE_SIMILARITY (cosine); entries are keyed on the index version
+# and expire after LLM_TUTOR_RESPONSE_CACHE_TTL seconds. A max of 0 disables it.
+LLM_TUTOR_RESPONSE_CACHE_MAX_ENTRIES = env.int("LLM_TUTOR_RESPONSE_CACHE_MAX_ENTRIES", default=2000)
+LLM_TUTOR_RESPONSE_CACHE_TTL = env.int("LLM_TUTOR_RESPONSE_CACHE_TTL", default=7 * 24 * 60 * 60)
+LLM_TUTOR_RESPONSE_SIMILARITY = env.float("LLM_TUTOR_RESPONSE_SIMILARITY", default=0.92)
+LLM_TUTOR_RESPONSE_CACHE_NEIGHBOURS = env.int("LLM_TUTOR_RESPONSE_CACHE_NEIGHBOURS", default=32)
+# Tutor code snapshots are stored as line deltas against the step's expected
+# code or the student's previous snapshot; a full keyframe is written at least
+# every LLM_TUTOR_SNAPSHOT_KEYFRAME_INTERVAL snapshots (1 stores every one in full).
+LLM_TUTOR_SNAPSHOT_KEYFRAME_INTERVAL = env.int("LLM_TUTOR_SNAPSHOT_KEYFRAME_INTERVAL", default=20)
+
 # Logging baseline that surfaces structured output in every environment
 LOGGING = {
     "version": 1,
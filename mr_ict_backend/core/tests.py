@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.media import file_etag, media_download_url, parse_range
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(parse_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(parse_range("bytes=-5000", 1000), (0, 999))
+        self.assertEqual(parse_range("bytes=990-5000", 1000), (990, 999))
+
+    def test_ignored_and_unsatisfiable_ranges(self):
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 1000))
+        self.assertIsNone(parse_range("items=0-1", 1000))
+        self.assertIsNone(parse_range("bytes=-", 1000))
+        for header in ("bytes=1000-", "bytes=50-10", "bytes=-0"):
+            with self.assertRaises(ValueError):
+                parse_range(header, 1000)
+
+
+class MediaServingTests(SimpleTestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        os.makedirs(os.path.join(self.media, "lesson_videos"))
+        self.body = bytes(range(256)) * 40
+        self.path = os.path.join(self.media, "lesson_videos", "intro.mp4")
+        with open(self.path, "wb") as handle:
+            handle.write(self.body)
+        self.etag = file_etag(os.stat(self.path))
+        overrides = override_settings(MEDIA_ROOT=self.media, MEDIA_OFFLOAD="")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_full_response_advertises_ranges_and_validators(self):
+        response = self.client.get("/media/lesson_videos/intro.mp4")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.body)
+        self.assertEqual(response["Content-Length"], str(len(self.body)))
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["ETag"], self.etag)
+        self.assertTrue(response["Content-Disposition"].startswith("inline"))
+
+    def test_range_request_returns_only_the_range(self):
+        response = self.client.get("/media/lesson_videos/intro.mp4", HTTP_RANGE="bytes=1000-1999")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 1000-1999/{len(self.body)}")
+        self.assertEqual(response["Content-Length"], "1000")
+        self.assertEqual(b"".join(response.streaming_content), self.body[1000:2000])
+
+        tail = self.client.get("/media/lesson_videos/intro.mp4", HTTP_RANGE="bytes=-10")
+        self.assertEqual(b"".join(tail.streaming_content), self.body[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get("/media/lesson_videos/intro.mp4", HTTP_RANGE=f"bytes={len(self.body)}-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.body)}")
+
+    def test_conditional_requests(self):
+        response = self.client.get("/media/lesson_videos/intro.mp4", HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], self.etag)
+
+        # A stale If-Range validator means the client's copy changed: send it all.
+        stale = self.client.get(
+            "/media/lesson_videos/intro.mp4", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"0-0"'
+        )
+        self.assertEqual(stale.status_code, 200)
+        current = self.client.get(
+            "/media/lesson_videos/intro.mp4", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=self.etag
+        )
+        self.assertEqual(current.status_code, 206)
+
+    def test_download_and_missing_files(self):
+        response = self.client.get("/media/lesson_videos/intro.mp4?download=1")
+        self.assertTrue(response["Content-Disposition"].startswith("attachment"))
+        response.close()
+
+        self.assertEqual(self.client.get("/media/lesson_videos/missing.mp4").status_code, 404)
+        self.assertEqual(self.client.get("/media/lesson_videos/").status_code, 404)
+        self.assertEqual(self.client.get("/media/../settings.py").status_code, 404)
+        self.assertEqual(self.client.post("/media/lesson_videos/intro.mp4").status_code, 405)
+
+    def test_offload_headers(self):
+        with override_settings(MEDIA_OFFLOAD="x-accel-redirect", MEDIA_ACCEL_PREFIX="/protected-media/"):
+            response = self.client.get("/media/lesson_videos/intro.mp4", HTTP_RANGE="bytes=0-9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/lesson_videos/intro.mp4")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["Content-Type"], "video/mp4")
+
+        with override_settings(MEDIA_OFFLOAD="x-sendfile"):
+            response = self.client.get("/media/lesson_videos/intro.mp4")
+        self.assertEqual(response["X-Sendfile"], self.path)
+
+    def test_download_url(self):
+        class Stored:
+            url = "/media/lesson_videos/intro.mp4"
+
+        request = RequestFactory().get("/")
+        self.assertEqual(media_download_url(request, Stored()), "http://testserver/media/lesson_videos/intro.mp4?download=1")
+        self.assertIsNone(media_download_url(request, None))
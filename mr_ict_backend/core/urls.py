@@ -15,16 +15,20 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+import re
+
 from django.contrib import admin
 from django.urls import path
 
+from django.apps import apps
 from django.conf import settings
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf.urls.static import static
 
-from video_tutorials.views import get_all_recorded_turorial_view, get_video_tutorial_details_view, project_create, project_detail, project_file_by_project, project_file_list, project_list, record_video_view, save_code_snapshot, update_project_file
-from core.health import health_check_view
+from video_tutorials.views import cut_recording_view, get_all_recorded_turorial_view, get_video_tutorial_details_view, project_create, project_detail, project_file_by_project, project_file_list, project_list, record_video_view, recording_cut_status_view, recording_status_view, recording_timeline_view, save_code_snapshot, update_project_file
+from core.health import health_check_view, readiness_check_view
+from core.media import serve_media
 
 
 urlpatterns = [
@@ -43,6 +47,10 @@ urlpatterns = [
 
     #path("api/upload/", VideoUploadView.as_view(), name="video-upload"),
     path("api/upload/", record_video_view, name="video-upload"),
+    path("api/recordings/<int:recording_id>/status/", recording_status_view, name="recording-status"),
+    path("api/recordings/<int:recording_id>/cuts/", cut_recording_view, name="recording-cut"),
+    path("api/recordings/<int:recording_id>/cuts/<int:cut_id>/", recording_cut_status_view, name="recording-cut-status"),
+    path("api/recordings/<int:recording_id>/timeline/", recording_timeline_view, name="recording-timeline"),
 
     path("api/save-code-snapshots/", save_code_snapshot, name="save_code_snapshot"),
 
@@ -59,20 +67,25 @@ urlpatterns = [
 
 
     path("health/", health_check_view, name="health-check"),
+    path("health/ready/", readiness_check_view, name="readiness-check"),
 ]
 
 
-try:
+# The LLM tutor is optional until Phase 4 resumes: its routes are mounted once
+# `llm_tutor` is in INSTALLED_APPS, and its retrieval dependencies are only
+# imported when the retriever loads (see llm_tutor.tutor.warmup).
+if apps.is_installed('llm_tutor'):
     urlpatterns.append(path('api/llm-tutor/', include('llm_tutor.urls', 'llm_tutor_api')))
-except ModuleNotFoundError:
-    # LLM tutor dependencies are optional until Phase 4 resumes.
-    pass
 
 
 if settings.DEBUG:
     urlpatterns = urlpatterns + static(
         settings.STATIC_URL, document_root=settings.STATIC_ROOT
     )
-    urlpatterns = urlpatterns + static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
+
+# Media goes through serve_media in every environment (Range/ETag support and
+# optional X-Accel-Redirect/X-Sendfile offload) unless MEDIA_URL is external.
+if settings.MEDIA_SERVE and settings.MEDIA_URL.startswith("/") and not settings.MEDIA_URL.startswith("//"):
+    urlpatterns.append(
+        re_path(r"^%s(?P<path>.*)$" % re.escape(settings.MEDIA_URL.lstrip("/")), serve_media, name="media")
     )
@@ -0,0 +1,56 @@
+"""JWT authentication for websocket connections.
+
+Browsers cannot set an Authorization header on a websocket, so the access
+token the REST API issues is passed either as `?token=<jwt>` or as the
+subprotocol pair `["Bearer", "<jwt>"]`. A valid token sets `scope["user"]`;
+an invalid one leaves the connection anonymous. Without a token the session
+middleware underneath resolves the user as before.
+
+Consumers that accept the subprotocol form must echo it back:
+`accept(subprotocol=scope.get("auth_subprotocol"))`.
+"""
+from __future__ import annotations
+
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+SUBPROTOCOL = "Bearer"
+
+
+def token_from_scope(scope) -> Tuple[Optional[str], Optional[str]]:
+    """Return `(token, subprotocol)` from the query string or subprotocols."""
+
+    subprotocols = list(scope.get("subprotocols") or [])
+    if len(subprotocols) >= 2 and subprotocols[0].lower() == SUBPROTOCOL.lower():
+        return subprotocols[1], subprotocols[0]
+    query = parse_qs((scope.get("query_string") or b"").decode("latin-1"))
+    tokens = query.get("token")
+    return (tokens[0], None) if tokens else (None, None)
+
+
+@database_sync_to_async
+def user_for_token(raw_token: str):
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed, TokenError):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    async def __call__(self, scope, receive, send):
+        token, subprotocol = token_from_scope(scope)
+        if token:
+            scope = dict(scope, user=await user_for_token(token), auth_subprotocol=subprotocol)
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return JWTAuthMiddleware(AuthMiddlewareStack(inner))
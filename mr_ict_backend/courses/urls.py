@@ -1,7 +1,7 @@
 from django.urls import path
 
 from courses.views.challenge_badge_view import add_lesson_badge_view, archive_lesson_badge, delete_lesson_badge, get_all_archived_lesson_badge_view, get_all_lesson_badges_view, get_lesson_badge_details_view, unarchive_lesson_badge
-from courses.views.coding_challenge_views import add_coding_challenge_view, archive_coding_challenge, delete_coding_challenge, get_all_archived_coding_challenges_view, get_all_coding_challenges_view, get_coding_challenge_details_view, unarchive_coding_challenge
+from courses.views.coding_challenge_views import add_coding_challenge_view, archive_coding_challenge, delete_coding_challenge, get_all_archived_coding_challenges_view, get_all_coding_challenges_view, get_coding_challenge_details_view, unarchive_coding_challenge, validate_coding_challenge_solution_view
 from courses.views.course_views import add_course_view, archive_course, delete_course, edit_course, get_all_archived_courses_view, get_all_courses_view, get_course_details_view, unarchive_course
 from courses.views.lesson_assignment_views import add_lesson_assignment_view, archive_lesson_assignment, delete_lesson_assignment, get_all_archived_lesson_assignment_view, get_all_lesson_assignments_view, get_lesson_assignment_details_view, unarchive_lesson_assignment
 from courses.views.lesson_code_snippet_views import add_lesson_code_snippet_view, archive_lesson_code_snippet, delete_lesson_code_snippet, get_all_archived_lesson_code_snippet_view, get_all_lesson_code_snippets_view, get_lesson_code_snippet_details_view, unarchive_lesson_code_snippet
@@ -101,6 +101,7 @@ urlpatterns = [
     path('get-all-coding-challenges/', get_all_coding_challenges_view, name="get_all_coding_challenges_view"),
     #path('edit-coding-challenge/', edit_coding_challenge, name="edit_coding_challenge_view"),
     path('get-coding-challenge-details/', get_coding_challenge_details_view, name="get_coding_challenge_detail_view"),
+    path('validate-coding-challenge-solution/', validate_coding_challenge_solution_view, name="validate_coding_challenge_solution_view"),
     path('archive-coding-challenge/', archive_coding_challenge, name="archive_coding_challenge"),
     path('unarchive-coding-challenge/', unarchive_coding_challenge, name="unarchive_coding_challenge"),
     path('get-all-archived-coding-challenge/', get_all_archived_coding_challenges_view, name="get_all_archived_coding_challenge_view"),
@@ -14,6 +14,7 @@ from rest_framework.response import Response
 
 from courses.models import CodingChallenge, Course
 from courses.views.serializers import AllCodingChallengesSerializer, CodingChallengeDetailsSerializer
+from students.services.coding import CodeExecutionError, run_test_cases
 
 
 @api_view(['POST'])
@@ -159,6 +160,59 @@ def get_coding_challenge_details_view(request):
 
 
 
+@api_view(['POST', ])
+@permission_classes([IsAuthenticated, ])
+@authentication_classes([JWTAuthentication, ])
+def validate_coding_challenge_solution_view(request):
+    payload = {}
+    data = {}
+    errors = {}
+
+    id = request.data.get('id', "")
+
+    if not id:
+        errors['id'] = ["CodingChallenge id required"]
+
+    try:
+        coding_challenge = CodingChallenge.objects.get(id=id)
+    except (CodingChallenge.DoesNotExist, ValueError):
+        errors['id'] = ['CodingChallenge does not exist.']
+
+    if errors:
+        payload['message'] = "Errors"
+        payload['errors'] = errors
+        return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+
+    if not coding_challenge.solution_files:
+        errors['solution_files'] = ['CodingChallenge has no solution files to validate.']
+        payload['message'] = "Errors"
+        payload['errors'] = errors
+        return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+
+    # Repeated validations of an unchanged solution are served from the
+    # execution result cache.
+    try:
+        passed, case_results = run_test_cases(
+            coding_challenge.solution_files,
+            coding_challenge.entrypoint_filename,
+            coding_challenge.test_cases,
+            time_limit=coding_challenge.time_limit_seconds,
+        )
+    except CodeExecutionError as exc:
+        errors['solution_files'] = [str(exc)]
+        payload['message'] = "Errors"
+        payload['errors'] = errors
+        return Response(payload, status=status.HTTP_400_BAD_REQUEST)
+
+    data['passed'] = passed
+    data['cases'] = case_results
+
+    payload['message'] = "Successful"
+    payload['data'] = data
+
+    return Response(payload, status=status.HTTP_200_OK)
+
+
 @api_view(['POST', ])
 @permission_classes([IsAuthenticated, ])
 @authentication_classes([JWTAuthentication, ])
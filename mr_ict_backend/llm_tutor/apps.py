@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class LlmTutorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'llm_tutor'
+
+    def ready(self):
+        from django.conf import settings
+
+        preload = getattr(settings, 'LLM_TUTOR_RAG_PRELOAD', '')
+        if preload:
+            from llm_tutor.tutor.warmup import warm_up
+
+            warm_up(background=preload == 'background')
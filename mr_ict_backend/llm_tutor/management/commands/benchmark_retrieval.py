@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from typing import Callable, List, Sequence
+
+from django.core.management.base import BaseCommand, CommandError
+
+from llm_tutor.tutor.batching import MicroBatcher
+
+
+class SyntheticRetriever:
+    """Stands in for the model and index where they are not installed.
+
+    Each call costs a fixed overhead plus a per-query amount. Calls hold a
+    lock for that time because one model on one set of cores runs one
+    forward pass at a time; concurrent `model.encode` calls queue for the
+    same CPU rather than running in parallel. The defaults approximate
+    MiniLM on a laptop CPU.
+    """
+
+    def __init__(self, overhead_ms: float, per_query_ms: float) -> None:
+        self.overhead = overhead_ms / 1000
+        self.per_query = per_query_ms / 1000
+        self._device = threading.Lock()
+
+    def retrieve_many(self, queries: Sequence[str], k: int = 2) -> List[List[str]]:
+        with self._device:
+            time.sleep(self.overhead + self.per_query * len(queries))
+        return [[f"document for {query[:20]}"] * k for query in queries]
+
+
+def _percentile(samples: Sequence[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _drive(call: Callable[[str], object], clients: int, requests: int) -> tuple[list[float], float]:
+    latencies: list[float] = []
+    lock = threading.Lock()
+    start_line = threading.Barrier(clients + 1)
+
+    def client(number: int) -> None:
+        own = []
+        start_line.wait()
+        for request in range(requests):
+            # Unique queries so neither cache short-circuits the measurement.
+            query = f"Semantic HTML step 3 <article><h1>Student {number}</h1><p>attempt {request}</p></article>"
+            started = time.perf_counter()
+            call(query)
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+    start_line.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-request retrieval against micro-batched retrieval under concurrent "
+        "clients and report throughput and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=32, help="Concurrent client threads (default 32).")
+        parser.add_argument("--requests", type=int, default=20, help="Requests per client (default 20).")
+        parser.add_argument("--k", type=int, default=2, help="Documents per query (default 2).")
+        parser.add_argument("--wait-ms", type=float, default=5.0, help="Batch collection window (default 5ms).")
+        parser.add_argument("--max-batch", type=int, default=32, help="Largest batch (default 32).")
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Use a synthetic retriever even if the model and index are available.",
+        )
+        parser.add_argument("--overhead-ms", type=float, default=8.0, help="Synthetic cost per call (default 8ms).")
+        parser.add_argument(
+            "--per-query-ms", type=float, default=0.6, help="Synthetic cost per query (default 0.6ms)."
+        )
+
+    def _retriever(self, options):
+        if not options["synthetic"]:
+            try:
+                from llm_tutor.tutor.rag import RAGRetriever
+            except ImportError as exc:
+                self.stdout.write(f"Model dependencies unavailable ({exc}); using the synthetic retriever")
+            else:
+                return RAGRetriever(), "model"
+        return SyntheticRetriever(options["overhead_ms"], options["per_query_ms"]), "synthetic"
+
+    def handle(self, *args, **options):
+        if options["clients"] <= 0 or options["requests"] <= 0:
+            raise CommandError("--clients and --requests must be positive")
+
+        retriever, kind = self._retriever(options)
+        k = options["k"]
+        batcher = MicroBatcher(
+            lambda queries: retriever.retrieve_many(queries, k),
+            max_batch=options["max_batch"],
+            max_wait=options["wait_ms"] / 1000,
+            name="benchmark-retrieval",
+        )
+        modes = (
+            ("per request", lambda query: retriever.retrieve_many([query], k)),
+            ("micro-batched", batcher.submit),
+        )
+
+        total = options["clients"] * options["requests"]
+        self.stdout.write(
+            f"{kind} retriever, {options['clients']} clients x {options['requests']} requests, "
+            f"window {options['wait_ms']}ms, max batch {options['max_batch']}"
+        )
+        for label, call in modes:
+            latencies, elapsed = _drive(call, options["clients"], options["requests"])
+            self.stdout.write(
+                f"{label:>14}: {total / elapsed:8.1f} req/s  "
+                f"p50 {statistics.median(latencies) * 1000:7.1f}ms  "
+                f"p99 {_percentile(latencies, 0.99) * 1000:7.1f}ms"
+            )
+        self.stdout.write(f"batches: {batcher.stats()}")
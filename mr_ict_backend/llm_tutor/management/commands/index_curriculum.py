@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from llm_tutor.tutor.documents import CURRICULUM_DIR, METADATA_PATH, MODEL_NAME
+from llm_tutor.tutor.indexing import (
+    INDEX_TYPES,
+    collect_from_database,
+    collect_from_files,
+    index_curriculum,
+    merge_entries,
+    plan_embeddings,
+    read_manifest,
+)
+
+SOURCES = ("all", "files", "database")
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the curriculum FAISS index, re-embedding only new or changed lesson steps, "
+        "and swap it in for running retrievers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            dest="source",
+            choices=SOURCES,
+            default="all",
+            help="Index lesson JSON files, database lessons, or both (database rows win).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=64,
+            help="Documents embedded per model call.",
+        )
+        parser.add_argument(
+            "--index-type",
+            dest="index_type",
+            choices=INDEX_TYPES,
+            default=None,
+            help="FAISS index type (defaults to LLM_TUTOR_INDEX_TYPE; 'auto' switches to HNSW "
+            "once the corpus reaches LLM_TUTOR_ANN_THRESHOLD documents).",
+        )
+        parser.add_argument("--nlist", dest="nlist", type=int, default=100, help="IVF inverted lists.")
+        parser.add_argument("--nprobe", dest="nprobe", type=int, default=10, help="IVF lists probed per query.")
+        parser.add_argument("--hnsw-m", dest="hnsw_m", type=int, default=32, help="HNSW neighbours per node.")
+        parser.add_argument("--ef-search", dest="ef_search", type=int, default=64, help="HNSW search depth.")
+        parser.add_argument(
+            "--force",
+            dest="force",
+            action="store_true",
+            help="Re-embed every document and rewrite the index even if nothing changed.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            dest="dry_run",
+            action="store_true",
+            help="Report how many documents would be embedded or reused without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        source = options["source"]
+        sources = []
+        if source in ("all", "files"):
+            sources.append(collect_from_files(CURRICULUM_DIR))
+        if source in ("all", "database"):
+            sources.append(collect_from_database())
+        entries = merge_entries(*sources)
+        if not entries:
+            raise CommandError("No curriculum documents found")
+
+        if options["dry_run"]:
+            reuse = {} if options["force"] else plan_embeddings(entries, read_manifest(METADATA_PATH), MODEL_NAME)
+            self.stdout.write(
+                f"{len(entries)} document(s): {len(entries) - len(reuse)} to embed, {len(reuse)} reused"
+            )
+            return
+
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise CommandError(f"Indexing needs the LLM tutor dependencies: {exc}") from exc
+
+        model = SentenceTransformer(MODEL_NAME)
+        build = index_curriculum(
+            entries,
+            encode=lambda texts: model.encode(texts, batch_size=options["batch_size"]),
+            index_type=options["index_type"] or getattr(settings, "LLM_TUTOR_INDEX_TYPE", "auto"),
+            batch_size=options["batch_size"],
+            ann_threshold=getattr(settings, "LLM_TUTOR_ANN_THRESHOLD", 20000),
+            nlist=options["nlist"],
+            nprobe=options["nprobe"],
+            hnsw_m=options["hnsw_m"],
+            ef_search=options["ef_search"],
+            force=options["force"],
+        )
+        if not build.written:
+            self.stdout.write(f"Index {build.version} is up to date ({build.documents} document(s))")
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {build.index_type} index {build.version}: {build.documents} document(s), "
+                f"{build.embedded} embedded, {build.reused} reused"
+            )
+        )
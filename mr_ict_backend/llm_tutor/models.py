@@ -1,8 +1,18 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 
 import uuid
 
+from llm_tutor.tutor.snapshots import (
+    ENCODING_EXPECTED,
+    ENCODING_FULL,
+    ENCODING_PREVIOUS,
+    apply_delta,
+    choose_encoding,
+)
+
 
 User = get_user_model()
 
@@ -25,15 +35,125 @@ class LessonStep(models.Model):
     class Meta:
         unique_together = ('lesson', 'step_number')
 
+    def save(self, *args, **kwargs):
+        # Snapshots stored as deltas against the old expected code have to be
+        # rewritten in full before the base they depend on changes.
+        with transaction.atomic():
+            if self.pk:
+                previous = LessonStep.objects.filter(pk=self.pk).values_list('expected_code', flat=True).first()
+                if previous is not None and previous != self.expected_code:
+                    CodeSnapshot.objects.materialise_expected_deltas(self, previous)
+            super().save(*args, **kwargs)
+
+
+class CodeSnapshotManager(models.Manager):
+    def record(self, *, user, lesson, step, code, **fields):
+        """Create a snapshot of `code`, stored in full or as the smallest delta.
+
+        The base is either the step's expected code or the student's previous
+        snapshot on the step; previous-snapshot chains are closed with a
+        keyframe every LLM_TUTOR_SNAPSHOT_KEYFRAME_INTERVAL snapshots.
+        """
+        code = code or ''
+        interval = getattr(settings, 'LLM_TUTOR_SNAPSHOT_KEYFRAME_INTERVAL', 20)
+        previous = None
+        if interval > 1:
+            previous = self.filter(user=user, lesson=lesson, step=step).select_related('step').order_by('-pk').first()
+            if previous is not None and previous.chain_depth + 1 >= interval:
+                previous = None
+        encoding, delta = choose_encoding(
+            code,
+            step.expected_code,
+            previous.get_code() if previous is not None else None,
+        )
+        snapshot = self.model(user=user, lesson=lesson, step=step, encoding=encoding, **fields)
+        if encoding == ENCODING_FULL:
+            snapshot.code = code
+        else:
+            snapshot.delta = delta
+        if encoding == ENCODING_PREVIOUS:
+            snapshot.base = previous
+            snapshot.keyframe_id = previous.keyframe_id or previous.pk
+            snapshot.chain_depth = previous.chain_depth + 1
+        snapshot.save()
+        snapshot._code = code
+        return snapshot
+
+    def codes_for(self, snapshots):
+        """Map snapshot pk to reconstructed code, loading each chain in one query."""
+        known = {snapshot.pk: snapshot for snapshot in snapshots}
+        keyframes = {snapshot.keyframe_id for snapshot in snapshots if snapshot.encoding == ENCODING_PREVIOUS}
+        if keyframes:
+            chains = self.filter(Q(pk__in=keyframes) | Q(keyframe_id__in=keyframes)).select_related('step')
+            for member in chains:
+                known.setdefault(member.pk, member)
+
+        codes = {}
+
+        def resolve(snapshot):
+            pending = []
+            while snapshot.pk not in codes and snapshot.encoding == ENCODING_PREVIOUS:
+                pending.append(snapshot)
+                snapshot = known[snapshot.base_id]
+            if snapshot.pk not in codes:
+                codes[snapshot.pk] = snapshot.decode()
+            text = codes[snapshot.pk]
+            for link in reversed(pending):
+                text = codes[link.pk] = apply_delta(text, link.delta)
+            return text
+
+        return {snapshot.pk: resolve(snapshot) for snapshot in snapshots}
+
+    def materialise_expected_deltas(self, step, expected_code):
+        for snapshot in self.filter(step=step, encoding=ENCODING_EXPECTED):
+            snapshot.code = apply_delta(expected_code, snapshot.delta)
+            snapshot.encoding, snapshot.delta = ENCODING_FULL, None
+            snapshot.save(update_fields=['code', 'encoding', 'delta'])
+
+
 class CodeSnapshot(models.Model):
+    ENCODING_CHOICES = (
+        (ENCODING_FULL, 'Full code'),
+        (ENCODING_EXPECTED, 'Delta from expected code'),
+        (ENCODING_PREVIOUS, 'Delta from previous snapshot'),
+    )
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
     step = models.ForeignKey(LessonStep, on_delete=models.CASCADE)
-    code = models.TextField()
+    # Full code for keyframes only; use get_code() to read any snapshot.
+    code = models.TextField(blank=True, default='')
+    encoding = models.CharField(max_length=10, choices=ENCODING_CHOICES, default=ENCODING_FULL)
+    delta = models.JSONField(null=True, blank=True)
+    base = models.ForeignKey('self', null=True, blank=True, on_delete=models.RESTRICT, related_name='+')
+    keyframe = models.ForeignKey('self', null=True, blank=True, on_delete=models.RESTRICT, related_name='+')
+    chain_depth = models.PositiveSmallIntegerField(default=0)
     timestamp = models.DateTimeField(auto_now_add=True)
     branch_id = models.CharField(max_length=36, null=True, default=None)
     interaction_start = models.DateTimeField(auto_now_add=True)
     interaction_end = models.DateTimeField(null=True, blank=True)
 
+    objects = CodeSnapshotManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'lesson', 'step', '-id'], name='llm_snapshot_chain_idx'),
+            models.Index(fields=['user', 'lesson', '-timestamp'], name='llm_snapshot_branch_idx', condition=Q(branch_id__isnull=False)),
+        ]
+
+    def decode(self):
+        """Code of a keyframe or expected-code delta (needs no other snapshot)."""
+        if self.encoding == ENCODING_EXPECTED:
+            return apply_delta(self.step.expected_code, self.delta)
+        return self.code
+
+    def get_code(self):
+        if not hasattr(self, '_code'):
+            if self.encoding == ENCODING_PREVIOUS:
+                self._code = CodeSnapshot.objects.codes_for([self])[self.pk]
+            else:
+                self._code = self.decode()
+        return self._code
+
     def __str__(self):
-        return f"{self.user.username} - {self.lesson.title} - Step {self.step.step_number}"
\ No newline at end of file
+        return f"{self.user.username} - {self.lesson.title} - Step {self.step.step_number}"
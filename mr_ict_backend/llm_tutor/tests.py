@@ -1,3 +1,617 @@
-from django.test import TestCase
+import asyncio
+import builtins
+import io
+import json
+import os
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+
+from core.health import readiness_check_view
+from core.lru import LocalLRU
+from llm_tutor.management.commands.benchmark_retrieval import Command as BenchmarkRetrievalCommand
+from llm_tutor.management.commands.index_curriculum import Command as IndexCurriculumCommand
+from llm_tutor.tutor import warmup
+from llm_tutor.tutor.batching import MicroBatcher
+from llm_tutor.tutor.cache import TieredCache, embedding_key, get_rag_caches, reset_rag_caches, retrieval_key
+from llm_tutor.tutor.codediff import codes_differ, missing_elements
+from llm_tutor.tutor.client import LLMBusy, LLMClient, LLMError
+from llm_tutor.tutor.documents import IndexSnapshot, load_documents
+from llm_tutor.tutor.indexing import (
+    INDEX_FLAT,
+    INDEX_HNSW,
+    INDEX_IVF,
+    choose_index_type,
+    collect_from_files,
+    merge_entries,
+    plan_embeddings,
+    read_manifest,
+    text_hash,
+)
+from llm_tutor.tutor.llm import CONNECTION_ERROR_MESSAGE, generate, relay_events, sse_response, wants_stream
+from llm_tutor.tutor.responses import (
+    HIT_EXACT,
+    HIT_SEMANTIC,
+    ResponseCache,
+    get_response_cache,
+    record_completion,
+    reset_response_cache,
+)
+from llm_tutor.tutor.snapshots import (
+    ENCODING_EXPECTED,
+    ENCODING_FULL,
+    ENCODING_PREVIOUS,
+    apply_delta,
+    choose_encoding,
+    encode_delta,
+)
+from llm_tutor.tutor.stub import StubOllamaServer
+
+
+def _parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        event_line, data_line = chunk.strip().split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+class StreamingClientTests(SimpleTestCase):
+    def test_relay_events_reports_time_to_first_token(self):
+        completed = []
+        events = _parse_events(
+            relay_events(
+                iter(["Hello", " there"]),
+                meta={"branch_id": None},
+                on_complete=lambda text: completed.append(text) or {"length": len(text)},
+            )
+        )
+
+        self.assertEqual([name for name, _ in events], ["meta", "token", "token", "done"])
+        self.assertEqual(events[1][1], {"text": "Hello"})
+        done = events[-1][1]
+        self.assertEqual(done["length"], 11)
+        self.assertIsNotNone(done["time_to_first_token"])
+        self.assertLessEqual(done["time_to_first_token"], done["interaction_duration"])
+        self.assertEqual(completed, ["Hello there"])
+
+    def test_relay_events_surfaces_connection_errors(self):
+        def broken():
+            yield "partial"
+            raise LLMError("reset")
+
+        events = _parse_events(relay_events(broken()))
+        self.assertEqual([name for name, _ in events], ["meta", "token", "error", "done"])
+
+    def test_client_disconnect_still_completes_interaction(self):
+        completed = []
+        stream = relay_events(iter(["a", "b", "c"]), on_complete=completed.append)
+        next(stream)
+        next(stream)
+        stream.close()
+        self.assertEqual(completed, ["a"])
+
+    def test_sse_response_and_stream_flag(self):
+        response = sse_response(iter(["event: done\ndata: {}\n\n"]))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+
+        factory = RequestFactory()
+        body = Request(
+            factory.post("/api/llm/ask", data={"stream": True}, content_type="application/json"),
+            parsers=[JSONParser()],
+        )
+        self.assertTrue(wants_stream(body))
+        self.assertTrue(wants_stream(Request(factory.post("/api/llm/ask?stream=1"))))
+        self.assertFalse(wants_stream(Request(factory.post("/api/llm/ask?stream=false"))))
+
+
+class LLMClientTests(SimpleTestCase):
+    def _client(self, server, **kwargs):
+        client = LLMClient(server.url, model="stub", **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    def _server(self, **kwargs):
+        server = StubOllamaServer(**kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def test_generate_reuses_pooled_connection(self):
+        server = self._server()
+        client = self._client(server)
+
+        answers = [client.generate(f"question {i}") for i in range(3)]
+
+        self.assertEqual(answers, ["echo: question 0", "echo: question 1", "echo: question 2"])
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(client.stats()["requests"], 3)
+
+    def test_stream_yields_fragments_in_order(self):
+        server = self._server(reply=lambda prompt: "Wrap it in <article>.", chunk_size=5)
+        client = self._client(server)
+
+        fragments = list(client.stream("explain"))
+
+        self.assertGreater(len(fragments), 1)
+        self.assertEqual("".join(fragments), "Wrap it in <article>.")
+
+    def test_async_callers_share_the_client(self):
+        server = self._server()
+        client = self._client(server)
+
+        async def run():
+            answer = await client.agenerate("async")
+            fragments = [fragment async for fragment in client.astream("streamed")]
+            return answer, "".join(fragments)
+
+        self.assertEqual(asyncio.run(run()), ("echo: async", "echo: streamed"))
+
+    def test_concurrency_is_capped_and_excess_requests_queue(self):
+        server = self._server(delay=0.15)
+        client = self._client(server, max_concurrency=2)
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            answers = list(pool.map(lambda i: client.generate(f"prompt {i}"), range(6)))
+
+        self.assertEqual(len(answers), 6)
+        self.assertEqual(server.max_active, 2)
+        stats = client.stats()
+        self.assertEqual(stats["requests"], 6)
+        self.assertEqual((stats["active"], stats["queued"]), (0, 0))
+        self.assertIsNotNone(stats["queue_wait_ms"]["p95"])
+
+    def test_identical_inflight_prompts_are_coalesced(self):
+        server = self._server(delay=0.3)
+        client = self._client(server)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            answers = list(pool.map(lambda _: client.generate("same prompt"), range(4)))
+
+        self.assertEqual(set(answers), {"echo: same prompt"})
+        self.assertEqual(server.prompts, ["same prompt"])
+        self.assertEqual(client.stats()["coalesced"], 3)
+
+    def test_full_queue_is_rejected_as_busy(self):
+        server = self._server(delay=0.5)
+        client = self._client(server, max_concurrency=1, max_queue=0)
+        worker = threading.Thread(target=client.generate, args=("slow",))
+        worker.start()
+        self.addCleanup(worker.join)
+        while server.active == 0:
+            time.sleep(0.01)
+
+        with self.assertRaises(LLMBusy):
+            client.generate("another")
+        self.assertEqual(client.stats()["rejected"], 1)
+
+    def test_server_errors_become_llm_errors(self):
+        server = self._server(status=500)
+        client = self._client(server)
+
+        with self.assertRaises(LLMError):
+            client.generate("boom")
+        with self.assertRaises(LLMError):
+            list(client.stream("boom"))
+        self.assertEqual(client.stats()["errors"], 2)
+        with mock.patch("llm_tutor.tutor.llm.get_llm_client", return_value=client):
+            self.assertEqual(generate("boom"), CONNECTION_ERROR_MESSAGE)
+
+
+class RAGWarmupTests(TestCase):
+    def setUp(self):
+        self.loads = []
+
+        class FakeRetriever:
+            def __init__(inner):
+                self.loads.append(threading.get_ident())
+                time.sleep(0.05)
+
+        fake_rag = types.ModuleType("llm_tutor.tutor.rag")
+        fake_rag.RAGRetriever = FakeRetriever
+        patcher = mock.patch.dict(sys.modules, {"llm_tutor.tutor.rag": fake_rag})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        warmup.reset_retriever()
+        self.addCleanup(warmup.reset_retriever)
+
+    def _readiness(self):
+        response = readiness_check_view(RequestFactory().get("/health/ready/"))
+        return response.status_code, json.loads(response.content)
+
+    def test_retriever_loads_once_for_concurrent_requests(self):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            retrievers = list(pool.map(lambda _: warmup.get_retriever(), range(4)))
+
+        self.assertEqual(len(self.loads), 1)
+        self.assertEqual(len({id(retriever) for retriever in retrievers}), 1)
+        self.assertEqual(warmup.rag_status()["state"], warmup.STATE_READY)
+
+    @override_settings(LLM_TUTOR_RAG_PRELOAD="background")
+    def test_readiness_waits_for_background_warm_up(self):
+        self.assertEqual(self._readiness()[0], 503)
+
+        warmup.warm_up(background=True)
+        deadline = time.monotonic() + 5
+        while warmup.rag_status()["state"] != warmup.STATE_READY and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        status_code, body = self._readiness()
+        self.assertEqual(status_code, 200)
+        self.assertEqual(body["checks"], {"database": "ok", "rag": "ok"})
+
+    @override_settings(LLM_TUTOR_RAG_PRELOAD="eager")
+    def test_failed_warm_up_is_reported_not_ready(self):
+        sys.modules["llm_tutor.tutor.rag"].RAGRetriever = mock.Mock(side_effect=OSError("index missing"))
+
+        warmup.warm_up()
+
+        status_code, body = self._readiness()
+        self.assertEqual(status_code, 503)
+        self.assertEqual(body["checks"]["rag"], "OSError: index missing")
+
+    def test_readiness_ignores_rag_without_preload(self):
+        self.assertEqual(self._readiness(), (200, {"status": "ready", "checks": {"database": "ok"}}))
+
+
+class RAGCacheTests(SimpleTestCase):
+    def test_keys_cover_the_whole_query_k_and_index_version(self):
+        prefix = "Semantic HTML step 3 <article><h1>Title</h1>"
+        first = retrieval_key(f"{prefix}<p>one</p></article>", 2, "v1")
+
+        self.assertNotEqual(first, retrieval_key(f"{prefix}<p>two</p></article>", 2, "v1"))
+        self.assertNotEqual(first, retrieval_key(f"{prefix}<p>one</p></article>", 3, "v1"))
+        self.assertNotEqual(first, retrieval_key(f"{prefix}<p>one</p></article>", 2, "v2"))
+        self.assertEqual(first, retrieval_key(f"  {prefix}<p>one</p></article>\n", 2, "v1"))
+        self.assertEqual(embedding_key("a  b", "model"), embedding_key("a b", "model"))
+        self.assertNotEqual(embedding_key("a b", "model"), embedding_key("a b", "other-model"))
+
+    def test_local_tier_is_bounded_lru(self):
+        cache = TieredCache(LocalLRU(2))
+        cache.set("a", ["doc a"])
+        cache.set("b", ["doc b"])
+        cache.get("a")
+        cache.set("c", ["doc c"])
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), ["doc a"])
+        self.assertEqual(cache.stats()["local"]["entries"], 2)
+
+    def test_shared_tier_fills_local_tier_and_failures_are_misses(self):
+        shared = mock.Mock()
+        shared.get.return_value = [0.5, 0.25]
+        cache = TieredCache(LocalLRU(10), shared, encode=list, decode=tuple)
+
+        self.assertEqual(cache.get("key"), (0.5, 0.25))
+        self.assertEqual(cache.get("key"), (0.5, 0.25))
+        self.assertEqual(shared.get.call_count, 1)
+
+        cache.set("other", (1.0,))
+        shared.set.assert_called_once_with("other", [1.0])
+
+        shared.get.side_effect = ConnectionError("redis down")
+        self.assertIsNone(cache.get("missing"))
+
+    @override_settings(LLM_TUTOR_EMBEDDING_CACHE_MAX_ENTRIES=0, LLM_TUTOR_RETRIEVAL_CACHE_MAX_ENTRIES=10)
+    def test_zero_max_entries_disables_a_cache(self):
+        reset_rag_caches()
+        self.addCleanup(reset_rag_caches)
+
+        embeddings, retrievals = get_rag_caches()
+
+        self.assertIsNone(embeddings)
+        self.assertIsNone(retrievals.shared)
+
+
+class CurriculumDocumentStoreTests(SimpleTestCase):
+    data_dir = os.path.join(os.path.dirname(__file__), "..", "data")
+
+    def setUp(self):
+        self.curriculum_dir = os.path.join(self.data_dir, "curriculum")
+        with open(os.path.join(self.data_dir, "vectors", "curriculum_metadata.json"), encoding="utf-8") as f:
+            self.metadata = json.load(f)
+
+    def test_documents_match_per_hit_rendering_and_read_each_lesson_once(self):
+        real_open = builtins.open
+        with mock.patch("builtins.open", side_effect=real_open) as opened:
+            documents = load_documents(self.metadata, self.curriculum_dir)
+
+        self.assertEqual(len(documents), len(self.metadata))
+        self.assertEqual(opened.call_count, len({meta["lesson_id"] for meta in self.metadata}))
+        for meta, document in zip(self.metadata, documents):
+            with open(os.path.join(self.curriculum_dir, f"{meta['lesson_id']}.json"), encoding="utf-8") as f:
+                lesson = json.load(f)
+            if meta["step_number"] is None:
+                expected = lesson["general_notes"]
+            else:
+                step = next(s for s in lesson["steps"] if s["step_number"] == meta["step_number"])
+                expected = f"{step['description']} {step.get('expected_code', '')} {step.get('notes', '')}"
+            self.assertEqual(document, expected)
+
+    def test_snapshot_maps_row_ids_and_skips_faiss_padding(self):
+        metadata = [{"lesson_id": "l1", "step_number": 1}, {"lesson_id": "l1", "step_number": None}]
+        snapshot = IndexSnapshot(index=None, metadata=metadata, documents=["first", "second"], version="v1")
+
+        self.assertEqual(snapshot.documents_for([1, 0, -1]), ["second", "first"])
+
+
+class CurriculumIndexingTests(SimpleTestCase):
+    curriculum_dir = os.path.join(os.path.dirname(__file__), "..", "data", "curriculum")
+
+    def _db_entry(self, lesson_id, step_number, text):
+        entry = {
+            "lesson_id": lesson_id,
+            "step_number": step_number,
+            "description": text,
+            "estimated_duration": 30,
+            "assignment": False,
+            "source": "database",
+            "text": text,
+        }
+        entry["hash"] = text_hash(text)
+        return entry
+
+    def test_file_entries_render_like_the_document_store(self):
+        entries = collect_from_files(self.curriculum_dir)
+
+        self.assertEqual([entry["text"] for entry in entries], load_documents(
+            [{key: entry[key] for key in ("lesson_id", "step_number")} for entry in entries],
+            self.curriculum_dir,
+        ))
+        self.assertIsNone(entries[-1]["step_number"])
+
+    def test_database_rows_override_files_and_keep_assignment_flags(self):
+        files = collect_from_files(self.curriculum_dir)
+        lesson_id = files[0]["lesson_id"]
+        files[0]["assignment"] = True
+        database = [self._db_entry(lesson_id, 1, "edited step"), self._db_entry("zz_new_lesson", 1, "new step")]
+
+        merged = merge_entries(files, database)
+
+        edited = next(entry for entry in merged if (entry["lesson_id"], entry["step_number"]) == (lesson_id, 1))
+        self.assertEqual(edited["text"], "edited step")
+        self.assertTrue(edited["assignment"])
+        self.assertEqual(len(merged), len(files) + 1)
+        self.assertEqual(merged[-1]["lesson_id"], "zz_new_lesson")
+
+    def test_only_new_or_changed_documents_need_embedding(self):
+        entries = collect_from_files(self.curriculum_dir)
+        previous = {"model": "m", "embeddings_file": "vectors.npy", "entries": entries}
+        changed = [dict(entry) for entry in entries]
+        changed[1] = self._db_entry(changed[1]["lesson_id"], changed[1]["step_number"], "rewritten")
+        changed.append(self._db_entry("zz_new_lesson", 1, "new step"))
+
+        reuse = plan_embeddings(changed, previous, "m")
+
+        self.assertEqual(set(range(len(changed))) - set(reuse), {1, len(changed) - 1})
+        self.assertEqual(reuse[2], 2)
+        self.assertEqual(plan_embeddings(changed, previous, "other-model"), {})
+        self.assertEqual(plan_embeddings(changed, {**previous, "embeddings_file": None}, "m"), {})
+
+    def test_index_type_selection(self):
+        self.assertEqual(choose_index_type("auto", 100, ann_threshold=20000, nlist=100), INDEX_FLAT)
+        self.assertEqual(choose_index_type("auto", 50000, ann_threshold=20000, nlist=100), INDEX_HNSW)
+        self.assertEqual(choose_index_type("ivf", 1000, ann_threshold=20000, nlist=100), INDEX_FLAT)
+        self.assertEqual(choose_index_type("ivf", 3900, ann_threshold=20000, nlist=100), INDEX_IVF)
+
+    def test_legacy_metadata_list_reads_as_manifest(self):
+        manifest = read_manifest(os.path.join(self.curriculum_dir, "..", "vectors", "curriculum_metadata.json"))
+
+        self.assertIsNone(manifest["version"])
+        self.assertEqual(manifest["index_file"], "curriculum_index.faiss")
+        self.assertTrue(manifest["entries"])
+
+    def test_dry_run_reports_documents_to_embed(self):
+        out = io.StringIO()
+
+        call_command(IndexCurriculumCommand(), source="files", dry_run=True, force=True, stdout=out)
+
+        count = len(collect_from_files(self.curriculum_dir))
+        self.assertIn(f"{count} document(s): {count} to embed, 0 reused", out.getvalue())
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_requests_share_one_call_and_keep_their_results(self):
+        calls = []
+
+        def process(items):
+            calls.append(list(items))
+            time.sleep(0.02)
+            return [item.upper() for item in items]
+
+        batcher = MicroBatcher(process, max_batch=16, max_wait=0.05)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(batcher.submit, [f"query {i}" for i in range(8)]))
+
+        self.assertEqual(results, [f"QUERY {i}" for i in range(8)])
+        self.assertLess(len(calls), 8)
+        self.assertEqual(sum(len(call) for call in calls), 8)
+        self.assertEqual(batcher.stats()["items"], 8)
+
+    def test_batches_are_capped_at_max_batch(self):
+        batcher = MicroBatcher(lambda items: list(items), max_batch=3, max_wait=0.05)
+        with ThreadPoolExecutor(max_workers=7) as pool:
+            list(pool.map(batcher.submit, range(7)))
+
+        self.assertLessEqual(batcher.stats()["largest_batch"], 3)
+
+    def test_failures_reach_every_caller_in_the_batch(self):
+        def process(items):
+            raise ValueError("index unavailable")
+
+        batcher = MicroBatcher(process, max_wait=0)
+        with self.assertRaisesMessage(ValueError, "index unavailable"):
+            batcher.submit("query")
+
+    def test_benchmark_reports_both_modes(self):
+        out = io.StringIO()
+
+        call_command(
+            BenchmarkRetrievalCommand(),
+            synthetic=True,
+            clients=4,
+            requests=3,
+            overhead_ms=1.0,
+            per_query_ms=0.1,
+            stdout=out,
+        )
+
+        self.assertIn("per request", out.getvalue())
+        self.assertIn("micro-batched", out.getvalue())
+
+
+class CodeDiffTests(SimpleTestCase):
+    expected = '<article class="post" id="intro">\n  <h1>Title</h1>\n  <p>Body text</p>\n</article>'
+
+    def test_formatting_only_changes_are_not_differences(self):
+        self.assertFalse(codes_differ(self.expected, self.expected))
+        self.assertFalse(codes_differ(self.expected, "  " + self.expected.replace("\n", " ") + "\n"))
+        self.assertFalse(codes_differ(
+            self.expected,
+            "<ARTICLE id='intro' class='post'><h1>Title</h1><p>Body\n text</p></ARTICLE>",
+        ))
+
+    def test_structural_and_text_changes_are_differences(self):
+        self.assertTrue(codes_differ(self.expected, self.expected.replace("<h1>Title</h1>", "")))
+        self.assertTrue(codes_differ(self.expected, self.expected.replace("Body text", "Other text")))
+        self.assertTrue(codes_differ(self.expected, self.expected.replace("article", "div")))
+        self.assertTrue(codes_differ("print('a')", "print('b')"))
+        self.assertFalse(codes_differ("print('a')\n", "print('a')"))
+
+    def test_missing_elements_lists_expected_tags_not_submitted(self):
+        self.assertEqual(missing_elements(self.expected, "<article><p>Body text</p></article>"), ["h1"])
+        self.assertEqual(missing_elements(self.expected, "nothing yet"), ["article", "h1", "p"])
+        self.assertEqual(missing_elements(self.expected, self.expected), [])
+
+    def test_snapshot_indexes_step_metadata(self):
+        metadata = [
+            {"lesson_id": "semantic_html_101", "step_number": 3, "assignment": True},
+            {"lesson_id": "semantic_html_101", "step_number": None, "assignment": False},
+        ]
+        snapshot = IndexSnapshot(index=None, metadata=metadata, documents=["a", "b"], version="v1")
+
+        self.assertTrue(snapshot.step_metadata("semantic_html_101", 3)["assignment"])
+        self.assertTrue(snapshot.step_metadata("semantic_html_101", "3")["assignment"])
+        self.assertIsNone(snapshot.step_metadata("semantic_html_101", 4))
+
+
+class ResponseCacheTests(SimpleTestCase):
+    expected = "<article>\n  <h1>Title</h1>\n  <p>Body</p>\n</article>"
+    code = "<article><h1>Title</h1></article>"
+    vectors = {
+        "what is an article element?": [1.0, 0.0, 0.0],
+        "What is the article element for?": [0.98, 0.2, 0.0],
+        "how do I add an image?": [0.0, 1.0, 0.0],
+    }
+
+    def _cache(self, **overrides):
+        options = dict(ttl=3600, similarity=0.9, neighbours=4, max_steps=8)
+        options.update(overrides)
+        return ResponseCache(TieredCache(LocalLRU(16)), **options)
+
+    def _embed(self, question):
+        return self.vectors[question]
+
+    def test_explanations_are_shared_by_structurally_equal_code(self):
+        cache = self._cache()
+        submitted = "<article><h1>Title</h1></article>"
+        cache.put_explanation("l1", 2, self.expected, submitted, "v1", "Add a paragraph.")
+
+        reformatted = "<article>\n    <h1>Title</h1>\n</article>"
+        self.assertEqual(cache.get_explanation("l1", 2, self.expected, reformatted, "v1"), "Add a paragraph.")
+        self.assertIsNone(cache.get_explanation("l1", 2, self.expected, "<article><h2>Title</h2></article>", "v1"))
+        self.assertIsNone(cache.get_explanation("l1", 3, self.expected, submitted, "v1"))
+        self.assertIsNone(cache.get_explanation("l1", 2, self.expected, submitted, "v2"))
+        self.assertEqual(cache.stats()["lessons"]["l1"], {"hits": 1, "semantic_hits": 0, "misses": 3, "hit_rate": 0.25})
+
+    def test_near_duplicate_questions_are_answered_from_the_cache(self):
+        cache = self._cache()
+        cache.put_answer("l1", 2, "what is an article element?", self.code, "v1", "A self-contained composition.", self._embed)
+
+        self.assertEqual(
+            cache.get_answer("l1", 2, "  What is an article   element? ", self.code, "v1", self._embed),
+            ("A self-contained composition.", HIT_EXACT),
+        )
+        self.assertEqual(
+            cache.get_answer("l1", 2, "What is the article element for?", self.code, "v1", self._embed),
+            ("A self-contained composition.", HIT_SEMANTIC),
+        )
+        self.assertEqual(cache.get_answer("l1", 2, "how do I add an image?", self.code, "v1", self._embed), (None, None))
+        self.assertEqual(cache.get_answer("l1", 3, "What is the article element for?", self.code, "v1", self._embed), (None, None))
+        self.assertEqual(cache.get_answer("l1", 2, "What is the article element for?", self.code, "v2", self._embed), (None, None))
+        # The student's code is part of the prompt, so a question about other code is a miss.
+        other_code = "<section><p>Intro</p></section>"
+        self.assertEqual(cache.get_answer("l1", 2, "what is an article element?", other_code, "v1", self._embed), (None, None))
+        self.assertEqual(cache.get_answer("l1", 2, "What is the article element for?", other_code, "v1", self._embed), (None, None))
+
+    def test_expired_and_error_responses_are_not_served(self):
+        cache = self._cache(ttl=60)
+        cache.put_answer("l1", 2, "how do I add an image?", self.code, "v1", CONNECTION_ERROR_MESSAGE, self._embed)
+        self.assertEqual(cache.get_answer("l1", 2, "how do I add an image?", self.code, "v1", self._embed), (None, None))
+
+        cache.put_answer("l1", 2, "what is an article element?", self.code, "v1", "Answer", self._embed)
+        with mock.patch("llm_tutor.tutor.responses.time.time", return_value=time.time() + 120):
+            self.assertEqual(cache.get_answer("l1", 2, "What is the article element for?", self.code, "v1", self._embed), (None, None))
+            self.assertEqual(cache.get_answer("l1", 2, "what is an article element?", self.code, "v1", self._embed), (None, None))
+
+    def test_only_completed_streams_are_recorded(self):
+        stored = []
+        self.assertEqual(list(record_completion(iter(["Use ", "<article>."]), stored.append)), ["Use ", "<article>."])
+        self.assertEqual(stored, ["Use <article>."])
+
+        def broken():
+            yield "Use "
+            raise LLMError("stream broke")
+
+        with self.assertRaises(LLMError):
+            list(record_completion(broken(), stored.append))
+        abandoned = record_completion(iter(["a", "b"]), stored.append)
+        next(abandoned)
+        abandoned.close()
+        self.assertEqual(stored, ["Use <article>."])
+
+    @override_settings(LLM_TUTOR_RESPONSE_CACHE_MAX_ENTRIES=0)
+    def test_zero_max_entries_disables_the_cache(self):
+        reset_response_cache()
+        self.addCleanup(reset_response_cache)
+
+        self.assertIsNone(get_response_cache())
+
+
+class SnapshotDeltaTests(SimpleTestCase):
+    expected = "<article>\n" + "".join(f"  <p>Paragraph {number}</p>\n" for number in range(30)) + "</article>\n"
+
+    def test_deltas_round_trip(self):
+        cases = [
+            (self.expected, self.expected.replace("Paragraph 7", "Paragraph seven")),
+            (self.expected, self.expected + "<footer>done</footer>"),
+            (self.expected, self.expected.replace("  <p>Paragraph 3</p>\n", "")),
+            (self.expected, ""),
+            ("", "<p>new</p>"),
+            ("no trailing newline", "no trailing newline\nnow two lines"),
+        ]
+        for base, target in cases:
+            with self.subTest(target=target[:30]):
+                self.assertEqual(apply_delta(base, encode_delta(base, target)), target)
+
+    def test_smallest_encoding_is_chosen(self):
+        previous = self.expected.replace("Paragraph 1<", "Paragraph one<")
+        code = previous.replace("Paragraph 2<", "Paragraph two<")
+
+        encoding, delta = choose_encoding(code, self.expected, previous)
+        self.assertEqual(encoding, ENCODING_PREVIOUS)
+        self.assertEqual(apply_delta(previous, delta), code)
+
+        encoding, delta = choose_encoding(code, self.expected, None)
+        self.assertEqual(encoding, ENCODING_EXPECTED)
+        self.assertEqual(apply_delta(self.expected, delta), code)
+
+        self.assertEqual(choose_encoding("<p>short</p>", self.expected, None), (ENCODING_FULL, None))
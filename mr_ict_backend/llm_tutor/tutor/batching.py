@@ -0,0 +1,95 @@
+"""Micro-batching for work that is cheaper per item in bulk.
+
+`MicroBatcher.submit(item)` blocks the calling thread while a worker thread
+collects requests for up to `max_wait` seconds (or until `max_batch` are
+waiting), hands the whole batch to `process(items)` and fans the results back
+out in order. The retriever uses it so concurrent tutor requests share one
+`model.encode` and one `index.search` call instead of one each.
+
+The worker thread is started lazily and again after a fork, so batchers built
+before gunicorn forks still work in every worker.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        process: Callable[[Sequence[Any]], Sequence[Any]],
+        *,
+        max_batch: int = 32,
+        max_wait: float = 0.005,
+        name: str = "micro-batcher",
+    ) -> None:
+        self.process = process
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+        self._lock = threading.Lock()
+        self._queue: Optional["queue.Queue[Tuple[Any, Future]]"] = None
+        self._pid: Optional[int] = None
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+
+    def _ensure_worker(self) -> "queue.Queue[Tuple[Any, Future]]":
+        with self._lock:
+            if self._queue is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, args=(self._queue,), name=self.name, daemon=True).start()
+            return self._queue
+
+    def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        future: Future = Future()
+        self._ensure_worker().put((item, future))
+        return future.result(timeout=timeout)
+
+    def _collect(self, pending: "queue.Queue[Tuple[Any, Future]]") -> List[Tuple[Any, Future]]:
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(pending.get(timeout=remaining) if remaining > 0 else pending.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pending: "queue.Queue[Tuple[Any, Future]]") -> None:
+        while True:
+            batch = self._collect(pending)
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._largest = max(self._largest, len(batch))
+            try:
+                results = self.process([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+            except Exception as exc:
+                logger.exception("%s batch of %s failed", self.name, len(batch))
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest,
+            }
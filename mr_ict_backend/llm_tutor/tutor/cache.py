@@ -0,0 +1,160 @@
+"""Bounded caches for RAG query embeddings and retrieval results.
+
+Keys are digests of the whole whitespace-normalised query, so two code
+submissions that only share a prefix never collide. Retrieval keys also cover
+`k` and the index version, so rebuilding the index retires old results
+without an explicit flush; embedding keys cover the model name.
+
+Each cache is a per-process LRU, optionally backed by a Redis LRU shared by
+every worker (`LLM_TUTOR_RAG_CACHE_URL`). A Redis hit is copied into the local
+tier. Redis failures are logged and treated as misses.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+
+from core.lru import LocalLRU, RedisLRU
+
+logger = logging.getLogger(__name__)
+
+
+def normalise_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+def retrieval_key(query: str, k: int, index_version: str) -> str:
+    return _digest("retrieval", index_version, k, normalise_query(query))
+
+
+def embedding_key(query: str, model_name: str) -> str:
+    return _digest("embedding", model_name, normalise_query(query))
+
+
+class TieredCache:
+    def __init__(
+        self,
+        local: Optional[LocalLRU],
+        shared: Optional[RedisLRU] = None,
+        *,
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+    ) -> None:
+        self.local = local
+        self.shared = shared
+        self.encode = encode
+        self.decode = decode
+
+    def get(self, key: str) -> Any:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        if self.shared is None:
+            return None
+        try:
+            raw = self.shared.get(key)
+        except Exception:
+            logger.warning("RAG cache read failed", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        value = self.decode(raw)
+        if self.local is not None:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        if self.local is not None:
+            self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, self.encode(value))
+            except Exception:
+                logger.warning("RAG cache write failed", exc_info=True)
+
+    def stats(self) -> Dict[str, object]:
+        stats: Dict[str, object] = {"local": self.local.stats() if self.local is not None else None}
+        if self.shared is not None:
+            try:
+                stats["shared"] = self.shared.stats()
+            except Exception as exc:
+                stats["shared"] = {"error": str(exc)}
+        return stats
+
+    def clear(self) -> None:
+        if self.local is not None:
+            self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+
+def _build_cache(name: str, max_entries: int, **codec) -> Optional[TieredCache]:
+    if max_entries <= 0:
+        return None
+    url = getattr(settings, "LLM_TUTOR_RAG_CACHE_URL", "")
+    shared = None
+    if url:
+        shared = RedisLRU(
+            url,
+            max_entries=max_entries,
+            ttl=int(getattr(settings, "LLM_TUTOR_RAG_CACHE_TTL", 86400)),
+            prefix=f"rag-{name}",
+        )
+    return TieredCache(LocalLRU(max_entries), shared, **codec)
+
+
+_caches: Optional[Tuple[Optional[TieredCache], Optional[TieredCache]]] = None
+_caches_lock = threading.Lock()
+
+
+def get_rag_caches(
+    *,
+    encode_embedding: Callable[[Any], Any] = lambda value: value,
+    decode_embedding: Callable[[Any], Any] = lambda value: value,
+) -> Tuple[Optional[TieredCache], Optional[TieredCache]]:
+    """Return the process-wide `(embedding_cache, retrieval_cache)`; either is
+    None when its `*_MAX_ENTRIES` setting is 0."""
+
+    global _caches
+    if _caches is None:
+        with _caches_lock:
+            if _caches is None:
+                _caches = (
+                    _build_cache(
+                        "embeddings",
+                        int(getattr(settings, "LLM_TUTOR_EMBEDDING_CACHE_MAX_ENTRIES", 0) or 0),
+                        encode=encode_embedding,
+                        decode=decode_embedding,
+                    ),
+                    _build_cache(
+                        "retrievals",
+                        int(getattr(settings, "LLM_TUTOR_RETRIEVAL_CACHE_MAX_ENTRIES", 0) or 0),
+                    ),
+                )
+    return _caches
+
+
+def rag_cache_stats() -> Optional[Dict[str, object]]:
+    if _caches is None:
+        return None
+    embeddings, retrievals = _caches
+    return {
+        "embeddings": embeddings.stats() if embeddings is not None else None,
+        "retrievals": retrievals.stats() if retrievals is not None else None,
+    }
+
+
+def reset_rag_caches() -> None:
+    global _caches
+    with _caches_lock:
+        _caches = None
@@ -0,0 +1,353 @@
+"""Shared asyncio client for the local Ollama server.
+
+A single `LLMClient` per process owns an aiohttp session, and with it a
+keep-alive connection pool, on a background event-loop thread. Sync DRF views
+(`generate`, `stream`) and async callers (`agenerate`, `astream`) all submit
+work to that loop, so they share the same connections, concurrency limit and
+metrics regardless of whether the project runs under WSGI or ASGI.
+
+Generations are limited to `max_concurrency` at a time; further requests wait
+in a queue up to `max_queue` deep for at most `queue_timeout` seconds before
+`LLMBusy` is raised. Identical non-streaming prompts that arrive while the
+first one is still running share its result instead of generating twice.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+import aiohttp
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = "token"
+_END = "end"
+_ERROR = "error"
+
+
+class LLMError(Exception):
+    """The LLM server could not produce an answer."""
+
+
+class LLMBusy(LLMError):
+    """Too many generations are already queued; the caller should retry later."""
+
+
+def _percentiles(samples: Deque[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50": None, "p95": None}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "p50": round(ordered[int(last * 0.5)] * 1000, 1),
+        "p95": round(ordered[int(last * 0.95)] * 1000, 1),
+    }
+
+
+class LLMClient:
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        model: str,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        max_concurrency: int = 2,
+        max_queue: int = 32,
+        queue_timeout: float = 30.0,
+        pool_size: int = 8,
+        keepalive_timeout: float = 60.0,
+    ) -> None:
+        self.generate_url = f"{base_url.rstrip('/')}/api/generate"
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+
+        self._start_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+        self._stats_lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._counters = {"requests": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+        self._latency: Deque[float] = deque(maxlen=500)
+        self._queue_wait: Deque[float] = deque(maxlen=500)
+
+    # -- event loop -----------------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None or self._thread is None or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run() -> None:
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                thread = threading.Thread(target=run, name="llm-client", daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+                self._session = None
+                self._semaphore = None
+                self._inflight = {}
+            return self._loop
+
+    def _submit(self, coroutine) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive_timeout),
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    sock_connect=self.connect_timeout,
+                    sock_read=self.read_timeout,
+                ),
+            )
+        return self._session
+
+    def close(self) -> None:
+        with self._start_lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or thread is None or not thread.is_alive():
+            return
+
+        async def shutdown() -> None:
+            if self._session is not None:
+                await self._session.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result(timeout=5)
+        except Exception:  # pragma: no cover - best effort during shutdown
+            logger.warning("LLM client session did not close cleanly", exc_info=True)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+    # -- metrics --------------------------------------------------------------
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            return {
+                "model": self.model,
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                "queued": self._waiting,
+                **self._counters,
+                "latency_ms": _percentiles(self._latency),
+                "queue_wait_ms": _percentiles(self._queue_wait),
+            }
+
+    # -- concurrency ----------------------------------------------------------
+
+    @asynccontextmanager
+    async def _slot(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        semaphore = self._semaphore
+        if semaphore.locked() and self._waiting >= self.max_queue:
+            self._count("rejected")
+            raise LLMBusy(f"{self._waiting} generations already queued")
+
+        queued_at = time.perf_counter()
+        with self._stats_lock:
+            self._waiting += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._count("rejected")
+            raise LLMBusy(f"no generation slot within {self.queue_timeout}s") from None
+        finally:
+            with self._stats_lock:
+                self._waiting -= 1
+
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._active += 1
+            self._counters["requests"] += 1
+            self._queue_wait.append(started - queued_at)
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self._active -= 1
+                self._latency.append(time.perf_counter() - started)
+            semaphore.release()
+
+    # -- generation -----------------------------------------------------------
+
+    async def _request(self, prompt: str, model: str) -> Optional[str]:
+        async with self._slot():
+            try:
+                async with self._get_session().post(
+                    self.generate_url,
+                    json={"model": model, "prompt": prompt, "stream": False},
+                ) as response:
+                    response.raise_for_status()
+                    body = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                self._count("errors")
+                raise LLMError(str(exc) or exc.__class__.__name__) from exc
+        if body.get("error"):
+            self._count("errors")
+            raise LLMError(body["error"])
+        return body.get("response")
+
+    async def _generate(self, prompt: str, model: str) -> Optional[str]:
+        key = (model, prompt)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(prompt, model))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self._count("coalesced")
+        # Shielded so one caller going away does not cancel the shared request.
+        return await asyncio.shield(task)
+
+    async def _pump(self, prompt: str, model: str, emit: Callable[[Tuple[str, object]], None]) -> None:
+        """Run one streaming generation, handing `(kind, value)` items to `emit`."""
+
+        try:
+            async with self._slot():
+                async with self._get_session().post(
+                    self.generate_url,
+                    json={"model": model, "prompt": prompt, "stream": True},
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.content:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise LLMError(chunk["error"])
+                        if chunk.get("response"):
+                            emit((_TOKEN, chunk["response"]))
+                        if chunk.get("done"):
+                            break
+            emit((_END, None))
+        except LLMError as exc:
+            if not isinstance(exc, LLMBusy):
+                self._count("errors")
+            emit((_ERROR, exc))
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+            self._count("errors")
+            emit((_ERROR, LLMError(str(exc) or exc.__class__.__name__)))
+
+    def _result_timeout(self) -> float:
+        return self.queue_timeout + self.connect_timeout + self.read_timeout
+
+    # -- public API -----------------------------------------------------------
+
+    def generate(self, prompt: str, *, model: Optional[str] = None) -> Optional[str]:
+        future = self._submit(self._generate(prompt, model or self.model))
+        try:
+            return future.result(timeout=self._result_timeout())
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise LLMError("timed out waiting for the LLM") from None
+
+    async def agenerate(self, prompt: str, *, model: Optional[str] = None) -> Optional[str]:
+        return await asyncio.wrap_future(self._submit(self._generate(prompt, model or self.model)))
+
+    def stream(self, prompt: str, *, model: Optional[str] = None) -> Iterator[str]:
+        items: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+        future = self._submit(self._pump(prompt, model or self.model, items.put))
+        try:
+            while True:
+                try:
+                    kind, value = items.get(timeout=self._result_timeout())
+                except queue.Empty:
+                    raise LLMError("timed out waiting for the LLM") from None
+                if kind == _END:
+                    return
+                if kind == _ERROR:
+                    raise value
+                yield value
+        finally:
+            # Stops the upstream generation when the client disconnects.
+            future.cancel()
+
+    async def astream(self, prompt: str, *, model: Optional[str] = None) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        items: "asyncio.Queue[Tuple[str, object]]" = asyncio.Queue()
+
+        def emit(item: Tuple[str, object]) -> None:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+
+        future = asyncio.wrap_future(self._submit(self._pump(prompt, model or self.model, emit)))
+        try:
+            while True:
+                kind, value = await asyncio.wait_for(items.get(), timeout=self._result_timeout())
+                if kind == _END:
+                    return
+                if kind == _ERROR:
+                    raise value
+                yield value
+        finally:
+            future.cancel()
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client configured from the `LLM_TUTOR_*` settings."""
+
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient(
+                getattr(settings, "LLM_TUTOR_OLLAMA_URL", "http://localhost:11434"),
+                model=getattr(settings, "LLM_TUTOR_MODEL", "llama3.2:3b"),
+                connect_timeout=getattr(settings, "LLM_TUTOR_CONNECT_TIMEOUT", 5.0),
+                read_timeout=getattr(settings, "LLM_TUTOR_READ_TIMEOUT", 120.0),
+                max_concurrency=getattr(settings, "LLM_TUTOR_MAX_CONCURRENCY", 2),
+                max_queue=getattr(settings, "LLM_TUTOR_MAX_QUEUE", 32),
+                queue_timeout=getattr(settings, "LLM_TUTOR_QUEUE_TIMEOUT", 30.0),
+                pool_size=getattr(settings, "LLM_TUTOR_POOL_SIZE", 8),
+            )
+        return _client
+
+
+def llm_client_stats() -> Optional[Dict[str, object]]:
+    """Metrics of the process-wide client, or None if it was never used."""
+
+    return _client.stats() if _client is not None else None
+
+
+def reset_llm_client() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
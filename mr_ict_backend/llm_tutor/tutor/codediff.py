@@ -0,0 +1,102 @@
+"""Cheap comparison of a student's code against a step's expected code.
+
+`CodeUpdateView` only needs to know whether the code differs, so
+`codes_differ` tries the cheapest checks first: identical strings, then equal
+whitespace-normalised digests (the expected side is memoised per step), then
+equal HTML token streams, so attribute order, quoting and indentation do not
+count as differences in the semantic HTML curriculum. Detail for feedback
+(`missing_elements`) is only computed when a message will use it.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+Token = Tuple
+
+
+def normalise_whitespace(code: str) -> str:
+    return " ".join(code.split())
+
+
+@lru_cache(maxsize=1024)
+def _expected_digest(code: str) -> str:
+    return code_digest(code)
+
+
+def code_digest(code: str) -> str:
+    return hashlib.sha256(normalise_whitespace(code).encode("utf-8")).hexdigest()
+
+
+_MARKUP = re.compile(r"<!--.*?-->|<(/?)([a-zA-Z][\w:-]*)((?:[^>\"']|\"[^\"]*\"|'[^']*')*)>|([^<]+)", re.S)
+_ATTRIBUTE = re.compile(r"""([^\s=/]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+)))?""")
+
+
+@lru_cache(maxsize=4096)
+def _attributes(source: str) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(
+        (match.group(1).lower(), next((value for value in match.group(2, 3, 4) if value is not None), ""))
+        for match in _ATTRIBUTE.finditer(source)
+    ))
+
+
+def html_tokens(code: str) -> Optional[Tuple[Token, ...]]:
+    """Tag/attribute/text tokens of `code`, or None if it does not look like HTML.
+
+    A regular expression scan rather than `html.parser`: it runs on every
+    keystroke-driven update and only has to be faithful enough to tell
+    whether two snippets have the same elements, attributes and text.
+    """
+
+    if "<" not in code:
+        return None
+    tokens = tuple(_scan(code))
+    if not any(token[0] == "start" for token in tokens):
+        return None
+    return tokens
+
+
+def _scan(code: str) -> Iterator[Token]:
+    for closing, tag, attributes, text in _MARKUP.findall(code):
+        if tag:
+            tag = tag.lower()
+            yield ("end", tag) if closing else ("start", tag, _attributes(attributes) if attributes.strip() else ())
+        elif text and not text.isspace():
+            yield ("text", normalise_whitespace(text))
+
+
+@lru_cache(maxsize=1024)
+def _expected_tokens(code: str) -> Optional[Tuple[Token, ...]]:
+    return html_tokens(code)
+
+
+def codes_differ(expected: str, submitted: str) -> bool:
+    expected = expected or ""
+    submitted = submitted or ""
+    if expected == submitted:
+        return False
+    if _expected_digest(expected) == code_digest(submitted):
+        return False
+    expected_tokens = _expected_tokens(expected)
+    if expected_tokens is None:
+        return True
+    return expected_tokens != html_tokens(submitted)
+
+
+def missing_elements(expected: str, submitted: str) -> List[str]:
+    """Tags the expected code opens more often than the submission, in order."""
+
+    expected_tokens = _expected_tokens(expected or "") or ()
+    available = Counter(token[1] for token in html_tokens(submitted or "") or () if token[0] == "start")
+    missing = []
+    for token in expected_tokens:
+        if token[0] != "start":
+            continue
+        if available[token[1]] > 0:
+            available[token[1]] -= 1
+        elif token[1] not in missing:
+            missing.append(token[1])
+    return missing
@@ -0,0 +1,81 @@
+"""Curriculum documents for RAG hits, rendered once per index build.
+
+`load_documents(metadata, curriculum_dir)` returns the document text for each
+FAISS row, in row order, so a search hit becomes a list lookup instead of
+opening and parsing the lesson JSON. Indexes written by the `index_curriculum`
+command store the text in their metadata; older ones are rendered from the
+lesson files, each read once.
+
+`IndexSnapshot` bundles the index with the metadata and documents it was
+built from; the retriever swaps whole snapshots so a query never mixes an old
+index with new documents.
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CURRICULUM_DIR = os.path.join(BASE_DIR, "data", "curriculum")
+VECTORS_DIR = os.path.join(BASE_DIR, "data", "vectors")
+INDEX_PATH = os.path.join(VECTORS_DIR, "curriculum_index.faiss")
+METADATA_PATH = os.path.join(VECTORS_DIR, "curriculum_metadata.json")
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+
+def render_step(step: Dict[str, Any]) -> str:
+    return f"{step['description']} {step.get('expected_code', '')} {step.get('notes', '')}"
+
+
+def load_documents(metadata: Sequence[Dict[str, Any]], curriculum_dir: str) -> List[str]:
+    lessons: Dict[str, Tuple[str, Dict[Any, str]]] = {}
+    documents = []
+    for meta in metadata:
+        # Indexes built by `index_curriculum` carry the rendered text.
+        if 'text' in meta:
+            documents.append(meta['text'])
+            continue
+        lesson_id = meta['lesson_id']
+        if lesson_id not in lessons:
+            with open(os.path.join(curriculum_dir, f"{lesson_id}.json"), 'r', encoding='utf-8') as f:
+                lesson = json.load(f)
+            lessons[lesson_id] = (
+                lesson['general_notes'],
+                {step['step_number']: render_step(step) for step in lesson['steps']},
+            )
+        general_notes, steps = lessons[lesson_id]
+        documents.append(general_notes if meta['step_number'] is None else steps[meta['step_number']])
+    return documents
+
+
+def step_key(lesson_id: Any, step_number: Any) -> Tuple[str, Optional[int]]:
+    """Lookup key for a lesson step; request data may carry the number as a string."""
+
+    if isinstance(step_number, str) and step_number.strip().lstrip("-").isdigit():
+        step_number = int(step_number)
+    return str(lesson_id), step_number
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    index: Any
+    metadata: List[Dict[str, Any]]
+    documents: List[str]
+    version: str
+    # Manifest file fingerprint the snapshot was loaded from.
+    fingerprint: str = ""
+    steps: Dict[Tuple[str, Optional[int]], Dict[str, Any]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, "steps", {step_key(meta["lesson_id"], meta["step_number"]): meta for meta in self.metadata}
+        )
+
+    def step_metadata(self, lesson_id, step_number) -> Optional[Dict[str, Any]]:
+        return self.steps.get(step_key(lesson_id, step_number))
+
+    def documents_for(self, row_ids) -> List[str]:
+        # FAISS pads with -1 when fewer than k rows exist.
+        return [self.documents[row] for row in row_ids if 0 <= row < len(self.documents)]
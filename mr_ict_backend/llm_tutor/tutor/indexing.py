@@ -0,0 +1,300 @@
+"""Incremental builds of the curriculum FAISS index.
+
+Documents come from the lesson JSON files in `data/curriculum` and from the
+`Lesson`/`LessonStep` tables (database rows win for the same lesson and step).
+Each document's text is hashed; vectors of unchanged documents are reused
+from the previous build and only new or edited ones are embedded, in batches.
+
+A build writes a versioned index file and vector file next to a manifest at
+`METADATA_PATH`:
+
+    {"version": ..., "model": ..., "index_type": ..., "index_file": ...,
+     "embeddings_file": ..., "built_at": ..., "entries": [...]}
+
+The manifest is replaced last with `os.replace`, so retrievers either see
+the previous build or the new one, never a mix; the manifest's modification
+triggers their hot reload. Only the current and previous index files are
+kept, so a worker still reading the previous build is not cut off.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.utils import timezone
+
+from llm_tutor.tutor.documents import CURRICULUM_DIR, INDEX_PATH, METADATA_PATH, MODEL_NAME, render_step
+
+logger = logging.getLogger(__name__)
+
+INDEX_FLAT = "flat"
+INDEX_IVF = "ivf"
+INDEX_HNSW = "hnsw"
+INDEX_AUTO = "auto"
+INDEX_TYPES = (INDEX_AUTO, INDEX_FLAT, INDEX_IVF, INDEX_HNSW)
+
+# IVF needs enough points to train its centroids (FAISS warns below ~39 per list).
+IVF_MIN_POINTS_PER_LIST = 39
+
+EntryKey = Tuple[str, Optional[int]]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _entry(lesson_id, step_number, text, *, description, estimated_duration=0, assignment=False, source) -> dict:
+    return {
+        "lesson_id": lesson_id,
+        "step_number": step_number,
+        "description": description,
+        "estimated_duration": estimated_duration,
+        "assignment": assignment,
+        "source": source,
+        "text": text,
+        "hash": text_hash(text),
+    }
+
+
+def collect_from_files(curriculum_dir: str = CURRICULUM_DIR) -> List[dict]:
+    entries = []
+    for filename in sorted(os.listdir(curriculum_dir)):
+        if not filename.endswith(".json"):
+            continue
+        with open(os.path.join(curriculum_dir, filename), "r", encoding="utf-8") as f:
+            lesson = json.load(f)
+        for step in lesson["steps"]:
+            entries.append(_entry(
+                lesson["lesson_id"],
+                step["step_number"],
+                render_step(step),
+                description=step["description"],
+                estimated_duration=step.get("estimated_duration", 30),
+                assignment=step.get("assignment", False),
+                source="file",
+            ))
+        entries.append(_entry(
+            lesson["lesson_id"], None, lesson["general_notes"], description="General Notes", source="file"
+        ))
+    return entries
+
+
+def collect_from_database() -> List[dict]:
+    from llm_tutor.models import Lesson
+
+    entries = []
+    for lesson in Lesson.objects.prefetch_related("steps").order_by("lesson_id"):
+        for step in sorted(lesson.steps.all(), key=lambda step: step.step_number):
+            entries.append(_entry(
+                lesson.lesson_id,
+                step.step_number,
+                render_step({"description": step.description, "expected_code": step.expected_code}),
+                description=step.description,
+                estimated_duration=step.estimated_duration,
+                source="database",
+            ))
+        if lesson.description:
+            entries.append(_entry(
+                lesson.lesson_id, None, lesson.description, description="General Notes", source="database"
+            ))
+    return entries
+
+
+def merge_entries(*sources: Iterable[dict]) -> List[dict]:
+    """Combine sources in order (later ones override earlier ones for the same
+    lesson and step, keeping the `assignment` flag the files define) and sort
+    each lesson's steps before its general notes."""
+
+    merged: Dict[EntryKey, dict] = {}
+    for source in sources:
+        for entry in source:
+            key = (entry["lesson_id"], entry["step_number"])
+            previous = merged.get(key)
+            if previous is not None and previous["assignment"] and not entry["assignment"]:
+                entry = {**entry, "assignment": True}
+            merged[key] = entry
+    return sorted(
+        merged.values(),
+        key=lambda entry: (entry["lesson_id"], entry["step_number"] is None, entry["step_number"] or 0),
+    )
+
+
+def read_manifest(path: str = METADATA_PATH) -> Optional[dict]:
+    """Load the manifest, wrapping the metadata-only list older builds wrote."""
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    if isinstance(data, list):
+        return {"version": None, "model": MODEL_NAME, "index_file": os.path.basename(INDEX_PATH), "entries": data}
+    return data
+
+
+def build_version(entries: Sequence[dict], model_name: str, index_type: str, params: Dict[str, Any]) -> str:
+    material = json.dumps([model_name, index_type, params, [entry["hash"] for entry in entries]], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+def plan_embeddings(entries: Sequence[dict], previous: Optional[dict], model_name: str) -> Dict[int, int]:
+    """Map each entry position to the row of a reusable vector in the previous build."""
+
+    if not previous or previous.get("model") != model_name or not previous.get("embeddings_file"):
+        return {}
+    previous_rows = {}
+    for row, entry in enumerate(previous["entries"]):
+        if "hash" in entry:
+            previous_rows.setdefault(entry["hash"], row)
+    return {
+        position: previous_rows[entry["hash"]]
+        for position, entry in enumerate(entries)
+        if entry["hash"] in previous_rows
+    }
+
+
+def choose_index_type(requested: str, count: int, *, ann_threshold: int, nlist: int) -> str:
+    if requested == INDEX_AUTO:
+        requested = INDEX_FLAT if count < ann_threshold else INDEX_HNSW
+    if requested == INDEX_IVF and count < nlist * IVF_MIN_POINTS_PER_LIST:
+        logger.warning("%s documents are too few to train %s IVF lists; using a flat index", count, nlist)
+        return INDEX_FLAT
+    return requested
+
+
+def build_faiss_index(vectors, index_type: str, *, nlist: int, nprobe: int, hnsw_m: int, ef_search: int):
+    import faiss
+
+    dimension = vectors.shape[1]
+    if index_type == INDEX_IVF:
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        index.train(vectors)
+        index.nprobe = nprobe
+    elif index_type == INDEX_HNSW:
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efSearch = ef_search
+    else:
+        index = faiss.IndexFlatL2(dimension)
+    index.add(vectors)
+    return index
+
+
+@dataclass
+class IndexBuild:
+    version: str
+    documents: int
+    embedded: int
+    reused: int
+    index_type: str
+    written: bool
+
+
+def _replace_atomically(path: str, write: Callable[[str], None]) -> None:
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _remove_stale_files(directory: str, keep: Iterable[str], prefixes: Sequence[str]) -> None:
+    keep = set(keep)
+    for name in os.listdir(directory):
+        if name in keep or not name.startswith(prefixes):
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            logger.warning("Could not remove stale index file %s", name, exc_info=True)
+
+
+def index_curriculum(
+    entries: Sequence[dict],
+    *,
+    encode: Callable[[List[str]], Any],
+    model_name: str = MODEL_NAME,
+    index_type: str = INDEX_AUTO,
+    batch_size: int = 64,
+    ann_threshold: int = 20000,
+    nlist: int = 100,
+    nprobe: int = 10,
+    hnsw_m: int = 32,
+    ef_search: int = 64,
+    force: bool = False,
+    manifest_path: str = METADATA_PATH,
+) -> IndexBuild:
+    """Embed new or changed entries with `encode(texts)` and write a new build.
+
+    Nothing is written when the build version (model, index settings and every
+    document hash) matches the current manifest, unless `force` is set.
+    """
+
+    import faiss
+    import numpy as np
+
+    if not entries:
+        raise ValueError("No curriculum documents to index")
+    directory = os.path.dirname(manifest_path)
+    previous = read_manifest(manifest_path)
+    index_type = choose_index_type(index_type, len(entries), ann_threshold=ann_threshold, nlist=nlist)
+    params = {"nlist": nlist, "nprobe": nprobe} if index_type == INDEX_IVF else {}
+    if index_type == INDEX_HNSW:
+        params = {"m": hnsw_m, "ef_search": ef_search}
+    version = build_version(entries, model_name, index_type, params)
+
+    reuse = {} if force else plan_embeddings(entries, previous, model_name)
+    if previous and previous.get("version") == version and not force and len(reuse) == len(entries):
+        return IndexBuild(version, len(entries), 0, len(entries), index_type, written=False)
+
+    previous_vectors = None
+    if reuse:
+        previous_vectors = np.load(os.path.join(directory, previous["embeddings_file"]), mmap_mode="r")
+    pending = [position for position in range(len(entries)) if position not in reuse]
+    fresh: Dict[int, Any] = {}
+    for start in range(0, len(pending), max(1, batch_size)):
+        batch = pending[start:start + batch_size]
+        encoded = np.asarray(encode([entries[position]["text"] for position in batch]), dtype="float32")
+        fresh.update(zip(batch, encoded))
+        logger.info("Embedded %s/%s changed documents", min(start + batch_size, len(pending)), len(pending))
+
+    vectors = np.stack([
+        np.asarray(previous_vectors[reuse[position]]) if position in reuse else fresh[position]
+        for position in range(len(entries))
+    ]).astype("float32")
+    index = build_faiss_index(vectors, index_type, nlist=nlist, nprobe=nprobe, hnsw_m=hnsw_m, ef_search=ef_search)
+
+    index_file = f"curriculum_index-{version}.faiss"
+    embeddings_file = f"curriculum_embeddings-{version}.npy"
+    _replace_atomically(os.path.join(directory, index_file), lambda path: faiss.write_index(index, path))
+
+    def write_vectors(path: str) -> None:
+        with open(path, "wb") as f:
+            np.save(f, vectors)
+
+    _replace_atomically(os.path.join(directory, embeddings_file), write_vectors)
+
+    manifest = {
+        "version": version,
+        "model": model_name,
+        "index_type": index_type,
+        "index_params": params,
+        "index_file": index_file,
+        "embeddings_file": embeddings_file,
+        "built_at": timezone.now().isoformat(),
+        "entries": list(entries),
+    }
+
+    def write_manifest(path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    _replace_atomically(manifest_path, write_manifest)
+
+    keep = {index_file, embeddings_file}
+    if previous:
+        keep.update(name for name in (previous.get("index_file"), previous.get("embeddings_file")) if name)
+    _remove_stale_files(directory, keep, ("curriculum_index-", "curriculum_embeddings-"))
+    return IndexBuild(version, len(entries), len(pending), len(reuse), index_type, written=True)
@@ -0,0 +1,118 @@
+"""LLM calls and Server-Sent Events helpers for the tutor endpoints.
+
+Both go through the shared, pooled client in `llm_tutor.tutor.client`.
+`generate` returns the whole completion once it is ready; `stream_generate`
+yields text fragments as Ollama produces them; `sse_response` relays such a
+stream to the browser as Server-Sent Events so the student sees the answer
+being written instead of a spinner.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from django.http import StreamingHttpResponse
+
+from llm_tutor.tutor.client import LLMBusy, LLMError, get_llm_client
+
+logger = logging.getLogger(__name__)
+
+NO_RESPONSE_MESSAGE = "No response from LLM."
+CONNECTION_ERROR_MESSAGE = "Error connecting to local LLM."
+BUSY_MESSAGE = "The tutor is busy right now, please try again in a moment."
+
+
+def generate(prompt: str, *, model: Optional[str] = None) -> str:
+    """Return the whole completion for `prompt` (or a readable error message).
+
+    `LLMBusy` propagates so views can answer 503 instead of an apology text.
+    """
+
+    try:
+        return get_llm_client().generate(prompt, model=model) or NO_RESPONSE_MESSAGE
+    except LLMBusy:
+        raise
+    except LLMError as exc:
+        logger.warning("LLM generation failed: %s", exc)
+        return CONNECTION_ERROR_MESSAGE
+
+
+def stream_generate(prompt: str, *, model: Optional[str] = None) -> Iterator[str]:
+    """Yield completion fragments for `prompt` as Ollama produces them.
+
+    Raises `LLMError` if the server cannot be reached or the stream breaks;
+    `relay_events` turns that into an `error` event.
+    """
+
+    return get_llm_client().stream(prompt, model=model)
+
+
+def wants_stream(request) -> bool:
+    """True when the client asked for a streamed answer (`stream` in the body or query)."""
+
+    value = request.query_params.get("stream")
+    if value is None and hasattr(request.data, "get"):
+        value = request.data.get("stream")
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes"}
+    return bool(value)
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def relay_events(
+    tokens: Iterable[str],
+    *,
+    meta: Optional[Dict[str, Any]] = None,
+    on_complete: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None,
+) -> Iterator[str]:
+    """Format a token stream as SSE: `meta`, one `token` per fragment, then `done`.
+
+    `done` carries `time_to_first_token` and `interaction_duration` in seconds
+    plus whatever `on_complete(full_text)` returns. `on_complete` also runs when
+    the client disconnects mid-stream so the interaction is still recorded.
+    """
+
+    start = time.perf_counter()
+    first_token_at: Optional[float] = None
+    parts: list[str] = []
+    completed = False
+    try:
+        yield sse_event("meta", meta or {})
+        try:
+            for token in tokens:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+        except LLMError as exc:
+            logger.warning("LLM stream failed: %s", exc)
+            message = BUSY_MESSAGE if isinstance(exc, LLMBusy) else CONNECTION_ERROR_MESSAGE
+            yield sse_event("error", {"message": message})
+
+        text = "".join(parts)
+        summary = dict(on_complete(text) or {}) if on_complete else {}
+        completed = True
+        end = time.perf_counter()
+        summary.update(
+            {
+                "time_to_first_token": round(first_token_at - start, 3) if first_token_at is not None else None,
+                "interaction_duration": round(end - start, 3),
+            }
+        )
+        yield sse_event("done", summary)
+    finally:
+        if on_complete and not completed:
+            on_complete("".join(parts))
+
+
+def sse_response(events: Iterator[str]) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream until it completes.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,46 +1,187 @@
 import json
+import logging
+from django.conf import settings
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
-from cacheout import Cache
-
-cache = Cache()
 
+import hashlib
 import os
+import threading
+import time
+
+from llm_tutor.tutor.batching import MicroBatcher
+from llm_tutor.tutor.cache import embedding_key, get_rag_caches, normalise_query, retrieval_key
+from llm_tutor.tutor.documents import (
+    BASE_DIR,
+    CURRICULUM_DIR,
+    INDEX_PATH,
+    METADATA_PATH,
+    MODEL_NAME,
+    IndexSnapshot,
+    load_documents,
+)
+from llm_tutor.tutor.indexing import read_manifest
+
+logger = logging.getLogger(__name__)
+
+
+def read_index(path=INDEX_PATH):
+    """Read the FAISS index memory-mapped when the index type allows it, so
+    processes forked after loading share its pages instead of copying them."""
+    if getattr(settings, 'LLM_TUTOR_RAG_MMAP', True):
+        flags = faiss.IO_FLAG_MMAP | getattr(faiss, 'IO_FLAG_MMAP_IFC', 0)
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError as exc:
+            logger.info("FAISS index %s cannot be memory-mapped (%s); reading it into memory", path, exc)
+    return faiss.read_index(path)
+
+
+def index_version(metadata_path=METADATA_PATH):
+    """Fingerprint of the manifest file; it changes whenever a build is swapped in."""
+    stat = os.stat(metadata_path)
+    return hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+
+
+def load_snapshot():
+    fingerprint = index_version()
+    manifest = read_manifest(METADATA_PATH)
+    metadata = manifest['entries']
+    index = read_index(os.path.join(os.path.dirname(METADATA_PATH), manifest['index_file']))
+    if index.ntotal != len(metadata):
+        raise ValueError(f"FAISS index has {index.ntotal} rows but metadata has {len(metadata)} entries")
+    documents = load_documents(metadata, CURRICULUM_DIR)
+    return IndexSnapshot(
+        index=index,
+        metadata=metadata,
+        documents=documents,
+        version=manifest.get('version') or fingerprint,
+        fingerprint=fingerprint,
+    )
 
-BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-CURRICULUM_DIR = os.path.join(BASE_DIR, "data", "curriculum")
-INDEX_PATH = os.path.join(BASE_DIR, "data", "vectors", "curriculum_index.faiss")
-METADATA_PATH = os.path.join(BASE_DIR, "data", "vectors", "curriculum_metadata.json")
 
 class RAGRetriever:
     def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.index = faiss.read_index(INDEX_PATH)
-        with open(METADATA_PATH, 'r', encoding='utf-8') as f:
-            self.metadata = json.load(f)
+        self.snapshot = load_snapshot()
+        self.model = SentenceTransformer(MODEL_NAME)
+        self.embedding_cache, self.retrieval_cache = get_rag_caches(
+            encode_embedding=lambda embedding: embedding.tolist(),
+            decode_embedding=lambda value: np.asarray(value, dtype='float32'),
+        )
+        self._reload_lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        wait_ms = getattr(settings, 'LLM_TUTOR_RAG_BATCH_WAIT_MS', 0)
+        self.batcher = None
+        if wait_ms > 0:
+            self.batcher = MicroBatcher(
+                self._retrieve_batch,
+                max_batch=getattr(settings, 'LLM_TUTOR_RAG_MAX_BATCH', 32),
+                max_wait=wait_ms / 1000,
+                name="rag-retrieval",
+            )
+
+    @property
+    def metadata(self):
+        return self.snapshot.metadata
+
+    @property
+    def index_version(self):
+        return self.snapshot.version
+
+    def step_metadata(self, lesson_id, step_number):
+        return self.snapshot.step_metadata(lesson_id, step_number)
+
+    def maybe_reload(self):
+        """Swap in a new snapshot if the index files changed since it was loaded.
+
+        Checked at most every LLM_TUTOR_RAG_RELOAD_INTERVAL seconds by one
+        request at a time; the others keep using the current snapshot while
+        the new one loads, and a half-written index is ignored until the next
+        check."""
+        interval = getattr(settings, 'LLM_TUTOR_RAG_RELOAD_INTERVAL', 30)
+        if not interval or time.monotonic() - self._checked_at < interval:
+            return False
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            self._checked_at = time.monotonic()
+            if index_version() == self.snapshot.fingerprint:
+                return False
+            self.snapshot = load_snapshot()
+            logger.info("Reloaded curriculum index version %s", self.snapshot.version)
+            return True
+        except (OSError, ValueError, RuntimeError) as exc:
+            logger.warning("Curriculum index reload skipped: %s", exc)
+            return False
+        finally:
+            self._reload_lock.release()
+
+    def embed_many(self, queries):
+        """Embeddings for `queries`, encoding the uncached ones in one model call."""
+        vectors = [None] * len(queries)
+        missing = {}
+        for position, query in enumerate(queries):
+            key = embedding_key(query, MODEL_NAME)
+            cached = self.embedding_cache.get(key) if self.embedding_cache is not None else None
+            if cached is not None:
+                vectors[position] = cached
+            else:
+                missing.setdefault(normalise_query(query), (key, []))[1].append(position)
+
+        if missing:
+            encoded = self.model.encode(list(missing))
+            for (key, positions), embedding in zip(missing.values(), encoded):
+                if self.embedding_cache is not None:
+                    self.embedding_cache.set(key, embedding)
+                for position in positions:
+                    vectors[position] = embedding
+        return np.asarray(vectors, dtype='float32')
+
+    def embed(self, query):
+        return self.embed_many([query])[0]
+
+    def retrieve_many(self, queries, k=2):
+        """Documents for each query, with one encode and one search for the misses."""
+        self.maybe_reload()
+        snapshot = self.snapshot
+        results = [None] * len(queries)
+        misses = []
+        for position, query in enumerate(queries):
+            cached = None
+            if self.retrieval_cache is not None:
+                cached = self.retrieval_cache.get(retrieval_key(query, k, snapshot.version))
+            if cached is not None:
+                results[position] = list(cached)
+            else:
+                misses.append(position)
+
+        if misses:
+            vectors = self.embed_many([queries[position] for position in misses])
+            distances, indices = snapshot.index.search(vectors, k)
+            for position, row_ids in zip(misses, indices):
+                documents = snapshot.documents_for(row_ids)
+                if self.retrieval_cache is not None:
+                    self.retrieval_cache.set(retrieval_key(queries[position], k, snapshot.version), documents)
+                results[position] = list(documents)
+        return results
+
+    def _retrieve_batch(self, requests):
+        # The batcher hands over (query, k) pairs; search each k as one matrix.
+        results = [None] * len(requests)
+        by_k = {}
+        for position, (query, k) in enumerate(requests):
+            by_k.setdefault(k, []).append(position)
+        for k, positions in by_k.items():
+            for position, documents in zip(positions, self.retrieve_many([requests[p][0] for p in positions], k)):
+                results[position] = documents
+        return results
 
     def retrieve(self, query, k=2):
-        cache_key = f"rag_{query[:50]}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-
-        query_embedding = self.model.encode([query])[0]
-        distances, indices = self.index.search(np.array([query_embedding]), k)
-
-        results = [self.metadata[i] for i in indices[0]]
-        documents = []
-
-        for meta in results:
-            lesson_path = os.path.join(CURRICULUM_DIR, f"{meta['lesson_id']}.json")
-            with open(lesson_path, 'r', encoding='utf-8') as f:
-                lesson = json.load(f)
-                if meta['step_number'] is None:
-                    documents.append(lesson['general_notes'])
-                else:
-                    step = next(s for s in lesson['steps'] if s['step_number'] == meta['step_number'])
-                    documents.append(f"{step['description']} {step.get('expected_code', '')} {step.get('notes', '')}")
-
-        cache.set(cache_key, documents, ttl=3600)
-        return documents
+        if self.batcher is None:
+            return self.retrieve_many([query], k)[0]
+        if self.retrieval_cache is not None:
+            cached = self.retrieval_cache.get(retrieval_key(query, k, self.snapshot.version))
+            if cached is not None:
+                return list(cached)
+        return self.batcher.submit((query, k))
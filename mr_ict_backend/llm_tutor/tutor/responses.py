@@ -0,0 +1,251 @@
+"""Cache of tutor explanations and answers, so repeated mistakes and questions
+on a step do not each cost a full CPU generation.
+
+Explanations (`CodeUpdateView`) are keyed on the lesson, the step, its
+expected code and a structural signature of the submission: the HTML token
+stream from `codediff`, so submissions that only differ in formatting share an
+entry. Answers (`AskQuestionView`) are keyed on the normalised question and the
+same signature of the student's code, which is part of the prompt; on a miss
+the question's embedding is compared with earlier questions on the same step
+about the same code and an answer is reused when the cosine similarity reaches
+`LLM_TUTOR_RESPONSE_SIMILARITY`.
+
+Every key includes the curriculum index version, so rebuilding the index
+retires cached responses, and entries older than `LLM_TUTOR_RESPONSE_CACHE_TTL`
+are ignored. Exact entries use the same local/Redis tiers as the RAG caches;
+the similarity search runs over a bounded per-process list of recent questions
+for each step. Hits and misses are counted per lesson.
+"""
+from __future__ import annotations
+
+import math
+import operator
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from llm_tutor.tutor.cache import TieredCache, _digest, normalise_query
+from llm_tutor.tutor.codediff import code_digest, html_tokens
+from llm_tutor.tutor.llm import CONNECTION_ERROR_MESSAGE, NO_RESPONSE_MESSAGE
+from core.lru import LocalLRU, RedisLRU
+
+HIT_EXACT = "exact"
+HIT_SEMANTIC = "semantic"
+
+_UNCACHEABLE = {"", NO_RESPONSE_MESSAGE, CONNECTION_ERROR_MESSAGE}
+
+Vector = Tuple[float, ...]
+
+
+def code_signature(code: str) -> str:
+    tokens = html_tokens(code or "")
+    if tokens is None:
+        return code_digest(code or "")
+    return _digest("html", repr(tokens))
+
+
+def explanation_key(lesson_id, step_number, expected_code: str, code: str, index_version: str) -> str:
+    return _digest(
+        "explanation", index_version, str(lesson_id), str(step_number),
+        code_digest(expected_code or ""), code_signature(code),
+    )
+
+
+def answer_key(lesson_id, step_number, question: str, code: str, index_version: str) -> str:
+    return _digest(
+        "answer", index_version, str(lesson_id), str(step_number),
+        code_signature(code), normalise_query(question or "").lower(),
+    )
+
+
+def _unit(vector: Iterable[float]) -> Vector:
+    values = [float(value) for value in vector]
+    norm = math.sqrt(sum(value * value for value in values)) or 1.0
+    return tuple(value / norm for value in values)
+
+
+def _similarity(left: Vector, right: Vector) -> float:
+    return sum(map(operator.mul, left, right))
+
+
+def record_completion(tokens: Iterable[str], store: Callable[[str], None]) -> Iterator[str]:
+    """Pass `tokens` through and `store` the full text once the stream ends.
+
+    Nothing is stored when the stream fails or the client disconnects, so a
+    truncated answer never becomes a cache entry.
+    """
+
+    parts = []
+    for token in tokens:
+        parts.append(token)
+        yield token
+    store("".join(parts))
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        exact: Optional[TieredCache],
+        *,
+        ttl: float,
+        similarity: float,
+        neighbours: int,
+        max_steps: int,
+    ) -> None:
+        self.exact = exact
+        self.ttl = ttl
+        self.similarity = similarity
+        self.neighbours = max(1, neighbours)
+        self.max_steps = max(1, max_steps)
+        self._lock = threading.Lock()
+        self._questions: "OrderedDict[Tuple[str, ...], Deque[Tuple[Vector, str, float]]]" = OrderedDict()
+        self._lessons: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, lesson_id, outcome: str) -> None:
+        with self._lock:
+            counters = self._lessons.setdefault(str(lesson_id), {"hits": 0, "semantic_hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def _fresh(self, entry) -> Optional[str]:
+        if not entry or time.time() - entry.get("stored_at", 0) > self.ttl:
+            return None
+        return entry.get("text")
+
+    def _get_exact(self, key: str) -> Optional[str]:
+        return self._fresh(self.exact.get(key)) if self.exact is not None else None
+
+    def _set_exact(self, key: str, text: str) -> None:
+        if self.exact is not None:
+            self.exact.set(key, {"text": text, "stored_at": time.time()})
+
+    def get_explanation(self, lesson_id, step_number, expected_code: str, code: str, index_version: str) -> Optional[str]:
+        text = self._get_exact(explanation_key(lesson_id, step_number, expected_code, code, index_version))
+        self._count(lesson_id, "hits" if text is not None else "misses")
+        return text
+
+    def put_explanation(self, lesson_id, step_number, expected_code: str, code: str, index_version: str, text: str) -> None:
+        if text not in _UNCACHEABLE:
+            self._set_exact(explanation_key(lesson_id, step_number, expected_code, code, index_version), text)
+
+    def get_answer(
+        self,
+        lesson_id,
+        step_number,
+        question: str,
+        code: str,
+        index_version: str,
+        embed: Callable[[str], Sequence[float]],
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Return `(answer, HIT_EXACT | HIT_SEMANTIC)`, or `(None, None)` on a miss."""
+
+        text = self._get_exact(answer_key(lesson_id, step_number, question, code, index_version))
+        if text is not None:
+            self._count(lesson_id, "hits")
+            return text, HIT_EXACT
+
+        bucket = (str(lesson_id), str(step_number), code_signature(code), index_version)
+        with self._lock:
+            candidates = list(self._questions.get(bucket, ()))
+        if candidates:
+            vector = _unit(embed(question))
+            now = time.time()
+            best, best_score = None, self.similarity
+            for other, answer, stored_at in candidates:
+                if now - stored_at > self.ttl:
+                    continue
+                score = _similarity(vector, other)
+                if score >= best_score:
+                    best, best_score = answer, score
+            if best is not None:
+                self._count(lesson_id, "semantic_hits")
+                return best, HIT_SEMANTIC
+
+        self._count(lesson_id, "misses")
+        return None, None
+
+    def put_answer(
+        self,
+        lesson_id,
+        step_number,
+        question: str,
+        code: str,
+        index_version: str,
+        text: str,
+        embed: Callable[[str], Sequence[float]],
+    ) -> None:
+        if text in _UNCACHEABLE:
+            return
+        self._set_exact(answer_key(lesson_id, step_number, question, code, index_version), text)
+        vector = _unit(embed(question))
+        bucket = (str(lesson_id), str(step_number), code_signature(code), index_version)
+        with self._lock:
+            questions = self._questions.get(bucket)
+            if questions is None:
+                questions = self._questions[bucket] = deque(maxlen=self.neighbours)
+            self._questions.move_to_end(bucket)
+            questions.append((vector, text, time.time()))
+            while len(self._questions) > self.max_steps:
+                self._questions.popitem(last=False)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lessons = {}
+            for lesson_id, counters in self._lessons.items():
+                lookups = counters["hits"] + counters["semantic_hits"] + counters["misses"]
+                hits = counters["hits"] + counters["semantic_hits"]
+                lessons[lesson_id] = dict(counters, hit_rate=round(hits / lookups, 4) if lookups else 0.0)
+            steps = len(self._questions)
+        return {
+            "exact": self.exact.stats() if self.exact is not None else None,
+            "question_steps": steps,
+            "lessons": lessons,
+        }
+
+    def clear(self) -> None:
+        if self.exact is not None:
+            self.exact.clear()
+        with self._lock:
+            self._questions.clear()
+            self._lessons.clear()
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when
+    `LLM_TUTOR_RESPONSE_CACHE_MAX_ENTRIES` is 0."""
+
+    global _response_cache
+    max_entries = int(getattr(settings, "LLM_TUTOR_RESPONSE_CACHE_MAX_ENTRIES", 0) or 0)
+    if max_entries <= 0:
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                ttl = int(getattr(settings, "LLM_TUTOR_RESPONSE_CACHE_TTL", 7 * 24 * 60 * 60))
+                neighbours = int(getattr(settings, "LLM_TUTOR_RESPONSE_CACHE_NEIGHBOURS", 32))
+                url = getattr(settings, "LLM_TUTOR_RAG_CACHE_URL", "")
+                shared = RedisLRU(url, max_entries=max_entries, ttl=ttl, prefix="tutor-responses") if url else None
+                _response_cache = ResponseCache(
+                    TieredCache(LocalLRU(max_entries), shared),
+                    ttl=ttl,
+                    similarity=float(getattr(settings, "LLM_TUTOR_RESPONSE_SIMILARITY", 0.92)),
+                    neighbours=neighbours,
+                    max_steps=max(1, max_entries // max(1, neighbours)),
+                )
+    return _response_cache
+
+
+def response_cache_stats() -> Optional[Dict[str, object]]:
+    return _response_cache.stats() if _response_cache is not None else None
+
+
+def reset_response_cache() -> None:
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = None
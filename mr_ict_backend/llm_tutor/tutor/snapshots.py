@@ -0,0 +1,83 @@
+"""Line deltas for `CodeSnapshot` storage.
+
+A delta is a JSON list whose items are either `[start, end]` (copy lines
+`start:end` of the base text) or a string (literal text to insert). Most tutor
+snapshots are a few keystrokes away from the step's expected code or from the
+student's previous snapshot, so a delta is usually a handful of items where the
+full text would be the whole file.
+
+`choose_encoding` picks whichever of the full text, a delta against the
+expected code or a delta against the previous snapshot serialises smallest.
+Chains of previous-snapshot deltas are closed with a keyframe every
+`LLM_TUTOR_SNAPSHOT_KEYFRAME_INTERVAL` snapshots, so reconstructing any
+snapshot replays a bounded number of deltas.
+"""
+from __future__ import annotations
+
+import json
+from difflib import SequenceMatcher
+from typing import List, Optional, Sequence, Tuple, Union
+
+ENCODING_FULL = "full"
+ENCODING_EXPECTED = "expected"
+ENCODING_PREVIOUS = "previous"
+
+DeltaItem = Union[str, List[int]]
+Delta = List[DeltaItem]
+
+
+def encode_delta(base: str, target: str) -> Delta:
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    delta: Delta = []
+    matcher = SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j2 > j1:
+            text = "".join(target_lines[j1:j2])
+            if delta and isinstance(delta[-1], str):
+                delta[-1] += text
+            else:
+                delta.append(text)
+    return delta
+
+
+def apply_delta(base: str, delta: Sequence[DeltaItem]) -> str:
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for item in delta:
+        if isinstance(item, str):
+            parts.append(item)
+        else:
+            start, end = item
+            parts.extend(base_lines[start:end])
+    return "".join(parts)
+
+
+def delta_size(delta: Sequence[DeltaItem]) -> int:
+    return len(json.dumps(delta, separators=(",", ":")))
+
+
+def choose_encoding(
+    code: str,
+    expected_code: Optional[str],
+    previous_code: Optional[str],
+) -> Tuple[str, Optional[Delta]]:
+    """Return `(encoding, delta)` for the smallest representation of `code`.
+
+    `previous_code` should be None when the previous snapshot's chain is
+    already at the keyframe interval, which forces a keyframe or an
+    expected-code delta.
+    """
+
+    best: Tuple[str, Optional[Delta]] = (ENCODING_FULL, None)
+    best_size = len(json.dumps(code))
+    for encoding, base in ((ENCODING_EXPECTED, expected_code), (ENCODING_PREVIOUS, previous_code)):
+        if base is None:
+            continue
+        delta = encode_delta(base, code)
+        size = delta_size(delta)
+        if size < best_size:
+            best, best_size = (encoding, delta), size
+    return best
@@ -0,0 +1,118 @@
+"""Stand-in for Ollama's `/api/generate`, for tests and offline development.
+
+    with StubOllamaServer(reply=lambda prompt: "Use <article>.") as server:
+        client = LLMClient(server.url, model="stub")
+
+The server runs on its own event-loop thread on a free local port, answers
+both the single-JSON and NDJSON streaming modes, and records the prompts it
+received, the peak number of concurrent generations and the number of TCP
+connections opened (to check keep-alive reuse).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from typing import Callable, List, Optional
+
+from aiohttp import web
+
+
+class StubOllamaServer:
+    def __init__(
+        self,
+        *,
+        reply: Callable[[str], str] = lambda prompt: f"echo: {prompt}",
+        delay: float = 0.0,
+        chunk_size: int = 4,
+        status: int = 200,
+    ) -> None:
+        self.reply = reply
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.status = status
+        self.prompts: List[str] = []
+        self.active = 0
+        self.max_active = 0
+        self._peers: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def connections(self) -> int:
+        return len(self._peers)
+
+    async def _generate(self, request: web.Request) -> web.StreamResponse:
+        self._peers.add(request.transport.get_extra_info("peername"))
+        body = await request.json()
+        prompt = body.get("prompt", "")
+        self.prompts.append(prompt)
+        if self.status != 200:
+            return web.json_response({"error": "stub failure"}, status=self.status)
+
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            text = self.reply(prompt)
+            if not body.get("stream", True):
+                await asyncio.sleep(self.delay)
+                return web.json_response({"model": body.get("model"), "response": text, "done": True})
+
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+            await response.prepare(request)
+            pieces = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+            for piece in pieces:
+                await asyncio.sleep(self.delay / max(len(pieces), 1))
+                await response.write(json.dumps({"response": piece, "done": False}).encode() + b"\n")
+            await response.write(json.dumps({"response": "", "done": True}).encode() + b"\n")
+            await response.write_eof()
+            return response
+        finally:
+            self.active -= 1
+
+    def start(self) -> "StubOllamaServer":
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        async def serve() -> None:
+            app = web.Application()
+            app.router.add_post("/api/generate", self._generate)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            await site.start()
+            self.port = site._server.sockets[0].getsockname()[1]
+
+        def run() -> None:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(serve())
+            ready.set()
+            loop.run_forever()
+
+        self._loop = loop
+        self._thread = threading.Thread(target=run, name="stub-ollama", daemon=True)
+        self._thread.start()
+        ready.wait(timeout=5)
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        if self._runner is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,100 @@
+"""Process-wide `RAGRetriever`, loaded once and shared by every request.
+
+Loading the embedding model, the FAISS index and the metadata takes seconds,
+so it should not happen inside the first tutor request of every worker. With
+`LLM_TUTOR_RAG_PRELOAD = "eager"` the retriever is loaded in
+`LlmTutorConfig.ready()`; under a pre-forking server (`gunicorn --preload`)
+that happens once in the master, and the forked workers share the model
+weights and the memory-mapped index pages copy-on-write. `"background"` loads
+in a thread instead, for single-process servers that should start listening
+straight away; the readiness probe reports 503 until the load has finished.
+
+This module avoids importing the heavy dependencies itself so `core.health`
+can report the state even where they are not installed.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_IDLE = "idle"
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+_lock = threading.Lock()
+_retriever = None
+_state = STATE_IDLE
+_error: Optional[str] = None
+_load_seconds: Optional[float] = None
+
+
+def _reset_lock_after_fork() -> None:
+    # A background warm-up may hold the lock in the parent at fork time.
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+def get_retriever():
+    """Return the shared retriever, loading it on first use."""
+
+    global _retriever, _state, _error, _load_seconds
+    if _retriever is not None:
+        return _retriever
+    with _lock:
+        if _retriever is None:
+            from llm_tutor.tutor.rag import RAGRetriever
+
+            _state, _error = STATE_LOADING, None
+            started = time.perf_counter()
+            try:
+                _retriever = RAGRetriever()
+            except Exception as exc:
+                _state, _error = STATE_FAILED, f"{exc.__class__.__name__}: {exc}"
+                raise
+            _load_seconds = round(time.perf_counter() - started, 3)
+            _state = STATE_READY
+            logger.info("RAG retriever loaded in %ss (pid %s)", _load_seconds, os.getpid())
+    return _retriever
+
+
+def _warm_up() -> None:
+    try:
+        get_retriever()
+    except Exception:
+        logger.exception("RAG retriever warm-up failed")
+
+
+def warm_up(*, background: bool = False) -> None:
+    """Load the retriever now, or in a daemon thread when `background` is set."""
+
+    global _state
+    if background:
+        _state = STATE_LOADING
+        threading.Thread(target=_warm_up, name="rag-warm-up", daemon=True).start()
+    else:
+        _warm_up()
+
+
+def rag_status() -> Dict[str, object]:
+    batcher = getattr(_retriever, "batcher", None)
+    return {
+        "state": _state,
+        "error": _error,
+        "load_seconds": _load_seconds,
+        "batching": batcher.stats() if batcher is not None else None,
+    }
+
+
+def reset_retriever() -> None:
+    global _retriever, _state, _error, _load_seconds
+    with _lock:
+        _retriever, _state, _error, _load_seconds = None, STATE_IDLE, None, None
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import BranchesView, CodeUpdateView, AskQuestionView, LessonMetadataView, llm_playround
+from .views import BranchDetailView, BranchesView, CodeUpdateView, AskQuestionView, LessonMetadataView, llm_playround
 
 app_name = "llm_tutor"
 
@@ -8,5 +8,6 @@ urlpatterns = [
     path('api/llm/ask', AskQuestionView.as_view(), name='ask-question'),
     path('api/lesson/<str:lesson_id>', LessonMetadataView.as_view(), name='lesson-metadata'),
     path('api/branches/<str:lesson_id>/', BranchesView.as_view(), name='branches'),
+    path('api/branches/<str:lesson_id>/<str:branch_id>/', BranchDetailView.as_view(), name='branch-detail'),
     path('llm-playground/', llm_playround, name='llm_playround'),
 ]
\ No newline at end of file
@@ -2,26 +2,38 @@ from django.http import JsonResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-import difflib
-import requests
 import uuid
 from datetime import datetime
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 
-from llm_tutor.tutor.rag import RAGRetriever
+from llm_tutor.tutor.client import LLMBusy
+from llm_tutor.tutor.codediff import codes_differ, missing_elements
+from llm_tutor.tutor.llm import BUSY_MESSAGE, generate, relay_events, sse_response, stream_generate, wants_stream
+from llm_tutor.tutor.responses import HIT_EXACT, get_response_cache, record_completion
+from llm_tutor.tutor.warmup import get_retriever
 from .models import Lesson, LessonStep, CodeSnapshot
 
-rag_retriever = None
-
 
 def get_rag():
-    global rag_retriever
-    if rag_retriever is None:
-        rag_retriever = RAGRetriever()
-    return rag_retriever
+    return get_retriever()
 
 User = get_user_model()
 
+BRANCHES_PAGE_SIZE = 20
+BRANCHES_MAX_PAGE_SIZE = 100
+
+
+def _busy_response():
+    return Response({'detail': BUSY_MESSAGE}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '5'})
+
+
+def _finish_snapshot(snapshot):
+    snapshot.interaction_end = datetime.now()
+    snapshot.save(update_fields=['interaction_end'])
+
+
 class CodeUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -36,11 +48,10 @@ class CodeUpdateView(APIView):
         expected_code = step.expected_code
 
         # Detect differences
-        diff = difflib.Differ().compare(expected_code.splitlines(), user_code.splitlines())
-        is_different = any(line.startswith(('+', '-')) for line in diff)
+        is_different = codes_differ(expected_code, user_code)
 
         # Save code snapshot
-        snapshot = CodeSnapshot.objects.create(
+        snapshot = CodeSnapshot.objects.record(
             user=user,
             lesson=lesson,
             step=step,
@@ -49,28 +60,54 @@ class CodeUpdateView(APIView):
             interaction_start=datetime.now()
         )
 
-        # Retrieve curriculum content
-        query = f"{lesson.title} step {step_number} {user_code}"
-        curriculum_docs = get_rag().retrieve(query, k=2)
-        context = "\n".join(curriculum_docs)
-
         # Check if step is an assignment
-        rag_meta = get_rag().metadata
-        is_assignment = any(meta['assignment'] for meta in rag_meta if meta['lesson_id'] == lesson_id and meta['step_number'] == step_number)
+        step_meta = get_rag().step_metadata(lesson_id, step_number)
+        is_assignment = bool(step_meta and step_meta.get('assignment'))
         feedback = ""
         if is_assignment and is_different:
             feedback = "Your code differs from the expected solution. Ensure your <article> has a heading and paragraph as shown in the curriculum."
+            missing = missing_elements(expected_code, user_code)
+            if missing:
+                feedback += " Missing elements: " + ", ".join(f"<{tag}>" for tag in missing) + "."
         elif is_assignment:
             feedback = "Great job! Your code matches the expected <article> structure."
 
-        # Call local LLM
-        start_time = datetime.now()
-        try:
-            llm_response = requests.post(
-                'http://localhost:11434/api/generate',
-                json={
-                    'model': 'llama3.2:3b',
-                    'prompt': f"""
+        # Students often make the same mistake on a step; reuse the explanation
+        responses = get_response_cache()
+        index_version = get_rag().index_version
+        explanation = None
+        if responses is not None:
+            explanation = responses.get_explanation(lesson_id, step_number, expected_code, user_code, index_version)
+
+        def remember(text):
+            if responses is not None:
+                responses.put_explanation(lesson_id, step_number, expected_code, user_code, index_version, text)
+
+        meta = {
+            'branch_id': snapshot.branch_id,
+            'assignment_feedback': feedback if is_assignment else None,
+            'cached': HIT_EXACT if explanation is not None else None,
+        }
+        if explanation is not None:
+            if wants_stream(request):
+                return sse_response(relay_events(
+                    [explanation], meta=meta, on_complete=lambda text: _finish_snapshot(snapshot),
+                ))
+            _finish_snapshot(snapshot)
+            return Response({
+                'explanation': explanation,
+                'branch_id': snapshot.branch_id,
+                'interaction_duration': 0.0,
+                'assignment_feedback': feedback if is_assignment else None,
+                'cached': HIT_EXACT,
+            })
+
+        # Retrieve curriculum content
+        query = f"{lesson.title} step {step_number} {user_code}"
+        curriculum_docs = get_rag().retrieve(query, k=2)
+        context = "\n".join(curriculum_docs)
+
+        prompt = f"""
                     Curriculum Context: {context}
                     Lesson: {lesson.title}
                     Step: {step.description}
@@ -80,14 +117,23 @@ class CodeUpdateView(APIView):
                     {'Explain the difference and guide the user based on the curriculum.' if is_different else 'Explain the current step using the curriculum.'}
                     Be concise and conversational, like a live tutor.
                     {f'Assignment Feedback: {feedback}' if is_assignment else ''}
-                    """,
-                    'stream': False
-                }
-            ).json()
-            explanation = llm_response.get('response', 'No response from LLM.')
-        except requests.RequestException:
-            explanation = 'Error connecting to local LLM.'
+                    """
+
+        if wants_stream(request):
+            return sse_response(relay_events(
+                record_completion(stream_generate(prompt), remember),
+                meta=meta,
+                on_complete=lambda text: _finish_snapshot(snapshot),
+            ))
+
+        # Call local LLM
+        start_time = datetime.now()
+        try:
+            explanation = generate(prompt)
+        except LLMBusy:
+            return _busy_response()
         end_time = datetime.now()
+        remember(explanation)
 
         snapshot.interaction_end = end_time
         snapshot.save()
@@ -96,7 +142,8 @@ class CodeUpdateView(APIView):
             'explanation': explanation,
             'branch_id': snapshot.branch_id,
             'interaction_duration': (end_time - start_time).total_seconds(),
-            'assignment_feedback': feedback if is_assignment else None
+            'assignment_feedback': feedback if is_assignment else None,
+            'cached': None,
         })
 
 class AskQuestionView(APIView):
@@ -111,16 +158,10 @@ class AskQuestionView(APIView):
         lesson = Lesson.objects.get(lesson_id=lesson_id)
         step = LessonStep.objects.get(lesson=lesson, step_number=step_number)
 
-        # Retrieve curriculum content
-        query = f"{lesson.title} step {step_number} {question}"
-        curriculum_docs = get_rag().retrieve(query, k=2)
-        context = "\n".join(curriculum_docs)
-
-
         user = request.user
 
         # Save interaction
-        snapshot = CodeSnapshot.objects.create(
+        snapshot = CodeSnapshot.objects.record(
             user=user,
             lesson=lesson,
             step=step,
@@ -128,35 +169,66 @@ class AskQuestionView(APIView):
             interaction_start=datetime.now()
         )
 
-        # Call local LLM
-        start_time = datetime.now()
-        try:
-            llm_response = requests.post(
-                'http://localhost:11434/api/generate',
-                json={
-                    'model': 'llama3.2:3b',
-                    'prompt': f"""
+        # Near-duplicate questions on a step are answered from the cache
+        rag = get_rag()
+        responses = get_response_cache()
+        answer, hit = None, None
+        if responses is not None and question:
+            answer, hit = responses.get_answer(lesson_id, step_number, question, user_code, rag.index_version, rag.embed)
+
+        def remember(text):
+            if responses is not None and question:
+                responses.put_answer(lesson_id, step_number, question, user_code, rag.index_version, text, rag.embed)
+
+        if answer is not None:
+            if wants_stream(request):
+                return sse_response(relay_events(
+                    [answer], meta={'cached': hit}, on_complete=lambda text: _finish_snapshot(snapshot),
+                ))
+            _finish_snapshot(snapshot)
+            return Response({
+                'answer': answer,
+                'interaction_duration': 0.0,
+                'cached': hit,
+            })
+
+        # Retrieve curriculum content
+        query = f"{lesson.title} step {step_number} {question}"
+        curriculum_docs = rag.retrieve(query, k=2)
+        context = "\n".join(curriculum_docs)
+
+        prompt = f"""
                     Curriculum Context: {context}
                     Lesson: {lesson.title}
                     Step: {step.description}
                     User Code: {user_code}
                     Question: {question}
                     Context: The user is learning Semantic HTML. Answer concisely and conversationally, using the curriculum.
-                    """,
-                    'stream': False
-                }
-            ).json()
-            answer = llm_response.get('response', 'No response from LLM.')
-        except requests.RequestException:
-            answer = 'Error connecting to local LLM.'
+                    """
+
+        if wants_stream(request):
+            return sse_response(relay_events(
+                record_completion(stream_generate(prompt), remember),
+                meta={'cached': None},
+                on_complete=lambda text: _finish_snapshot(snapshot),
+            ))
+
+        # Call local LLM
+        start_time = datetime.now()
+        try:
+            answer = generate(prompt)
+        except LLMBusy:
+            return _busy_response()
         end_time = datetime.now()
+        remember(answer)
 
         snapshot.interaction_end = end_time
         snapshot.save()
 
         return Response({
             'answer': answer,
-            'interaction_duration': (end_time - start_time).total_seconds()
+            'interaction_duration': (end_time - start_time).total_seconds(),
+            'cached': None,
         })
 
 class LessonMetadataView(APIView):
@@ -179,27 +251,78 @@ class LessonMetadataView(APIView):
 
 
 class BranchesView(APIView):
+    """A student's branch snapshots for a lesson, newest first, one page at a time.
+
+    Snapshots are stored as deltas, so the list only carries metadata unless
+    `include_code=true`; `BranchDetailView` returns the code of one branch.
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, lesson_id):
         user = request.user
 
         lesson = Lesson.objects.get(lesson_id=lesson_id)
-        snapshots = CodeSnapshot.objects.filter(user=user, lesson=lesson, branch_id__isnull=False).order_by('-timestamp')
-        return Response([{
-            'branch_id': snapshot.branch_id,
-            'code': snapshot.code,
-            'step': {'step_number': snapshot.step.step_number},
-            'timestamp': snapshot.timestamp.isoformat()
-        } for snapshot in snapshots])
-    
-
-
+        snapshots = (
+            CodeSnapshot.objects.filter(user=user, lesson=lesson, branch_id__isnull=False)
+            .select_related('step')
+            .order_by('-timestamp', '-pk')
+        )
 
+        page_number = request.query_params.get('page', 1)
+        try:
+            page_size = min(int(request.query_params.get('page_size', BRANCHES_PAGE_SIZE)), BRANCHES_MAX_PAGE_SIZE)
+        except ValueError:
+            page_size = BRANCHES_PAGE_SIZE
+        paginator = Paginator(snapshots, max(1, page_size))
+        try:
+            page = paginator.page(page_number)
+        except PageNotAnInteger:
+            page = paginator.page(1)
+        except EmptyPage:
+            page = paginator.page(paginator.num_pages)
+
+        include_code = str(request.query_params.get('include_code', '')).lower() in {'1', 'true', 'yes'}
+        codes = CodeSnapshot.objects.codes_for(list(page)) if include_code else {}
+
+        branches = []
+        for snapshot in page:
+            branch = {
+                'branch_id': snapshot.branch_id,
+                'step': {'step_number': snapshot.step.step_number},
+                'timestamp': snapshot.timestamp.isoformat(),
+            }
+            if include_code:
+                branch['code'] = codes[snapshot.pk]
+            branches.append(branch)
 
+        return Response({
+            'branches': branches,
+            'pagination': {
+                'page_number': page.number,
+                'total_pages': paginator.num_pages,
+                'next': page.next_page_number() if page.has_next() else None,
+                'previous': page.previous_page_number() if page.has_previous() else None,
+            },
+        })
 
 
+class BranchDetailView(APIView):
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request, lesson_id, branch_id):
+        snapshot = (
+            CodeSnapshot.objects.filter(user=request.user, lesson__lesson_id=lesson_id, branch_id=branch_id)
+            .select_related('step')
+            .first()
+        )
+        if snapshot is None:
+            return Response({'detail': 'Branch not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'branch_id': snapshot.branch_id,
+            'code': snapshot.get_code(),
+            'step': {'step_number': snapshot.step.step_number},
+            'timestamp': snapshot.timestamp.isoformat(),
+        })
 
 
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
@@ -224,19 +347,14 @@ def llm_playround(request):
             return Response(payload, status=status.HTTP_400_BAD_REQUEST)
 
 
+        model = getattr(settings, 'LLM_PLAYGROUND_MODEL', 'phi')
+        if wants_stream(request):
+            return sse_response(relay_events(stream_generate(context, model=model)))
+
         try:
-            llm_response = requests.post(
-                'http://localhost:11434/api/generate',
-                json={
-                    'model': 'phi',
-                    'prompt': f"""{context}""",
-                    'stream': False
-                }
-            ).json()
-            explanation = llm_response.get('response', 'No response from LLM.')
-            print(explanation)
-        except requests.RequestException:
-            explanation = 'Error connecting to local LLM.'
+            explanation = generate(context, model=model)
+        except LLMBusy:
+            return _busy_response()
 
 
         payload['message'] = "Successful"
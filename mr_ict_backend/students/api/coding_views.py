@@ -18,7 +18,14 @@ from students.services.coding import (
     CodeExecutionError,
     normalise_execution_files,
     run_python_files,
-    run_test_cases,
+)
+from students.services.grading import (
+    PENDING_STATUSES,
+    STATUS_FAILED,
+    GradingQueueFull,
+    SubmissionAlreadyPending,
+    enqueue_submission,
+    submission_payload,
 )
 
 HINT_COOLDOWN_SECONDS = 45
@@ -200,39 +207,41 @@ class CodingChallengeSubmitView(StudentExperienceBaseView):
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            passed, case_results = run_test_cases(
-                execution_files,
-                challenge.entrypoint_filename,
-                challenge.test_cases,
-                time_limit=challenge.time_limit_seconds,
+            job_id = enqueue_submission(state, execution_files)
+        except SubmissionAlreadyPending as exc:
+            return Response(
+                {"detail": str(exc), "job_id": exc.job_id},
+                status=status.HTTP_409_CONFLICT,
+            )
+        except GradingQueueFull as exc:
+            return Response(
+                {"detail": str(exc), "retry_in": exc.retry_in},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
             )
-        except CodeExecutionError as exc:
-            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if files_payload is not None:
-            state.files = execution_files
+        state.refresh_from_db()
+        payload = submission_payload(state)
+        if payload["status"] in PENDING_STATUSES:
+            return Response({"data": payload}, status=status.HTTP_202_ACCEPTED)
+        if payload["status"] == STATUS_FAILED:
+            return Response({"detail": payload.get("detail"), "data": payload}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"data": payload})
 
-        state.last_run_result = {
-            "type": "submit",
-            "passed": passed,
-            "cases": case_results,
-        }
-        state.last_run_at = timezone.now()
-        updates = ["files", "last_run_result", "last_run_at", "updated_at"]
-        if passed and not state.is_completed:
-            state.is_completed = True
-            state.completed_at = timezone.now()
-            updates.extend(["is_completed", "completed_at"])
-        state.save(update_fields=updates)
-
-        response_payload = {
-            "passed": passed,
-            "cases": case_results,
-            "files": state.files,
-        }
-        if passed and challenge.solution_files:
-            response_payload["solution_files"] = challenge.solution_files
-        return Response({"data": response_payload})
+
+class CodingChallengeSubmissionStatusView(StudentExperienceBaseView):
+    def get(self, request, slug: str, job_id: str):
+        student = self.get_student(request)
+        state = get_object_or_404(
+            StudentCodingChallengeState.objects.select_related("challenge"),
+            student=student,
+            challenge__slug=slug,
+        )
+        if (state.last_run_result or {}).get("job_id") != job_id:
+            return Response(
+                {"detail": "Submission not found or superseded."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response({"data": submission_payload(state)})
 
 
 class CodingChallengeHintView(StudentExperienceBaseView):
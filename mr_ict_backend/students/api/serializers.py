@@ -432,7 +432,7 @@ class LessonPlaybackSerializer(serializers.Serializer):
     primary_video = serializers.DictField(allow_null=True)
     insert_videos = LessonAssetSerializer(many=True)
     insert_outputs = serializers.ListField(child=serializers.DictField())
-    code_snippets = serializers.ListField(child=serializers.DictField())
+    code_timeline = serializers.DictField()
     assignments = serializers.ListField(child=serializers.DictField())
     download_manifest = serializers.ListField(child=serializers.DictField())
     playback_state = serializers.DictField()
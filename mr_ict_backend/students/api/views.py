@@ -5,6 +5,7 @@ from typing import Any, Dict, Iterable, List, Optional
 from django.db.models import Count, Prefetch, Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
@@ -15,6 +16,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from analytics.models import LearningEvent
 from analytics.services import record_event
+from core.media import media_download_url
 from courses.models import (
     CodingChallenge,
     Course,
@@ -36,6 +38,8 @@ from students.api.serializers import (
     build_resume_map,
 )
 from students.models import Student, StudentBadge, StudentChallenge, StudentCourse, StudentLesson
+from video_tutorials.services.packaging import hls_url
+from video_tutorials.services.timeline import get_code_timeline, timeline_response, timeline_summary
 
 
 class StudentExperienceBaseView(APIView):
@@ -430,6 +434,8 @@ class LessonPlaybackView(StudentExperienceBaseView):
                 "id": primary_video_obj.pk,
                 "type": "primary",
                 "url": primary_video_obj.video_url or _lesson_file_url(request, primary_video_obj.video_file),
+                # Adaptive stream when packaged; `url` stays the progressive fallback.
+                "hls_url": hls_url(primary_video_obj, request.build_absolute_uri),
                 "duration": primary_video_obj.duration,
                 "language": primary_video_obj.language,
                 "timestamp": None,
@@ -439,11 +445,8 @@ class LessonPlaybackView(StudentExperienceBaseView):
             else None
         )
 
-        insert_videos = _serialize_lesson_assets(
-            request,
-            lesson.insert_videos.filter(is_archived=False).order_by("timestamp"),
-            asset_type="insert",
-        )
+        insert_video_objs = list(lesson.insert_videos.filter(is_archived=False).order_by("timestamp"))
+        insert_videos = _serialize_lesson_assets(request, insert_video_objs, asset_type="insert")
 
         insert_outputs = [
             {
@@ -457,18 +460,11 @@ class LessonPlaybackView(StudentExperienceBaseView):
             for output in LessonInsertOutput.objects.filter(lesson=lesson, is_archived=False).order_by("timestamp")
         ]
 
-        code_snippets = [
-            {
-                "id": snippet.pk,
-                "timestamp": snippet.timestamp,
-                "code_content": snippet.code_content,
-                "cursor_position": snippet.cursor_position,
-                "scroll_position": snippet.scroll_position,
-                "is_highlight": snippet.is_highlight,
-                "output": snippet.output,
-            }
-            for snippet in LessonCodeSnippet.objects.filter(lesson=lesson, is_archived=False).order_by("timestamp")
-        ]
+        # Snippets are served as a keyframe + delta timeline fetched chunk by chunk.
+        code_timeline = timeline_summary(
+            get_code_timeline(lesson),
+            request.build_absolute_uri(reverse("students:student_lesson_timeline", args=[lesson.lesson_id])),
+        )
 
         assignments = [
             {
@@ -482,16 +478,21 @@ class LessonPlaybackView(StudentExperienceBaseView):
             for assignment in LessonAssignment.objects.filter(lesson=lesson, is_archived=False)
         ]
 
+        # Stored files are downloaded through core.media.serve_media, which
+        # supports resuming with Range requests.
         download_manifest = []
-        if primary_video:
-            download_manifest.append({"type": "video", "label": "Lesson video", "url": primary_video["url"]})
-            if primary_video.get("subtitles_url"):
-                download_manifest.append({"type": "subtitles", "label": "Subtitles", "url": primary_video["subtitles_url"]})
-        for asset in insert_videos:
-            if asset.get("url"):
-                download_manifest.append({"type": asset["type"], "label": f"Insert at {asset.get('timestamp', 0)}s", "url": asset["url"]})
-            if asset.get("subtitles_url"):
-                download_manifest.append({"type": "subtitles", "label": "Insert subtitles", "url": asset["subtitles_url"]})
+        if primary_video_obj:
+            url = primary_video_obj.video_url or media_download_url(request, primary_video_obj.video_file)
+            if url:
+                download_manifest.append({"type": "video", "label": "Lesson video", "url": url})
+            if primary_video_obj.subtitles_url:
+                download_manifest.append({"type": "subtitles", "label": "Subtitles", "url": primary_video_obj.subtitles_url})
+        for asset in insert_video_objs:
+            url = getattr(asset, "video_url", None) or media_download_url(request, asset.video_file)
+            if url:
+                download_manifest.append({"type": "insert", "label": f"Insert at {asset.timestamp or 0}s", "url": url})
+            if asset.subtitles_url:
+                download_manifest.append({"type": "subtitles", "label": "Insert subtitles", "url": asset.subtitles_url})
 
         playback_state = {
             "completed": student_lesson.completed,
@@ -519,7 +520,7 @@ class LessonPlaybackView(StudentExperienceBaseView):
             "primary_video": primary_video,
             "insert_videos": insert_videos,
             "insert_outputs": insert_outputs,
-            "code_snippets": code_snippets,
+            "code_timeline": code_timeline,
             "assignments": assignments,
             "download_manifest": download_manifest,
             "playback_state": playback_state,
@@ -531,6 +532,20 @@ class LessonPlaybackView(StudentExperienceBaseView):
         return Response({"message": "Successful", "data": serializer.validated_data})
 
 
+class LessonCodeTimelineView(StudentExperienceBaseView):
+    def get(self, request, lesson_id: str):
+        student = self.get_student(request)
+        lesson = get_object_or_404(
+            Lesson.objects.select_related("course"),
+            lesson_id=lesson_id,
+            status=PublishStatus.PUBLISHED,
+            is_archived=False,
+        )
+        if not StudentCourse.objects.filter(student=student, course=lesson.course).exists():
+            return Response({"message": "Not enrolled"}, status=status.HTTP_403_FORBIDDEN)
+        return timeline_response(request, lesson)
+
+
 class LessonProgressView(StudentExperienceBaseView):
     def post(self, request, lesson_id: str):
         student = self.get_student(request)
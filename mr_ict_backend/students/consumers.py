@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from students.models import StudentCodingChallengeState
+from students.services.grading import TERMINAL_STATUSES, grading_group_name, submission_payload
+
+
+class CodingSubmissionConsumer(AsyncJsonWebsocketConsumer):
+    """Pushes the result of a queued coding submission to its owner."""
+
+    async def connect(self):
+        user = self.scope.get("user")
+        self.job_id = self.scope["url_route"]["kwargs"]["job_id"]
+        if user is None or not user.is_authenticated or not await self._owns_job(user):
+            await self.close()
+            return
+        self.group_name = grading_group_name(self.job_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept(subprotocol=self.scope.get("auth_subprotocol"))
+
+        # The job may have settled before the socket opened; its push is gone,
+        # so send the stored result instead of waiting for one.
+        payload = await self._settled_payload(user)
+        if payload is not None:
+            await self.grading_result({"payload": payload})
+
+    async def disconnect(self, code):
+        group_name = getattr(self, "group_name", None)
+        if group_name:
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+
+    async def grading_result(self, event):
+        await self.send_json({"type": "result", "data": event["payload"]})
+        await self.close()
+
+    def _job_states(self, user):
+        return StudentCodingChallengeState.objects.filter(
+            student__user=user,
+            last_run_result__job_id=self.job_id,
+        )
+
+    @database_sync_to_async
+    def _owns_job(self, user) -> bool:
+        return self._job_states(user).exists()
+
+    @database_sync_to_async
+    def _settled_payload(self, user) -> Optional[Dict[str, Any]]:
+        state = self._job_states(user).select_related("challenge").first()
+        if state is None or (state.last_run_result or {}).get("status") not in TERMINAL_STATUSES:
+            return None
+        return submission_payload(state)
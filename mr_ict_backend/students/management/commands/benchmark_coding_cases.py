@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.services.coding import get_worker_pool, run_test_cases
+
+BENCHMARK_PROGRAM = (
+    "import time\n"
+    "value = int(input())\n"
+    "time.sleep({delay})\n"
+    "print(value * value)\n"
+)
+
+
+class Command(BaseCommand):
+    help = "Time a multi-case coding challenge graded sequentially and in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cases", type=int, default=20, help="Number of test cases (default 20).")
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=0.1,
+            help="Seconds each case sleeps to simulate work (default 0.1).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Concurrency for the parallel run (default 4).",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per mode; the best is reported.")
+
+    def handle(self, *args, **options):
+        cases = options["cases"]
+        workers = options["workers"]
+        if cases <= 0 or workers <= 0 or options["repeat"] <= 0:
+            raise CommandError("--cases, --workers and --repeat must be positive integers")
+
+        files = [{"name": "main.py", "content": BENCHMARK_PROGRAM.format(delay=options["delay"])}]
+        test_cases = [
+            {"name": f"case_{index}", "stdin": f"{index}\n", "expected_output": str(index * index)}
+            for index in range(cases)
+        ]
+
+        pool = get_worker_pool()
+        if pool is not None:
+            pool.warm()
+
+        timings = {}
+        for label, max_workers in (("sequential", 1), ("parallel", workers)):
+            best = None
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                passed, results = run_test_cases(
+                    files,
+                    "main.py",
+                    test_cases,
+                    use_cache=False,
+                    max_workers=max_workers,
+                )
+                elapsed = time.perf_counter() - start
+                if not passed or len(results) != cases:
+                    raise CommandError(f"{label} run did not pass all {cases} cases")
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+            self.stdout.write(f"{label:<10} {best * 1000:8.1f} ms  ({cases} cases, max_workers={max_workers})")
+
+        speedup = timings["sequential"] / timings["parallel"] if timings["parallel"] else 0
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Parallel grading is {speedup:.2f}x faster "
+                f"(pool size {pool.size if pool else 'disabled'})"
+            )
+        )
@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import json
+import logging
 import os
+import select
 import subprocess
 import sys
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 from pathlib import Path, PurePosixPath
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from students.services.execution_cache import execution_key, files_digest, get_result_cache, is_deterministic
+
+logger = logging.getLogger(__name__)
 
 
 class CodeExecutionError(Exception):
@@ -28,6 +39,11 @@ class CodeExecutionResult(Dict[str, object]):
 MAX_FILE_COUNT = 25
 MAX_FILE_BYTES = 200_000
 
+WORKER_SCRIPT = Path(__file__).resolve().with_name("coding_worker.py")
+WORKER_START_TIMEOUT = 10.0
+WORKER_RESPONSE_GRACE = 2.0
+WORKER_ACQUIRE_TIMEOUT = 30.0
+
 
 def _clean_relative_path(raw_name: str) -> str:
     """Ensure file names remain within the temp directory."""
@@ -90,6 +106,337 @@ def normalise_execution_files(files: Iterable[Dict[str, object]]) -> List[Dict[s
     return _normalise_files(files)
 
 
+class ExecutionWorkspace:
+    """Temporary directory holding a prepared copy of the execution files.
+
+    Files are written on first access to `root`, so runs answered entirely
+    from the result cache never touch the filesystem.
+    """
+
+    def __init__(self, files: Iterable[Dict[str, object]], *, files_are_normalised: bool = False) -> None:
+        self.files = list(files) if files_are_normalised else _normalise_files(files)
+        self._tmpdir: Optional[tempfile.TemporaryDirectory] = None
+        self._digest: Optional[str] = None
+        self._deterministic: Optional[bool] = None
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = files_digest(self.files)
+        return self._digest
+
+    @property
+    def deterministic(self) -> bool:
+        if self._deterministic is None:
+            self._deterministic = is_deterministic(self.files)
+        return self._deterministic
+
+    @property
+    def root(self) -> Path:
+        return self.prepare()
+
+    def prepare(self) -> Path:
+        """Write the files to a fresh temporary directory if not done yet."""
+
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.TemporaryDirectory()
+            root = Path(self._tmpdir.name)
+            for file in self.files:
+                path = root / file["name"]
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(file["content"], encoding="utf-8")
+        return Path(self._tmpdir.name)
+
+    def __enter__(self) -> "ExecutionWorkspace":
+        return self
+
+    def close(self) -> None:
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+        self._tmpdir = None
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class WorkerCrashed(Exception):
+    """Raised when a pooled worker dies or stops responding mid-job."""
+
+
+class WorkerUnavailable(WorkerCrashed):
+    """Raised when every pooled worker stays busy past the acquire timeout."""
+
+
+class _PythonWorker:
+    """Handle on a single `coding_worker.py` process."""
+
+    def __init__(self) -> None:
+        self.jobs_run = 0
+        self.process = subprocess.Popen(
+            [sys.executable, str(WORKER_SCRIPT)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            env=_execution_env(),
+        )
+        ready = self._read_line(WORKER_START_TIMEOUT)
+        if ready is None or not ready.get("ready"):
+            self.close()
+            raise WorkerCrashed("Execution worker failed to start.")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_line(self, timeout: float) -> Optional[Dict[str, object]]:
+        stdout = self.process.stdout
+        if stdout is None:
+            return None
+        readable, _, _ = select.select([stdout], [], [], timeout)
+        if not readable:
+            return None
+        line = stdout.readline()
+        if not line:
+            return None
+        return json.loads(line)
+
+    def run(self, root: Path, entrypoint: str, stdin: Optional[str], time_limit: int) -> CodeExecutionResult:
+        job = {
+            "root": str(root),
+            "entrypoint": entrypoint,
+            "stdin": stdin,
+            "time_limit": time_limit,
+        }
+        try:
+            assert self.process.stdin is not None
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            raise WorkerCrashed("Execution worker is not accepting jobs.") from exc
+
+        self.jobs_run += 1
+        response = self._read_line(time_limit + WORKER_RESPONSE_GRACE)
+        if response is None or "error" in response:
+            raise WorkerCrashed("Execution worker stopped responding.")
+        return CodeExecutionResult(response)
+
+    def close(self) -> None:
+        if self.alive:
+            self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:  # pragma: no cover - defensive
+            pass
+        for stream in (self.process.stdin, self.process.stdout):
+            if stream is not None:
+                try:
+                    stream.close()
+                except OSError:
+                    pass
+
+
+class PythonWorkerPool:
+    """Pre-started Python workers that fork a fresh child per execution.
+
+    Workers are recycled after `max_jobs` executions or as soon as they crash,
+    so a misbehaving submission can only ever take down its own worker. A
+    retired worker frees its slot and wakes one waiter, which starts the
+    replacement; waiters give up after `acquire_timeout` seconds.
+    """
+
+    def __init__(self, size: int, max_jobs: int, *, acquire_timeout: float = WORKER_ACQUIRE_TIMEOUT) -> None:
+        self.size = max(size, 1)
+        self.max_jobs = max(max_jobs, 1)
+        self.acquire_timeout = acquire_timeout
+        self._idle: List[_PythonWorker] = []
+        self._available = threading.Condition()
+        self._started = 0
+
+    def _start_worker(self) -> _PythonWorker:
+        """Start a worker for a slot the caller has already reserved."""
+
+        try:
+            return _PythonWorker()
+        except BaseException:
+            self._free_slot()
+            raise
+
+    def _free_slot(self) -> None:
+        with self._available:
+            self._started -= 1
+            self._available.notify()
+
+    def warm(self) -> None:
+        """Start workers until the pool is full."""
+
+        while True:
+            with self._available:
+                if self._started >= self.size:
+                    return
+                self._started += 1
+            worker = self._start_worker()
+            with self._available:
+                self._idle.append(worker)
+                self._available.notify()
+
+    def _acquire(self) -> _PythonWorker:
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._available:
+            while not self._idle and self._started >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WorkerUnavailable("No execution worker became available.")
+                self._available.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        return self._start_worker()
+
+    def _release(self, worker: _PythonWorker, *, healthy: bool) -> None:
+        if healthy and worker.alive and worker.jobs_run < self.max_jobs:
+            with self._available:
+                self._idle.append(worker)
+                self._available.notify()
+            return
+        worker.close()
+        self._free_slot()
+
+    def run(self, root: Path, entrypoint: str, *, stdin: Optional[str], time_limit: int) -> CodeExecutionResult:
+        worker = self._acquire()
+        healthy = False
+        try:
+            result = worker.run(root, entrypoint, stdin, time_limit)
+            healthy = True
+            return result
+        finally:
+            self._release(worker, healthy=healthy)
+
+    def shutdown(self) -> None:
+        with self._available:
+            workers, self._idle = self._idle, []
+            self._started -= len(workers)
+            self._available.notify_all()
+        for worker in workers:
+            worker.close()
+
+
+_worker_pool: Optional[PythonWorkerPool] = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool() -> Optional[PythonWorkerPool]:
+    """Return the process-wide worker pool, or None when pooling is disabled."""
+
+    global _worker_pool
+    if not hasattr(os, "fork"):
+        return None
+    size = int(getattr(settings, "CODE_EXECUTION_POOL_SIZE", 0) or 0)
+    if size <= 0:
+        return None
+    if _worker_pool is None:
+        with _worker_pool_lock:
+            if _worker_pool is None:
+                pool = PythonWorkerPool(
+                    size=size,
+                    max_jobs=int(getattr(settings, "CODE_EXECUTION_WORKER_MAX_JOBS", 50)),
+                )
+                try:
+                    pool.warm()
+                except WorkerCrashed:
+                    logger.warning("Could not pre-start execution workers; they will start on demand.")
+                _worker_pool = pool
+    return _worker_pool
+
+
+def _execution_env() -> Dict[str, str]:
+    env = os.environ.copy()
+    env["PYTHONUNBUFFERED"] = "1"
+    return env
+
+
+def _run_cold(root: Path, entrypoint: str, stdin: Optional[str], time_limit: int) -> CodeExecutionResult:
+    env = _execution_env()
+    env["PYTHONPATH"] = f"{root}{os.pathsep}{env.get('PYTHONPATH', '')}"
+
+    command = [sys.executable, entrypoint]
+    start = time.perf_counter()
+    try:
+        completed = subprocess.run(
+            command,
+            cwd=root,
+            input=stdin,
+            capture_output=True,
+            text=True,
+            timeout=time_limit,
+            env=env,
+        )
+        duration = time.perf_counter() - start
+        return CodeExecutionResult(
+            stdout=completed.stdout,
+            stderr=completed.stderr,
+            exit_code=completed.returncode,
+            timed_out=False,
+            duration=duration,
+        )
+    except subprocess.TimeoutExpired as exc:
+        duration = time.perf_counter() - start
+        stdout = exc.stdout if isinstance(exc.stdout, str) else ""
+        stderr = exc.stderr if isinstance(exc.stderr, str) else ""
+        return CodeExecutionResult(
+            stdout=stdout,
+            stderr=stderr,
+            exit_code=-1,
+            timed_out=True,
+            duration=duration,
+        )
+
+
+def run_in_workspace(
+    workspace: ExecutionWorkspace,
+    entrypoint: str,
+    *,
+    stdin: Optional[str] = None,
+    time_limit: int = 5,
+    use_cache: bool = True,
+) -> CodeExecutionResult:
+    """Execute `entrypoint` inside a workspace.
+
+    Identical runs are answered from the result cache when it is enabled.
+    Otherwise the warm worker pool is used, falling back to a cold
+    interpreter start if pooling is disabled or the worker crashes. Timed-out
+    runs are never cached because they depend on machine load, and programs
+    that import a nondeterministic module (see `execution_cache`) always run.
+    """
+
+    entrypoint = _clean_relative_path(entrypoint or "main.py")
+
+    cache = get_result_cache() if use_cache and workspace.deterministic else None
+    cache_key = None
+    if cache is not None:
+        cache_key = execution_key(workspace.digest, entrypoint, stdin, time_limit)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            result = CodeExecutionResult(cached)
+            result["cached"] = True
+            return result
+
+    result = None
+    pool = get_worker_pool()
+    if pool is not None:
+        try:
+            result = pool.run(workspace.root, entrypoint, stdin=stdin, time_limit=time_limit)
+        except WorkerCrashed as exc:
+            logger.warning("%s Falling back to a cold interpreter.", exc)
+    if result is None:
+        result = _run_cold(workspace.root, entrypoint, stdin, time_limit)
+
+    if cache is not None and cache_key is not None and not result.get("timed_out"):
+        cache.set(cache_key, dict(result))
+    return result
+
+
 def run_python_files(
     files: Iterable[Dict[str, object]],
     entrypoint: str,
@@ -97,55 +444,74 @@ def run_python_files(
     stdin: Optional[str] = None,
     time_limit: int = 5,
     files_are_normalised: bool = False,
+    use_cache: bool = True,
 ) -> CodeExecutionResult:
     """Execute Python files within a temporary directory."""
 
-    normalised = list(files) if files_are_normalised else _normalise_files(files)
-    entrypoint = entrypoint or "main.py"
-    entrypoint = _clean_relative_path(entrypoint)
+    entrypoint = _clean_relative_path(entrypoint or "main.py")
+    with ExecutionWorkspace(files, files_are_normalised=files_are_normalised) as workspace:
+        return run_in_workspace(
+            workspace,
+            entrypoint,
+            stdin=stdin,
+            time_limit=time_limit,
+            use_cache=use_cache,
+        )
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        root = Path(tmpdir)
-        for file in normalised:
-            path = root / file["name"]
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_text(file["content"], encoding="utf-8")
 
-        env = os.environ.copy()
-        env["PYTHONUNBUFFERED"] = "1"
-        env["PYTHONPATH"] = f"{root}{os.pathsep}{env.get('PYTHONPATH', '')}"
+def _parse_case(index: int, case: Dict[str, object]) -> Dict[str, object]:
+    stdin = case.get("stdin")
+    if stdin is not None and not isinstance(stdin, str):
+        raise CodeExecutionError("Test case stdin must be a string.")
+    expected_output = case.get("expected_output", "")
+    if not isinstance(expected_output, str):
+        raise CodeExecutionError("Test case expected_output must be a string.")
+    comparison = case.get("comparison", "equals")
+    if comparison not in {"equals", "contains"}:
+        raise CodeExecutionError("Unsupported comparison type.")
+    return {
+        "name": case.get("name") or f"case_{index}",
+        "stdin": stdin,
+        "expected_output": expected_output,
+        "comparison": comparison,
+        "strip_output": bool(case.get("strip_output", True)),
+        "stop_on_failure": bool(case.get("stop_on_failure", True)),
+    }
+
+
+def _grade_case(spec: Dict[str, object], execution: CodeExecutionResult) -> Dict[str, object]:
+    expected_output = spec["expected_output"]
+    strip_output = spec["strip_output"]
+    actual_output = execution.stdout
+    expected_compare = expected_output.strip() if strip_output else expected_output
+    actual_compare = actual_output.strip() if strip_output else actual_output
+
+    if spec["comparison"] == "equals":
+        passed = (
+            not execution.get("timed_out")
+            and execution.get("exit_code") == 0
+            and actual_compare == expected_compare
+        )
+    else:  # contains
+        passed = (
+            not execution.get("timed_out")
+            and execution.get("exit_code") == 0
+            and expected_compare in actual_compare
+        )
 
-        command = [sys.executable, entrypoint]
-        start = time.perf_counter()
-        try:
-            completed = subprocess.run(
-                command,
-                cwd=root,
-                input=stdin,
-                capture_output=True,
-                text=True,
-                timeout=time_limit,
-                env=env,
-            )
-            duration = time.perf_counter() - start
-            return CodeExecutionResult(
-                stdout=completed.stdout,
-                stderr=completed.stderr,
-                exit_code=completed.returncode,
-                timed_out=False,
-                duration=duration,
-            )
-        except subprocess.TimeoutExpired as exc:
-            duration = time.perf_counter() - start
-            stdout = exc.stdout if isinstance(exc.stdout, str) else ""
-            stderr = exc.stderr if isinstance(exc.stderr, str) else ""
-            return CodeExecutionResult(
-                stdout=stdout,
-                stderr=stderr,
-                exit_code=-1,
-                timed_out=True,
-                duration=duration,
-            )
+    return {
+        "name": spec["name"],
+        "stdin": spec["stdin"],
+        "expected_output": expected_output,
+        "actual_output": actual_output,
+        "comparison": spec["comparison"],
+        "strip_output": strip_output,
+        "exit_code": execution.get("exit_code"),
+        "timed_out": execution.get("timed_out"),
+        "stderr": execution.stderr,
+        "duration": execution.get("duration"),
+        "passed": passed,
+    }
 
 
 def run_test_cases(
@@ -154,73 +520,97 @@ def run_test_cases(
     test_cases: Iterable[Dict[str, object]],
     *,
     time_limit: int = 5,
+    use_cache: bool = True,
+    max_workers: Optional[int] = None,
 ) -> Tuple[bool, List[Dict[str, object]]]:
-    """Run the supplied files against structured test cases."""
+    """Run the supplied files against structured test cases.
+
+    Cases run concurrently on up to `max_workers` threads (defaulting to
+    CODE_EXECUTION_CASE_CONCURRENCY); 1 runs them sequentially. Either way the
+    results come back in declared order and stop at the first failing case
+    whose `stop_on_failure` flag is set, exactly as a sequential run would.
+    """
 
-    normalised_tests = list(test_cases)
-    if not normalised_tests:
+    specs = [_parse_case(index, case) for index, case in enumerate(test_cases, start=1)]
+    if not specs:
         return True, []
 
-    results: List[Dict[str, object]] = []
-    all_passed = True
+    if max_workers is None:
+        max_workers = int(getattr(settings, "CODE_EXECUTION_CASE_CONCURRENCY", 1) or 1)
+
     prepared_files = _normalise_files(files)
+    entrypoint = _clean_relative_path(entrypoint or "main.py")
+    workspace = ExecutionWorkspace(prepared_files, files_are_normalised=True)
 
-    for index, case in enumerate(normalised_tests, start=1):
-        name = case.get("name") or f"case_{index}"
-        stdin = case.get("stdin")
-        if stdin is not None and not isinstance(stdin, str):
-            raise CodeExecutionError("Test case stdin must be a string.")
-        expected_output = case.get("expected_output", "")
-        if not isinstance(expected_output, str):
-            raise CodeExecutionError("Test case expected_output must be a string.")
-        comparison = case.get("comparison", "equals")
-        if comparison not in {"equals", "contains"}:
-            raise CodeExecutionError("Unsupported comparison type.")
-        strip_output = bool(case.get("strip_output", True))
-
-        execution = run_python_files(
-            prepared_files,
+    def execute(spec: Dict[str, object]) -> Dict[str, object]:
+        execution = run_in_workspace(
+            workspace,
             entrypoint,
-            stdin=stdin,
+            stdin=spec["stdin"],
             time_limit=time_limit,
-            files_are_normalised=True,
+            use_cache=use_cache,
         )
+        return _grade_case(spec, execution)
 
-        actual_output = execution.stdout
-        expected_compare = expected_output.strip() if strip_output else expected_output
-        actual_compare = actual_output.strip() if strip_output else actual_output
-
-        if comparison == "equals":
-            passed = (
-                not execution.get("timed_out")
-                and execution.get("exit_code") == 0
-                and actual_compare == expected_compare
-            )
-        else:  # contains
-            passed = (
-                not execution.get("timed_out")
-                and execution.get("exit_code") == 0
-                and expected_compare in actual_compare
-            )
-
-        result_payload = {
-            "name": name,
-            "stdin": stdin,
-            "expected_output": expected_output,
-            "actual_output": actual_output,
-            "comparison": comparison,
-            "strip_output": strip_output,
-            "exit_code": execution.get("exit_code"),
-            "timed_out": execution.get("timed_out"),
-            "stderr": execution.stderr,
-            "duration": execution.get("duration"),
-            "passed": passed,
-        }
-        results.append(result_payload)
+    if max_workers <= 1 or len(specs) == 1:
+        with workspace:
+            results = _run_cases_sequentially(specs, execute)
+    else:
+        # Write the files before fanning out so threads never race to do it.
+        workspace.prepare()
+        results = _run_cases_concurrently(specs, execute, max_workers, release=workspace.close)
+
+    return all(result["passed"] for result in results), results
 
-        if not passed:
-            all_passed = False
-            if case.get("stop_on_failure", True):
+
+def _run_cases_sequentially(specs, execute) -> List[Dict[str, object]]:
+    results: List[Dict[str, object]] = []
+    for spec in specs:
+        result = execute(spec)
+        results.append(result)
+        if not result["passed"] and spec["stop_on_failure"]:
+            break
+    return results
+
+
+def _run_cases_concurrently(
+    specs, execute, max_workers: int, release: Callable[[], None]
+) -> List[Dict[str, object]]:
+    # Index of the earliest declared case that failed and stops the run; any
+    # case after it is irrelevant, so it is cancelled if it has not started.
+    stop_at = len(specs)
+    by_index: Dict[int, Dict[str, object]] = {}
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(specs)))
+    futures = {executor.submit(execute, spec): index for index, spec in enumerate(specs)}
+    try:
+        for future in as_completed(futures):
+            index = futures[future]
+            if future.cancelled() or index > stop_at:
+                continue
+            result = future.result()
+            by_index[index] = result
+            if not result["passed"] and specs[index]["stop_on_failure"] and index < stop_at:
+                stop_at = index
+                for pending, pending_index in futures.items():
+                    if pending_index > stop_at:
+                        pending.cancel()
+            if all(needed in by_index for needed in range(min(stop_at + 1, len(specs)))):
+                # Every case the response needs is known; don't wait for
+                # later ones that were already running.
                 break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        running = [future for future in futures if not future.done()]
+        if running:
+            # Discarded cases still use the workspace until they finish.
+            threading.Thread(target=_release_when_done, args=(running, release), daemon=True).start()
+        else:
+            release()
+
+    return [by_index[index] for index in range(min(stop_at + 1, len(specs)))]
+
 
-    return all_passed, results
+def _release_when_done(futures, release: Callable[[], None]) -> None:
+    wait(futures)
+    release()
@@ -0,0 +1,162 @@
+"""Long-lived Python worker used by the coding execution pool.
+
+The parent process starts this script once and then streams JSON jobs over
+stdin, one per line. For each job the worker forks a short-lived child that
+runs the entrypoint inside the prepared workspace, so student code never
+executes in the worker itself and every run starts from the same clean,
+already-initialised interpreter. Results are written back as a single JSON
+line on stdout.
+
+This module intentionally depends on the standard library only; it must not
+import Django or any project code.
+"""
+from __future__ import annotations
+
+import json
+import os
+import runpy
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+POLL_INTERVAL = 0.005
+
+
+RUNNER_FILES = {os.path.abspath(__file__), runpy.__file__, "<frozen runpy>"}
+
+
+def _trim_traceback(tb):
+    """Drop runner frames so tracebacks look like a plain `python main.py`."""
+
+    while tb is not None and tb.tb_frame.f_code.co_filename in RUNNER_FILES:
+        tb = tb.tb_next
+    return tb
+
+
+def _run_child(job: dict, stdin_path: str, stdout_path: str, stderr_path: str) -> None:
+    """Executed in the forked child; never returns."""
+
+    exit_code = 1
+    try:
+        os.setsid()
+        root = job["root"]
+        entrypoint = job["entrypoint"]
+
+        stdin_fd = os.open(stdin_path, os.O_RDONLY)
+        stdout_fd = os.open(stdout_path, os.O_WRONLY | os.O_TRUNC)
+        stderr_fd = os.open(stderr_path, os.O_WRONLY | os.O_TRUNC)
+        os.dup2(stdin_fd, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (stdin_fd, stdout_fd, stderr_fd):
+            os.close(fd)
+
+        sys.stdin = open(0, "r", encoding="utf-8", closefd=False)
+        # Line buffering keeps partial output when a run is killed on timeout.
+        sys.stdout = open(1, "w", encoding="utf-8", buffering=1, closefd=False)
+        sys.stderr = open(2, "w", encoding="utf-8", buffering=1, closefd=False)
+
+        os.chdir(root)
+        sys.path[0:1] = [root]
+        sys.argv = [entrypoint]
+
+        try:
+            runpy.run_path(entrypoint, run_name="__main__")
+            exit_code = 0
+        except SystemExit as exc:
+            code = exc.code
+            if code is None:
+                exit_code = 0
+            elif isinstance(code, int):
+                exit_code = code
+            else:
+                print(code, file=sys.stderr)
+                exit_code = 1
+        except BaseException as exc:  # noqa: BLE001 - mirror interpreter behaviour
+            traceback.print_exception(type(exc), exc, _trim_traceback(exc.__traceback__))
+            exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(exit_code & 0xFF)
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as handle:
+        return handle.read()
+
+
+def _execute(job: dict) -> dict:
+    with tempfile.TemporaryDirectory(prefix="coding-io-") as io_dir:
+        stdin_path = os.path.join(io_dir, "stdin")
+        stdout_path = os.path.join(io_dir, "stdout")
+        stderr_path = os.path.join(io_dir, "stderr")
+        with open(stdin_path, "w", encoding="utf-8") as handle:
+            handle.write(job.get("stdin") or "")
+        open(stdout_path, "w").close()
+        open(stderr_path, "w").close()
+
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            _run_child(job, stdin_path, stdout_path, stderr_path)
+
+        deadline = start + float(job.get("time_limit") or 5)
+        timed_out = False
+        status = 0
+        while True:
+            finished, status = os.waitpid(pid, os.WNOHANG)
+            if finished:
+                break
+            if time.perf_counter() >= deadline:
+                timed_out = True
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    # The child may not have reached setsid() yet.
+                    os.kill(pid, signal.SIGKILL)
+                _, status = os.waitpid(pid, 0)
+                break
+            time.sleep(POLL_INTERVAL)
+        duration = time.perf_counter() - start
+
+        if timed_out:
+            exit_code = -1
+        elif os.WIFSIGNALED(status):
+            exit_code = -os.WTERMSIG(status)
+        else:
+            exit_code = os.WEXITSTATUS(status)
+
+        return {
+            "stdout": _read(stdout_path),
+            "stderr": _read(stderr_path),
+            "exit_code": exit_code,
+            "timed_out": timed_out,
+            "duration": duration,
+        }
+
+
+def main() -> None:
+    channel_in = sys.stdin
+    channel_out = sys.stdout
+    channel_out.write(json.dumps({"ready": True}) + "\n")
+    channel_out.flush()
+    for line in channel_in:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = _execute(json.loads(line))
+        except Exception as exc:  # pragma: no cover - reported to the parent
+            result = {"error": f"{type(exc).__name__}: {exc}"}
+        channel_out.write(json.dumps(result) + "\n")
+        channel_out.flush()
+
+
+if __name__ == "__main__":
+    main()
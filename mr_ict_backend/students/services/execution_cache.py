@@ -0,0 +1,156 @@
+"""Content-addressed cache for code execution results.
+
+Results are keyed on a digest of everything that can influence a run: the
+normalised files, the entrypoint, stdin, the time limit and the interpreter
+build. Two tiers are available: an in-process LRU used when no Redis URL is
+configured, and a Redis-backed LRU shared by every web and Celery worker.
+Cache failures are logged and treated as misses so execution never depends
+on the cache being reachable.
+
+Only deterministic programs are cached. A program that imports a module whose
+results vary between runs (`random`, `time`, `datetime`, `uuid`, threads,
+sockets, ...) or imports modules dynamically is always executed, so a "Run"
+of a dice simulator never replays the first roll. The check is a static scan
+of import statements: nondeterminism it cannot see, such as iterating a `set`
+of strings under hash randomisation, `id()` values or reading the clock via
+`os.times()`, is still cached, so graded test cases should not rely on it.
+"""
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import logging
+import platform
+import sys
+import threading
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+
+from core.lru import LocalLRU, RedisLRU
+
+logger = logging.getLogger(__name__)
+
+INTERPRETER_FINGERPRINT = f"{platform.python_implementation()}-{sys.version}"
+
+NONDETERMINISTIC_MODULES = frozenset(
+    {
+        "asyncio",
+        "concurrent",
+        "datetime",
+        "importlib",
+        "multiprocessing",
+        "random",
+        "secrets",
+        "socket",
+        "subprocess",
+        "threading",
+        "time",
+        "urllib",
+        "uuid",
+    }
+)
+
+
+def files_digest(files: Iterable[Dict[str, str]]) -> str:
+    """Stable digest of normalised execution files, independent of order."""
+
+    canonical = sorted((file["name"], file["content"]) for file in files)
+    return hashlib.sha256(json.dumps(canonical).encode("utf-8")).hexdigest()
+
+
+def _imported_modules(tree: ast.AST) -> Iterable[str]:
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield alias.name
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            yield node.module
+        elif isinstance(node, ast.Name) and node.id == "__import__":
+            yield "importlib"
+
+
+def is_deterministic(files: Iterable[Dict[str, str]]) -> bool:
+    """Whether the Python files import nothing from NONDETERMINISTIC_MODULES.
+
+    Files that fail to parse count as deterministic: they exit with the same
+    SyntaxError every time.
+    """
+
+    for file in files:
+        if not file["name"].endswith(".py"):
+            continue
+        try:
+            tree = ast.parse(file["content"])
+        except (SyntaxError, ValueError):
+            continue
+        for module in _imported_modules(tree):
+            if module.partition(".")[0] in NONDETERMINISTIC_MODULES:
+                return False
+    return True
+
+
+def execution_key(files_hash: str, entrypoint: str, stdin: Optional[str], time_limit: int) -> str:
+    material = json.dumps(
+        [files_hash, entrypoint, stdin, time_limit, INTERPRETER_FINGERPRINT]
+    ).encode("utf-8")
+    return hashlib.sha256(material).hexdigest()
+
+
+class ExecutionResultCache:
+    def __init__(self, backend) -> None:
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            return self.backend.get(key)
+        except Exception:
+            logger.warning("Execution result cache read failed", exc_info=True)
+            return None
+
+    def set(self, key: str, value: dict) -> None:
+        try:
+            self.backend.set(key, value)
+        except Exception:
+            logger.warning("Execution result cache write failed", exc_info=True)
+
+    def stats(self) -> Dict[str, int]:
+        try:
+            stats = self.backend.stats()
+        except Exception as exc:
+            return {"error": str(exc)}  # type: ignore[dict-item]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0  # type: ignore[assignment]
+        return stats
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+_result_cache: Optional[ExecutionResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ExecutionResultCache]:
+    """Return the configured result cache, or None when caching is disabled."""
+
+    global _result_cache
+    max_entries = int(getattr(settings, "CODE_RESULT_CACHE_MAX_ENTRIES", 0) or 0)
+    if max_entries <= 0:
+        return None
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                url = getattr(settings, "CODE_RESULT_CACHE_URL", "")
+                if url:
+                    backend = RedisLRU(
+                        url,
+                        max_entries=max_entries,
+                        ttl=int(getattr(settings, "CODE_RESULT_CACHE_TTL", 86400)),
+                        prefix="code-results",
+                    )
+                else:
+                    backend = LocalLRU(max_entries)
+                _result_cache = ExecutionResultCache(backend)
+    return _result_cache
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+
+from students.models import Student, StudentCodingChallengeState
+from students.services.coding import CodeExecutionError, run_test_cases
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+PENDING_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+TERMINAL_STATUSES = (STATUS_COMPLETED, STATUS_FAILED)
+# Key for the transaction-scoped advisory lock that serialises the global
+# pending count on PostgreSQL.
+CAPACITY_LOCK_KEY = 0x6D72_6772
+
+
+class GradingQueueFull(Exception):
+    """Raised when a concurrency cap prevents a new submission from queueing."""
+
+    def __init__(self, message: str, retry_in: int) -> None:
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+class SubmissionAlreadyPending(Exception):
+    """Raised when the challenge already has a submission being graded."""
+
+    def __init__(self, job_id: str) -> None:
+        super().__init__("A submission for this challenge is already being graded.")
+        self.job_id = job_id
+
+
+def grading_group_name(job_id: str) -> str:
+    return f"coding-submission-{job_id}"
+
+
+def _stale_after() -> timedelta:
+    return timedelta(seconds=settings.CODE_GRADING_STALE_SECONDS)
+
+
+def _is_pending(state: StudentCodingChallengeState) -> bool:
+    result = state.last_run_result or {}
+    if result.get("type") != "submit" or result.get("status") not in PENDING_STATUSES:
+        return False
+    return bool(state.last_run_at and state.last_run_at >= timezone.now() - _stale_after())
+
+
+def _pending_states():
+    return StudentCodingChallengeState.objects.filter(
+        last_run_result__type="submit",
+        last_run_result__status__in=PENDING_STATUSES,
+        last_run_at__gte=timezone.now() - _stale_after(),
+    )
+
+
+def _lock_capacity(state: StudentCodingChallengeState) -> StudentCodingChallengeState:
+    """Serialise capacity checks until the surrounding transaction ends.
+
+    The student's row is locked so their own submissions queue one at a time,
+    and on PostgreSQL an advisory lock does the same for the global count.
+    SQLite already allows a single writer. Returns the state re-read under
+    the lock.
+    """
+
+    Student.objects.select_for_update().filter(pk=state.student_id).exists()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [CAPACITY_LOCK_KEY])
+    return StudentCodingChallengeState.objects.select_for_update().get(pk=state.pk)
+
+
+def _check_capacity(state: StudentCodingChallengeState) -> None:
+    if _is_pending(state):
+        raise SubmissionAlreadyPending(state.last_run_result["job_id"])
+
+    pending = _pending_states()
+    if pending.count() >= settings.CODE_GRADING_MAX_PENDING_GLOBAL:
+        raise GradingQueueFull("Grading is busy right now. Please try again shortly.", retry_in=10)
+    if pending.filter(student_id=state.student_id).count() >= settings.CODE_GRADING_MAX_PENDING_PER_STUDENT:
+        raise GradingQueueFull("You already have submissions being graded.", retry_in=5)
+
+
+def submission_payload(state: StudentCodingChallengeState) -> Dict[str, Any]:
+    """Client-facing view of the latest submission stored on the state."""
+
+    result = dict(state.last_run_result or {})
+    payload: Dict[str, Any] = {
+        "job_id": result.get("job_id"),
+        "status": result.get("status", STATUS_COMPLETED),
+        "passed": result.get("passed"),
+        "cases": result.get("cases", []),
+        "files": state.files,
+    }
+    if result.get("detail"):
+        payload["detail"] = result["detail"]
+    if result.get("passed") and state.challenge.solution_files:
+        payload["solution_files"] = state.challenge.solution_files
+    return payload
+
+
+def enqueue_submission(
+    state: StudentCodingChallengeState,
+    files: List[Dict[str, str]],
+) -> str:
+    """Record a queued submission and hand it to Celery (or grade inline).
+
+    Returns the job id that clients use to poll or subscribe for the result.
+    """
+
+    job_id = uuid.uuid4().hex
+    with transaction.atomic():
+        # The count and the insert must happen under one lock, or concurrent
+        # submissions all pass the check before any of them is saved.
+        locked = _lock_capacity(state)
+        _check_capacity(locked)
+        state.files = files
+        state.last_run_result = {"type": "submit", "status": STATUS_QUEUED, "job_id": job_id}
+        state.last_run_at = timezone.now()
+        state.save(update_fields=["files", "last_run_result", "last_run_at", "updated_at"])
+
+    if settings.CODE_GRADING_ASYNC:
+        from students.tasks import grade_coding_submission_task
+
+        try:
+            grade_coding_submission_task.apply_async(args=[state.pk, job_id], task_id=job_id)
+        except OperationalError as exc:
+            logger.error("Could not enqueue grading job %s: %s", job_id, exc)
+            state.last_run_result = {
+                "type": "submit",
+                "status": STATUS_FAILED,
+                "job_id": job_id,
+                "passed": False,
+                "cases": [],
+                "detail": "Grading is temporarily unavailable.",
+            }
+            state.save(update_fields=["last_run_result", "updated_at"])
+            raise GradingQueueFull("Grading is temporarily unavailable.", retry_in=30) from exc
+    else:
+        grade_submission(state.pk, job_id, push=False)
+    return job_id
+
+
+def grade_submission(
+    state_id: int,
+    job_id: str,
+    *,
+    push: bool = True,
+) -> Optional[StudentCodingChallengeState]:
+    """Run the test cases for a queued submission and store the outcome."""
+
+    state = (
+        StudentCodingChallengeState.objects.select_related("challenge")
+        .filter(pk=state_id)
+        .first()
+    )
+    if state is None or (state.last_run_result or {}).get("job_id") != job_id:
+        # The state was reset or superseded while the job was waiting.
+        return None
+
+    state.last_run_result = {"type": "submit", "status": STATUS_RUNNING, "job_id": job_id}
+    state.save(update_fields=["last_run_result", "updated_at"])
+
+    challenge = state.challenge
+    try:
+        passed, case_results = run_test_cases(
+            state.files,
+            challenge.entrypoint_filename,
+            challenge.test_cases,
+            time_limit=challenge.time_limit_seconds,
+        )
+    except CodeExecutionError as exc:
+        state.last_run_result = {
+            "type": "submit",
+            "status": STATUS_FAILED,
+            "job_id": job_id,
+            "passed": False,
+            "cases": [],
+            "detail": str(exc),
+        }
+        passed = False
+    except Exception:
+        logger.error("Grading job %s failed unexpectedly", job_id, exc_info=True)
+        state.last_run_result = {
+            "type": "submit",
+            "status": STATUS_FAILED,
+            "job_id": job_id,
+            "passed": False,
+            "cases": [],
+            "detail": "Grading failed unexpectedly. Please submit again.",
+        }
+        passed = False
+    else:
+        state.last_run_result = {
+            "type": "submit",
+            "status": STATUS_COMPLETED,
+            "job_id": job_id,
+            "passed": passed,
+            "cases": case_results,
+        }
+
+    now = timezone.now()
+    state.last_run_at = now
+    updates = ["last_run_result", "last_run_at", "updated_at"]
+    if passed and not state.is_completed:
+        state.is_completed = True
+        state.completed_at = now
+        updates.extend(["is_completed", "completed_at"])
+    state.save(update_fields=updates)
+
+    if push:
+        _push_result(job_id, submission_payload(state))
+    return state
+
+
+def _push_result(job_id: str, payload: Dict[str, Any]) -> None:
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            grading_group_name(job_id),
+            {"type": "grading.result", "payload": payload},
+        )
+    except Exception:  # pragma: no cover - push is best effort, polling still works
+        logger.warning("Could not push grading result for job %s", job_id, exc_info=True)
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from celery import shared_task
+
+from students.services.grading import grade_submission
+
+
+@shared_task(name="students.grade_coding_submission")
+def grade_coding_submission_task(state_id: int, job_id: str) -> str:
+    """Grade a queued coding challenge submission outside the request cycle."""
+
+    state = grade_submission(state_id, job_id)
+    if state is None:
+        return f"Submission {job_id} skipped"
+    return f"Submission {job_id} {state.last_run_result.get('status')}"
@@ -0,0 +1,119 @@
+"""
+Unit tests for the lesson code timeline served to students
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from courses.models import Course, Lesson, LessonCodeSnippet, LessonVideo, Module, PublishStatus
+from schools.models import School
+from students.models import Student, StudentCourse
+
+User = get_user_model()
+
+
+class LessonCodeTimelineTest(TestCase):
+    """Lesson playback carries a timeline index instead of every snapshot"""
+
+    def setUp(self):
+        school = School.objects.create(
+            school_id="TIMELINE-SCHOOL",
+            name="Timeline School",
+            region="Test Region",
+            district="Test District",
+            phone="1234567890",
+        )
+        self.user = User.objects.create_user(
+            email="timeline@example.com",
+            first_name="Time",
+            last_name="Line",
+            password="testpass123",
+        )
+        self.student = Student.objects.create(user=self.user, school=school)
+        self.course = Course.objects.create(
+            title="Intro to HTML",
+            summary="Basics",
+            description="",
+            status=PublishStatus.PUBLISHED,
+        )
+        module = Module.objects.create(course=self.course, title="Getting started", order=1, status=PublishStatus.PUBLISHED)
+        self.lesson = Lesson.objects.create(
+            course=self.course,
+            module=module,
+            title="What is HTML?",
+            order=1,
+            status=PublishStatus.PUBLISHED,
+            duration_seconds=120,
+        )
+        LessonVideo.objects.create(lesson=self.lesson, video_url="https://cdn.example.com/html-intro.mp4", duration=120)
+        self.first = LessonCodeSnippet.objects.create(
+            lesson=self.lesson,
+            timestamp=5,
+            code_content="<h1>Hello</h1>",
+            cursor_position={"line": 1, "column": 14},
+            scroll_position={"top": 0},
+        )
+        LessonCodeSnippet.objects.create(
+            lesson=self.lesson,
+            timestamp=45,
+            code_content="<h1>Hello HTML</h1>",
+            cursor_position={"line": 1, "column": 19},
+            scroll_position={"top": 0},
+            output="Hello HTML",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.playback_url = reverse("students:student_lesson_playback", args=[self.lesson.lesson_id])
+        self.timeline_url = reverse("students:student_lesson_timeline", args=[self.lesson.lesson_id])
+
+    def _enroll(self):
+        StudentCourse.objects.create(student=self.student, course=self.course, last_seen=timezone.now())
+
+    def _events(self, **params):
+        response = self.client.get(self.timeline_url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return json.loads(response.content)["events"]
+
+    def test_playback_returns_timeline_index(self):
+        self._enroll()
+
+        payload = self.client.get(self.playback_url).data["data"]
+
+        self.assertNotIn("code_snippets", payload)
+        timeline = payload["code_timeline"]
+        self.assertEqual(timeline["count"], 2)
+        self.assertEqual(timeline["duration"], 45)
+        self.assertIn(f"{self.timeline_url}?v=", timeline["url"])
+        self.assertEqual(timeline["chunks"][0]["start"], 5)
+
+    def test_chunk_holds_keyframe_and_deltas(self):
+        self._enroll()
+
+        keyframe, delta = self._events(at=60)
+
+        self.assertEqual(keyframe["code"], "<h1>Hello</h1>")
+        self.assertEqual(keyframe["id"], self.first.pk)
+        self.assertNotIn("code", delta)
+        self.assertEqual(delta["ops"], [9, " HTML"])
+        self.assertEqual(delta["output"], "Hello HTML")
+        self.assertEqual(delta["cursor"], {"line": 1, "column": 19})
+        self.assertNotIn("scroll", delta)
+
+    def test_edited_snippet_rebuilds_timeline(self):
+        self._enroll()
+        self._events(chunk=0)
+
+        self.first.code_content = "<h2>Hello</h2>"
+        self.first.save()
+
+        self.assertEqual(self._events(chunk=0)[0]["code"], "<h2>Hello</h2>")
+
+    def test_students_must_be_enrolled(self):
+        response = self.client.get(self.timeline_url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,102 @@
+"""
+Unit tests for the coding submission websocket
+"""
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core import routing
+from core.ws_auth import JWTAuthMiddlewareStack
+from courses.models import CodingChallenge, Course, PublishStatus
+from schools.models import School
+from students.models import Student, StudentCodingChallengeState
+from students.services.grading import grading_group_name
+
+User = get_user_model()
+
+application = JWTAuthMiddlewareStack(URLRouter(routing.websocket_urlpatterns))
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class CodingSubmissionConsumerTest(TestCase):
+    """Students holding a JWT receive the result of their own submission"""
+
+    def setUp(self):
+        school = School.objects.create(
+            school_id="WS-SCHOOL",
+            name="Socket School",
+            region="Test Region",
+            district="Test District",
+            phone="1234567890",
+        )
+        self.user = User.objects.create_user(
+            email="socket@example.com",
+            first_name="Socket",
+            last_name="Student",
+            password="testpass123",
+        )
+        student = Student.objects.create(user=self.user, school=school)
+        course = Course.objects.create(
+            title="Python Basics",
+            summary="Basics",
+            description="",
+            status=PublishStatus.PUBLISHED,
+        )
+        challenge = CodingChallenge.objects.create(
+            course=course,
+            title="Echo",
+            instructions="Print it.",
+            difficulty="easy",
+            starter_files=[{"name": "main.py", "content": "print(input())\n"}],
+            test_cases=[{"stdin": "hi\n", "expected_output": "hi"}],
+        )
+        self.job_id = "a" * 32
+        self.state = StudentCodingChallengeState.objects.create(
+            student=student,
+            challenge=challenge,
+            last_run_result={"type": "submit", "status": "queued", "job_id": self.job_id},
+        )
+        self.token = str(AccessToken.for_user(self.user))
+        self.path = f"/ws/coding/submissions/{self.job_id}/"
+
+    async def test_query_string_token_receives_pushed_result(self):
+        communicator = WebsocketCommunicator(application, f"{self.path}?token={self.token}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertTrue(await communicator.receive_nothing())
+
+        await get_channel_layer().group_send(
+            grading_group_name(self.job_id),
+            {"type": "grading.result", "payload": {"job_id": self.job_id, "status": "completed"}},
+        )
+        message = await communicator.receive_json_from()
+        self.assertEqual(message["data"]["status"], "completed")
+        await communicator.disconnect()
+
+    async def test_settled_job_is_sent_on_connect(self):
+        self.state.last_run_result = {
+            "type": "submit",
+            "status": "completed",
+            "job_id": self.job_id,
+            "passed": True,
+            "cases": [],
+        }
+        await self.state.asave(update_fields=["last_run_result"])
+
+        communicator = WebsocketCommunicator(application, self.path, subprotocols=["Bearer", self.token])
+        connected, subprotocol = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual(subprotocol, "Bearer")
+        message = await communicator.receive_json_from()
+        self.assertEqual(message["type"], "result")
+        self.assertTrue(message["data"]["passed"])
+        await communicator.disconnect()
+
+    async def test_missing_or_invalid_token_is_rejected(self):
+        for path in (self.path, f"{self.path}?token=not-a-jwt"):
+            communicator = WebsocketCommunicator(application, path)
+            connected, _ = await communicator.connect()
+            self.assertFalse(connected)
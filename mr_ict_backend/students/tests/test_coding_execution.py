@@ -0,0 +1,250 @@
+"""
+Unit tests for the coding execution service
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.lru import LocalLRU
+from students.services import coding
+from students.services.coding import (
+    ExecutionWorkspace,
+    PythonWorkerPool,
+    WorkerUnavailable,
+    run_python_files,
+    run_test_cases,
+)
+from students.services.execution_cache import ExecutionResultCache
+
+ADDER = [
+    {
+        "name": "main.py",
+        "content": "first, second = map(int, input().split())\nprint(first + second)\n",
+    }
+]
+
+
+class PythonWorkerPoolTest(SimpleTestCase):
+    """Behaviour of the warm worker pool"""
+
+    def setUp(self):
+        self.pool = PythonWorkerPool(size=1, max_jobs=2)
+        self.addCleanup(self.pool.shutdown)
+
+    def test_runs_job_in_prepared_workspace(self):
+        with ExecutionWorkspace(ADDER) as workspace:
+            result = self.pool.run(workspace.root, "main.py", stdin="2 3\n", time_limit=5)
+        self.assertEqual(result.stdout.strip(), "5")
+        self.assertEqual(result["exit_code"], 0)
+        self.assertFalse(result["timed_out"])
+
+    def test_worker_recycled_after_max_jobs(self):
+        with ExecutionWorkspace(ADDER) as workspace:
+            self.pool.run(workspace.root, "main.py", stdin="1 1\n", time_limit=5)
+            first_worker = self.pool._idle[0]
+            self.pool.run(workspace.root, "main.py", stdin="1 1\n", time_limit=5)
+        self.assertFalse(first_worker.alive)
+        self.assertEqual(self.pool._started, 0)
+
+    def test_waiters_get_replacement_workers(self):
+        pool = PythonWorkerPool(size=1, max_jobs=1, acquire_timeout=20)
+        self.addCleanup(pool.shutdown)
+        with ExecutionWorkspace(ADDER) as workspace:
+            workspace.prepare()
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                futures = [
+                    executor.submit(pool.run, workspace.root, "main.py", stdin=f"{i} 1\n", time_limit=5)
+                    for i in range(3)
+                ]
+                outputs = sorted(future.result(timeout=30).stdout.strip() for future in futures)
+        self.assertEqual(outputs, ["1", "2", "3"])
+        self.assertEqual(pool._started, 0)
+
+    def test_failed_run_frees_its_slot(self):
+        pool = PythonWorkerPool(size=1, max_jobs=10, acquire_timeout=1)
+        self.addCleanup(pool.shutdown)
+        with ExecutionWorkspace(ADDER) as workspace:
+            with mock.patch.object(coding._PythonWorker, "run", side_effect=RuntimeError("boom")):
+                with self.assertRaises(RuntimeError):
+                    pool.run(workspace.root, "main.py", stdin="1 1\n", time_limit=5)
+            self.assertEqual(pool._started, 0)
+            result = pool.run(workspace.root, "main.py", stdin="1 1\n", time_limit=5)
+        self.assertEqual(result.stdout.strip(), "2")
+
+    def test_acquire_gives_up_after_timeout(self):
+        pool = PythonWorkerPool(size=1, max_jobs=10, acquire_timeout=0.1)
+        self.addCleanup(pool.shutdown)
+        busy = pool._acquire()
+        self.addCleanup(pool._release, busy, healthy=False)
+        with self.assertRaises(WorkerUnavailable):
+            pool._acquire()
+
+    def test_timeout_kills_run_but_keeps_worker(self):
+        files = [{"name": "main.py", "content": "print('start')\nwhile True:\n    pass\n"}]
+        with ExecutionWorkspace(files) as workspace:
+            result = self.pool.run(workspace.root, "main.py", stdin=None, time_limit=1)
+        self.assertTrue(result["timed_out"])
+        self.assertEqual(result["exit_code"], -1)
+        self.assertEqual(result.stdout, "start\n")
+        self.assertEqual(len(self.pool._idle), 1)
+
+
+class RunTestCasesTest(SimpleTestCase):
+    """run_test_cases prepares one workspace and survives worker crashes"""
+
+    def test_workspace_prepared_once_for_all_cases(self):
+        cases = [{"stdin": f"{i} 1\n", "expected_output": str(i + 1)} for i in range(4)]
+        with mock.patch.object(
+            coding.tempfile, "TemporaryDirectory", wraps=coding.tempfile.TemporaryDirectory
+        ) as created:
+            passed, results = run_test_cases(ADDER, "main.py", cases)
+        self.assertTrue(passed)
+        self.assertEqual(len(results), 4)
+        self.assertEqual(created.call_count, 1)
+
+    def test_falls_back_to_cold_start_when_worker_crashes(self):
+        pool = PythonWorkerPool(size=1, max_jobs=10)
+        self.addCleanup(pool.shutdown)
+        pool.warm()
+        pool._idle[0].process.kill()
+        with mock.patch.object(coding, "get_worker_pool", return_value=pool):
+            result = run_python_files(ADDER, "main.py", stdin="4 2\n", use_cache=False)
+        self.assertEqual(result.stdout.strip(), "6")
+        self.assertEqual(pool._started, 0)
+
+
+class ExecutionResultCacheTest(SimpleTestCase):
+    """Identical runs are served from the content-addressed cache"""
+
+    def setUp(self):
+        self.cache = ExecutionResultCache(LocalLRU(max_entries=2))
+        patcher = mock.patch.object(coding, "get_result_cache", return_value=self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_run_is_a_cache_hit(self):
+        first = run_python_files(ADDER, "main.py", stdin="1 2\n")
+        with mock.patch.object(coding, "get_worker_pool") as get_pool, mock.patch.object(coding, "_run_cold") as run_cold:
+            second = run_python_files(ADDER, "main.py", stdin="1 2\n")
+        get_pool.assert_not_called()
+        run_cold.assert_not_called()
+        self.assertNotIn("cached", first)
+        self.assertTrue(second["cached"])
+        self.assertEqual(second.stdout, first.stdout)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_key_covers_stdin_and_time_limit(self):
+        run_python_files(ADDER, "main.py", stdin="1 2\n")
+        other_stdin = run_python_files(ADDER, "main.py", stdin="2 2\n")
+        other_limit = run_python_files(ADDER, "main.py", stdin="1 2\n", time_limit=3)
+        self.assertNotIn("cached", other_stdin)
+        self.assertNotIn("cached", other_limit)
+        self.assertEqual(other_stdin.stdout.strip(), "4")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for stdin in ("1 1\n", "2 2\n", "3 3\n"):
+            run_python_files(ADDER, "main.py", stdin=stdin)
+        self.assertEqual(self.cache.stats()["entries"], 2)
+        self.assertNotIn("cached", run_python_files(ADDER, "main.py", stdin="1 1\n"))
+        self.assertTrue(run_python_files(ADDER, "main.py", stdin="3 3\n")["cached"])
+
+    def test_timed_out_runs_are_not_cached(self):
+        files = [{"name": "main.py", "content": "while True:\n    pass\n"}]
+        run_python_files(files, "main.py", time_limit=1)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_nondeterministic_programs_are_not_cached(self):
+        for content in (
+            "import random\nprint(random.random())\n",
+            "from datetime import datetime\nprint(datetime.now())\n",
+            "rng = __import__('random')\nprint(rng.random())\n",
+        ):
+            files = [{"name": "main.py", "content": content}]
+            first = run_python_files(files, "main.py")
+            second = run_python_files(files, "main.py")
+            self.assertNotIn("cached", second)
+            self.assertNotEqual(first.stdout, second.stdout)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_imports_in_helper_files_are_checked(self):
+        files = ADDER + [{"name": "helpers.py", "content": "import time\n"}]
+        run_python_files(files, "main.py", stdin="1 2\n")
+        self.assertNotIn("cached", run_python_files(files, "main.py", stdin="1 2\n"))
+
+
+class ParallelTestCasesTest(SimpleTestCase):
+    """Concurrent case execution keeps sequential semantics"""
+
+    SLOW_ECHO = [
+        {
+            "name": "main.py",
+            "content": "import time\nvalue = input()\ntime.sleep(0.3 if value == 'slow' else 0)\nprint(value)\n",
+        }
+    ]
+
+    def test_results_keep_declared_order(self):
+        cases = [
+            {"name": "slow", "stdin": "slow\n", "expected_output": "slow"},
+            {"name": "fast", "stdin": "fast\n", "expected_output": "fast"},
+            {"name": "quick", "stdin": "quick\n", "expected_output": "quick"},
+        ]
+        passed, results = run_test_cases(self.SLOW_ECHO, "main.py", cases, use_cache=False, max_workers=3)
+        self.assertTrue(passed)
+        self.assertEqual([result["name"] for result in results], ["slow", "fast", "quick"])
+
+    def test_matches_sequential_results_on_failure(self):
+        cases = [{"stdin": f"{i} 1\n", "expected_output": str(i + 1)} for i in range(6)]
+        cases[2]["expected_output"] = "wrong"
+        cases[4]["expected_output"] = "wrong"
+        sequential = run_test_cases(ADDER, "main.py", cases, use_cache=False, max_workers=1)
+        parallel = run_test_cases(ADDER, "main.py", cases, use_cache=False, max_workers=4)
+        self.assertFalse(parallel[0])
+        self.assertEqual(
+            [result["name"] for result in parallel[1]],
+            [result["name"] for result in sequential[1]],
+        )
+        self.assertEqual(len(parallel[1]), 3)
+
+    def test_failure_cancels_outstanding_cases(self):
+        cases = [{"stdin": "fast\n", "expected_output": "wrong"}]
+        cases += [{"stdin": "slow\n", "expected_output": "slow"} for _ in range(10)]
+        with mock.patch.object(coding, "run_in_workspace", wraps=coding.run_in_workspace) as run:
+            passed, results = run_test_cases(self.SLOW_ECHO, "main.py", cases, use_cache=False, max_workers=2)
+        self.assertFalse(passed)
+        self.assertEqual(len(results), 1)
+        self.assertLess(run.call_count, len(cases))
+
+    def test_failure_returns_without_waiting_for_running_cases(self):
+        files = [
+            {
+                "name": "main.py",
+                "content": "import time\nvalue = input()\ntime.sleep(2 if value == 'slow' else 0.2)\nprint(value)\n",
+            }
+        ]
+        cases = [
+            {"stdin": "fast\n", "expected_output": "wrong"},
+            {"stdin": "slow\n", "expected_output": "slow"},
+        ]
+        released = threading.Event()
+        with mock.patch.object(coding.ExecutionWorkspace, "close", autospec=True, side_effect=lambda _: released.set()):
+            started = time.monotonic()
+            passed, results = run_test_cases(files, "main.py", cases, use_cache=False, max_workers=2)
+            elapsed = time.monotonic() - started
+            self.assertFalse(released.is_set())
+            self.assertTrue(released.wait(timeout=10))
+        self.assertFalse(passed)
+        self.assertEqual(len(results), 1)
+        self.assertLess(elapsed, 1.5)
+
+    def test_non_stopping_failures_run_every_case(self):
+        cases = [
+            {"stdin": f"{i} 1\n", "expected_output": "wrong", "stop_on_failure": False}
+            for i in range(4)
+        ]
+        passed, results = run_test_cases(ADDER, "main.py", cases, use_cache=False, max_workers=4)
+        self.assertFalse(passed)
+        self.assertEqual(len(results), 4)
@@ -0,0 +1,131 @@
+"""
+Unit tests for queued coding challenge grading
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from courses.models import CodingChallenge, Course, PublishStatus
+from schools.models import School
+from students.models import Student, StudentCodingChallengeState
+from students.services.grading import grade_submission
+from students.tasks import grade_coding_submission_task
+
+User = get_user_model()
+
+ADDER = "first, second = map(int, input().split())\nprint(first + second)\n"
+
+
+@override_settings(CODE_GRADING_ASYNC=True, CODE_GRADING_MAX_PENDING_PER_STUDENT=1)
+class CodingSubmissionQueueTest(APITestCase):
+    """Submissions are enqueued and their result is fetched by job id"""
+
+    def setUp(self):
+        school = School.objects.create(
+            school_id="GRADE-SCHOOL",
+            name="Grading School",
+            region="Test Region",
+            district="Test District",
+            phone="1234567890",
+        )
+        self.user = User.objects.create_user(
+            email="grader@example.com",
+            first_name="Queue",
+            last_name="Student",
+            password="testpass123",
+        )
+        self.student = Student.objects.create(user=self.user, school=school)
+        course = Course.objects.create(
+            title="Python Basics",
+            summary="Basics",
+            description="",
+            status=PublishStatus.PUBLISHED,
+        )
+        self.challenge = CodingChallenge.objects.create(
+            course=course,
+            title="Adder",
+            instructions="Add two numbers.",
+            difficulty="easy",
+            starter_files=[{"name": "main.py", "content": ADDER}],
+            test_cases=[
+                {"name": "small", "stdin": "2 3\n", "expected_output": "5"},
+                {"name": "large", "stdin": "11 19\n", "expected_output": "30"},
+            ],
+        )
+        self.other_challenge = CodingChallenge.objects.create(
+            course=course,
+            title="Adder Again",
+            instructions="Add two numbers again.",
+            difficulty="easy",
+            starter_files=[{"name": "main.py", "content": ADDER}],
+            test_cases=[{"stdin": "1 1\n", "expected_output": "2"}],
+        )
+        self.client.force_authenticate(self.user)
+        self.submit_url = reverse("students:student_coding_challenge_submit", args=[self.challenge.slug])
+
+    def test_submit_returns_job_and_status_reports_result(self):
+        with mock.patch.object(grade_coding_submission_task, "apply_async") as apply_async:
+            response = self.client.post(self.submit_url, {}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data["data"]["job_id"]
+        self.assertEqual(response.data["data"]["status"], "queued")
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.kwargs["task_id"], job_id)
+
+        status_url = reverse(
+            "students:student_coding_challenge_submission_status",
+            args=[self.challenge.slug, job_id],
+        )
+        self.assertEqual(self.client.get(status_url).data["data"]["status"], "queued")
+
+        grade_submission(*apply_async.call_args.kwargs["args"], push=False)
+
+        result = self.client.get(status_url).data["data"]
+        self.assertEqual(result["status"], "completed")
+        self.assertTrue(result["passed"])
+        self.assertEqual(len(result["cases"]), 2)
+        state = StudentCodingChallengeState.objects.get(student=self.student, challenge=self.challenge)
+        self.assertTrue(state.is_completed)
+
+    def test_pending_submission_and_student_cap_are_enforced(self):
+        with mock.patch.object(grade_coding_submission_task, "apply_async"):
+            first = self.client.post(self.submit_url, {}, format="json")
+            duplicate = self.client.post(self.submit_url, {}, format="json")
+            other_url = reverse("students:student_coding_challenge_submit", args=[self.other_challenge.slug])
+            capped = self.client.post(other_url, {}, format="json")
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(duplicate.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(duplicate.data["job_id"], first.data["data"]["job_id"])
+        self.assertEqual(capped.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("retry_in", capped.data)
+
+    def test_superseded_job_is_skipped(self):
+        with mock.patch.object(grade_coding_submission_task, "apply_async") as apply_async:
+            self.client.post(self.submit_url, {}, format="json")
+        state_id, job_id = apply_async.call_args.kwargs["args"]
+        self.client.post(reverse("students:student_coding_challenge_reset", args=[self.challenge.slug]))
+
+        self.assertIsNone(grade_submission(state_id, job_id, push=False))
+
+    def test_unexpected_grading_error_is_reported_as_failed(self):
+        with mock.patch.object(grade_coding_submission_task, "apply_async") as apply_async:
+            self.client.post(self.submit_url, {}, format="json")
+        state_id, job_id = apply_async.call_args.kwargs["args"]
+
+        with mock.patch("students.services.grading.run_test_cases", side_effect=RuntimeError("pool exploded")), \
+                mock.patch("students.services.grading._push_result") as push, \
+                self.assertLogs("students.services.grading", level="ERROR"):
+            grade_submission(state_id, job_id)
+
+        result = push.call_args.args[1]
+        self.assertEqual(result["status"], "failed")
+        self.assertNotIn("pool exploded", result["detail"])
+        state = StudentCodingChallengeState.objects.get(pk=state_id)
+        self.assertEqual(state.last_run_result["status"], "failed")
+        self.assertFalse(state.is_completed)
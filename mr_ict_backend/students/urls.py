@@ -7,6 +7,7 @@ from students.api.coding_views import (
     CodingChallengeListView,
     CodingChallengeResetView,
     CodingChallengeRunView,
+    CodingChallengeSubmissionStatusView,
     CodingChallengeSubmitView,
 )
 from students.api.project_views import (
@@ -21,6 +22,7 @@ from students.api.views import (
     CourseCatalogView,
     CourseDetailView,
     CourseEnrollmentView,
+    LessonCodeTimelineView,
     LessonPlaybackView,
     LessonProgressView,
     StudentDashboardView,
@@ -81,6 +83,7 @@ urlpatterns = [
     path('experience/catalog/<str:course_id>/', CourseDetailView.as_view(), name='student_course_detail'),
     path('experience/catalog/<str:course_id>/enroll/', CourseEnrollmentView.as_view(), name='student_course_enroll'),
     path('experience/lessons/<str:lesson_id>/', LessonPlaybackView.as_view(), name='student_lesson_playback'),
+    path('experience/lessons/<str:lesson_id>/timeline/', LessonCodeTimelineView.as_view(), name='student_lesson_timeline'),
     path('experience/lessons/<str:lesson_id>/progress/', LessonProgressView.as_view(), name='student_lesson_progress'),
     path('experience/lessons/<str:lesson_id>/comments/', LessonCommentListCreateView.as_view(), name='student_lesson_comments'),
     path('experience/comments/<int:comment_id>/like/', LessonCommentLikeView.as_view(), name='student_lesson_comment_like'),
@@ -91,6 +94,7 @@ urlpatterns = [
     path('experience/coding/challenges/<slug:slug>/reset/', CodingChallengeResetView.as_view(), name='student_coding_challenge_reset'),
     path('experience/coding/challenges/<slug:slug>/run/', CodingChallengeRunView.as_view(), name='student_coding_challenge_run'),
     path('experience/coding/challenges/<slug:slug>/submit/', CodingChallengeSubmitView.as_view(), name='student_coding_challenge_submit'),
+    path('experience/coding/challenges/<slug:slug>/submissions/<str:job_id>/', CodingChallengeSubmissionStatusView.as_view(), name='student_coding_challenge_submission_status'),
     path('experience/coding/challenges/<slug:slug>/hint/', CodingChallengeHintView.as_view(), name='student_coding_challenge_hint'),
     path('experience/projects/', StudentProjectListCreateView.as_view(), name='student_projects'),
     path('experience/projects/<uuid:project_id>/', StudentProjectDetailView.as_view(), name='student_project_detail'),
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VideoTutorialsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'video_tutorials'
+
+    def ready(self):
+        from video_tutorials import signals  # noqa: F401
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from courses.models import Lesson
+from video_tutorials.models import Recording
+from video_tutorials.services.timeline import build_code_timeline, get_code_timeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the code snapshots of every recording and lesson into the "
+        "keyframe + delta timeline format. Timelines that are already current are "
+        "left alone unless --force is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild timelines that are already current.")
+
+    def handle(self, *args, **options):
+        owners = [
+            Recording.objects.filter(code_records__isnull=False).distinct(),
+            Lesson.objects.filter(snippets__isnull=False).distinct(),
+        ]
+        built = raw_bytes = stored_bytes = 0
+        for queryset in owners:
+            for owner in queryset.iterator():
+                timeline = build_code_timeline(owner) if options["force"] else get_code_timeline(owner)
+                built += 1
+                raw_bytes += timeline.raw_bytes
+                stored_bytes += sum(chunk["length"] for chunk in timeline.chunks)
+        self.stdout.write(
+            f"{built} timeline(s): {raw_bytes} bytes of snapshot code stored in {stored_bytes} bytes"
+        )
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from video_tutorials.models import Recording
+from video_tutorials.services.packaging import enqueue_package
+from video_tutorials.signals import PACKAGED_VIDEOS
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue HLS packaging for recordings and lesson videos whose current file has "
+        "no package yet (or whose last attempt failed)."
+    )
+
+    def handle(self, *args, **options):
+        if not settings.VIDEO_HLS_ENABLED:
+            raise CommandError("HLS packaging is disabled (VIDEO_HLS_ENABLED)")
+
+        queued = 0
+        for model in PACKAGED_VIDEOS:
+            videos = model.objects.exclude(video_file="")
+            if model is Recording:
+                videos = videos.filter(status=Recording.STATUS_READY)
+            for video in videos.iterator():
+                package = enqueue_package(video)
+                if package is not None and package.status == package.STATUS_QUEUED:
+                    queued += 1
+        self.stdout.write(f"Queued {queued} video(s) for packaging")
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_tutorials', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recording',
+            name='processing_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='progress',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='source_file',
+            field=models.FileField(blank=True, null=True, upload_to='recordings/uploads/'),
+        ),
+        migrations.AddField(
+            model_name='recording',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='recording',
+            name='video_file',
+            field=models.FileField(blank=True, upload_to='recordings/'),
+        ),
+    ]
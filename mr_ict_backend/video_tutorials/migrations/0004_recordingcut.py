@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_tutorials', '0003_videopackage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordingCut',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.FloatField()),
+                ('end', models.FloatField()),
+                ('source_name', models.CharField(max_length=500)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('progress', models.FloatField(default=0)),
+                ('processing_error', models.TextField(blank=True, default='')),
+                ('reencoded_seconds', models.FloatField(default=0)),
+                ('snapshots_removed', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('recording', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cuts', to='video_tutorials.recording')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
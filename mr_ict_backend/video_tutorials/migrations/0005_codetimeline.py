@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('video_tutorials', '0004_recordingcut'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeTimeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('version', models.PositiveSmallIntegerField(default=1)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('data', models.BinaryField(default=bytes)),
+                ('chunks', models.JSONField(blank=True, default=list)),
+                ('event_count', models.PositiveIntegerField(default=0)),
+                ('raw_bytes', models.PositiveIntegerField(default=0)),
+                ('duration', models.FloatField(default=0)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
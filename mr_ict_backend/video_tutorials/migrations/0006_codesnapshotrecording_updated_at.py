@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_tutorials', '0005_codetimeline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='codesnapshotrecording',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,23 +1,107 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 
 
 
 
 class Recording(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
     title = models.CharField(max_length=1000, unique=True)
     description = models.TextField(blank=True, null=True)
-    video_file = models.FileField(upload_to='recordings/')  # Store videos in a 'videos' folder
+    video_file = models.FileField(upload_to='recordings/', blank=True)  # Transcoded MP4, set once processing is done
+    source_file = models.FileField(upload_to='recordings/uploads/', blank=True, null=True)  # Original upload awaiting transcoding
 
     duration = models.FloatField()  # Seconds from start of video
     published = models.BooleanField(default=False)
 
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_READY)
+    progress = models.FloatField(default=0)  # Percent of the transcode done
+    processing_error = models.TextField(blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)  # Set when a worker claims the transcode, refreshed with progress
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f'Video {self.id} uploaded at {self.created_at}'
 
 
+class VideoPackage(models.Model):
+    """HLS rendition ladder built from the `video_file` of a recording or lesson video."""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    source_name = models.CharField(max_length=500)  # video_file name the package was built from
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.FloatField(default=0)
+    master_playlist = models.CharField(max_length=500, blank=True)  # Storage name of master.m3u8
+    renditions = models.JSONField(default=list, blank=True)  # [{"name", "height", "bandwidth"}]
+    processing_error = models.TextField(blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)  # Set when a worker claims the build, refreshed with progress
+
+    updated_at = models.DateTimeField(auto_now=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+
+    def __str__(self):
+        return f'HLS package for {self.content_type.model} {self.object_id}'
+
+
+class CodeTimeline(models.Model):
+    """Code snapshots of a recording or lesson packed as keyframes plus text deltas.
+
+    Built by `video_tutorials.services.timeline` from the snapshot rows, which
+    stay the editable source; `data` holds the gzipped chunks back to back and
+    `chunks` is the seek index into it.
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey("content_type", "object_id")
+
+    version = models.PositiveSmallIntegerField(default=1)
+    fingerprint = models.CharField(max_length=64)  # Digest of the rows the timeline was built from
+    data = models.BinaryField(default=bytes)
+    chunks = models.JSONField(default=list, blank=True)  # [{"start", "end", "count", "offset", "length"}]
+    event_count = models.PositiveIntegerField(default=0)
+    raw_bytes = models.PositiveIntegerField(default=0)  # Size of the full snapshots it replaces on the wire
+    duration = models.FloatField(default=0)
+
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+
+    def __str__(self):
+        return f'Code timeline for {self.content_type.model} {self.object_id}'
+
+
 class CodeSnapshotRecording(models.Model):
     title = models.CharField(max_length=1000)
     timestamp = models.FloatField()  # Seconds from start of video
@@ -28,11 +112,49 @@ class CodeSnapshotRecording(models.Model):
     is_highlight = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Part of the code timeline fingerprint; bulk .update() calls must set it.
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['timestamp']
 
 
+class RecordingCut(models.Model):
+    """Removal of the `start`-`end` span from a recording and its code snapshots."""
+
+    STATUS_QUEUED = 'queued'
+    STATUS_PROCESSING = 'processing'
+    STATUS_READY = 'ready'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_READY, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    recording = models.ForeignKey(Recording, on_delete=models.CASCADE, related_name='cuts')
+    start = models.FloatField()  # Seconds from start of video
+    end = models.FloatField()
+    source_name = models.CharField(max_length=500)  # video_file name the cut applies to
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.FloatField(default=0)
+    processing_error = models.TextField(blank=True, default='')
+    reencoded_seconds = models.FloatField(default=0)  # Media re-encoded to reach a keyframe; the rest is stream-copied
+    snapshots_removed = models.PositiveIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # Set when a worker claims the cut, refreshed with progress
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'Cut {self.start}-{self.end}s of recording {self.recording_id}'
+
+
 
 
 
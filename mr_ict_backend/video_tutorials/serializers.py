@@ -1,16 +1,40 @@
 from rest_framework import serializers
-from .models import Project, ProjectFile, Recording, CodeSnapshotRecording
+from .models import Project, ProjectFile, Recording, RecordingCut, CodeSnapshotRecording
 
 
 class RecordingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recording
-        fields = ["id", "title", "description", "video_file", "duration", "created_at"]
+        fields = ["id", "title", "description", "video_file", "duration", "status", "created_at"]
 
 class AllRecordingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recording
-        fields = ["id", "title", "video_file", "duration"]
+        fields = ["id", "title", "video_file", "duration", "status"]
+
+
+class RecordingStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Recording
+        fields = ["id", "title", "status", "progress", "processing_error", "video_file"]
+
+
+class RecordingCutSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecordingCut
+        fields = [
+            "id",
+            "recording",
+            "start",
+            "end",
+            "status",
+            "progress",
+            "processing_error",
+            "reencoded_seconds",
+            "snapshots_removed",
+            "created_at",
+            "completed_at",
+        ]
         
 
 class CodeSnapshotRecordingSerializer(serializers.ModelSerializer):
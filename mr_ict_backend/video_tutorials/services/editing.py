@@ -0,0 +1,358 @@
+"""Cutting a span out of a recording without re-encoding the whole lecture.
+
+`cut_plan` splits what is kept into pieces that can be stream-copied and the
+few that cannot. The kept part before the cut ends wherever the cut starts,
+because a copied piece may end on any frame. The part after the cut has to
+start on a keyframe, so only the frames from `end` up to the next keyframe
+(one GOP at most) are re-encoded; everything from that keyframe on is
+copied. Each piece is written as MPEG-TS, which carries codec parameters in
+band, and the pieces are joined with the concat demuxer into a new MP4.
+
+`cut_recording` then swaps the recording's `video_file` and rebases its
+`CodeSnapshotRecording` rows in one transaction: snapshots inside the cut are
+dropped except the last one, which is moved to `start` so the editor shows the
+code as it was when the video resumes, and later snapshots move back by the
+cut length. The old file is deleted after commit, and the HLS package is
+rebuilt by the `post_save` handler in `video_tutorials.signals`.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import ffmpeg
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from kombu.exceptions import OperationalError
+
+from video_tutorials.models import CodeSnapshotRecording, Recording, RecordingCut
+from video_tutorials.services.transcoding import TranscodeError, claimable, local_copy, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = (RecordingCut.STATUS_QUEUED, RecordingCut.STATUS_PROCESSING)
+# Stream copy needs codecs MPEG-TS can carry and that the re-encoded pieces
+# can match; other sources are re-encoded in full.
+COPYABLE_VIDEO = {"h264": "libx264"}
+COPYABLE_AUDIO = {"aac": "aac"}
+# Timestamps closer than this are treated as the same instant.
+EPSILON = 0.001
+
+
+@dataclass
+class Piece:
+    start: float
+    end: float
+    copy: bool
+
+    @property
+    def length(self) -> float:
+        return self.end - self.start
+
+
+def cut_plan(duration: float, start: float, end: float, keyframes: Optional[List[float]]) -> List[Piece]:
+    """Pieces of the source that make up the video with `start`-`end` removed.
+
+    `keyframes` are the video keyframe times of the source; None means the
+    source cannot be stream-copied and every piece is re-encoded.
+    """
+
+    end = min(end, duration)
+    kept = [(0.0, start), (end, duration)]
+    pieces: List[Piece] = []
+    for piece_start, piece_end in kept:
+        if piece_end - piece_start <= EPSILON:
+            continue
+        if keyframes is None:
+            pieces.append(Piece(piece_start, piece_end, copy=False))
+            continue
+        if piece_start <= EPSILON:
+            pieces.append(Piece(piece_start, piece_end, copy=True))
+            continue
+        keyframe = next((time for time in keyframes if time >= piece_start - EPSILON), None)
+        if keyframe is not None and keyframe - piece_start <= EPSILON:
+            pieces.append(Piece(keyframe, piece_end, copy=True))
+        elif keyframe is None or keyframe >= piece_end - EPSILON:
+            pieces.append(Piece(piece_start, piece_end, copy=False))
+        else:
+            pieces.append(Piece(piece_start, keyframe, copy=False))
+            pieces.append(Piece(keyframe, piece_end, copy=True))
+    return pieces
+
+
+def probe_streams(path: str) -> Dict[str, Any]:
+    info = ffmpeg.probe(path, cmd=settings.VIDEO_FFPROBE_BINARY)
+    streams = info.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+    duration = info.get("format", {}).get("duration")
+    return {
+        "video": video,
+        "audio": audio,
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+    }
+
+
+def keyframe_times(path: str) -> List[float]:
+    """Presentation times of the first video stream's keyframes, from packet flags (no decoding)."""
+
+    result = subprocess.run(
+        [
+            settings.VIDEO_FFPROBE_BINARY,
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            path,
+        ],
+        capture_output=True,
+        text=True,
+        timeout=settings.VIDEO_TRANSCODE_TIMEOUT,
+    )
+    if result.returncode != 0:
+        raise TranscodeError(result.stderr.strip()[-2000:] or "ffprobe could not read keyframes")
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(float(pts_time))
+    return sorted(times)
+
+
+def _copyable(streams: Dict[str, Any]) -> bool:
+    video, audio = streams["video"], streams["audio"]
+    if video is None or video.get("codec_name") not in COPYABLE_VIDEO:
+        return False
+    return audio is None or audio.get("codec_name") in COPYABLE_AUDIO
+
+
+def piece_command(source_path: str, output_path: str, piece: Piece, streams: Dict[str, Any]) -> List[str]:
+    # A copied piece starts on a keyframe; seeking a hair past it keeps the
+    # demuxer from snapping back to the previous one.
+    seek = piece.start + EPSILON if piece.copy and piece.start > 0 else piece.start
+    source = ffmpeg.input(source_path, ss=seek) if seek > 0 else ffmpeg.input(source_path)
+    outputs = [source["v:0"]]
+    options: Dict[str, Any] = {"t": round(piece.length, 6), "format": "mpegts"}
+    if streams["audio"] is not None:
+        outputs.append(source["a:0"])
+
+    if piece.copy:
+        options.update(c="copy", avoid_negative_ts="make_zero")
+    else:
+        video, audio = streams["video"] or {}, streams["audio"] or {}
+        options.update(
+            vcodec=COPYABLE_VIDEO.get(video.get("codec_name"), "libx264"),
+            preset=settings.VIDEO_TRANSCODE_PRESET,
+            pix_fmt=video.get("pix_fmt") or "yuv420p",
+        )
+        profile = (video.get("profile") or "").lower().replace("constrained ", "")
+        if profile in ("baseline", "main", "high"):
+            options["profile:v"] = profile
+        if audio:
+            options.update(
+                acodec=COPYABLE_AUDIO.get(audio.get("codec_name"), "aac"),
+                ar=audio.get("sample_rate") or 48000,
+                ac=audio.get("channels") or 2,
+            )
+
+    output = ffmpeg.output(*outputs, output_path, **options)
+    return output.global_args("-progress", "pipe:1", "-nostats", "-loglevel", "error").overwrite_output().compile(
+        cmd=settings.VIDEO_FFMPEG_BINARY
+    )
+
+
+def concat_command(list_path: str, output_path: str, has_audio: bool) -> List[str]:
+    options: Dict[str, Any] = {"c": "copy", "movflags": "+faststart", "format": "mp4"}
+    if has_audio:
+        options["bsf:a"] = "aac_adtstoasc"
+    stream = ffmpeg.input(list_path, format="concat", safe=0).output(output_path, **options)
+    return stream.global_args("-progress", "pipe:1", "-nostats", "-loglevel", "error").overwrite_output().compile(
+        cmd=settings.VIDEO_FFMPEG_BINARY
+    )
+
+
+class _ProgressRecorder:
+    """Maps one step's percent onto the whole job and writes it at most once a second."""
+
+    def __init__(self, cut_id: int) -> None:
+        self.cut_id = cut_id
+        self.offset = 0.0
+        self.weight = 0.0
+        self._written_at = 0.0
+
+    def step(self, offset: float, weight: float) -> "_ProgressRecorder":
+        self.offset, self.weight = offset, weight
+        return self
+
+    def __call__(self, percent: float) -> None:
+        now = time.monotonic()
+        if percent < 100 and now - self._written_at < 1.0:
+            return
+        self._written_at = now
+        overall = round(min(99.0, self.offset + self.weight * percent / 100), 1)
+        RecordingCut.objects.filter(pk=self.cut_id).update(progress=overall, claimed_at=timezone.now())
+
+
+def _mark(cut: RecordingCut, status: str, **fields) -> None:
+    cut.status = status
+    for name, value in fields.items():
+        setattr(cut, name, value)
+    cut.save(update_fields=["status", *fields])
+
+
+def render_cut(source_path: str, output_path: str, cut: RecordingCut, work_dir: str, progress: _ProgressRecorder) -> List[Piece]:
+    streams = probe_streams(source_path)
+    duration = streams["duration"] or cut.recording.duration
+    keyframes = keyframe_times(source_path) if _copyable(streams) else None
+    pieces = cut_plan(duration, cut.start, cut.end, keyframes)
+    if not pieces:
+        raise TranscodeError("The cut would remove the whole recording")
+
+    total = sum(piece.length for piece in pieces) or 1.0
+    done = 0.0
+    lines = []
+    for index, piece in enumerate(pieces):
+        piece_path = os.path.join(work_dir, f"piece_{index:02d}.ts")
+        weight = 90.0 * piece.length / total
+        run_ffmpeg(
+            piece_command(source_path, piece_path, piece, streams),
+            duration=piece.length,
+            on_progress=progress.step(done, weight),
+        )
+        done += weight
+        lines.append(f"file '{piece_path}'\n")
+
+    list_path = os.path.join(work_dir, "pieces.txt")
+    with open(list_path, "w") as handle:
+        handle.writelines(lines)
+    run_ffmpeg(
+        concat_command(list_path, output_path, streams["audio"] is not None),
+        duration=total,
+        on_progress=progress.step(90.0, 10.0),
+    )
+    return pieces
+
+
+def rebase_snapshots(recording: Recording, start: float, end: float) -> int:
+    """Drop snapshots inside the cut and shift later ones back; returns how many were deleted.
+
+    The last snapshot inside the cut is the code on screen when playback
+    resumes, so it is kept and moved to `start`.
+    """
+
+    snapshots = CodeSnapshotRecording.objects.filter(recording=recording)
+    now = timezone.now()
+    inside = snapshots.filter(timestamp__gte=start, timestamp__lte=end).order_by("-timestamp", "-id")
+    resumed = inside.values_list("id", flat=True).first()
+    removed, _ = inside.exclude(id=resumed).delete()
+    if resumed is not None:
+        snapshots.filter(id=resumed).update(timestamp=start, updated_at=now)
+    snapshots.filter(timestamp__gt=end).update(timestamp=F("timestamp") - (end - start), updated_at=now)
+    return removed
+
+
+def cut_recording(cut_id: int) -> Optional[RecordingCut]:
+    """Render a queued cut and apply it to the recording and its snapshots."""
+
+    cut = RecordingCut.objects.select_related("recording").filter(pk=cut_id).first()
+    if cut is None:
+        return None
+    # Claim the job in one UPDATE so a redelivered task cannot run it twice
+    # while its first run is alive.
+    claimed_at = timezone.now()
+    claimed = RecordingCut.objects.filter(claimable(RecordingCut), pk=cut.pk).update(
+        status=RecordingCut.STATUS_PROCESSING, progress=0.0, processing_error="", claimed_at=claimed_at
+    )
+    if not claimed:
+        return None
+    cut.status, cut.progress, cut.processing_error = RecordingCut.STATUS_PROCESSING, 0.0, ""
+    cut.claimed_at = claimed_at
+    recording = cut.recording
+    if recording.video_file.name != cut.source_name:
+        _mark(cut, RecordingCut.STATUS_FAILED, processing_error="The recording was replaced before the cut ran.")
+        return cut
+
+    output_name = f"{get_valid_filename(recording.title)}.mp4"
+    new_name = None
+    try:
+        with local_copy(recording.video_file) as source_path, tempfile.TemporaryDirectory() as work_dir:
+            output_path = os.path.join(work_dir, "cut.mp4")
+            pieces = render_cut(source_path, output_path, cut, work_dir, _ProgressRecorder(cut.pk))
+            with open(output_path, "rb") as result:
+                new_name = recording.video_file.storage.save(recording.video_file.field.generate_filename(recording, output_name), File(result))
+    except (TranscodeError, ffmpeg.Error, FileNotFoundError, subprocess.TimeoutExpired) as exc:
+        detail = exc.stderr.decode("utf-8", "replace")[-2000:] if isinstance(exc, ffmpeg.Error) and exc.stderr else str(exc)
+        logger.error("Cutting recording %s failed: %s", recording.pk, detail)
+        _mark(cut, RecordingCut.STATUS_FAILED, processing_error=detail)
+        return cut
+    except Exception as exc:
+        _abandon(cut, recording, new_name, exc)
+        raise
+
+    removed_seconds = min(cut.end, recording.duration) - cut.start
+    try:
+        with transaction.atomic():
+            recording = Recording.objects.select_for_update().get(pk=recording.pk)
+            if recording.video_file.name != cut.source_name:
+                transaction.on_commit(lambda: recording.video_file.storage.delete(new_name))
+                _mark(cut, RecordingCut.STATUS_FAILED, processing_error="The recording was replaced while the cut ran.")
+                return cut
+            old_name = recording.video_file.name
+            removed = rebase_snapshots(recording, cut.start, cut.end)
+            recording.video_file.name = new_name
+            recording.duration = max(0.0, recording.duration - removed_seconds)
+            recording.save(update_fields=["video_file", "duration"])
+            _mark(
+                cut,
+                RecordingCut.STATUS_READY,
+                progress=100.0,
+                snapshots_removed=removed,
+                reencoded_seconds=round(sum(piece.length for piece in pieces if not piece.copy), 3),
+                completed_at=timezone.now(),
+            )
+            transaction.on_commit(lambda: recording.video_file.storage.delete(old_name))
+    except Exception as exc:
+        _abandon(cut, recording, new_name, exc)
+        raise
+    return cut
+
+
+def _abandon(cut: RecordingCut, recording: Recording, new_name: Optional[str], exc: Exception) -> None:
+    """Fail a cut on an unexpected error so the recording can be cut again."""
+
+    logger.exception("Cutting recording %s failed", recording.pk)
+    if new_name:
+        recording.video_file.storage.delete(new_name)
+    _mark(cut, RecordingCut.STATUS_FAILED, processing_error=f"{exc.__class__.__name__}: {exc}")
+
+
+def enqueue_cut(cut: RecordingCut) -> None:
+    """Hand the cut to Celery once it is committed (or run it inline)."""
+
+    if not settings.VIDEO_TRANSCODE_ASYNC:
+        cut_recording(cut.pk)
+        cut.refresh_from_db()
+        return
+
+    from video_tutorials.tasks import cut_recording_task
+
+    def send() -> None:
+        try:
+            cut_recording_task.delay(cut.pk)
+        except OperationalError as exc:
+            logger.error("Could not enqueue %s: %s", cut, exc)
+            RecordingCut.objects.filter(pk=cut.pk).update(
+                status=RecordingCut.STATUS_FAILED,
+                processing_error="Video editing is temporarily unavailable.",
+            )
+
+    transaction.on_commit(send)
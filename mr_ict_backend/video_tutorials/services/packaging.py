@@ -0,0 +1,326 @@
+"""Adaptive-bitrate HLS packaging for recordings and lesson videos.
+
+Whenever a `Recording` becomes ready or a `LessonVideo`, `LessonIntroVideo`
+or `LessonInsertVideo` is saved with a new `video_file`, `enqueue_package`
+records a `VideoPackage` and a worker runs `package_video`. One ffmpeg pass
+scales the source to every rung of `VIDEO_HLS_RENDITIONS` no taller than the
+source, with keyframes forced on segment boundaries so players can switch
+rungs between any two segments. The segments, the per-rendition playlists and
+a master playlist are written to a fresh storage prefix, and the previous
+package is deleted once the new one is live. Deleting a video deletes its
+package and every file under the video's prefix (`delete_package`).
+
+`hls_urls_for` returns the master playlist URLs for the playback endpoints.
+The original `video_file` is untouched and stays the fallback for players
+without HLS support and for videos whose package is missing or stale.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import posixpath
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import ffmpeg
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+
+from video_tutorials.models import VideoPackage
+from video_tutorials.services.transcoding import TranscodeError, claim_expired, claimable, local_copy, run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+MASTER_PLAYLIST = "master.m3u8"
+
+
+def probe_source(path: str) -> Tuple[Optional[int], bool, Optional[float]]:
+    """Return `(height, has_audio, duration)` for a video file."""
+
+    info = ffmpeg.probe(path, cmd=settings.VIDEO_FFPROBE_BINARY)
+    streams = info.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    has_audio = any(stream.get("codec_type") == "audio" for stream in streams)
+    duration = info.get("format", {}).get("duration")
+    return (
+        int(video["height"]) if video and video.get("height") else None,
+        has_audio,
+        float(duration) if duration not in (None, "N/A") else None,
+    )
+
+
+def ladder_for(height: Optional[int]) -> List[Dict[str, Any]]:
+    """Renditions from `VIDEO_HLS_RENDITIONS` that do not upscale the source."""
+
+    ladder = sorted(settings.VIDEO_HLS_RENDITIONS, key=lambda rendition: rendition["height"])
+    if height is None:
+        return ladder
+    fitting = [rendition for rendition in ladder if rendition["height"] <= height]
+    if fitting:
+        return fitting
+    # Smaller than the lowest rung: one rendition at the source height.
+    return [dict(ladder[0], name=f"{height - height % 2}p", height=height - height % 2)]
+
+
+def hls_command(source_path: str, output_dir: str, renditions: List[Dict[str, Any]], has_audio: bool) -> List[str]:
+    segment_seconds = settings.VIDEO_HLS_SEGMENT_SECONDS
+    source = ffmpeg.input(source_path)
+    split = source.video.filter_multi_output("split", len(renditions))
+
+    streams = []
+    options: Dict[str, Any] = {}
+    stream_map = []
+    for index, rendition in enumerate(renditions):
+        streams.append(split.stream(index).filter("scale", -2, rendition["height"]))
+        options[f"b:v:{index}"] = f"{rendition['video_kbps']}k"
+        options[f"maxrate:v:{index}"] = f"{int(rendition['video_kbps'] * 1.07)}k"
+        options[f"bufsize:v:{index}"] = f"{rendition['video_kbps'] * 2}k"
+        entry = f"v:{index}"
+        if has_audio:
+            streams.append(source.audio)
+            options[f"b:a:{index}"] = f"{rendition['audio_kbps']}k"
+            entry += f",a:{index}"
+        stream_map.append(f"{entry},name:{rendition['name']}")
+
+    output = ffmpeg.output(
+        *streams,
+        os.path.join(output_dir, "%v", "index.m3u8"),
+        format="hls",
+        vcodec="libx264",
+        preset=settings.VIDEO_TRANSCODE_PRESET,
+        sc_threshold=0,
+        force_key_frames=f"expr:gte(t,n_forced*{segment_seconds})",
+        hls_time=segment_seconds,
+        hls_playlist_type="vod",
+        hls_segment_filename=os.path.join(output_dir, "%v", "segment_%04d.ts"),
+        master_pl_name=MASTER_PLAYLIST,
+        var_stream_map=" ".join(stream_map),
+        **({"acodec": "aac", "ac": 2} if has_audio else {}),
+        **options,
+    )
+    return output.global_args("-progress", "pipe:1", "-nostats", "-loglevel", "error").overwrite_output().compile(
+        cmd=settings.VIDEO_FFMPEG_BINARY
+    )
+
+
+def _video_prefix(content_type: ContentType, object_id) -> str:
+    """Storage prefix holding every package built for one video."""
+
+    return posixpath.join("hls", f"{content_type.app_label}-{content_type.model}", str(object_id))
+
+
+def _package_prefix(package: VideoPackage) -> str:
+    return posixpath.join(_video_prefix(package.content_type, package.object_id), uuid.uuid4().hex[:12])
+
+
+def _upload_tree(local_dir: str, prefix: str) -> None:
+    for root, _, files in os.walk(local_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, local_dir).replace(os.sep, "/")
+            with open(path, "rb") as handle:
+                saved = default_storage.save(posixpath.join(prefix, relative), File(handle))
+            if saved != posixpath.join(prefix, relative):
+                raise TranscodeError(f"Storage renamed {relative} to {saved}; playlists would break")
+
+
+def _delete_tree(prefix: str) -> None:
+    try:
+        directories, files = default_storage.listdir(prefix)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for name in files:
+        default_storage.delete(posixpath.join(prefix, name))
+    for name in directories:
+        _delete_tree(posixpath.join(prefix, name))
+    try:
+        default_storage.delete(prefix)
+    except OSError:
+        pass
+
+
+class _ProgressRecorder:
+    def __init__(self, package_id: int, interval: float = 1.0) -> None:
+        self.package_id = package_id
+        self.interval = interval
+        self._written_at = 0.0
+
+    def __call__(self, percent: float) -> None:
+        now = time.monotonic()
+        if percent < 100 and now - self._written_at < self.interval:
+            return
+        self._written_at = now
+        VideoPackage.objects.filter(pk=self.package_id).update(progress=percent, claimed_at=timezone.now())
+
+
+def _finish(package: VideoPackage, status: str, **fields) -> bool:
+    """Record the job's outcome unless the package was requeued while it ran.
+
+    A replaced `video_file` resets the row to QUEUED with a new `source_name`;
+    the finished job must then leave the row to the job that builds it.
+    """
+
+    finished = VideoPackage.objects.filter(
+        pk=package.pk, status=VideoPackage.STATUS_PROCESSING, source_name=package.source_name
+    ).update(status=status, updated_at=timezone.now(), **fields)
+    if finished:
+        package.status = status
+        for name, value in fields.items():
+            setattr(package, name, value)
+    return bool(finished)
+
+
+def package_video(package_id: int) -> Optional[VideoPackage]:
+    """Build the HLS ladder for a queued package and publish it."""
+
+    package = VideoPackage.objects.select_related("content_type").filter(pk=package_id).first()
+    if package is None or package.status not in (VideoPackage.STATUS_QUEUED, VideoPackage.STATUS_PROCESSING):
+        return None
+    video = package.content_object
+    video_file = getattr(video, "video_file", None)
+    if not video_file or video_file.name != package.source_name:
+        # The video was deleted or replaced; a newer package job supersedes this one.
+        return None
+    # Claim the job in one UPDATE so a redelivered task cannot run it twice
+    # while its first run is alive.
+    now = timezone.now()
+    claimed = VideoPackage.objects.filter(
+        claimable(VideoPackage), pk=package.pk, source_name=package.source_name
+    ).update(status=VideoPackage.STATUS_PROCESSING, progress=0.0, processing_error="", claimed_at=now, updated_at=now)
+    if not claimed:
+        return None
+    package.status, package.progress, package.processing_error = VideoPackage.STATUS_PROCESSING, 0.0, ""
+    package.claimed_at = now
+
+    prefix = _package_prefix(package)
+    try:
+        with local_copy(video_file) as source_path, tempfile.TemporaryDirectory() as output_dir:
+            height, has_audio, duration = probe_source(source_path)
+            renditions = ladder_for(height)
+            run_ffmpeg(
+                hls_command(source_path, output_dir, renditions, has_audio),
+                duration=duration or getattr(video, "duration", None) or 0,
+                on_progress=_ProgressRecorder(package.pk),
+            )
+            _upload_tree(output_dir, prefix)
+    except (TranscodeError, ffmpeg.Error, FileNotFoundError) as exc:
+        detail = exc.stderr.decode("utf-8", "replace")[-2000:] if isinstance(exc, ffmpeg.Error) and exc.stderr else str(exc)
+        logger.error("Packaging %s failed: %s", package, detail)
+        _delete_tree(prefix)
+        _finish(package, VideoPackage.STATUS_FAILED, processing_error=detail)
+        return package
+
+    previous = posixpath.dirname(package.master_playlist) if package.master_playlist else None
+    finished = _finish(
+        package,
+        VideoPackage.STATUS_READY,
+        progress=100.0,
+        master_playlist=posixpath.join(prefix, MASTER_PLAYLIST),
+        renditions=[
+            {
+                "name": rendition["name"],
+                "height": rendition["height"],
+                "bandwidth": (rendition["video_kbps"] + (rendition["audio_kbps"] if has_audio else 0)) * 1000,
+            }
+            for rendition in renditions
+        ],
+    )
+    if not finished:
+        logger.info("Discarding superseded package build for %s", package)
+        _delete_tree(prefix)
+        return None
+    if previous:
+        _delete_tree(previous)
+    return package
+
+
+def enqueue_package(video) -> Optional[VideoPackage]:
+    """Queue HLS packaging for `video` unless its current file is already packaged."""
+
+    video_file = getattr(video, "video_file", None)
+    if not settings.VIDEO_HLS_ENABLED or not video_file:
+        return None
+
+    content_type = ContentType.objects.get_for_model(video)
+    package = VideoPackage.objects.filter(content_type=content_type, object_id=video.pk).first()
+    if (
+        package is not None
+        and package.source_name == video_file.name
+        and package.status != VideoPackage.STATUS_FAILED
+        and not claim_expired(package)
+    ):
+        return package
+    if package is None:
+        package = VideoPackage(content_type=content_type, object_id=video.pk)
+    package.source_name = video_file.name
+    package.status = VideoPackage.STATUS_QUEUED
+    package.progress = 0.0
+    package.processing_error = ""
+    package.save()
+
+    if not settings.VIDEO_TRANSCODE_ASYNC:
+        transaction.on_commit(lambda: package_video(package.pk))
+        return package
+
+    from video_tutorials.tasks import package_video_task
+
+    def send() -> None:
+        try:
+            package_video_task.delay(package.pk)
+        except OperationalError as exc:
+            logger.error("Could not enqueue HLS packaging for %s: %s", package, exc)
+            VideoPackage.objects.filter(pk=package.pk).update(
+                status=VideoPackage.STATUS_FAILED,
+                processing_error="Packaging is temporarily unavailable.",
+            )
+
+    transaction.on_commit(send)
+    return package
+
+
+def delete_package(video) -> None:
+    """Remove `video`'s package row and, once committed, everything under its HLS prefix."""
+
+    content_type = ContentType.objects.get_for_model(video)
+    VideoPackage.objects.filter(content_type=content_type, object_id=video.pk).delete()
+    prefix = _video_prefix(content_type, video.pk)
+    transaction.on_commit(lambda: _delete_tree(prefix))
+
+
+def hls_urls_for(videos: Iterable[Any], build_url=None) -> Dict[Tuple[int, int], str]:
+    """Master playlist URLs keyed on `(content_type_id, pk)` for videos with a current package."""
+
+    videos = [video for video in videos if video is not None and getattr(video, "video_file", None)]
+    if not videos:
+        return {}
+    wanted = {}
+    for video in videos:
+        content_type = ContentType.objects.get_for_model(video)
+        wanted[(content_type.pk, video.pk)] = video.video_file.name
+
+    packages = VideoPackage.objects.filter(
+        content_type_id__in={key[0] for key in wanted},
+        object_id__in={key[1] for key in wanted},
+        status=VideoPackage.STATUS_READY,
+    )
+    urls = {}
+    for package in packages:
+        key = (package.content_type_id, package.object_id)
+        if wanted.get(key) == package.source_name:
+            url = default_storage.url(package.master_playlist)
+            urls[key] = build_url(url) if build_url else url
+    return urls
+
+
+def hls_url(video, build_url=None) -> Optional[str]:
+    if video is None or not getattr(video, "video_file", None):
+        return None
+    content_type = ContentType.objects.get_for_model(video)
+    return hls_urls_for([video], build_url).get((content_type.pk, video.pk))
@@ -0,0 +1,353 @@
+"""Compact, seekable code timelines for recordings and lessons.
+
+Editor snapshots are stored one row per snapshot, each with the full code,
+and consecutive snapshots differ by a few characters. A `CodeTimeline` packs
+them as events:
+
+- a keyframe carries the full `code`;
+- every other event carries `ops` against the previous event's code, as
+  text operations: a positive int keeps that many characters, a negative int
+  deletes that many, a string is inserted; whatever follows the last op is
+  kept. Counts are UTF-16 code units so the player can apply them to
+  JavaScript strings directly.
+
+Each event also has `t` (seconds), `id` (the snapshot row, so resume points
+keep working) and `cursor` / `scroll` when they differ from the previous
+event; `highlight` and `output` appear only when set. A keyframe starts a new
+chunk, at least every `CODE_TIMELINE_KEYFRAME_INTERVAL` events and whenever
+the delta would be larger than the code itself. Chunks are gzipped
+separately and stored back to back, with a seek index of
+`{start, end, count, offset, length}`, so the player fetches the chunk
+holding any timestamp (a keyframe and its deltas) without the rest.
+
+Timelines are rebuilt on read when the rows they came from have changed:
+added, deleted or shifted rows, and rows whose `updated_at` moved. Saving a
+row sets it; a bulk `.update()` does not, so bulk writes must set
+`updated_at=Now()` themselves or call `invalidate_code_timeline`.
+`timeline_response` serves the index and the chunks, slicing each chunk's
+gzip bytes out of the stored blob in the database and passing them straight
+through.
+"""
+from __future__ import annotations
+
+import bisect
+import gzip
+import hashlib
+import json
+import os
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError
+from django.db.models import BinaryField, Count, Max, Sum
+from django.db.models.functions import Substr
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework import status
+from rest_framework.response import Response
+
+from courses.models import Lesson, LessonCodeSnippet
+from video_tutorials.models import CodeSnapshotRecording, CodeTimeline, Recording
+
+FORMAT_VERSION = 1
+# Changed regions longer than this (on both sides) are diffed line by line
+# instead of being replaced wholesale.
+LINE_DIFF_THRESHOLD = 200
+
+Op = Union[int, str]
+
+SNAPSHOT_FIELDS = ("id", "timestamp", "code_content", "cursor_position", "scroll_position", "is_highlight")
+
+
+def _units(text: str) -> int:
+    """Length of `text` in UTF-16 code units, as JavaScript counts it."""
+
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _push(ops: List[Op], op: Op) -> None:
+    if not op:
+        return
+    if ops and type(ops[-1]) is type(op) and (isinstance(op, str) or (ops[-1] > 0) == (op > 0)):
+        ops[-1] += op
+    else:
+        ops.append(op)
+
+
+def text_ops(old: str, new: str) -> List[Op]:
+    """Operations that turn `old` into `new` (see the module docstring)."""
+
+    if old == new:
+        return []
+    prefix = len(os.path.commonprefix([old, new]))
+    suffix = len(os.path.commonprefix([old[prefix:][::-1], new[prefix:][::-1]]))
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+
+    ops: List[Op] = []
+    _push(ops, _units(old[:prefix]))
+    if len(old_mid) > LINE_DIFF_THRESHOLD and len(new_mid) > LINE_DIFF_THRESHOLD and "\n" in old_mid and "\n" in new_mid:
+        old_lines = old_mid.splitlines(keepends=True)
+        new_lines = new_mid.splitlines(keepends=True)
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+            if tag == "equal":
+                _push(ops, _units("".join(old_lines[i1:i2])))
+                continue
+            _push(ops, -_units("".join(old_lines[i1:i2])))
+            _push(ops, "".join(new_lines[j1:j2]))
+    else:
+        _push(ops, -_units(old_mid))
+        _push(ops, new_mid)
+    return ops
+
+
+def apply_ops(code: str, ops: Iterable[Op]) -> str:
+    data = code.encode("utf-16-le")
+    out = []
+    position = 0
+    for op in ops:
+        if isinstance(op, str):
+            out.append(op.encode("utf-16-le"))
+        elif op > 0:
+            out.append(data[position:position + 2 * op])
+            position += 2 * op
+        else:
+            position -= 2 * op
+    out.append(data[position:])
+    return b"".join(out).decode("utf-16-le")
+
+
+def _ops_size(ops: List[Op]) -> int:
+    return len(json.dumps(ops, separators=(",", ":")))
+
+
+def encode_events(rows: Iterable[Dict[str, Any]], keyframe_interval: int) -> List[List[Dict[str, Any]]]:
+    """Group snapshot rows (ordered by timestamp) into chunks of timeline events."""
+
+    chunks: List[List[Dict[str, Any]]] = []
+    previous: Optional[Dict[str, Any]] = None
+    for row in rows:
+        code = row["code_content"] or ""
+        event: Dict[str, Any] = {"t": row["timestamp"], "id": row["id"]}
+        keyframe = previous is None or len(chunks[-1]) >= max(1, keyframe_interval)
+        if not keyframe:
+            ops = text_ops(previous["code_content"] or "", code)
+            keyframe = _ops_size(ops) > len(code)
+        if keyframe:
+            chunks.append([])
+            event["code"] = code
+        else:
+            event["ops"] = ops
+        for field, key in (("cursor_position", "cursor"), ("scroll_position", "scroll")):
+            if keyframe or row[field] != previous[field]:
+                event[key] = row[field]
+        if row.get("is_highlight"):
+            event["highlight"] = True
+        if row.get("output"):
+            event["output"] = row["output"]
+        chunks[-1].append(event)
+        previous = row
+    return chunks
+
+
+def decode_events(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rebuild full snapshots from one chunk's events (the player does the same)."""
+
+    snapshots = []
+    code, cursor, scroll = "", {}, {}
+    for event in events:
+        code = event["code"] if "code" in event else apply_ops(code, event["ops"])
+        cursor = event.get("cursor", cursor)
+        scroll = event.get("scroll", scroll)
+        snapshots.append(
+            {
+                "id": event["id"],
+                "timestamp": event["t"],
+                "code_content": code,
+                "cursor_position": cursor,
+                "scroll_position": scroll,
+                "is_highlight": event.get("highlight", False),
+                "output": event.get("output"),
+            }
+        )
+    return snapshots
+
+
+def pack_chunks(chunks: List[List[Dict[str, Any]]]) -> Tuple[bytes, List[Dict[str, Any]]]:
+    blob = bytearray()
+    index = []
+    for events in chunks:
+        body = json.dumps(
+            {"start": events[0]["t"], "end": events[-1]["t"], "events": events},
+            separators=(",", ":"),
+            ensure_ascii=False,
+        ).encode("utf-8")
+        packed = gzip.compress(body, compresslevel=6, mtime=0)
+        index.append(
+            {
+                "start": events[0]["t"],
+                "end": events[-1]["t"],
+                "count": len(events),
+                "offset": len(blob),
+                "length": len(packed),
+            }
+        )
+        blob.extend(packed)
+    return bytes(blob), index
+
+
+def _source(owner) -> Tuple[Any, Tuple[str, ...]]:
+    if isinstance(owner, Recording):
+        return CodeSnapshotRecording.objects.filter(recording=owner), SNAPSHOT_FIELDS
+    if isinstance(owner, Lesson):
+        rows = LessonCodeSnippet.objects.filter(lesson=owner, is_archived=False)
+        return rows, SNAPSHOT_FIELDS + ("output",)
+    raise TypeError(f"No code snapshots for {owner.__class__.__name__}")
+
+
+def source_fingerprint(owner) -> str:
+    """Digest of the rows' count, ids, timestamps and `updated_at`; one aggregate query."""
+
+    rows, _ = _source(owner)
+    aggregates = {"count": Count("id"), "last": Max("id"), "total": Sum("timestamp"), "updated": Max("updated_at")}
+    summary = rows.aggregate(**aggregates)
+    key = (FORMAT_VERSION, settings.CODE_TIMELINE_KEYFRAME_INTERVAL, sorted((name, str(value)) for name, value in summary.items()))
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+def build_code_timeline(owner, fingerprint: Optional[str] = None) -> CodeTimeline:
+    rows, fields = _source(owner)
+    fingerprint = fingerprint or source_fingerprint(owner)
+    snapshots = list(rows.order_by("timestamp", "id").values(*fields))
+    blob, index = pack_chunks(encode_events(snapshots, settings.CODE_TIMELINE_KEYFRAME_INTERVAL))
+    values = {
+        "version": FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "data": blob,
+        "chunks": index,
+        "event_count": len(snapshots),
+        "raw_bytes": sum(_units(snapshot["code_content"] or "") for snapshot in snapshots),
+        "duration": snapshots[-1]["timestamp"] if snapshots else 0.0,
+    }
+    content_type = ContentType.objects.get_for_model(owner)
+    try:
+        timeline, _ = CodeTimeline.objects.update_or_create(content_type=content_type, object_id=owner.pk, defaults=values)
+    except IntegrityError:
+        # Another request built it concurrently; theirs is as good as ours.
+        timeline = CodeTimeline.objects.get(content_type=content_type, object_id=owner.pk)
+    return timeline
+
+
+def get_code_timeline(owner) -> CodeTimeline:
+    """The current timeline for `owner`, rebuilt if its snapshot rows changed."""
+
+    fingerprint = source_fingerprint(owner)
+    timeline = (
+        CodeTimeline.objects.defer("data")
+        .filter(content_type=ContentType.objects.get_for_model(owner), object_id=owner.pk)
+        .first()
+    )
+    if timeline is not None and timeline.fingerprint == fingerprint:
+        return timeline
+    return build_code_timeline(owner, fingerprint)
+
+
+def invalidate_code_timeline(owner) -> None:
+    CodeTimeline.objects.filter(content_type=ContentType.objects.get_for_model(owner), object_id=owner.pk).delete()
+
+
+def chunk_at(chunks: List[Dict[str, Any]], time: float) -> int:
+    """Index of the chunk holding the snapshot on screen at `time`."""
+
+    starts = [chunk["start"] for chunk in chunks]
+    return max(0, bisect.bisect_right(starts, time) - 1)
+
+
+def _version(timeline: CodeTimeline) -> str:
+    return timeline.fingerprint[:20]
+
+
+def timeline_summary(timeline: CodeTimeline, url: Optional[str] = None) -> Dict[str, Any]:
+    """The seek index; chunk requests to `url` carry `v`, the version it describes."""
+
+    return {
+        "url": f"{url}?v={_version(timeline)}" if url else url,
+        "version": timeline.version,
+        "count": timeline.event_count,
+        "duration": timeline.duration,
+        "chunks": [
+            {"index": index, "start": chunk["start"], "end": chunk["end"], "count": chunk["count"]}
+            for index, chunk in enumerate(timeline.chunks)
+        ],
+    }
+
+
+def _read_chunk(timeline: CodeTimeline, chunk: Dict[str, Any]) -> bytes:
+    """One chunk's bytes, sliced from the stored blob by the database."""
+
+    packed = (
+        CodeTimeline.objects.filter(pk=timeline.pk)
+        .annotate(chunk=Substr("data", chunk["offset"] + 1, chunk["length"], output_field=BinaryField()))
+        .values_list("chunk", flat=True)
+        .get()
+    )
+    return bytes(packed)
+
+
+def _stored_timeline(owner, version: str) -> Optional[CodeTimeline]:
+    return (
+        CodeTimeline.objects.defer("data")
+        .filter(
+            content_type=ContentType.objects.get_for_model(owner),
+            object_id=owner.pk,
+            fingerprint__startswith=version,
+        )
+        .first()
+    )
+
+
+def timeline_response(request, owner):
+    """Seek index by default; `?chunk=<n>` or `?at=<seconds>` returns one chunk of events.
+
+    Chunk requests that name the index version they were planned from (`v`)
+    are served from that stored timeline while it is still stored, skipping
+    the fingerprint query and any rebuild, so a client keeps reading the
+    version its index describes; otherwise the timeline is checked first.
+    """
+
+    chunk_param, at_param = request.GET.get("chunk"), request.GET.get("at")
+    version = request.GET.get("v")
+    timeline = None
+    if version and (chunk_param is not None or at_param is not None):
+        timeline = _stored_timeline(owner, version)
+    if timeline is None:
+        timeline = get_code_timeline(owner)
+    if chunk_param is None and at_param is None:
+        data = timeline_summary(timeline, request.build_absolute_uri(request.path))
+        data["bytes"] = sum(chunk["length"] for chunk in timeline.chunks)
+        data["raw_bytes"] = timeline.raw_bytes
+        return Response({"message": "Successful", "data": data})
+
+    try:
+        index = int(chunk_param) if chunk_param is not None else chunk_at(timeline.chunks, float(at_param))
+    except ValueError:
+        return Response({"message": "chunk and at must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 <= index < len(timeline.chunks):
+        return Response({"message": "Chunk not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    etag = f'"{_version(timeline)}-{index}"'
+    if etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponseNotModified()
+    else:
+        packed = _read_chunk(timeline, timeline.chunks[index])
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = HttpResponse(packed, content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(gzip.decompress(packed), content_type="application/json")
+        response["X-Timeline-Chunk"] = str(index)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    response["Vary"] = "Accept-Encoding"
+    return response
@@ -0,0 +1,275 @@
+"""Background transcoding of uploaded screen recordings.
+
+`record_video_view` stores the upload as `Recording.source_file` and calls
+`enqueue_transcode`; the request returns as soon as the upload is on storage.
+A Celery worker (or the request itself when `VIDEO_TRANSCODE_ASYNC` is off)
+then runs `transcode_recording`, which:
+
+- copies the source to a local temporary file only when the storage backend
+  has no local path for it,
+- runs ffmpeg with `-progress pipe:1` and records the percentage done on the
+  recording as the key=value progress blocks arrive,
+- saves the MP4 to storage from the open file, chunk by chunk, and deletes the
+  source upload.
+
+When the ffmpeg binary is missing the original upload is published as-is, as
+the synchronous view used to do; an ffmpeg failure marks the recording
+failed and keeps the source so the job can be retried.
+
+Transcodes, HLS builds and cuts are claimed by stamping `claimed_at`, which
+progress updates keep fresh. A row left in processing whose claim is older
+than `VIDEO_TRANSCODE_TIMEOUT` belongs to a worker that died mid-job: the
+next delivery of its task reclaims it, and the `requeue_abandoned_jobs` task
+(run by beat) sends that delivery when the broker does not.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import ffmpeg
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from kombu.exceptions import OperationalError
+
+from video_tutorials.models import Recording
+
+logger = logging.getLogger(__name__)
+
+
+class TranscodeError(Exception):
+    """Raised when ffmpeg exits with an error."""
+
+
+def _claim_expiry():
+    return timezone.now() - timedelta(seconds=settings.VIDEO_TRANSCODE_TIMEOUT)
+
+
+def claimable(model) -> Q:
+    """Jobs a worker may claim: queued ones and abandoned processing ones."""
+
+    abandoned = Q(claimed_at__isnull=True) | Q(claimed_at__lt=_claim_expiry())
+    return Q(status=model.STATUS_QUEUED) | (Q(status=model.STATUS_PROCESSING) & abandoned)
+
+
+def claim_expired(job) -> bool:
+    """Whether `job` is stuck in processing under a claim nobody is renewing."""
+
+    return job.status == job.STATUS_PROCESSING and (job.claimed_at is None or job.claimed_at < _claim_expiry())
+
+
+def transcode_command(source_path: str, output_path: str) -> List[str]:
+    stream = ffmpeg.input(source_path).output(
+        output_path,
+        format="mp4",
+        vcodec="libx264",
+        acodec="aac",
+        preset=settings.VIDEO_TRANSCODE_PRESET,
+        movflags="+faststart",
+    )
+    return stream.global_args("-progress", "pipe:1", "-nostats", "-loglevel", "error").overwrite_output().compile(
+        cmd=settings.VIDEO_FFMPEG_BINARY
+    )
+
+
+def progress_blocks(lines: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """Group ffmpeg `-progress` output into one dict per report.
+
+    Each report is a run of `key=value` lines ending with `progress=continue`
+    or `progress=end`.
+    """
+
+    block: Dict[str, str] = {}
+    for line in lines:
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            continue
+        block[key] = value
+        if key == "progress":
+            yield block
+            block = {}
+
+
+def progress_percent(block: Dict[str, str], duration: float) -> Optional[float]:
+    if block.get("progress") == "end":
+        return 100.0
+    # `out_time_ms` is in microseconds despite its name; prefer `out_time_us`.
+    raw = block.get("out_time_us") or block.get("out_time_ms")
+    if not raw or not duration or duration <= 0:
+        return None
+    try:
+        seconds = int(raw) / 1_000_000
+    except ValueError:
+        return None
+    return round(max(0.0, min(99.9, seconds / duration * 100)), 1)
+
+
+def run_ffmpeg(command: List[str], *, duration: float, on_progress: Callable[[float], None]) -> None:
+    """Run an ffmpeg command that writes `-progress pipe:1`, reporting percent done.
+
+    Raises `TranscodeError` on a non-zero exit or after `VIDEO_TRANSCODE_TIMEOUT`.
+    """
+
+    timed_out = threading.Event()
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors, text=True)
+
+        def kill() -> None:
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(settings.VIDEO_TRANSCODE_TIMEOUT, kill)
+        watchdog.start()
+        try:
+            for block in progress_blocks(process.stdout):
+                percent = progress_percent(block, duration)
+                if percent is not None:
+                    on_progress(percent)
+            returncode = process.wait()
+        except BaseException:
+            process.kill()
+            process.wait()
+            raise
+        finally:
+            watchdog.cancel()
+        if timed_out.is_set():
+            raise TranscodeError(f"ffmpeg did not finish within {settings.VIDEO_TRANSCODE_TIMEOUT}s")
+        if returncode != 0:
+            errors.seek(0)
+            detail = errors.read().decode("utf-8", "replace").strip()[-2000:]
+            raise TranscodeError(detail or f"ffmpeg exited with status {returncode}")
+
+
+def run_transcode(
+    source_path: str,
+    output_path: str,
+    *,
+    duration: float,
+    on_progress: Callable[[float], None],
+) -> None:
+    run_ffmpeg(transcode_command(source_path, output_path), duration=duration, on_progress=on_progress)
+
+
+@contextmanager
+def local_copy(field_file) -> Iterator[str]:
+    """Yield a local path for a stored file, downloading it only if needed."""
+
+    try:
+        yield field_file.path
+        return
+    except NotImplementedError:
+        pass
+    suffix = os.path.splitext(field_file.name)[1] or ".tmp"
+    with tempfile.NamedTemporaryFile(suffix=suffix) as copy:
+        with field_file.open("rb") as source:
+            shutil.copyfileobj(source, copy, length=1024 * 1024)
+        copy.flush()
+        yield copy.name
+
+
+class _ProgressRecorder:
+    """Writes progress to the row at most once per interval (and on completion)."""
+
+    def __init__(self, recording_id: int, interval: float = 1.0) -> None:
+        self.recording_id = recording_id
+        self.interval = interval
+        self._written_at = 0.0
+
+    def __call__(self, percent: float) -> None:
+        now = time.monotonic()
+        if percent < 100 and now - self._written_at < self.interval:
+            return
+        self._written_at = now
+        Recording.objects.filter(pk=self.recording_id).update(progress=percent, claimed_at=timezone.now())
+
+
+def _mark(recording: Recording, status: str, **fields) -> None:
+    recording.status = status
+    for name, value in fields.items():
+        setattr(recording, name, value)
+    recording.save(update_fields=["status", *fields])
+
+
+def transcode_recording(recording_id: int) -> Optional[Recording]:
+    """Transcode a queued recording's source upload into its MP4 `video_file`."""
+
+    recording = Recording.objects.filter(pk=recording_id).first()
+    if recording is None or not recording.source_file:
+        return None
+    # Claim the job in one UPDATE so a redelivered task cannot run it twice
+    # while its first run is alive.
+    claimed_at = timezone.now()
+    claimed = Recording.objects.filter(claimable(Recording), pk=recording.pk).update(
+        status=Recording.STATUS_PROCESSING, progress=0.0, processing_error="", claimed_at=claimed_at
+    )
+    if not claimed:
+        return None
+    recording.status, recording.progress, recording.processing_error = Recording.STATUS_PROCESSING, 0.0, ""
+    recording.claimed_at = claimed_at
+
+    output_name = f"{get_valid_filename(recording.title)}.mp4"
+    try:
+        with local_copy(recording.source_file) as source_path, tempfile.NamedTemporaryFile(suffix=".mp4") as output:
+            run_transcode(
+                source_path,
+                output.name,
+                duration=recording.duration,
+                on_progress=_ProgressRecorder(recording.pk),
+            )
+            with open(output.name, "rb") as result:
+                recording.video_file.save(output_name, File(result), save=False)
+    except FileNotFoundError as exc:
+        if getattr(exc, "filename", None) != settings.VIDEO_FFMPEG_BINARY:
+            _mark(recording, Recording.STATUS_FAILED, processing_error=f"{exc.__class__.__name__}: {exc}")
+            raise
+        logger.warning("ffmpeg is not installed; publishing recording %s untranscoded", recording.pk)
+        recording.video_file.name = recording.source_file.name
+        _mark(recording, Recording.STATUS_READY, progress=100.0, video_file=recording.video_file.name)
+        return recording
+    except TranscodeError as exc:
+        logger.error("Transcoding recording %s failed: %s", recording.pk, exc)
+        _mark(recording, Recording.STATUS_FAILED, processing_error=str(exc))
+        return recording
+    except Exception as exc:
+        _mark(recording, Recording.STATUS_FAILED, processing_error=f"{exc.__class__.__name__}: {exc}")
+        raise
+
+    source_name = recording.source_file.name
+    _mark(recording, Recording.STATUS_READY, progress=100.0, video_file=recording.video_file.name, source_file=None)
+    recording.source_file.storage.delete(source_name)
+    return recording
+
+
+def enqueue_transcode(recording: Recording) -> None:
+    """Hand the recording to Celery once the upload is committed (or transcode inline)."""
+
+    if not settings.VIDEO_TRANSCODE_ASYNC:
+        transcode_recording(recording.pk)
+        recording.refresh_from_db()
+        return
+
+    from video_tutorials.tasks import transcode_recording_task
+
+    def send() -> None:
+        try:
+            transcode_recording_task.delay(recording.pk)
+        except OperationalError as exc:
+            logger.error("Could not enqueue transcoding for recording %s: %s", recording.pk, exc)
+            Recording.objects.filter(pk=recording.pk).update(
+                status=Recording.STATUS_FAILED,
+                processing_error="Transcoding is temporarily unavailable.",
+            )
+
+    transaction.on_commit(send)
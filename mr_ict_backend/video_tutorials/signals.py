@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save
+
+from courses.models import Lesson, LessonInsertVideo, LessonIntroVideo, LessonVideo
+from video_tutorials.models import CodeSnapshotRecording, Recording
+from video_tutorials.services.packaging import delete_package, enqueue_package
+from video_tutorials.services.timeline import invalidate_code_timeline
+
+PACKAGED_VIDEOS = (LessonVideo, LessonIntroVideo, LessonInsertVideo, Recording)
+
+
+def package_saved_video(sender, instance, raw=False, **kwargs) -> None:
+    """Queue HLS packaging when a video's file is new or replaced."""
+
+    if raw:
+        return
+    if isinstance(instance, Recording) and instance.status != Recording.STATUS_READY:
+        return
+    enqueue_package(instance)
+
+
+def delete_video_package(sender, instance, **kwargs) -> None:
+    """Drop the HLS package, which is only tied to the video by a generic key."""
+
+    delete_package(instance)
+
+
+for model in PACKAGED_VIDEOS:
+    post_save.connect(
+        package_saved_video,
+        sender=model,
+        dispatch_uid=f"video-tutorials-package-{model._meta.label_lower}",
+    )
+    post_delete.connect(
+        delete_video_package,
+        sender=model,
+        dispatch_uid=f"video-tutorials-unpackage-{model._meta.label_lower}",
+    )
+
+
+def invalidate_recording_timeline(sender, instance, raw=False, **kwargs) -> None:
+    """Drop the cached timeline as soon as a snapshot is saved.
+
+    The row fingerprint would catch the change on the next read too; bulk
+    `.update()` calls bypass this handler and must set `updated_at`.
+    """
+
+    if raw or instance.recording_id is None:
+        return
+    invalidate_code_timeline(Recording(pk=instance.recording_id))
+
+
+post_save.connect(
+    invalidate_recording_timeline,
+    sender=CodeSnapshotRecording,
+    dispatch_uid="video-tutorials-invalidate-code-timeline",
+)
+
+
+def delete_owner_timeline(sender, instance, **kwargs) -> None:
+    """Drop the timeline of a deleted recording or lesson; like packages, it
+    is only tied to its owner by a generic key."""
+
+    invalidate_code_timeline(instance)
+
+
+for model in (Recording, Lesson):
+    post_delete.connect(
+        delete_owner_timeline,
+        sender=model,
+        dispatch_uid=f"video-tutorials-delete-code-timeline-{model._meta.label_lower}",
+    )
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from celery import shared_task
+
+from video_tutorials.models import Recording, RecordingCut, VideoPackage
+from video_tutorials.services.editing import cut_recording
+from video_tutorials.services.packaging import package_video
+from video_tutorials.services.transcoding import claimable, transcode_recording
+
+
+@shared_task(name="video_tutorials.transcode_recording")
+def transcode_recording_task(recording_id: int) -> str:
+    """Transcode an uploaded recording outside the request cycle."""
+
+    recording = transcode_recording(recording_id)
+    if recording is None:
+        return f"Recording {recording_id} skipped"
+    return f"Recording {recording_id} {recording.status}"
+
+
+@shared_task(name="video_tutorials.package_video")
+def package_video_task(package_id: int) -> str:
+    """Build the HLS rendition ladder for a video outside the request cycle."""
+
+    package = package_video(package_id)
+    if package is None:
+        return f"Package {package_id} skipped"
+    return f"Package {package_id} {package.status}"
+
+
+@shared_task(name="video_tutorials.cut_recording")
+def cut_recording_task(cut_id: int) -> str:
+    """Cut a span out of a recording and rebase its code snapshots."""
+
+    cut = cut_recording(cut_id)
+    if cut is None:
+        return f"Cut {cut_id} skipped"
+    return f"Cut {cut_id} {cut.status}"
+
+
+@shared_task(name="video_tutorials.requeue_abandoned_jobs")
+def requeue_abandoned_jobs_task() -> str:
+    """Resend the task of every job left in processing by a worker that died."""
+
+    resent = 0
+    for model, task in (
+        (Recording, transcode_recording_task),
+        (VideoPackage, package_video_task),
+        (RecordingCut, cut_recording_task),
+    ):
+        abandoned = model.objects.filter(claimable(model), status=model.STATUS_PROCESSING)
+        for pk in abandoned.values_list("pk", flat=True):
+            task.delay(pk)
+            resent += 1
+    return f"Requeued {resent} abandoned video job(s)"
@@ -1,3 +1,774 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from courses.models import Course, Lesson, LessonVideo, Module
+from video_tutorials.models import CodeSnapshotRecording, CodeTimeline, Recording, RecordingCut, VideoPackage
+from video_tutorials.services.editing import Piece, cut_plan, cut_recording, rebase_snapshots
+from video_tutorials.services import packaging
+from video_tutorials.services.packaging import enqueue_package, hls_command, hls_url, ladder_for, package_video
+from video_tutorials.services.timeline import apply_ops, decode_events, encode_events, text_ops
+from video_tutorials.services.transcoding import progress_blocks, progress_percent, run_transcode, transcode_recording
+from video_tutorials.tasks import requeue_abandoned_jobs_task
+from video_tutorials.views import publish_recording_view, recording_detail_view
+
+User = get_user_model()
+
+FAKE_FFMPEG = textwrap.dedent(
+    """\
+    #!{python}
+    import shutil, sys
+    args = sys.argv[1:]
+    if "FAIL" in open(args[args.index("-i") + 1], "rb").read().decode("latin-1"):
+        sys.stderr.write("Invalid data found when processing input\\n")
+        sys.exit(1)
+    if "-var_stream_map" in args:
+        import os
+        template = args[args.index("-progress") - 1]
+        root = os.path.dirname(os.path.dirname(template))
+        names = [entry.split("name:")[1] for entry in args[args.index("-var_stream_map") + 1].split()]
+        with open(os.path.join(root, args[args.index("-master_pl_name") + 1]), "w") as master:
+            master.write("#EXTM3U\\n" + "".join(f"#EXT-X-STREAM-INF:BANDWIDTH=1\\n{{name}}/index.m3u8\\n" for name in names))
+        for name in names:
+            os.makedirs(os.path.join(root, name))
+            open(os.path.join(root, name, "index.m3u8"), "w").write("#EXTM3U\\nsegment_0000.ts\\n")
+            open(os.path.join(root, name, "segment_0000.ts"), "wb").write(b"ts")
+    elif "concat" in args:
+        with open(args[args.index("-progress") - 1], "wb") as output:
+            for line in open(args[args.index("-i") + 1]):
+                output.write(open(line.strip()[len("file '"):-1], "rb").read())
+    else:
+        shutil.copyfile(args[args.index("-i") + 1], args[args.index("-progress") - 1])
+    for out_time_us, state in ((500000, "continue"), (1000000, "continue"), (2000000, "end")):
+        print(f"frame=1\\nout_time_us={{out_time_us}}\\nout_time_ms={{out_time_us}}\\nprogress={{state}}", flush=True)
+    """
+)
+
+
+class TranscodeProgressTests(unittest.TestCase):
+    def test_progress_blocks_and_percentages(self):
+        output = [
+            "frame=10\n", "out_time_us=1000000\n", "progress=continue\n",
+            "frame=20\n", "out_time_ms=3000000\n", "progress=continue\n",
+            "out_time_us=N/A\n", "progress=continue\n",
+            "progress=end\n",
+        ]
+        blocks = list(progress_blocks(output))
+
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual([progress_percent(block, 4.0) for block in blocks], [25.0, 75.0, None, 100.0])
+        self.assertIsNone(progress_percent(blocks[0], 0))
+        self.assertEqual(progress_percent({"out_time_us": "9000000"}, 4.0), 99.9)
+
+
+class RecordingTranscodeTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.ffmpeg = os.path.join(self.media, "fake-ffmpeg")
+        with open(self.ffmpeg, "w") as script:
+            script.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IEXEC)
+        overrides = override_settings(MEDIA_ROOT=self.media, VIDEO_FFMPEG_BINARY=self.ffmpeg)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _recording(self, content=b"webm bytes", title="Intro"):
+        return Recording.objects.create(
+            title=title,
+            source_file=SimpleUploadedFile("intro.webm", content),
+            duration=2.0,
+            status=Recording.STATUS_QUEUED,
+        )
+
+    def test_transcode_saves_output_and_removes_the_upload(self):
+        recording = self._recording()
+        source_path = recording.source_file.path
+
+        transcode_recording(recording.pk)
+
+        recording.refresh_from_db()
+        self.assertEqual(recording.status, Recording.STATUS_READY)
+        self.assertEqual(recording.progress, 100.0)
+        self.assertEqual(recording.video_file.name, "recordings/Intro.mp4")
+        with recording.video_file.open("rb") as video:
+            self.assertEqual(video.read(), b"webm bytes")
+        self.assertFalse(recording.source_file)
+        self.assertFalse(os.path.exists(source_path))
+
+    def test_progress_is_reported_from_ffmpeg_output(self):
+        source = os.path.join(self.media, "source.webm")
+        with open(source, "wb") as handle:
+            handle.write(b"webm bytes")
+        reported = []
+
+        run_transcode(source, os.path.join(self.media, "out.mp4"), duration=2.0, on_progress=reported.append)
+
+        self.assertEqual(reported, [25.0, 50.0, 100.0])
+
+    def test_ffmpeg_errors_mark_the_recording_failed_and_keep_the_upload(self):
+        recording = self._recording(b"FAIL")
+
+        transcode_recording(recording.pk)
+
+        recording.refresh_from_db()
+        self.assertEqual(recording.status, Recording.STATUS_FAILED)
+        self.assertIn("Invalid data", recording.processing_error)
+        self.assertTrue(os.path.exists(recording.source_file.path))
+
+    def test_missing_ffmpeg_publishes_the_original_upload(self):
+        recording = self._recording()
+
+        with override_settings(VIDEO_FFMPEG_BINARY=os.path.join(self.media, "no-such-ffmpeg")):
+            transcode_recording(recording.pk)
+
+        recording.refresh_from_db()
+        self.assertEqual(recording.status, Recording.STATUS_READY)
+        self.assertEqual(recording.video_file.name, recording.source_file.name)
+
+    def test_only_queued_recordings_are_processed(self):
+        recording = self._recording()
+        Recording.objects.filter(pk=recording.pk).update(status=Recording.STATUS_READY)
+
+        self.assertIsNone(transcode_recording(recording.pk))
+
+    def test_redelivered_job_does_not_run_twice(self):
+        recording = self._recording()
+        # Another worker claimed the job first.
+        Recording.objects.filter(pk=recording.pk).update(status=Recording.STATUS_PROCESSING, claimed_at=timezone.now())
+
+        with mock.patch("video_tutorials.services.transcoding.run_transcode") as run:
+            self.assertIsNone(transcode_recording(recording.pk))
+        run.assert_not_called()
+        recording.refresh_from_db()
+        self.assertEqual(recording.status, Recording.STATUS_PROCESSING)
+        self.assertTrue(recording.source_file)
+
+    def test_job_abandoned_by_a_dead_worker_is_reclaimed(self):
+        recording = self._recording()
+        # The first worker claimed the job and died without renewing the claim.
+        stale = timezone.now() - timedelta(seconds=settings.VIDEO_TRANSCODE_TIMEOUT + 60)
+        Recording.objects.filter(pk=recording.pk).update(status=Recording.STATUS_PROCESSING, claimed_at=stale)
+
+        with mock.patch("video_tutorials.tasks.transcode_recording_task.delay") as delay:
+            requeue_abandoned_jobs_task()
+        delay.assert_called_once_with(recording.pk)
+
+        with override_settings(VIDEO_FFMPEG_BINARY=os.path.join(self.media, "no-such-ffmpeg")):
+            transcode_recording(recording.pk)
+        recording.refresh_from_db()
+        self.assertEqual(recording.status, Recording.STATUS_READY)
+        self.assertGreater(recording.claimed_at, stale)
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_real_ffmpeg_transcodes_a_generated_clip(self):
+        clip = os.path.join(self.media, "clip.webm")
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=duration=1:size=64x64:rate=10", clip],
+            check=True,
+        )
+        with open(clip, "rb") as source:
+            recording = self._recording(source.read(), title="Generated")
+
+        with override_settings(VIDEO_FFMPEG_BINARY="ffmpeg"):
+            transcode_recording(recording.pk)
+
+        recording.refresh_from_db()
+        self.assertEqual(recording.status, Recording.STATUS_READY, recording.processing_error)
+        with recording.video_file.open("rb") as video:
+            self.assertEqual(video.read(12)[4:8], b"ftyp")
+
+
+@override_settings(VIDEO_TRANSCODE_ASYNC=True)
+class RecordingUploadTests(APITestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=self.media)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.staff = User.objects.create_user(
+            email="recorder@example.com",
+            first_name="Screen",
+            last_name="Recorder",
+            password="testpass123",
+            is_staff=True,
+        )
+        self.client.force_authenticate(self.staff)
+
+    def test_upload_is_accepted_and_queued_for_transcoding(self):
+        CodeSnapshotRecording.objects.create(title="Lesson 1", timestamp=0.5, code_content="<p></p>")
+
+        with mock.patch("video_tutorials.tasks.transcode_recording_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("video-upload"),
+                    {
+                        "title": "Lesson 1",
+                        "duration": "12.5",
+                        "video_file": SimpleUploadedFile("lesson.webm", b"webm bytes"),
+                    },
+                    format="multipart",
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        recording = Recording.objects.get(pk=response.data["data"]["video_id"])
+        self.assertEqual(recording.status, Recording.STATUS_QUEUED)
+        self.assertTrue(recording.source_file.name.startswith("recordings/uploads/"))
+        self.assertFalse(recording.video_file)
+        delay.assert_called_once_with(recording.pk)
+        self.assertEqual(CodeSnapshotRecording.objects.get().recording, recording)
+
+        Recording.objects.filter(pk=recording.pk).update(status=Recording.STATUS_PROCESSING, progress=40.0)
+        response = self.client.get(reverse("recording-status", args=[recording.pk]))
+        self.assertEqual(response.data["data"]["status"], Recording.STATUS_PROCESSING)
+        self.assertEqual(response.data["data"]["progress"], 40.0)
+
+
+    def test_queued_recording_has_no_video_url_and_cannot_be_published(self):
+        Recording.objects.create(title="Ready", video_file="recordings/ready.mp4", duration=5.0)
+        queued = Recording.objects.create(
+            title="Fresh upload", source_file="recordings/uploads/fresh.webm", duration=5.0, status=Recording.STATUS_QUEUED
+        )
+
+        factory = APIRequestFactory()
+        request = factory.get("/")
+        force_authenticate(request, self.staff)
+        detail = recording_detail_view(request, recording_id=queued.pk)
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertIsNone(detail.data["data"]["video_url"])
+        self.assertEqual(detail.data["data"]["status"], Recording.STATUS_QUEUED)
+
+        request = factory.post("/")
+        force_authenticate(request, self.staff)
+        publish = publish_recording_view(request, recording_id=queued.pk)
+        self.assertEqual(publish.status_code, status.HTTP_409_CONFLICT)
+        queued.refresh_from_db()
+        self.assertFalse(queued.published)
+
+        latest = self.client.get(reverse("video_code"))
+        self.assertEqual(latest.status_code, status.HTTP_200_OK)
+        self.assertTrue(latest.data["data"]["video_url"].endswith("recordings/ready.mp4"))
+
+
+class HLSPackagingTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.ffmpeg = os.path.join(self.media, "fake-ffmpeg")
+        with open(self.ffmpeg, "w") as script:
+            script.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IEXEC)
+        overrides = override_settings(MEDIA_ROOT=self.media, VIDEO_FFMPEG_BINARY=self.ffmpeg, VIDEO_HLS_ENABLED=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _recording(self, title="Packaged"):
+        return Recording.objects.create(
+            title=title,
+            published=True,
+            video_file=SimpleUploadedFile("packaged.mp4", b"mp4 bytes"),
+            duration=2.0,
+            status=Recording.STATUS_READY,
+        )
+
+    def test_ladder_skips_rungs_taller_than_the_source(self):
+        self.assertEqual([rung["name"] for rung in ladder_for(540)], ["240p", "360p", "540p"])
+        self.assertEqual([rung["name"] for rung in ladder_for(None)], ["240p", "360p", "540p", "720p"])
+        self.assertEqual([(rung["name"], rung["height"]) for rung in ladder_for(181)], [("180p", 180)])
+
+    def test_command_maps_every_rendition_and_only_existing_audio(self):
+        renditions = ladder_for(360)
+        with_audio = hls_command("in.webm", "out", renditions, has_audio=True)
+        without_audio = hls_command("in.webm", "out", renditions, has_audio=False)
+
+        self.assertEqual(with_audio[with_audio.index("-var_stream_map") + 1], "v:0,a:0,name:240p v:1,a:1,name:360p")
+        self.assertEqual(without_audio[without_audio.index("-var_stream_map") + 1], "v:0,name:240p v:1,name:360p")
+        self.assertNotIn("0:a", without_audio)
+        self.assertIn("expr:gte(t,n_forced*6)", with_audio)
+
+    def test_ready_recordings_are_packaged_and_exposed(self):
+        recording = self._recording()
+        package = VideoPackage.objects.get(object_id=recording.pk)
+        self.assertEqual(package.status, VideoPackage.STATUS_QUEUED)
+        self.assertIsNone(hls_url(recording))
+
+        with mock.patch("video_tutorials.services.packaging.probe_source", return_value=(540, True, 2.0)):
+            package_video(package.pk)
+
+        package.refresh_from_db()
+        self.assertEqual(package.status, VideoPackage.STATUS_READY, package.processing_error)
+        self.assertEqual([rendition["name"] for rendition in package.renditions], ["240p", "360p", "540p"])
+        self.assertEqual(package.renditions[0]["bandwidth"], 364000)
+        master = os.path.join(self.media, package.master_playlist)
+        self.assertTrue(os.path.exists(master))
+        self.assertTrue(os.path.exists(os.path.join(os.path.dirname(master), "360p", "segment_0000.ts")))
+        self.assertEqual(hls_url(recording), f"/media/{package.master_playlist}")
+
+        response = recording_detail_view(APIRequestFactory().get("/"), recording_id=recording.pk)
+        self.assertTrue(response.data["data"]["hls_url"].endswith(package.master_playlist))
+        self.assertTrue(response.data["data"]["video_url"].endswith(".mp4"))
+
+        # A replaced file makes the package stale until it is rebuilt.
+        recording.video_file = SimpleUploadedFile("replaced.mp4", b"new bytes")
+        recording.save()
+        self.assertIsNone(hls_url(recording))
+        old_prefix = os.path.dirname(master)
+        with mock.patch("video_tutorials.services.packaging.probe_source", return_value=(240, False, 2.0)):
+            package_video(package.pk)
+        package.refresh_from_db()
+        self.assertEqual([rendition["name"] for rendition in package.renditions], ["240p"])
+        self.assertFalse(os.path.exists(old_prefix))
+        self.assertIsNotNone(hls_url(recording))
+
+    def test_build_superseded_by_a_replaced_file_is_discarded(self):
+        recording = self._recording()
+        package = VideoPackage.objects.get(object_id=recording.pk)
+        upload_tree = packaging._upload_tree
+
+        def upload_then_replace(local_dir, prefix):
+            upload_tree(local_dir, prefix)
+            recording.video_file = SimpleUploadedFile("replaced.mp4", b"new bytes")
+            recording.save()
+
+        with mock.patch("video_tutorials.services.packaging.probe_source", return_value=(240, True, 2.0)), mock.patch(
+            "video_tutorials.services.packaging._upload_tree", side_effect=upload_then_replace
+        ):
+            self.assertIsNone(package_video(package.pk))
+
+        package.refresh_from_db()
+        self.assertEqual(package.status, VideoPackage.STATUS_QUEUED)
+        self.assertEqual(package.source_name, recording.video_file.name)
+        self.assertEqual(package.master_playlist, "")
+        self.assertEqual(os.listdir(os.path.join(self.media, "hls", "video_tutorials-recording", str(recording.pk))), [])
+
+    def test_failed_packaging_keeps_the_original_as_the_only_source(self):
+        recording = self._recording()
+        package = VideoPackage.objects.get(object_id=recording.pk)
+
+        with override_settings(VIDEO_FFMPEG_BINARY=os.path.join(self.media, "no-such-ffmpeg")), mock.patch(
+            "video_tutorials.services.packaging.probe_source", return_value=(540, True, 2.0)
+        ):
+            package_video(package.pk)
+
+        package.refresh_from_db()
+        self.assertEqual(package.status, VideoPackage.STATUS_FAILED)
+        self.assertIsNone(hls_url(recording))
+        self.assertFalse(os.path.exists(os.path.join(self.media, "hls")))
+
+    def test_deleting_a_video_removes_its_package(self):
+        recording = self._recording()
+        package = VideoPackage.objects.get(object_id=recording.pk)
+        with mock.patch("video_tutorials.services.packaging.probe_source", return_value=(240, True, 2.0)):
+            package_video(package.pk)
+        package.refresh_from_db()
+        video_dir = os.path.dirname(os.path.dirname(os.path.join(self.media, package.master_playlist)))
+        self.assertTrue(os.path.isdir(video_dir))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recording.delete()
+
+        self.assertFalse(VideoPackage.objects.exists())
+        self.assertFalse(os.path.exists(video_dir))
+
+    def test_packages_being_processed_are_not_claimed_again(self):
+        recording = self._recording()
+        package = VideoPackage.objects.get(object_id=recording.pk)
+        VideoPackage.objects.filter(pk=package.pk).update(status=VideoPackage.STATUS_PROCESSING, claimed_at=timezone.now())
+
+        with mock.patch("video_tutorials.services.packaging.run_ffmpeg") as run:
+            self.assertIsNone(package_video(package.pk))
+        run.assert_not_called()
+        self.assertEqual(enqueue_package(recording).status, VideoPackage.STATUS_PROCESSING)
+
+        # Once the claim expires the package is requeued and rebuilt.
+        stale = timezone.now() - timedelta(seconds=settings.VIDEO_TRANSCODE_TIMEOUT + 60)
+        VideoPackage.objects.filter(pk=package.pk).update(claimed_at=stale)
+        self.assertEqual(enqueue_package(recording).status, VideoPackage.STATUS_QUEUED)
+        VideoPackage.objects.filter(pk=package.pk).update(status=VideoPackage.STATUS_PROCESSING, claimed_at=stale)
+        with mock.patch("video_tutorials.services.packaging.probe_source", return_value=(240, True, 2.0)):
+            package_video(package.pk)
+        package.refresh_from_db()
+        self.assertEqual(package.status, VideoPackage.STATUS_READY)
+
+    def test_lesson_videos_are_queued_on_save(self):
+        course = Course.objects.create(title="Web Basics", summary="", description="")
+        module = Module.objects.create(course=course, title="Markup", order=1)
+        lesson = Lesson.objects.create(module=module, title="Semantic HTML", order=1)
+        video = LessonVideo.objects.create(lesson=lesson, video_file=SimpleUploadedFile("lesson.mp4", b"mp4"))
+
+        package = VideoPackage.objects.get(object_id=video.pk, content_type__model="lessonvideo")
+        self.assertEqual(package.source_name, video.video_file.name)
+        video.save()
+        self.assertEqual(VideoPackage.objects.filter(object_id=video.pk, content_type__model="lessonvideo").count(), 1)
+
+
+class CutPlanTests(unittest.TestCase):
+    def test_only_the_gap_before_the_next_keyframe_is_reencoded(self):
+        keyframes = [0.0, 6.0, 12.0, 18.0, 24.0]
+
+        self.assertEqual(
+            cut_plan(30.0, 10.0, 14.5, keyframes),
+            [Piece(0.0, 10.0, True), Piece(14.5, 18.0, False), Piece(18.0, 30.0, True)],
+        )
+        # A cut ending on a keyframe needs no re-encoding at all.
+        self.assertEqual(cut_plan(30.0, 10.0, 12.0, keyframes), [Piece(0.0, 10.0, True), Piece(12.0, 30.0, True)])
+        # Trimming the head or the tail leaves a single piece.
+        self.assertEqual(cut_plan(30.0, 0.0, 6.0, keyframes), [Piece(6.0, 30.0, True)])
+        self.assertEqual(cut_plan(30.0, 25.0, 40.0, keyframes), [Piece(0.0, 25.0, True)])
+        # No keyframe after the cut: the tail is re-encoded.
+        self.assertEqual(cut_plan(30.0, 10.0, 26.0, keyframes), [Piece(0.0, 10.0, True), Piece(26.0, 30.0, False)])
+
+    def test_sources_that_cannot_be_copied_are_reencoded(self):
+        self.assertEqual(cut_plan(30.0, 10.0, 12.0, None), [Piece(0.0, 10.0, False), Piece(12.0, 30.0, False)])
+
+
+class RecordingCutTests(APITestCase):
+    STREAMS = {
+        "video": {"codec_name": "h264", "pix_fmt": "yuv420p", "profile": "High"},
+        "audio": {"codec_name": "aac", "sample_rate": "48000", "channels": 2},
+        "duration": 30.0,
+    }
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.ffmpeg = os.path.join(self.media, "fake-ffmpeg")
+        with open(self.ffmpeg, "w") as script:
+            script.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(self.ffmpeg, os.stat(self.ffmpeg).st_mode | stat.S_IEXEC)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media, VIDEO_FFMPEG_BINARY=self.ffmpeg, VIDEO_HLS_ENABLED=False, VIDEO_TRANSCODE_ASYNC=True
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.staff = User.objects.create_user(
+            email="editor@example.com",
+            first_name="Video",
+            last_name="Editor",
+            password="testpass123",
+            is_staff=True,
+        )
+        self.client.force_authenticate(self.staff)
+        self.recording = Recording.objects.create(
+            title="Lecture",
+            video_file=SimpleUploadedFile("lecture.mp4", b"0123456789"),
+            duration=30.0,
+        )
+        for timestamp in (2.0, 11.0, 13.0, 14.0, 20.0):
+            CodeSnapshotRecording.objects.create(
+                title="Lecture", recording=self.recording, timestamp=timestamp, code_content=f"code at {timestamp}"
+            )
+
+    def _timeline(self):
+        return list(
+            CodeSnapshotRecording.objects.filter(recording=self.recording)
+            .order_by("timestamp")
+            .values_list("timestamp", "code_content")
+        )
+
+    def test_rebase_keeps_the_code_on_screen_when_playback_resumes(self):
+        self.assertEqual(rebase_snapshots(self.recording, 10.0, 14.5), 2)
+        self.assertEqual(
+            self._timeline(), [(2.0, "code at 2.0"), (10.0, "code at 14.0"), (15.5, "code at 20.0")]
+        )
+
+    def test_cut_is_queued_then_applied_in_one_step(self):
+        with mock.patch("video_tutorials.tasks.cut_recording_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse("recording-cut", args=[self.recording.pk]), {"start": 10, "end": 14.5}, format="json"
+                )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        cut = RecordingCut.objects.get(pk=response.data["data"]["id"])
+        delay.assert_called_once_with(cut.pk)
+        self.assertEqual(self._timeline()[1], (11.0, "code at 11.0"))
+
+        conflict = self.client.post(reverse("recording-cut", args=[self.recording.pk]), {"start": 1, "end": 2}, format="json")
+        self.assertEqual(conflict.status_code, status.HTTP_409_CONFLICT)
+
+        old_path = self.recording.video_file.path
+        with mock.patch("video_tutorials.services.editing.probe_streams", return_value=self.STREAMS), mock.patch(
+            "video_tutorials.services.editing.keyframe_times", return_value=[0.0, 6.0, 12.0, 18.0, 24.0]
+        ), self.captureOnCommitCallbacks(execute=True):
+            cut_recording(cut.pk)
+
+        cut.refresh_from_db()
+        self.recording.refresh_from_db()
+        self.assertEqual(cut.status, RecordingCut.STATUS_READY, cut.processing_error)
+        self.assertEqual(cut.reencoded_seconds, 3.5)
+        self.assertEqual(cut.snapshots_removed, 2)
+        self.assertEqual(self.recording.duration, 25.5)
+        self.assertNotEqual(self.recording.video_file.name, cut.source_name)
+        with self.recording.video_file.open("rb") as video:
+            # The fake ffmpeg copies each of the three pieces whole.
+            self.assertEqual(video.read(), b"0123456789" * 3)
+        self.assertFalse(os.path.exists(old_path))
+        self.assertEqual(self._timeline(), [(2.0, "code at 2.0"), (10.0, "code at 14.0"), (15.5, "code at 20.0")])
+
+        response = self.client.get(reverse("recording-cut-status", args=[self.recording.pk, cut.pk]))
+        self.assertEqual(response.data["data"]["status"], RecordingCut.STATUS_READY)
+
+    def test_cuts_being_processed_are_not_claimed_again(self):
+        cut = RecordingCut.objects.create(
+            recording=self.recording,
+            start=10.0,
+            end=14.5,
+            source_name=self.recording.video_file.name,
+            status=RecordingCut.STATUS_PROCESSING,
+            claimed_at=timezone.now(),
+        )
+
+        with mock.patch("video_tutorials.services.editing.render_cut") as render:
+            self.assertIsNone(cut_recording(cut.pk))
+        render.assert_not_called()
+        self.assertEqual(len(self._timeline()), 5)
+
+    def test_failed_render_leaves_recording_and_snapshots_alone(self):
+        cut = RecordingCut.objects.create(
+            recording=self.recording, start=10.0, end=14.5, source_name=self.recording.video_file.name
+        )
+        with mock.patch("video_tutorials.services.editing.probe_streams", return_value=self.STREAMS), mock.patch(
+            "video_tutorials.services.editing.keyframe_times", return_value=[0.0, 6.0, 12.0, 18.0, 24.0]
+        ), override_settings(VIDEO_FFMPEG_BINARY=os.path.join(self.media, "no-such-ffmpeg")):
+            cut_recording(cut.pk)
+
+        cut.refresh_from_db()
+        self.recording.refresh_from_db()
+        self.assertEqual(cut.status, RecordingCut.STATUS_FAILED)
+        self.assertEqual(self.recording.video_file.name, cut.source_name)
+        self.assertEqual(self.recording.duration, 30.0)
+        self.assertEqual(len(self._timeline()), 5)
+
+    def test_unexpected_errors_fail_the_cut_and_remove_its_output(self):
+        cut = RecordingCut.objects.create(
+            recording=self.recording, start=10.0, end=14.5, source_name=self.recording.video_file.name
+        )
+        with mock.patch("video_tutorials.services.editing.probe_streams", return_value=self.STREAMS), mock.patch(
+            "video_tutorials.services.editing.keyframe_times", return_value=[0.0, 6.0, 12.0, 18.0, 24.0]
+        ), mock.patch("video_tutorials.services.editing.rebase_snapshots", side_effect=PermissionError("read-only")):
+            with self.assertRaises(PermissionError):
+                cut_recording(cut.pk)
+
+        cut.refresh_from_db()
+        self.recording.refresh_from_db()
+        self.assertEqual(cut.status, RecordingCut.STATUS_FAILED)
+        self.assertIn("PermissionError", cut.processing_error)
+        self.assertEqual(self.recording.video_file.name, cut.source_name)
+        self.assertEqual(os.listdir(os.path.dirname(self.recording.video_file.path)), [os.path.basename(cut.source_name)])
+
+        response = self.client.post(reverse("recording-cut", args=[self.recording.pk]), {"start": 1, "end": 2}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    def test_invalid_cuts_are_rejected(self):
+        url = reverse("recording-cut", args=[self.recording.pk])
+        for body in ({"start": "a", "end": 2}, {"start": 5, "end": 5}, {"start": 31, "end": 40}, {"start": 0, "end": 30}):
+            self.assertEqual(self.client.post(url, body, format="json").status_code, status.HTTP_400_BAD_REQUEST, body)
+        self.assertFalse(RecordingCut.objects.exists())
+
+    @unittest.skipUnless(shutil.which("ffmpeg") and shutil.which("ffprobe"), "ffmpeg is not installed")
+    def test_real_ffmpeg_cuts_a_generated_clip(self):
+        clip = os.path.join(self.media, "clip.mp4")
+        subprocess.run(
+            [
+                "ffmpeg", "-loglevel", "error",
+                "-f", "lavfi", "-i", "testsrc=duration=6:size=64x64:rate=10",
+                "-f", "lavfi", "-i", "sine=duration=6",
+                "-c:v", "libx264", "-g", "20", "-c:a", "aac", "-shortest", clip,
+            ],
+            check=True,
+        )
+        with open(clip, "rb") as source:
+            self.recording.video_file = SimpleUploadedFile("clip.mp4", source.read())
+        self.recording.duration = 6.0
+        self.recording.save()
+        cut = RecordingCut.objects.create(
+            recording=self.recording, start=1.0, end=2.5, source_name=self.recording.video_file.name
+        )
+
+        with override_settings(VIDEO_FFMPEG_BINARY="ffmpeg", VIDEO_FFPROBE_BINARY="ffprobe"):
+            cut_recording(cut.pk)
+
+        cut.refresh_from_db()
+        self.assertEqual(cut.status, RecordingCut.STATUS_READY, cut.processing_error)
+        self.assertEqual(cut.reencoded_seconds, 1.5)
+        duration = float(subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", self.recording.video_file.path],
+            capture_output=True, text=True, check=True,
+        ).stdout)
+        self.assertAlmostEqual(duration, 4.5, delta=0.2)
+
+
+class CodeTimelineFormatTests(unittest.TestCase):
+    def _rows(self):
+        code = "<html>\n<body>\n</body>\n</html>\n"
+        rows = []
+        for index, edit in enumerate(["<h1>", "Hi 😀", "</h1>", "\n<p>é</p>", "", "<footer/>"] * 5):
+            if edit:
+                position = code.index("</body>")
+                code = code[:position] + edit + code[position:]
+            rows.append(
+                {
+                    "id": index + 1,
+                    "timestamp": index * 1.5,
+                    "code_content": code,
+                    "cursor_position": {"line": 2, "column": index},
+                    "scroll_position": {"scrollTop": 0 if index < 10 else 40},
+                    "is_highlight": index == 3,
+                }
+            )
+        return rows
+
+    def test_ops_round_trip_in_utf16_units(self):
+        self.assertEqual(text_ops("abc", "abc"), [])
+        self.assertEqual(text_ops("<p>a</p>", "<p>ab</p>"), [4, "b"])
+        # The emoji is two UTF-16 code units, as in the player's JavaScript strings.
+        self.assertEqual(text_ops("😀a", "😀b"), [2, -1, "b"])
+        for old, new in (("", "x"), ("x", ""), ("aa", "a"), ("abcabc", "abc"), ("😀a", "😀b😀")):
+            self.assertEqual(apply_ops(old, text_ops(old, new)), new)
+
+        old = "x\n" * 300 + "middle\n" + "y\n" * 300
+        new = "x\n" * 300 + "changed\n" + "y\n" * 150 + "z\n" + "y\n" * 150
+        ops = text_ops(old, new)
+        self.assertEqual(apply_ops(old, ops), new)
+        self.assertLess(sum(len(op) for op in ops if isinstance(op, str)), 20)
+
+    def test_chunks_start_on_keyframes_and_decode_to_the_snapshots(self):
+        rows = self._rows()
+        chunks = encode_events(rows, keyframe_interval=8)
+
+        self.assertEqual([len(chunk) for chunk in chunks], [8, 8, 8, 6])
+        for chunk in chunks:
+            self.assertIn("code", chunk[0])
+            self.assertTrue(all("ops" in event for event in chunk[1:]))
+        self.assertNotIn("scroll", chunks[0][1])
+        self.assertEqual(chunks[0][3]["highlight"], True)
+
+        decoded = [snapshot for chunk in chunks for snapshot in decode_events(chunk)]
+        for row, snapshot in zip(rows, decoded):
+            self.assertEqual(snapshot["code_content"], row["code_content"])
+            self.assertEqual(snapshot["cursor_position"], row["cursor_position"])
+            self.assertEqual(snapshot["scroll_position"], row["scroll_position"])
+            self.assertEqual(snapshot["id"], row["id"])
+
+
+@override_settings(CODE_TIMELINE_KEYFRAME_INTERVAL=4, VIDEO_HLS_ENABLED=False)
+class CodeTimelineApiTests(APITestCase):
+    def setUp(self):
+        self.recording = Recording.objects.create(title="Timeline", video_file="recordings/timeline.mp4", duration=60.0, published=True)
+        code = ""
+        for index in range(10):
+            code += f"<p>{index}</p>\n"
+            CodeSnapshotRecording.objects.create(
+                title="Timeline",
+                recording=self.recording,
+                timestamp=index * 5.0,
+                code_content=code,
+                cursor_position={"line": index},
+                scroll_position={},
+            )
+        self.url = reverse("recording-timeline", args=[self.recording.pk])
+
+    def _chunk(self, **params):
+        response = self.client.get(self.url, params, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        return response, json.loads(gzip.decompress(response.content))
+
+    def test_index_and_seeking(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(3):
+            # Recording, row fingerprint and the stored index; no snapshot rows are read.
+            index = self.client.get(self.url).data["data"]
+        self.assertEqual(index["count"], 10)
+        self.assertEqual([chunk["start"] for chunk in index["chunks"]], [0.0, 20.0, 40.0])
+        self.assertLess(index["bytes"], index["raw_bytes"])
+
+        response, chunk = self._chunk(at=27.5)
+        self.assertEqual(response["X-Timeline-Chunk"], "1")
+        snapshots = decode_events(chunk["events"])
+        self.assertEqual(snapshots[0]["code_content"], CodeSnapshotRecording.objects.get(timestamp=20.0).code_content)
+        self.assertEqual(snapshots[-1]["code_content"], CodeSnapshotRecording.objects.get(timestamp=35.0).code_content)
+
+        not_modified = self.client.get(self.url, {"chunk": 1}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+        plain = self.client.get(self.url, {"chunk": 2})
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(len(json.loads(plain.content)["events"]), 2)
+        self.assertEqual(self.client.get(self.url, {"chunk": 3}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {"at": "soon"}).status_code, 400)
+
+    def test_versioned_chunk_requests_skip_the_fingerprint_check(self):
+        url = self.client.get(self.url).data["data"]["url"]
+        with self.assertNumQueries(3):
+            # Recording, the stored index and the chunk's bytes; no fingerprint aggregate.
+            response = self.client.get(f"{url}&chunk=1")
+        self.assertEqual(len(json.loads(response.content)["events"]), 4)
+
+        # Once the index is rebuilt the old version falls back to the current timeline.
+        CodeSnapshotRecording.objects.filter(recording=self.recording, timestamp=45.0).delete()
+        self.client.get(self.url)
+        events = json.loads(self.client.get(f"{url}&chunk=2").content)["events"]
+        self.assertEqual(len(events), 1)
+
+    def test_deleting_the_recording_drops_its_timeline(self):
+        self.client.get(self.url)
+        self.assertEqual(CodeTimeline.objects.count(), 1)
+
+        self.recording.delete()
+
+        self.assertFalse(CodeTimeline.objects.exists())
+
+    def test_timeline_follows_snapshot_changes(self):
+        self.client.get(self.url)
+        built_at = CodeTimeline.objects.get().built_at
+
+        self.client.get(self.url)
+        self.assertEqual(CodeTimeline.objects.get().built_at, built_at)
+
+        # Bulk rebasing (as a cut does) changes the fingerprint.
+        rebase_snapshots(self.recording, 10.0, 20.0)
+        index = self.client.get(self.url).data["data"]
+        self.assertEqual(index["count"], 8)
+        self.assertEqual(index["duration"], 35.0)
+
+        # An in-place edit invalidates it through the post_save handler.
+        snapshot = CodeSnapshotRecording.objects.get(timestamp=35.0)
+        snapshot.code_content = "edited"
+        snapshot.save()
+        _, chunk = self._chunk(at=35.0)
+        self.assertEqual(decode_events(chunk["events"])[-1]["code_content"], "edited")
+
+        # Bulk content edits that keep the row count and timestamps are seen
+        # through `updated_at`.
+        CodeSnapshotRecording.objects.filter(recording=self.recording).update(
+            cursor_position={"line": 0}, updated_at=timezone.now()
+        )
+        _, chunk = self._chunk(at=35.0)
+        self.assertEqual(decode_events(chunk["events"])[-1]["cursor_position"], {"line": 0})
+
+    def test_recording_detail_links_the_timeline_instead_of_full_snapshots(self):
+        data = recording_detail_view(APIRequestFactory().get("/"), recording_id=self.recording.pk).data["data"]
+        self.assertNotIn("code_snippets", data)
+        self.assertIn(f"{self.url}?v=", data["code_timeline"]["url"])
+        self.assertEqual(len(data["code_timeline"]["chunks"]), 3)
+
+        full = recording_detail_view(APIRequestFactory().get("/", {"snippets": "full"}), recording_id=self.recording.pk)
+        self.assertEqual(len(full.data["data"]["code_snippets"]), 10)
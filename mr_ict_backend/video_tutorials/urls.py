@@ -5,9 +5,13 @@ urlpatterns = [
     # Admin recording endpoints
     path('api/upload/', views.record_video_view, name='video-upload'),
     path('api/save-code-snapshots/', views.save_code_snapshot, name='save-code-snapshots'),
+    path('api/recordings/<int:recording_id>/status/', views.recording_status_view, name='recording-status'),
     path('api/recordings/<int:recording_id>/publish/', views.publish_recording_view, name='publish-recording'),
+    path('api/recordings/<int:recording_id>/cuts/', views.cut_recording_view, name='recording-cut'),
+    path('api/recordings/<int:recording_id>/cuts/<int:cut_id>/', views.recording_cut_status_view, name='recording-cut-status'),
 
     # Student playback endpoints
     path('api/recordings/', views.list_recordings_view, name='list-recordings'),
     path('api/recordings/<int:recording_id>/', views.recording_detail_view, name='recording-detail'),
+    path('api/recordings/<int:recording_id>/timeline/', views.recording_timeline_view, name='recording-timeline'),
 ]
@@ -1,13 +1,8 @@
 from rest_framework.response import Response
 from rest_framework import status
-import ffmpeg
-import os
-import tempfile
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from django.core.files import File
-
-from video_tutorials.models import CodeSnapshotRecording, Recording
+from django.db import transaction
+
+from video_tutorials.models import CodeSnapshotRecording, Recording, RecordingCut
 from rest_framework.decorators import api_view
 
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
@@ -18,10 +13,15 @@ from django.db.models import Q
 from django.contrib.auth import get_user_model
 
 from django.conf import settings
+from django.urls import reverse
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from video_tutorials.serializers import AllRecordingsSerializer, CodeSnapshotRecordingSerializer, RecordingSerializer
+from video_tutorials.serializers import AllRecordingsSerializer, CodeSnapshotRecordingSerializer, RecordingCutSerializer, RecordingSerializer, RecordingStatusSerializer
+from video_tutorials.services.editing import PENDING_STATUSES as CUT_PENDING_STATUSES, enqueue_cut
+from video_tutorials.services.packaging import hls_url
+from video_tutorials.services.timeline import get_code_timeline, timeline_response, timeline_summary
+from video_tutorials.services.transcoding import enqueue_transcode
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -61,70 +61,54 @@ def record_video_view(request):
             payload['errors'] = errors
             return Response(payload, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            # Ensure unique title
-            original_title = title
-            counter = 1
-            while Recording.objects.filter(title=title).exists():
-                title = f"{original_title}_{counter}"
-                counter += 1
-
-            saved_file_name = None
+        # Ensure unique title
+        original_title = title
+        counter = 1
+        while Recording.objects.filter(title=title).exists():
+            title = f"{original_title}_{counter}"
+            counter += 1
 
-            # Try to convert to mp4 if ffmpeg available; else store original
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.tmp') as tmp_file:
-                    for chunk in video_file.chunks():
-                        tmp_file.write(chunk)
-                    tmp_file_path = tmp_file.name
-
-                # Convert using ffmpeg into memory and save to storage
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as out_file:
-                    output_path = out_file.name
-
-                ffmpeg.input(tmp_file_path).output(output_path, format='mp4', vcodec='libx264', acodec='aac').run()
-
-                with open(output_path, 'rb') as f:
-                    mp4_video = ContentFile(f.read(), name=f'{title}.mp4')
-                    saved_file_name = default_storage.save(f'recordings/{title}.mp4', mp4_video)
-
-                # Clean temp files
-                try:
-                    os.remove(tmp_file_path)
-                except Exception:
-                    pass
-                try:
-                    os.remove(output_path)
-                except Exception:
-                    pass
-            except Exception:
-                # Fallback: save the original uploaded file under recordings/
-                saved_file_name = default_storage.save(f'recordings/{video_file.name}', video_file)
-
-            # Create the new video record in the database
+        # Store the upload as-is; transcoding to MP4 happens in the background
+        with transaction.atomic():
             new_video = Recording.objects.create(
                 title=title,
                 description=description,
-                video_file=saved_file_name,
+                source_file=video_file,
                 duration=duration,
+                status=Recording.STATUS_QUEUED,
             )
 
             # Set code snippet IDs
             # Use a batch update with `update()` to set the `recording` field for all matching records
             CodeSnapshotRecording.objects.filter(title=original_title).update(recording=new_video)
 
-            data['video_id'] = new_video.id
+        enqueue_transcode(new_video)
 
-            payload['message'] = "Successful"
-            payload['data'] = data
+        data['video_id'] = new_video.id
+        data['status'] = new_video.status
 
-        except Exception as e:
-            payload['message'] = "Error during video conversion"
-            payload['errors'] = str(e)
-            return Response(payload, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        payload['message'] = "Successful"
+        payload['data'] = data
+
+        response_status = status.HTTP_200_OK if new_video.status == Recording.STATUS_READY else status.HTTP_202_ACCEPTED
+        return Response(payload, status=response_status)
 
     return Response(payload)
 
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recording_status_view(request, recording_id: int):
+    user = getattr(request, 'user', None)
+    if not user or not user.is_staff:
+        return Response({"message": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        rec = Recording.objects.get(id=recording_id)
+    except Recording.DoesNotExist:
+        return Response({"message": "Recording not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({"message": "Successful", "data": RecordingStatusSerializer(rec).data})
+
 @api_view(['POST'])
 def save_code_snapshot_orijay(request):
     payload = {}
@@ -257,6 +241,12 @@ def publish_recording_view(request, recording_id: int):
     if not user or not user.is_staff:
         return Response({"message": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
+    if rec.status != Recording.STATUS_READY or not rec.video_file:
+        return Response(
+            {"message": "Recording is not ready to publish", "data": {"id": rec.id, "status": rec.status}},
+            status=status.HTTP_409_CONFLICT,
+        )
+
     rec.published = True
     rec.save(update_fields=["published"])
     return Response({"message": "Published", "data": {"id": rec.id, "published": rec.published}})
@@ -287,24 +277,44 @@ def recording_detail_view(request, recording_id: int):
     if not rec.published and not (getattr(request, 'user', None) and request.user.is_staff):
         return Response({"message": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
-    snippets = CodeSnapshotRecording.objects.filter(recording=rec).order_by('timestamp')
-    snippets_data = CodeSnapshotRecordingSerializer(snippets, many=True).data
+    # Build absolute or relative URL as provided by storage; there is no file
+    # until transcoding has finished.
+    video_url = rec.video_file.url if rec.video_file else None
+
+    data = {
+        "id": rec.id,
+        "title": rec.title,
+        "description": rec.description,
+        "duration": rec.duration,
+        "published": rec.published,
+        "status": rec.status,
+        "video_url": video_url,
+        "hls_url": hls_url(rec, request.build_absolute_uri),
+        # Code is fetched chunk by chunk from the timeline URL.
+        "code_timeline": timeline_summary(
+            get_code_timeline(rec),
+            request.build_absolute_uri(reverse('recording-timeline', args=[rec.id])),
+        ),
+    }
+    if request.query_params.get('snippets') == 'full':
+        snippets = CodeSnapshotRecording.objects.filter(recording=rec).order_by('timestamp')
+        data["code_snippets"] = CodeSnapshotRecordingSerializer(snippets, many=True).data
+
+    return Response({"message": "Successful", "data": data})
+
+
+# Student: a recording's code timeline (seek index, or one chunk with ?chunk= / ?at=)
+@api_view(['GET'])
+def recording_timeline_view(request, recording_id: int):
+    try:
+        rec = Recording.objects.get(id=recording_id)
+    except Recording.DoesNotExist:
+        return Response({"message": "Recording not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Build absolute or relative URL as provided by storage
-    video_url = getattr(rec.video_file, 'url', None) or str(rec.video_file)
+    if not rec.published and not (getattr(request, 'user', None) and request.user.is_staff):
+        return Response({"message": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
 
-    return Response({
-        "message": "Successful",
-        "data": {
-            "id": rec.id,
-            "title": rec.title,
-            "description": rec.description,
-            "duration": rec.duration,
-            "published": rec.published,
-            "video_url": video_url,
-            "code_snippets": snippets_data,
-        }
-    })
+    return timeline_response(request, rec)
 
 
 
@@ -330,18 +340,22 @@ def get_video_tutorial_details_view(request):
         payload['errors'] = errors
         return Response(payload, status=status.HTTP_400_BAD_REQUEST)
 
-    _video = Recording.objects.order_by('-id').first()
-
-
+    # Uploads still being transcoded have no playable file yet.
+    _video = Recording.objects.filter(status=Recording.STATUS_READY).exclude(video_file='').order_by('-id').first()
+    if _video is None:
+        return Response({"message": "No recording available"}, status=status.HTTP_404_NOT_FOUND)
 
     data['video_url'] = _video.video_file.url
+    data['status'] = _video.status
 
 
-    code_snippets = CodeSnapshotRecording.objects.filter(recording=_video)
-    code_snippets_serializer = CodeSnapshotRecordingSerializer(code_snippets, many=True)
-    code_snippets = code_snippets_serializer.data if code_snippets_serializer else []
-
-    data['code_snippets'] = code_snippets
+    data['code_timeline'] = timeline_summary(
+        get_code_timeline(_video),
+        request.build_absolute_uri(reverse('recording-timeline', args=[_video.id])),
+    )
+    if request.query_params.get('snippets') == 'full':
+        code_snippets = CodeSnapshotRecording.objects.filter(recording=_video)
+        data['code_snippets'] = CodeSnapshotRecordingSerializer(code_snippets, many=True).data
 
 
     payload['message'] = "Successful"
@@ -409,59 +423,63 @@ def get_all_recorded_turorial_view(request):
 
 
 
-def cut_video_and_code(request):
-    data = json.loads(request.body)
-    video_id = data['videoId']
-    start_time = data['start']
-    end_time = data['end']
-
-    # Step 1: Cut the video (you can use a library like moviepy or ffmpeg)
-    # This utility function will handle video cutting and save the new video file
-    cut_video(video_id, start_time, end_time)
-
-    # Step 2: Remove code snapshots in the cut range
-    CodeSnapshotRecording.objects.filter(
-        timestamp__gte=start_time,
-        timestamp__lte=end_time,
-        video_id=video_id
-    ).delete()  # This will delete all code snapshots that fall within the cut range
+# Admin: cut a span out of a recording (and its code snapshots) in the background
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def cut_recording_view(request, recording_id: int):
+    user = getattr(request, 'user', None)
+    if not user or not user.is_staff:
+        return Response({"message": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        rec = Recording.objects.get(id=recording_id)
+    except Recording.DoesNotExist:
+        return Response({"message": "Recording not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Step 3: Adjust the timestamps of the remaining code snapshots that are after the cut range
-    CodeSnapshotRecording.objects.filter(
-        timestamp__gt=end_time,
-        video_id=video_id
-    ).update(
-        timestamp=F('timestamp') - (end_time - start_time)  # Adjust the timestamps
+    errors = {}
+    times = {}
+    for field in ('start', 'end'):
+        try:
+            times[field] = float(request.data.get(field))
+        except (TypeError, ValueError):
+            errors[field] = [f'{field.capitalize()} must be a number of seconds.']
+    if not errors:
+        start, end = times['start'], times['end']
+        if start < 0 or end <= start:
+            errors['end'] = ['End must be after start, and start at least 0.']
+        elif start >= rec.duration:
+            errors['start'] = ['Start is past the end of the recording.']
+        elif start <= 0 and end >= rec.duration:
+            errors['end'] = ['The cut would remove the whole recording.']
+    if errors:
+        return Response({"message": "Errors", "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    if rec.status != Recording.STATUS_READY or not rec.video_file:
+        return Response({"message": "Recording is still processing"}, status=status.HTTP_409_CONFLICT)
+    if rec.cuts.filter(status__in=CUT_PENDING_STATUSES).exists():
+        return Response({"message": "Another cut is in progress"}, status=status.HTTP_409_CONFLICT)
+
+    cut = RecordingCut.objects.create(
+        recording=rec,
+        start=times['start'],
+        end=min(times['end'], rec.duration),
+        source_name=rec.video_file.name,
     )
-
-    # Step 4: Optionally return the updated list of code snapshots
-    remaining_snippets = CodeSnapshotRecording.objects.filter(video_id=video_id).values('id', 'timestamp', 'code_content', 'cursor_position', 'scroll_position')
-    
-    return JsonResponse({'updatedSnippets': list(remaining_snippets)})
-
+    enqueue_cut(cut)
+    return Response({"message": "Cut queued", "data": RecordingCutSerializer(cut).data}, status=status.HTTP_202_ACCEPTED)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recording_cut_status_view(request, recording_id: int, cut_id: int):
+    user = getattr(request, 'user', None)
+    if not user or not user.is_staff:
+        return Response({"message": "Forbidden"}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        cut = RecordingCut.objects.get(id=cut_id, recording_id=recording_id)
+    except RecordingCut.DoesNotExist:
+        return Response({"message": "Cut not found"}, status=status.HTTP_404_NOT_FOUND)
 
-
-
-
-
-
-
-#from moviepy.editor import VideoFileClip
-
-def cut_video(video_id, start_time, end_time):
-    video_path = f'/path/to/videos/{video_id}.mp4'
-    output_path = f'/path/to/output/{video_id}_cut.mp4'
-    
-    video_clip = VideoFileClip(video_path)
-    cut_clip = video_clip.subclip(start_time, end_time)
-    cut_clip.write_videofile(output_path)
-    
-    # Optionally, update your video file path in the database if you want to store it
-    # Video.objects.filter(id=video_id).update(video_file=output_path)
-
-
+    return Response({"message": "Successful", "data": RecordingCutSerializer(cut).data})
 
 
 
@@ -5,6 +5,7 @@ import {
   fetchLessonPlayback,
   updateLessonProgress,
 } from '../../services/studentExperience';
+import { CodeSnapshot, CodeTimelineLoader } from '../../services/codeTimeline';
 import { trackLearningEvent } from '../../services/analytics';
 
 const LESSON_CACHE_PREFIX = 'mrict_lesson_cache_';
@@ -21,6 +22,7 @@ const LessonViewer: React.FC = () => {
   const [usingCache, setUsingCache] = useState(false);
   const [saving, setSaving] = useState(false);
   const [lastPosition, setLastPosition] = useState(0);
+  const [codeSnapshots, setCodeSnapshots] = useState<CodeSnapshot[]>([]);
   const offline = typeof navigator !== 'undefined' && !navigator.onLine;
 
   const cacheKey = lessonId ? `${LESSON_CACHE_PREFIX}${lessonId}` : null;
@@ -74,6 +76,25 @@ const LessonViewer: React.FC = () => {
     }
   }, [data?.lesson.lesson_id, usingCache]);
 
+  // Only the timeline chunk around the playback position is fetched; the next
+  // one is prefetched as playback approaches it.
+  const codeTimeline = useMemo(() => new CodeTimelineLoader(data?.code_timeline), [data?.code_timeline]);
+
+  useEffect(() => {
+    let cancelled = false;
+    codeTimeline
+      .chunkFor(lastPosition)
+      .then((snapshots) => {
+        if (!cancelled) setCodeSnapshots(snapshots);
+      })
+      .catch(() => {
+        // code snapshots are optional; the lesson still plays without them
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [codeTimeline, lastPosition]);
+
   useEffect(() => {
     if (videoRef.current && data) {
       try {
@@ -263,11 +284,11 @@ const LessonViewer: React.FC = () => {
             </section>
           )}
 
-          {data.code_snippets.length > 0 && (
+          {codeSnapshots.length > 0 && (
             <section className="rounded-2xl bg-white p-6 shadow dark:bg-boxdark dark:text-white">
               <h2 className="text-lg font-semibold">Code snapshots</h2>
               <div className="mt-3 space-y-4">
-                {data.code_snippets.map((snippet) => (
+                {codeSnapshots.map((snippet) => (
                   <div key={snippet.id} className="rounded-xl bg-gray-900 p-4 font-mono text-sm text-white">
                     <p className="mb-2 text-xs uppercase tracking-wide text-gray-400">Timestamp {snippet.timestamp}s</p>
                     <pre className="whitespace-pre-wrap">{snippet.code_content}</pre>
@@ -8,9 +8,16 @@ const BranchHistory = ({ lessonId, onSelectBranch }) => {
   useEffect(() => {
     api
       .get(`llm-tutor/api/branches/${lessonId}`)
-      .then((res) => setBranches(res.data))
+      .then((res) => setBranches(res.data.branches))
       .catch((error) => console.error('Error fetching branches:', error));
   }, [lessonId]);
+
+  const selectBranch = (branch) => {
+    api
+      .get(`llm-tutor/api/branches/${lessonId}/${branch.branch_id}/`)
+      .then((res) => onSelectBranch(res.data.code, branch.step.step_number))
+      .catch((error) => console.error('Error fetching branch:', error));
+  };
   
   
   return (
@@ -21,7 +28,7 @@ const BranchHistory = ({ lessonId, onSelectBranch }) => {
           <li key={branch.branch_id} className="py-1">
             <button
               className="text-blue-600 hover:underline"
-              onClick={() => onSelectBranch(branch.code, branch.step.step_number)}
+              onClick={() => selectBranch(branch)}
             >
               Step {branch.step.step_number} - {branch.timestamp}
             </button>
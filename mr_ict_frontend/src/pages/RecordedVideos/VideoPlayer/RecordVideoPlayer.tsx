@@ -3,6 +3,7 @@ import React, { useRef, useState, useEffect } from 'react';
 import { Link, useLocation, useNavigate } from 'react-router-dom';
 import Logo from '../../../images/logo/mrict_logo.jpg';
 import api from '../../../services/apiClient';
+import { CodeTimelineLoader } from '../../../services/codeTimeline';
 import RecDraggableWindow from '../../RecordLesson/Components/RecDraggableWindow';
 import DraggableVideoWindow from '../Components/DraggableVideoWindow';
 import TutorialPage from './Editor/TutorialPage';
@@ -10,7 +11,8 @@ import TutorialPage from './Editor/TutorialPage';
 const RecordVideoPlayer = () => {
   // State for video and code data
   const [videoUrl, setVideoUrl] = useState('');
-  const [codeTimelineData, setCodeTimelineData] = useState([]);
+  // Code timeline chunks are fetched as playback reaches them
+  const timelineRef = useRef<CodeTimelineLoader | null>(null);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
   const [videoError, setVideoError] = useState(null);
@@ -63,17 +65,16 @@ const RecordVideoPlayer = () => {
           : ((import.meta as any).env?.VITE_MEDIA_BASE || '') + url;
         setVideoUrl(fullUrl);
 
-        const sortedSnippets = [...(data.code_snippets || [])].sort(
-          (a, b) => a.timestamp - b.timestamp,
-        );
-        setCodeTimelineData(sortedSnippets);
-
-        if (sortedSnippets.length > 0) {
-          setCurrentCode(sortedSnippets[0].code_content);
-          setHtmlOutput(sortedSnippets[0].code_content);
-          setEditedCode(sortedSnippets[0].code_content);
-          setCursorPosition(sortedSnippets[0].cursor_position);
-          setScrollPosition(sortedSnippets[0].scroll_position);
+        const timeline = new CodeTimelineLoader(data.code_timeline);
+        timelineRef.current = timeline;
+        const { current: firstSnippet } = await timeline.seek(0);
+
+        if (firstSnippet) {
+          setCurrentCode(firstSnippet.code_content);
+          setHtmlOutput(firstSnippet.code_content);
+          setEditedCode(firstSnippet.code_content);
+          setCursorPosition(firstSnippet.cursor_position);
+          setScrollPosition(firstSnippet.scroll_position);
         }
 
         setIsLoading(false);
@@ -106,23 +107,22 @@ const RecordVideoPlayer = () => {
 
   // Enhanced code sync with interpolation
   const syncCodeWithTime = (time) => {
-    if (!codeTimelineData.length) return;
-
-    let appropriateSnippet = codeTimelineData[0];
-    let nextSnippet = null;
-
-    // Find the most recent snippet and the next one for interpolation
-    for (let i = 0; i < codeTimelineData.length; i++) {
-      const snippet = codeTimelineData[i];
-      if (snippet.timestamp <= time) {
-        appropriateSnippet = snippet;
-        if (i + 1 < codeTimelineData.length) {
-          nextSnippet = codeTimelineData[i + 1];
-        }
-      } else {
-        nextSnippet = snippet;
-        break;
-      }
+    const timeline = timelineRef.current;
+    if (!timeline) return;
+
+    // The most recent snippet and the next one for interpolation
+    timeline.prefetch(time);
+    const { current: appropriateSnippet, next: nextSnippet } = timeline.around(time);
+    if (!appropriateSnippet) {
+      // Seeked into a chunk that is not loaded yet; sync once it arrives
+      lastSyncTimeRef.current = time;
+      timeline
+        .seek(time)
+        .then(() => {
+          if (lastSyncTimeRef.current === time) syncCodeWithTime(time);
+        })
+        .catch((err) => console.error('Error loading code timeline:', err));
+      return;
     }
 
     // Update code and cursor
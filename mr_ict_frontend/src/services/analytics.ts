@@ -9,12 +9,52 @@ export interface LearningEventPayload {
   metadata?: Record<string, unknown>;
 }
 
-export const trackLearningEvent = async (payload: LearningEventPayload): Promise<void> => {
+const BATCH_SIZE = 20;
+const FLUSH_DELAY_MS = 2000;
+const MAX_QUEUED = 200;
+
+let queue: LearningEventPayload[] = [];
+let flushTimer: ReturnType<typeof setTimeout> | null = null;
+
+const scheduleFlush = (delay: number) => {
+  if (flushTimer === null) {
+    flushTimer = setTimeout(() => {
+      flushTimer = null;
+      void flushLearningEvents();
+    }, delay);
+  }
+};
+
+export const flushLearningEvents = async (): Promise<void> => {
+  if (!queue.length) {
+    return;
+  }
+  const batch = queue.slice(0, BATCH_SIZE);
+  queue = queue.slice(batch.length);
   try {
-    await api.post('analytics/events/', payload);
+    await api.post('analytics/events/batch/', { events: batch });
   } catch (error) {
+    const status = (error as { response?: { status?: number } })?.response?.status;
+    if (status === 429) {
+      // Backpressure: keep the batch and retry after the server's hint.
+      queue = [...batch, ...queue].slice(0, MAX_QUEUED);
+      const retryIn = (error as { response?: { data?: { retry_in?: number } } })?.response?.data?.retry_in ?? 5;
+      scheduleFlush(retryIn * 1000);
+      return;
+    }
     if (import.meta.env.DEV) {
-      console.warn('Failed to record analytics event', error);
+      console.warn('Failed to record analytics events', error);
     }
   }
+  if (queue.length) {
+    scheduleFlush(queue.length >= BATCH_SIZE ? 0 : FLUSH_DELAY_MS);
+  }
+};
+
+export const trackLearningEvent = async (payload: LearningEventPayload): Promise<void> => {
+  if (queue.length >= MAX_QUEUED) {
+    queue.shift();
+  }
+  queue.push({ occurred_at: new Date().toISOString(), ...payload });
+  scheduleFlush(queue.length >= BATCH_SIZE ? 0 : FLUSH_DELAY_MS);
 };
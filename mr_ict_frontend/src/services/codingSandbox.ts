@@ -57,6 +57,8 @@ export interface RunResult {
 }
 
 export interface SubmitResult {
+  job_id?: string;
+  status?: 'queued' | 'running' | 'completed' | 'failed';
   passed: boolean;
   cases: Array<Record<string, unknown>>;
   files: SandboxFile[];
@@ -92,12 +94,28 @@ export const runChallenge = async (
   return response.data.data;
 };
 
+const SUBMISSION_POLL_INTERVAL_MS = 1000;
+const SUBMISSION_POLL_LIMIT = 120;
+
+const isPending = (result: SubmitResult) => result.status === 'queued' || result.status === 'running';
+
+export const fetchSubmission = async (slug: string, jobId: string): Promise<SubmitResult> => {
+  const response = await api.get<{ data: SubmitResult }>(`${BASE}${slug}/submissions/${jobId}/`);
+  return response.data.data;
+};
+
 export const submitChallenge = async (
   slug: string,
   payload: { files?: SandboxFile[] },
 ): Promise<SubmitResult> => {
   const response = await api.post<{ data: SubmitResult }>(`${BASE}${slug}/submit/`, payload);
-  return response.data.data;
+  let result = response.data.data;
+  // Submissions are graded in the background; poll until the job settles.
+  for (let attempt = 0; isPending(result) && result.job_id && attempt < SUBMISSION_POLL_LIMIT; attempt += 1) {
+    await new Promise((resolve) => setTimeout(resolve, SUBMISSION_POLL_INTERVAL_MS));
+    result = await fetchSubmission(slug, result.job_id);
+  }
+  return result;
 };
 
 export const requestHint = async (
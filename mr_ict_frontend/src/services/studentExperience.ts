@@ -1,4 +1,5 @@
 import api from './apiClient';
+import { CodeTimelineIndex } from './codeTimeline';
 
 export interface StudentProfile {
   student_id: string;
@@ -131,15 +132,7 @@ export interface LessonPlaybackData {
     window_dimension: Record<string, unknown>;
     subtitles_url: string | null;
   }>;
-  code_snippets: Array<{
-    id: number;
-    timestamp: number;
-    code_content: string;
-    cursor_position: Record<string, unknown>;
-    scroll_position: Record<string, unknown>;
-    is_highlight: boolean;
-    output: string | null;
-  }>;
+  code_timeline: CodeTimelineIndex;
   assignments: Array<{
     id: number;
     title: string;